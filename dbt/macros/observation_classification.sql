@@ -0,0 +1,18 @@
+-- The <tier>_classification view: gbifid and the species ... class ids of
+-- each observation in a tier, from taxon_classification. define_arq binds
+-- Observation.species ... class_ from it with materialized_classification,
+-- so a model only reads the classification of the tier it is bound to. Run
+-- as a post_hook of each tier model, which must declare
+-- `-- depends_on: {{ ref('taxon_classification') }}`.
+{% macro observation_classification() %}
+    {% if execute %}
+        {% set view = this.incorporate(path={'identifier': this.identifier ~ '_classification'}) %}
+        {% do run_query(
+            'create or replace view ' ~ view ~ ' as'
+            ~ ' select o.gbifid, c.speciesid, c.genusid, c.familyid, c.orderid, c.classid'
+            ~ ' from ' ~ this ~ ' as o join ' ~ ref('taxon_classification') ~ ' as c on c.taxonid = o.taxonkey'
+        ) %}
+        {# needed for RAI #}
+        {% do run_query('alter view ' ~ view ~ ' set change_tracking=true') %}
+    {% endif %}
+{% endmacro %}
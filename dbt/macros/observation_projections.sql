@@ -0,0 +1,21 @@
+-- Narrow views over an observation tier, <tier>_<projection> with gbifid and
+-- the projection's columns. define_arq binds pruned observation properties
+-- from these (OBSERVATION_PROJECTIONS in kg/model/core/observation.py) so
+-- the engine streams only the columns a query reads. Run as a post_hook of
+-- each tier model; keep the column lists in sync with the Python mapping.
+{% macro observation_projections() %}
+    {% set projections = {
+        'taxon': ['taxonkey'],
+        'time': ['eventdate', 'dayofyear', 'year'],
+        'record': ['basisofrecord', 'countrycode', 'stateprovince'],
+        'location': ['lat', 'lon', 'h3_cell_6', 'h3_cell_7', 'h3_cell_8', 'h3_cell_9', 'h3_cell_10'],
+    } %}
+    {% if execute %}
+        {% for name, columns in projections.items() %}
+            {% set view = this.incorporate(path={'identifier': this.identifier ~ '_' ~ name}) %}
+            {% do run_query('create or replace view ' ~ view ~ ' as select gbifid, ' ~ columns | join(', ') ~ ' from ' ~ this) %}
+            {# needed for RAI #}
+            {% do run_query('alter view ' ~ view ~ ' set change_tracking=true') %}
+        {% endfor %}
+    {% endif %}
+{% endmacro %}
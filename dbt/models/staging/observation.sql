@@ -1,8 +1,14 @@
--- needed for RAI
+-- needed for RAI, and the projection and classification views define_arq binds from
 {{ config(
-    post_hook='alter table {{this}} set change_tracking=true'
+    post_hook=[
+        'alter table {{this}} set change_tracking=true',
+        '{{ observation_projections() }}',
+        '{{ observation_classification() }}',
+    ]
 ) }}
 
+-- depends_on: {{ ref('taxon_classification') }}
+
 
 select
     obs.gbifid,
@@ -15,9 +21,10 @@ select
     obs.stateprovince,
     obs.decimallatitude as lat,
     obs.decimallongitude as lon,
-    H3_LATLNG_TO_CELL(lat, lon, 6) as h3_cell_6, -- 36km
-    H3_LATLNG_TO_CELL(lat, lon, 7) as h3_cell_7, -- 5km
-    H3_LATLNG_TO_CELL(lat, lon, 8) as h3_cell_8, -- 0.7km
-    H3_LATLNG_TO_CELL(lat, lon, 9) as h3_cell_9, -- 0.1km
-    H3_LATLNG_TO_CELL(lat, lon, 10) as h3_cell_10 -- 0.01km
+    -- computed while ingesting the raw file (kg/apps/ingest_observations.py)
+    obs.h3_cell_6, -- 36km
+    obs.h3_cell_7, -- 5km
+    obs.h3_cell_8, -- 0.7km
+    obs.h3_cell_9, -- 0.1km
+    obs.h3_cell_10 -- 0.01km
 from {{ source('gbif', 'observation') }} as obs
@@ -1,8 +1,14 @@
--- needed for RAI
+-- needed for RAI, and the projection and classification views define_arq binds from
 {{ config(
-    post_hook='alter table {{this}} set change_tracking=true'
+    post_hook=[
+        'alter table {{this}} set change_tracking=true',
+        '{{ observation_projections() }}',
+        '{{ observation_classification() }}',
+    ]
 ) }}
 
+-- depends_on: {{ ref('taxon_classification') }}
+
 
 select * from {{ ref('observation') }}
 order by eventdate desc
@@ -0,0 +1,28 @@
+-- needed for RAI
+{{ config(
+    post_hook='alter table {{this}} set change_tracking=true'
+) }}
+
+
+-- Solstice and equinox datetimes per year: the published astropixels table
+-- for 2001-2100, and the computed meeus_soleq seed for every other year
+select
+    year,
+    spring_equinox,
+    summer_solstice,
+    fall_equinox,
+    winter_solstice
+from {{ ref('astropixels_soleq') }}
+
+union all
+
+select
+    m.year,
+    m.spring_equinox,
+    m.summer_solstice,
+    m.fall_equinox,
+    m.winter_solstice
+from {{ ref('meeus_soleq') }} as m
+left join {{ ref('astropixels_soleq') }} as a
+    on a.year = m.year
+where a.year is null
@@ -0,0 +1,44 @@
+-- needed for RAI
+{{ config(
+    post_hook='alter table {{this}} set change_tracking=true'
+) }}
+
+
+-- Resolve every taxon to its accepted taxon, following synonym chains
+-- (a synonym of a synonym) until an accepted name is reached.
+-- Taxa that are accepted, or whose accepted name is missing from the
+-- backbone, map to themselves. So do taxa the chains never reach from an
+-- accepted taxon: synonym cycles (30 -> 31 -> 30), chains running into one,
+-- and chains past the hop limit, as kg/local/synonyms.py resolves them.
+with recursive accepted (taxonid, acceptedtaxonid, hops) as (
+    select
+        t.taxonid,
+        t.taxonid,
+        0
+    from {{ ref('taxon') }} as t
+    left join {{ ref('taxon') }} as a
+        on a.taxonid = t.acceptednameusageid
+    where t.acceptednameusageid is null
+        or t.acceptednameusageid = t.taxonid
+        or a.taxonid is null
+
+    union all
+
+    select
+        t.taxonid,
+        accepted.acceptedtaxonid,
+        accepted.hops + 1
+    from {{ ref('taxon') }} as t
+    join accepted
+        on t.acceptednameusageid = accepted.taxonid
+    where t.acceptednameusageid != t.taxonid
+        and accepted.hops < 10
+)
+
+select
+    t.taxonid,
+    coalesce(accepted.acceptedtaxonid, t.taxonid) as acceptedtaxonid,
+    coalesce(accepted.hops, 0) as hops
+from {{ ref('taxon') }} as t
+left join accepted
+    on accepted.taxonid = t.taxonid
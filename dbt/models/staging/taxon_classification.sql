@@ -0,0 +1,82 @@
+-- needed for RAI
+{{ config(
+    post_hook='alter table {{this}} set change_tracking=true'
+) }}
+
+
+-- The species, genus, family, order and class of every taxon at one of those
+-- ranks, precomputed for kg/model/derived/classification.py. Each observation
+-- tier joins it to its rows in a <tier>_classification view (see
+-- dbt/macros/observation_classification.sql), so a model bound to a tier
+-- only reads that tier's observations. Follows the same
+-- parent chain as kg/model/derived/taxonomy.py: each step goes from a taxon
+-- to a parent of exactly the next rank up, so a species whose parent is not
+-- a genus has no genus (or family, order, class).
+with ranks (taxonrank, depth) as (
+    select * from values
+        ('class', 1),
+        ('order', 2),
+        ('family', 3),
+        ('genus', 4),
+        ('species', 5)
+),
+
+-- Every taxon of a chained rank with its parent of the next rank up
+chained as (
+    select
+        t.taxonid,
+        t.taxonrank,
+        p.taxonid as nextid
+    from {{ ref('taxon') }} as t
+    join ranks as r
+        on r.taxonrank = t.taxonrank
+    left join ranks as pr
+        on pr.depth = r.depth - 1
+    left join {{ ref('taxon') }} as p
+        on p.taxonid = t.parentnameusageid
+        and p.taxonrank = pr.taxonrank
+        and p.taxonid != t.taxonid
+),
+
+-- The taxon and up to four chained ancestors (species -> genus -> family -> order -> class)
+lineage as (
+    select
+        c0.taxonid,
+        iff(c0.taxonrank = 'species', c0.taxonid, null) as speciesid,
+        case
+            when c0.taxonrank = 'genus' then c0.taxonid
+            when c1.taxonrank = 'genus' then c1.taxonid
+        end as genusid,
+        case
+            when c0.taxonrank = 'family' then c0.taxonid
+            when c1.taxonrank = 'family' then c1.taxonid
+            when c2.taxonrank = 'family' then c2.taxonid
+        end as familyid,
+        case
+            when c0.taxonrank = 'order' then c0.taxonid
+            when c1.taxonrank = 'order' then c1.taxonid
+            when c2.taxonrank = 'order' then c2.taxonid
+            when c3.taxonrank = 'order' then c3.taxonid
+        end as orderid,
+        case
+            when c0.taxonrank = 'class' then c0.taxonid
+            when c1.taxonrank = 'class' then c1.taxonid
+            when c2.taxonrank = 'class' then c2.taxonid
+            when c3.taxonrank = 'class' then c3.taxonid
+            when c4.taxonrank = 'class' then c4.taxonid
+        end as classid
+    from chained as c0
+    left join chained as c1 on c1.taxonid = c0.nextid
+    left join chained as c2 on c2.taxonid = c1.nextid
+    left join chained as c3 on c3.taxonid = c2.nextid
+    left join chained as c4 on c4.taxonid = c3.nextid
+)
+
+select
+    taxonid,
+    speciesid,
+    genusid,
+    familyid,
+    orderid,
+    classid
+from lineage
@@ -1,7 +1,8 @@
 import pandas as pd
 from rich.console import Console
 import relationalai.semantics as rai
-from kg.model import ARQModel, define_arq
+from kg.model import ARQModel
+from kg.session import arq_model
 
 """
 Step 1: Taxonomic Hierarchy Query
@@ -31,7 +32,7 @@ def test_solution(result: pd.DataFrame) -> None:
 if __name__ == "__main__":
     console = Console()
     console.print("\n[bold blue]Testing Kata Step 1...")
-    arq = define_arq(rai.Model(f"kata_step_1"))
+    arq = arq_model(query=taxonomic_hierarchy_query)
     result = taxonomic_hierarchy_query(arq).to_df()
     console.print("Step [white]1[/white] - Taxonomic Hierarchy Query Result", style="bold")
     console.print("-" * 50 + "\n" + str(result) + "\n")
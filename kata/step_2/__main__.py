@@ -1,7 +1,8 @@
 import pandas as pd
 from rich.console import Console
 import relationalai.semantics as rai
-from kg.model import ARQModel, define_arq
+from kg.model import ARQModel
+from kg.session import arq_model
 
 """
 Step 2: Species Richness by Region
@@ -13,7 +14,7 @@ Step 2: Species Richness by Region
 def species_richness_query(arq: ARQModel) -> rai.Fragment:
     return rai.select(
         rai.count(arq.Species).where(
-            arq.Observation.classification == arq.Species
+            arq.Observation.species == arq.Species
         ).per(arq.Observation.country_code).alias("species_count"),
         rai.count(arq.Observation).per(arq.Observation.country_code).alias("observation_count"),
         arq.Observation.country_code.alias("country_code"),
@@ -32,7 +33,7 @@ def test_solution(result: pd.DataFrame) -> None:
 if __name__ == "__main__":
     console = Console()
     console.print("\n[bold blue]Testing Kata Step 2...")
-    arq = define_arq(rai.Model(f"kata_step_2"))
+    arq = arq_model(query=species_richness_query)
     result = species_richness_query(arq).to_df()
     console.print("Step [white]2[/white] - Species Richness by Region Result", style="bold")
     console.print("-" * 50 + "\n" + str(result) + "\n")
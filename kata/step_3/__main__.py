@@ -2,7 +2,8 @@ import pandas as pd
 from rich.console import Console
 import relationalai.semantics as rai
 import relationalai.semantics.std as std
-from kg.model import ARQModel, define_arq
+from kg.model import ARQModel
+from kg.session import arq_model
 
 """
 Step 3: Summer Solstice Observations by Location
@@ -16,8 +17,12 @@ def summer_solstice_query(arq: ARQModel) -> rai.Fragment:
     delta_days = std.math.abs(dayofyear(arq.Solstice.datetime) - dayofyear(arq.Observation.event_datetime))
 
     return rai.where(
-        arq.Observation.classification(arq.Species),
-        arq.Species.family(arq.Family),
+        arq.Observation.species(arq.Species),
+        arq.Observation.family(arq.Family),
+        # Only late spring and early summer observations can be near the summer solstice,
+        # so only those are compared with every solstice of their hemisphere
+        arq.Observation.season(arq.Season),
+        arq.Season.id.in_(["spring", "summer"]),
         arq.Solstice.summer(arq.Observation.hemisphere),
         delta_days < 20,
         species_count := rai.count(arq.Species).per(
@@ -44,7 +49,7 @@ def test_solution(result: pd.DataFrame) -> None:
 if __name__ == "__main__":
     console = Console()
     console.print("\n[bold blue]Testing Kata Step 3...")
-    arq = define_arq(rai.Model(f"kata_step_3"))
+    arq = arq_model(query=summer_solstice_query)
     result = summer_solstice_query(arq).to_df()
     console.print("Step [white]3[/white] - Summer Solstice Observations by Location", style="bold")
     console.print("-" * 50 + "\n" + str(result) + "\n")
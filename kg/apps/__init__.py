@@ -0,0 +1,13 @@
+from typing import List
+
+
+def taxon_ids(values: List[str]) -> List[int]:
+    """Resolve command line taxon ids or names (kg.local.names.resolve_taxa), printing each name's matches."""
+    from kg.local.names import resolve_taxa
+
+    ids = []
+    for value, found in resolve_taxa(values).items():
+        if not value.isdigit():
+            print(f"{value}: {found or 'no match'}")
+        ids.extend(found)
+    return ids
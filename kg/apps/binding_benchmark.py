@@ -0,0 +1,87 @@
+"""
+Source Binding Benchmark
+
+Compares observation bindings for an EDA query, on a fresh model each:
+- full: every property bound from the observation tier
+- pruned: only the properties the query reads, still bound from the tier
+- projected: only those properties, bound from the narrow projection views
+  over the tier (see OBSERVATION_PROJECTIONS in kg/model/core/observation.py)
+
+For each it reports the tables and views bound, the bytes Snowflake scans to
+read them in full (as the engine's stream of a bound source does, measured
+from query history with the result cache off), and the time to load the
+model and run the query.
+
+Run with `uv run -m kg.apps.binding_benchmark <query> --table <tier>` eg
+- `uv run -m kg.apps.binding_benchmark observations_per_genus --table OBSERVATION_1m`
+"""
+
+import argparse
+import time
+
+from kg.apps.observation_eda import _get_query_functions
+
+
+def _bytes_scanned(connection, fqn: str) -> int:
+    """Bytes Snowflake scans to read every column of a table or view."""
+    connection.sql(f"select hash_agg(*) from {fqn}").collect()
+    query_id = connection.sql("select last_query_id()").collect()[0][0]
+    rows = connection.sql(f"""
+        select bytes_scanned from table(information_schema.query_history_by_session())
+        where query_id = '{query_id}'
+    """).collect()
+    return int(rows[0][0]) if rows else 0
+
+
+def main():
+    query_functions = _get_query_functions()
+    parser = argparse.ArgumentParser(description="Benchmark full, pruned and projected observation bindings")
+    parser.add_argument('query_name', choices=list(query_functions.keys()))
+    parser.add_argument('--table', default='OBSERVATION_1m', help='Observation tier to bind (default: OBSERVATION_1m)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    args = parser.parse_args()
+
+    import relationalai.semantics as rai
+    from kg.model import define_arq, observation_sources, plan_query
+    from kg.session import get_pool
+
+    query = query_functions[args.query_name]
+    pool = get_pool()
+    connection = pool.connection()
+    connection.sql("alter session set use_cached_result = false").collect()
+
+    print(f"Query: {args.query_name} on {args.db}.{args.schema}.{args.table}")
+    print(f"Probed relationships: {sorted(plan_query(query, args.db, args.schema).relationships)}")
+    results = {}
+    for variant in ("full", "pruned", "projected"):
+        m = rai.Model(f"{pool.model_name}_bind_{variant}_{int(time.time())}", connection=connection)
+        start = time.perf_counter()
+        define_arq(
+            m,
+            db=args.db,
+            schema=args.schema,
+            query=query if variant != "full" else None,
+            observation_table=args.table,
+            project_observations=variant == "projected",
+        )
+        rows = len(query(m).to_df())
+        elapsed = time.perf_counter() - start
+
+        sources = observation_sources(m)
+        scanned = sum(_bytes_scanned(connection, fqn) for fqn in sources)
+        results[variant] = (scanned, elapsed)
+        print(f"\n{variant}: binds {sources}")
+        print(f"  scanned: {scanned / 1e6:,.1f} MB, load + query: {elapsed:.2f}s ({rows} rows)")
+
+    full_scanned, full_elapsed = results["full"]
+    print(f"\n{'variant':<10} {'MB':>10} {'of full':>8} {'seconds':>8} {'of full':>8}")
+    for variant, (scanned, elapsed) in results.items():
+        print(
+            f"{variant:<10} {scanned / 1e6:>10,.1f} {scanned / max(full_scanned, 1):>8.0%}"
+            f" {elapsed:>8.2f} {elapsed / full_elapsed:>8.0%}"
+        )
+
+
+if __name__ == '__main__':
+    main()
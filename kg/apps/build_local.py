@@ -0,0 +1,155 @@
+"""
+Local Artifact Builder
+
+Builds the array-backed artifacts used by client-side tools (see kg/local)
+into the ARQ cache, from Snowflake tables or the raw GBIF files.
+
+Run with `uv run -m kg.apps.build_local <artifact> <args>` eg
+- `uv run -m kg.apps.build_local taxonomy`
+- `uv run -m kg.apps.build_local taxonomy --tsv /path/to/backbone/Taxon.tsv`
+- `uv run -m kg.apps.build_local synonyms`
+- `uv run -m kg.apps.build_local names` (incremental once built, `--rebuild` to start over)
+- `uv run -m kg.apps.build_local cooccurrence --table OBSERVATION_1m --resolution 7`
+- `uv run -m kg.apps.build_local minhash --table OBSERVATION_1m` (adds new observations once built)
+- `uv run -m kg.apps.build_local spatial --table OBSERVATION_1m`
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from kg.cache import cache_dir
+
+
+def _out(args: argparse.Namespace, artifact: str) -> Path:
+    return Path(args.out) if args.out else cache_dir(artifact)
+
+
+def build_taxonomy(args: argparse.Namespace):
+    from kg.local.taxonomy import TaxonomyStore
+
+    if args.tsv:
+        store = TaxonomyStore.from_tsv(args.tsv, _out(args, "taxonomy"))
+    else:
+        from kg.session import get_pool
+        fqn = f"{args.db}.{args.schema}.TAXON"
+        store = TaxonomyStore.from_table(get_pool().connection(), fqn, _out(args, "taxonomy"))
+    print(f"taxonomy: {len(store):,} taxa, {len(store.ranks)} ranks -> {store.path}")
+
+
+def build_synonyms(args: argparse.Namespace):
+    from kg.local.synonyms import SynonymMap
+
+    if args.tsv:
+        synonyms = SynonymMap.from_tsv(args.tsv, _out(args, "synonyms"))
+    else:
+        from kg.session import get_pool
+        fqn = f"{args.db}.{args.schema}.TAXON_ACCEPTED"
+        synonyms = SynonymMap.from_table(get_pool().connection(), fqn, _out(args, "synonyms"))
+    print(f"synonyms: {len(synonyms.accepted):,} taxon ids -> {synonyms.path}")
+
+
+def build_names(args: argparse.Namespace):
+    from kg.local.names import NameIndex, entries_from_tables, entries_from_tsv
+
+    if args.tsv:
+        entries = entries_from_tsv(args.tsv, args.vernacular_tsv)
+    else:
+        from kg.session import get_pool
+        entries = entries_from_tables(get_pool().connection(), args.db, args.schema)
+
+    path = _out(args, "names")
+    if args.rebuild or not (path / "manifest.json").exists():
+        NameIndex.build(entries, path)
+        print(f"names: {len(entries):,} names indexed -> {path}")
+        return
+    index = NameIndex.load(path)
+    changed = index.update(entries)
+    if args.compact:
+        index = index.compact()
+    print(f"names: {changed:,} taxa updated, {len(index.segments)} segments -> {path}")
+
+
+def build_cooccurrence(args: argparse.Namespace):
+    from kg.local.cooccurrence import Incidence
+    from kg.local.taxonomy import TaxonomyStore
+    from kg.session import get_pool
+
+    store = TaxonomyStore.load() if args.rank else None
+    incidence = Incidence.from_table(
+        get_pool().connection(), f"{args.db}.{args.schema}.{args.table}",
+        args.resolution, args.bucket_years, store, args.rank,
+    ).save(_out(args, "cooccurrence"))
+    print(f"cooccurrence: {incidence.shape[0]:,} taxa x {incidence.shape[1]:,} cells, "
+          f"{len(incidence.indices):,} nonzeros -> {incidence.path}")
+
+
+def build_minhash(args: argparse.Namespace):
+    import shutil
+
+    from kg.local.minhash import RangeIndex
+    from kg.session import get_pool
+
+    path = _out(args, "minhash")
+    if args.rebuild:
+        shutil.rmtree(path, ignore_errors=True)
+    index = RangeIndex.refresh(get_pool().connection(), f"{args.db}.{args.schema}.{args.table}", args.resolution, path)
+    print(f"minhash: {len(index.taxa):,} taxa, observations up to GBIFID {index.meta['watermark']} -> {index.path}")
+
+
+def build_spatial(args: argparse.Namespace):
+    from kg.local.spatial import SpatialIndex
+    from kg.session import get_pool
+
+    fqn = f"{args.db}.{args.schema}.{args.table}"
+    index = SpatialIndex.from_table(get_pool().connection(), fqn, _out(args, "spatial"))
+    print(f"spatial: {len(index):,} observations -> {index.path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build local artifacts for client-side tools")
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--out', default=None, help='Output directory (default: the ARQ cache)')
+    artifacts = parser.add_subparsers(dest='artifact', required=True)
+
+    taxonomy = artifacts.add_parser('taxonomy', help='Memory-mapped taxonomy store (kg/local/taxonomy.py)')
+    taxonomy.add_argument('--tsv', default=None, help='Build from GBIF backbone Taxon.tsv instead of the TAXON table')
+    taxonomy.set_defaults(build=build_taxonomy)
+
+    synonyms = artifacts.add_parser('synonyms', help='Synonym to accepted taxon map (kg/local/synonyms.py)')
+    synonyms.add_argument('--tsv', default=None, help='Build from GBIF backbone Taxon.tsv instead of the TAXON_ACCEPTED table')
+    synonyms.set_defaults(build=build_synonyms)
+
+    names = artifacts.add_parser('names', help='Taxon name index (kg/local/names.py)')
+    names.add_argument('--tsv', default=None, help='Build from GBIF backbone Taxon.tsv instead of the TAXON table')
+    names.add_argument('--vernacular-tsv', default=None, help='GBIF backbone VernacularName.tsv to index with --tsv')
+    names.add_argument('--rebuild', action='store_true', help='Rebuild from scratch instead of updating changed taxa')
+    names.add_argument('--compact', action='store_true', help='Fold the index segments into one after updating')
+    names.set_defaults(build=build_names)
+
+    cooccurrence = artifacts.add_parser('cooccurrence', help='Taxon x H3 cell incidence matrix (kg/local/cooccurrence.py)')
+    cooccurrence.add_argument('--table', default='OBSERVATION_10k', help='Observation tier (default: OBSERVATION_10k)')
+    cooccurrence.add_argument('--resolution', type=int, default=6, choices=range(6, 11), help='H3 resolution (default: 6)')
+    cooccurrence.add_argument('--bucket-years', type=int, default=0, help='Split cells into buckets of this many years (default: no buckets)')
+    cooccurrence.add_argument('--rank', default='species', help="Roll classifications up to this rank with the taxonomy store, '' to keep them (default: species)")
+    cooccurrence.set_defaults(build=build_cooccurrence)
+
+    minhash = artifacts.add_parser('minhash', help='MinHash / LSH index of taxon ranges (kg/local/minhash.py)')
+    minhash.add_argument('--table', default='OBSERVATION_10k', help='Observation tier (default: OBSERVATION_10k)')
+    minhash.add_argument('--resolution', type=int, default=6, choices=range(6, 11), help='H3 resolution (default: 6)')
+    minhash.add_argument('--rebuild', action='store_true', help='Rebuild from scratch instead of adding new observations')
+    minhash.set_defaults(build=build_minhash)
+
+    spatial = artifacts.add_parser('spatial', help='Ball tree over observation coordinates (kg/local/spatial.py)')
+    spatial.add_argument('--table', default='OBSERVATION_10k', help='Observation tier (default: OBSERVATION_10k)')
+    spatial.set_defaults(build=build_spatial)
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    args.build(args)
+    print(f"built in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Classification Benchmark
+
+Compares queries that join each observation's classification up the taxon
+chain (Observation.classification -> Taxon.genus / Species.family / ...) in
+every query with the same queries on the derived Observation.species ...
+Observation.class_ (see kg/model/derived/classification.py), and optionally
+with those bound from the tier's dbt view <tier>_classification:
+- observations_per_genus, synonym_recovery and
+  species_before_summer_solstice_by_class from observation_eda
+- kata steps 2 and 3
+
+Each variant is defined and run on a fresh model; the report shows load +
+query time, rows, and whether every variant returns the same rows as the chain;
+it exits non-zero if any does not.
+
+Run with `uv run -m kg.apps.classification_benchmark <args>` eg
+- `uv run -m kg.apps.classification_benchmark --table OBSERVATION_1m`
+- `uv run -m kg.apps.classification_benchmark observations_per_genus --materialized --repeat 3`
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from typing import TYPE_CHECKING
+
+from kg.profiling import lazy_import
+
+rai = lazy_import("relationalai.semantics")
+std = lazy_import("relationalai.semantics.std")
+
+if TYPE_CHECKING:
+    import relationalai.semantics as rai
+    from kg.model import ARQModel
+
+
+def observations_per_genus_by_chain(arq: ARQModel, threshold: int = 10) -> rai.Fragment:
+    """observations_per_genus as written before Observation.genus."""
+    return rai.where(
+        arq.Observation.classification(arq.Taxon),
+        arq.Taxon.genus(arq.Genus),
+        obs_count := rai.count(arq.Observation).per(arq.Genus),
+        obs_count > threshold
+    ).select(
+        obs_count.alias("observation_count"),
+        rai.sum(obs_count),
+        arq.Genus.canonical_name.alias("genus_name"),
+        arq.Genus.id.alias("genus_id"),
+    )
+
+
+def synonym_recovery_by_chain(arq: ARQModel) -> rai.Fragment:
+    """synonym_recovery as written before Observation.genus."""
+    classified = arq.Taxon.ref()
+    accepted = arq.Taxon.ref()
+
+    return rai.where(
+        arq.Observation.classification(classified),
+        rai.not_(classified.genus(arq.Genus.ref())),
+        arq.Observation.accepted_taxon(accepted),
+        accepted.genus(arq.Genus),
+    ).select(
+        rai.count(arq.Observation).alias("recovered_count"),
+    )
+
+
+def before_summer_solstice_by_chain(arq: ARQModel, year: int = 2025) -> rai.Fragment:
+    """species_before_summer_solstice_by_class as written before Observation.species / class_."""
+    return rai.where(
+        arq.Observation.country_code("US"),
+        arq.Observation.year(year),
+        arq.Observation.classification(arq.Species),
+        arq.Species.class_(arq.Class),
+        arq.Observation.event_datetime < arq.Observation.year.june_solstice,
+        species_count := rai.count(arq.Species).per(arq.Class),
+    ).select(
+        species_count.alias("species_count"),
+        arq.Class.canonical_name.alias("class_name"),
+    )
+
+
+def species_richness_by_chain(arq: ARQModel) -> rai.Fragment:
+    """Kata step 2 as written before Observation.species."""
+    return rai.select(
+        rai.count(arq.Species).where(
+            arq.Observation.classification == arq.Species
+        ).per(arq.Observation.country_code).alias("species_count"),
+        rai.count(arq.Observation).per(arq.Observation.country_code).alias("observation_count"),
+        arq.Observation.country_code.alias("country_code"),
+    )
+
+
+def summer_solstice_by_chain(arq: ARQModel) -> rai.Fragment:
+    """Kata step 3 with the taxon chain in place of Observation.species / family."""
+    dayofyear = std.datetime.datetime.dayofyear
+    delta_days = std.math.abs(dayofyear(arq.Solstice.datetime) - dayofyear(arq.Observation.event_datetime))
+
+    return rai.where(
+        arq.Observation.classification(arq.Species),
+        arq.Species.family(arq.Family),
+        arq.Observation.season(arq.Season),
+        arq.Season.id.in_(["spring", "summer"]),
+        arq.Solstice.summer(arq.Observation.hemisphere),
+        delta_days < 20,
+        species_count := rai.count(arq.Species).per(
+            arq.Family,
+            arq.Observation.country_code,
+            arq.Observation.state_province,
+        ),
+    ).select(
+        species_count.alias("species_count"),
+        arq.Family.canonical_name.alias("family_name"),
+        arq.Observation.country_code.alias("country_code"),
+        arq.Observation.state_province.alias("state_province"),
+    )
+
+
+def _cases():
+    """Chain and derived query per benchmark case."""
+    from kata.step_2.__main__ import species_richness_query
+    from kata.step_3.__main__ import summer_solstice_query
+    from kg.apps.observation_eda import (
+        observations_per_genus,
+        species_before_summer_solstice_by_class,
+        synonym_recovery,
+    )
+
+    return {
+        "observations_per_genus": (observations_per_genus_by_chain, observations_per_genus),
+        "synonym_recovery": (synonym_recovery_by_chain, synonym_recovery),
+        "before_summer_solstice": (before_summer_solstice_by_chain, species_before_summer_solstice_by_class),
+        "kata_step_2": (species_richness_by_chain, species_richness_query),
+        "kata_step_3": (summer_solstice_by_chain, summer_solstice_query),
+    }
+
+
+def _same_rows(a, b) -> bool:
+    if list(a.columns) != list(b.columns):
+        return False
+    key = list(a.columns)
+    a = a.astype(str).sort_values(key).reset_index(drop=True)
+    b = b.astype(str).sort_values(key).reset_index(drop=True)
+    return a.equals(b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rank queries through the taxon chain and on the derived Observation ranks")
+    parser.add_argument('cases', nargs='*', help='Cases to run (default: all of observations_per_genus, synonym_recovery, before_summer_solstice, kata_step_2, kata_step_3)')
+    parser.add_argument('--table', default='OBSERVATION_10k', help='Observation tier to bind (default: OBSERVATION_10k)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--materialized', action='store_true', help="Also run the derived queries on the tier's classification view (dbt)")
+    parser.add_argument('--repeat', type=int, default=1, help='Query runs per variant after the first (default: 1)')
+    args = parser.parse_args()
+
+    from kg.model import define_arq
+    from kg.session import get_pool
+
+    cases = _cases()
+    unknown = set(args.cases) - set(cases)
+    if unknown:
+        parser.error(f"unknown cases {sorted(unknown)}, expected some of {list(cases)}")
+
+    pool = get_pool()
+    connection = pool.connection()
+    mismatched = []
+    for case in args.cases or cases:
+        chain, derived = cases[case]
+        variants = [("chain", chain, False), ("derived", derived, False)]
+        if args.materialized:
+            variants.append(("materialized", derived, True))
+
+        print(f"\n{case} on {args.db}.{args.schema}.{args.table}")
+        results = {}
+        for variant, query, materialized in variants:
+            m = rai.Model(f"{pool.model_name}_classification_{case}_{variant}_{int(time.time())}", connection=connection)
+            start = time.perf_counter()
+            define_arq(
+                m, db=args.db, schema=args.schema, query=query,
+                observation_table=args.table, materialized_classification=materialized,
+            )
+            results[variant] = query(m).to_df()
+            first = time.perf_counter() - start
+            runs = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                query(m).to_df()
+                runs.append(time.perf_counter() - start)
+            again = f", then {min(runs):.2f}s" if runs else ""
+            same = ""
+            if variant != "chain":
+                agree = _same_rows(results['chain'], results[variant])
+                if not agree:
+                    mismatched.append(f"{case} {variant}")
+                same = f", same rows: {agree}"
+            print(f"  {variant}: load + query {first:.2f}s{again} ({len(results[variant])} rows{same})")
+
+    if mismatched:
+        sys.exit(f"rows differ from the chain: {', '.join(mismatched)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Dedup Observations
+
+Clusters duplicate records of the same sighting (same taxon, H3 cell at
+resolution 9 and day, within distance and time tolerances), streaming only
+the candidate blocks out of the observation table, and writes cluster ids to
+OBSERVATION_DUPLICATES, bound in the model as Observation.is_duplicate (see
+kg/local/dedup.py).
+
+Run with `uv run -m kg.apps.dedup_observations <args>` eg
+- `ARQ_OBSERVATION_TABLE=OBSERVATION uv run -m kg.apps.dedup_observations`
+- `uv run -m kg.apps.dedup_observations --max-meters 50 --max-minutes 30 --dry-run`
+
+Then count events rather than records, eg
+- `uv run -m kg.apps.observation_eda observations_per_genus --deduplicate`
+"""
+
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster duplicate observation records")
+    parser.add_argument('--table', help='Observation tier (default: the tier the shared model binds, see ARQ_OBSERVATION_TABLE)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--max-meters', type=float, default=100.0, help='Link records at most this far apart (default: 100)')
+    parser.add_argument('--max-minutes', type=float, default=60.0, help='Link timed records at most this far apart (default: 60)')
+    parser.add_argument('--max-block', type=int, default=1000, help='Compare each record with at most this many later records of its block (default: 1000)')
+    parser.add_argument('--dry-run', action='store_true', help='Report without writing the duplicate table')
+    args = parser.parse_args()
+
+    from kg.local.dedup import DUPLICATE_TABLE, DedupParams, candidates_sql, cluster_batches, write_duplicates
+    from kg.session import get_pool
+
+    pool = get_pool()
+    connection = pool.connection()
+    args.table = args.table or pool.observation_table
+    params = DedupParams(args.max_meters, args.max_minutes, args.max_block)
+
+    start = time.perf_counter()
+    batches = connection.sql(candidates_sql(f"{args.db}.{args.schema}.{args.table}")).to_pandas_batches()
+    clusters = cluster_batches(batches, params)
+    done = time.perf_counter()
+
+    sizes = clusters.drop_duplicates("CLUSTERID")["CLUSTERSIZE"]
+    print(f"\nClusters ({len(sizes):,}, {len(clusters):,} records), by size:")
+    print(sizes.value_counts().sort_index().head(20))
+    if not args.dry_run:
+        count = write_duplicates(connection, clusters, args.db, args.schema)
+        print(f"wrote {args.db}.{args.schema}.{DUPLICATE_TABLE}: {count:,} duplicate records")
+    print(f"\ndedup: {done - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Export Observations
+
+Streams raw observation records with their taxon's name and rank
+(observation_eda observation_records) into a Parquet file one page at a
+time, keyset-paginated on Observation.id, with the next page fetched while
+the current one is written (see kg/paging.py). Memory stays at about two
+pages whatever the tier.
+
+Run with `uv run -m kg.apps.export_observations <out> <args>` eg
+- `uv run -m kg.apps.export_observations observations_2024.parquet --year 2024 --table OBSERVATION_1m`
+- `uv run -m kg.apps.export_observations rest.parquet --year 2024 --after 4012345678` (resume after an id)
+"""
+
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream observation records into Parquet page by page")
+    parser.add_argument('out', help='Parquet file to write')
+    parser.add_argument('--year', type=int, default=2025, help='Year of the observations (default: 2025)')
+    parser.add_argument('--page-size', type=int, default=100_000, help='Rows per page (default: 100000)')
+    parser.add_argument('--after', type=int, default=None, help='Resume after this observation id')
+    parser.add_argument('--prefetch', action=argparse.BooleanOptionalAction, default=True, help='Fetch the next page in the background (default: on)')
+    parser.add_argument('--table', default='OBSERVATION_10k', help='Observation tier (default: OBSERVATION_10k)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    args = parser.parse_args()
+
+    import relationalai.semantics as rai
+
+    from kg.apps.observation_eda import observation_records
+    from kg.model import define_arq
+    from kg.paging import ResultCursor
+    from kg.session import get_pool
+
+    pool = get_pool()
+    query = lambda arq: observation_records(arq, year=args.year)
+    m = rai.Model(f"{pool.model_name}_export_{args.table.lower()}", connection=pool.connection())
+    define_arq(m, db=args.db, schema=args.schema, query=query, observation_table=args.table)
+
+    cursor = ResultCursor(query(m), m.Observation.id, "id", args.page_size, args.after, args.prefetch)
+    start = time.perf_counter()
+    rows = cursor.write_parquet(args.out)
+    elapsed = time.perf_counter() - start
+    print(f"\nWrote {rows} rows in {cursor.pages} pages to {args.out} in {elapsed:.2f}s")
+    if rows:
+        print(f"Last id: {cursor.after} (pass --after to resume from it)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Flag Outliers
+
+Flags observations whose coordinates are implausible for their species, in
+one streaming pass over an observation table, and writes the flagged
+(taxon, H3 cell) pairs to OBSERVATION_OUTLIER_CELLS, bound in the model as
+Observation.is_outlier (see kg/local/outliers.py).
+
+Run with `uv run -m kg.apps.flag_outliers <args>` eg
+- `ARQ_OBSERVATION_TABLE=OBSERVATION_1m uv run -m kg.apps.flag_outliers`
+- `uv run -m kg.apps.flag_outliers --distance-factor 8 --min-km 1000 --dry-run`
+
+Then filter EDA queries on it, eg
+- `uv run -m kg.apps.observation_eda observations_per_genus --exclude-outliers`
+
+Build the taxonomy store first with `uv run -m kg.apps.build_local taxonomy`.
+"""
+
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag observations far outside their species' range")
+    parser.add_argument('--table', help='Observation tier (default: the tier the shared model binds, see ARQ_OBSERVATION_TABLE)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--distance-factor', type=float, default=5.0, help='Flag cells this many median distances from the range center (default: 5)')
+    parser.add_argument('--min-km', type=float, default=500.0, help='Never flag cells closer than this to the range center (default: 500)')
+    parser.add_argument('--density-resolution', type=int, default=3, help='H3 resolution of the density neighbourhood (default: 3)')
+    parser.add_argument('--min-density', type=int, default=2, help='Flag distant cells whose neighbourhood has fewer observations (default: 2)')
+    parser.add_argument('--min-observations', type=int, default=20, help='Skip species with fewer observations (default: 20)')
+    parser.add_argument('--dry-run', action='store_true', help='Report without writing the outlier table')
+    args = parser.parse_args()
+
+    from kg.local.outliers import OUTLIER_TABLE, OutlierParams, accumulate_cells, flag_cells, observation_batches_sql, write_outliers
+    from kg.local.taxonomy import TaxonomyStore
+    from kg.session import get_pool
+
+    pool = get_pool()
+    connection = pool.connection()
+    args.table = args.table or pool.observation_table
+    params = OutlierParams(args.distance_factor, args.min_km, args.density_resolution, args.min_density, args.min_observations)
+
+    start = time.perf_counter()
+    batches = connection.sql(observation_batches_sql(f"{args.db}.{args.schema}.{args.table}")).to_pandas_batches()
+    cells = accumulate_cells(batches)
+    scanned = time.perf_counter()
+    flags = flag_cells(cells, TaxonomyStore.load(), params)
+    flagged = flags[flags["IS_OUTLIER"]]
+    done = time.perf_counter()
+
+    print(f"\nFlagged cells ({len(flagged)} of {len(flags)}):")
+    print(flagged.sort_values("DISTANCE_KM", ascending=False).head(20))
+    print(f"\nby reason: {flagged.groupby('REASON')['N'].sum().to_dict()}")
+    if not args.dry_run:
+        count = write_outliers(connection, flags, args.db, args.schema)
+        print(f"wrote {args.db}.{args.schema}.{OUTLIER_TABLE}: {count:,} of {int(flags['N'].sum()):,} observations flagged")
+    print(f"\nscan: {scanned - start:.2f}s, flag: {done - scanned:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
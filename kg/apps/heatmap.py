@@ -0,0 +1,71 @@
+"""
+Heatmap
+
+Kernel density heatmap of observations over the H3 grid, optionally for one
+taxon's subtree, a year range and a season, smoothed over the cells within k
+steps of each cell (see kg/local/heatmap.py). Grouped counts and heatmaps are
+cached per filter until the observation table changes, and written as
+(cell, value) Parquet or GeoJSON, in one file or one per tile.
+
+Run with `uv run -m kg.apps.heatmap <args>` eg
+- `uv run -m kg.apps.heatmap --resolution 7 --out heatmap.parquet --table OBSERVATION_1m`
+- `uv run -m kg.apps.heatmap --taxon Ericaceae --season summer --k 3 --format geojson --tiles 3 --out heatmap/`
+
+Build the taxonomy store first with `uv run -m kg.apps.build_local taxonomy`
+(and the name index with `uv run -m kg.apps.build_local names` to pass names).
+"""
+
+import argparse
+import time
+
+RESOLUTIONS = (6, 7, 8, 9, 10)
+SEASONS = ("spring", "summer", "fall", "winter")
+KERNELS = ("gaussian", "linear", "flat")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kernel density heatmap of observations over H3 cells")
+    parser.add_argument('--resolution', type=int, choices=RESOLUTIONS, default=7, help='H3 resolution (default: 7)')
+    parser.add_argument('--taxon', help='Only count observations of this taxon and below (id or name)')
+    parser.add_argument('--years', type=int, nargs=2, default=None, metavar=('FIRST', 'LAST'), help='Inclusive year range')
+    parser.add_argument('--season', choices=SEASONS, help='Season of each observation\'s hemisphere')
+    parser.add_argument('--k', type=int, default=2, help='Cells to smooth over in each direction, 0 for raw counts (default: 2)')
+    parser.add_argument('--kernel', choices=KERNELS, default='gaussian', help='Weights by distance in cells (default: gaussian)')
+    parser.add_argument('--out', help='File to write, or directory with --tiles')
+    parser.add_argument('--format', choices=('parquet', 'geojson'), default='parquet', help='Output format (default: parquet)')
+    parser.add_argument('--tiles', type=int, default=None, metavar='RESOLUTION', help='Write one file per parent cell at this resolution')
+    parser.add_argument('--table', default='OBSERVATION_10k', help='Observation tier (default: OBSERVATION_10k)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print (default: 20)')
+    args = parser.parse_args()
+
+    from kg.local.heatmap import HeatmapIndex, write_tiles
+    from kg.local.taxonomy import TaxonomyStore
+    from kg.session import get_pool
+
+    taxon_id = None
+    if args.taxon:
+        from kg.apps import taxon_ids
+
+        found = taxon_ids([args.taxon])
+        if not found:
+            return
+        taxon_id = found[0]
+
+    start = time.perf_counter()
+    index = HeatmapIndex.load(TaxonomyStore.load(), get_pool().connection(), f"{args.db}.{args.schema}.{args.table}")
+    years = tuple(args.years) if args.years else None
+    df = index.heatmap(args.resolution, taxon_id, years, args.season, args.k, args.kernel)
+    done = time.perf_counter()
+
+    print(f"\nCells: {len(df)}, total: {df['value'].sum():.0f}")
+    print(df.nlargest(args.top, "value").assign(cell=lambda d: d["cell"].map("{:x}".format)).to_string(index=False))
+    print(f"\nheatmap: {done - start:.2f}s")
+    if args.out:
+        paths = write_tiles(df, args.out, args.format, args.tiles)
+        print(f"wrote {len(paths)} file(s) to {args.out} in {time.perf_counter() - done:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
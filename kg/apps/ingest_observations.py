@@ -0,0 +1,61 @@
+"""
+Ingest Observations
+
+Converts the raw GBIF observation TSV into Parquet parts with the H3 cells
+(resolutions 6 to 10) precomputed as int64 columns, on all cores, for
+script/gbif_observation.sql to load (see kg/local/ingest.py). The staging
+model then selects the cells instead of computing them in the warehouse.
+
+Run with `uv run -m kg.apps.ingest_observations <tsv> --out <dir>` eg
+- `uv run -m kg.apps.ingest_observations /path/to/gbif_observation.csv --out /path/to/gbif_observation`
+
+Check local cells against the warehouse's on a sample with
+- `uv run -m kg.apps.ingest_observations --check --table OBSERVATION_1m --sample 100000`
+"""
+
+import argparse
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the GBIF observation TSV to Parquet with H3 cells")
+    parser.add_argument('tsv', nargs='?', help='Raw GBIF observation TSV')
+    parser.add_argument('--out', help='Output directory for the Parquet parts')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--max-skipped', type=int, default=0, help='Malformed rows to tolerate before failing (default: 0)')
+    parser.add_argument('--check', action='store_true', help='Compare local cells with the warehouse on a sample instead')
+    parser.add_argument('--table', default='OBSERVATION_10k', help='Observation tier to check (default: OBSERVATION_10k)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--sample', type=int, default=100_000, help='Rows to check (default: 100000)')
+    args = parser.parse_args()
+    if not args.check and not (args.tsv and args.out):
+        parser.error("a TSV and --out are required unless --check is given")
+
+    from kg.local.ingest import check_parity, convert_tsv
+
+    start = time.perf_counter()
+    if args.check:
+        from kg.session import get_pool
+        report = check_parity(get_pool().connection(), f"{args.db}.{args.schema}.{args.table}", args.sample)
+        print(report.to_string(index=False))
+        if report["mismatches"].any():
+            print("\nFirst mismatches:")
+            print(report.attrs["examples"])
+        print(f"\ncheck: {time.perf_counter() - start:.2f}s")
+        sys.exit(1 if report["mismatches"].any() else 0)
+
+    rows, skipped = convert_tsv(args.tsv, args.out, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"ingest: {rows:,} records -> {args.out} in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} records/s)")
+    if skipped:
+        print(f"skipped {len(skipped):,} malformed rows (wrong number of fields), eg:", file=sys.stderr)
+        for text in skipped[:5]:
+            print(f"  {text[:200]}", file=sys.stderr)
+    if len(skipped) > args.max_skipped:
+        sys.exit(f"more than {args.max_skipped} malformed rows, rerun with --max-skipped to load the rest")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Taxon Name Lookup
+
+Resolves canonical, scientific or vernacular names to taxon ids with the local
+name index (kg/local/names.py): case- and diacritic-insensitive exact matches,
+then prefix or typo-tolerant matches.
+
+Run with `uv run -m kg.apps.name_lookup <name> [--prefix | --fuzzy]` eg
+- `uv run -m kg.apps.name_lookup "paquerette"`
+- `uv run -m kg.apps.name_lookup "Acaena nov" --prefix`
+- `uv run -m kg.apps.name_lookup "Belis perenis" --fuzzy`
+
+Build the index first with `uv run -m kg.apps.build_local names`.
+"""
+
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up taxon ids by name")
+    parser.add_argument('name', help='Canonical, scientific or vernacular name')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--prefix', action='store_true', help='Match names starting with the given text')
+    mode.add_argument('--fuzzy', action='store_true', help='Match similar names, tolerating typos')
+    parser.add_argument('--limit', type=int, default=20, help='Maximum matches for --prefix and --fuzzy (default: 20)')
+    args = parser.parse_args()
+
+    from kg.local.names import NameIndex
+
+    index = NameIndex.load()
+    start = time.perf_counter()
+    if args.prefix:
+        matches = index.prefix(args.name, args.limit)
+    elif args.fuzzy:
+        matches = index.fuzzy(args.name, args.limit)
+    else:
+        matches = index.exact(args.name)
+    elapsed = time.perf_counter() - start
+
+    for match in matches:
+        print(f"{match.taxon_id:>10}  {match.kind:<10}  {match.score:.2f}  {match.name}")
+    print(f"{len(matches)} matches in {elapsed * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Nearest Observations
+
+The closest observations to a point, or all observations within a radius,
+optionally of one taxon's subtree and a year range, from the local ball tree
+(see kg/local/spatial.py).
+
+Run with `uv run -m kg.apps.nearest_observations <lat> <lon> <args>` eg
+- `uv run -m kg.apps.nearest_observations 47.6 -122.3 --k 20 --taxon Ericaceae`
+- `uv run -m kg.apps.nearest_observations 47.6 -122.3 --radius-km 5 --years 2020 2025`
+
+Build the index first with `uv run -m kg.apps.build_local spatial` (and the
+taxonomy store and name index to filter by taxon).
+"""
+
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Observations nearest to a point")
+    parser.add_argument('lat', type=float, help='Latitude in degrees')
+    parser.add_argument('lon', type=float, help='Longitude in degrees')
+    search = parser.add_mutually_exclusive_group()
+    search.add_argument('--k', type=int, default=20, help='Number of nearest observations (default: 20)')
+    search.add_argument('--radius-km', type=float, default=None, help='Return every observation within this distance instead')
+    parser.add_argument('--taxon', default=None, help='Only observations in this taxon (id or name) or below it')
+    parser.add_argument('--years', type=int, nargs=2, default=None, metavar=('FIRST', 'LAST'), help='Inclusive year range')
+    args = parser.parse_args()
+
+    from kg.apps import taxon_ids
+    from kg.local.spatial import SpatialIndex
+
+    index = SpatialIndex.load()
+    taxon_id = None
+    if args.taxon:
+        found = taxon_ids([args.taxon])
+        if not found:
+            raise SystemExit(f"No taxon matches {args.taxon}")
+        taxon_id = found[0]
+    years = tuple(args.years) if args.years else None
+
+    start = time.perf_counter()
+    if args.radius_km is not None:
+        df = index.radius(args.lat, args.lon, args.radius_km * 1000, taxon_id, years)
+    else:
+        df = index.knn(args.lat, args.lon, args.k, taxon_id, years)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nResults ({len(df)} rows):")
+    print(df.drop(columns="query"))
+    print(f"\n{elapsed * 1000:.1f}ms over {len(index):,} observations")
+
+
+if __name__ == '__main__':
+    main()
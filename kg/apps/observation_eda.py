@@ -8,32 +8,59 @@ Run queries using `uv run -m kg.apps.observation_eda <function> <args>` eg
 - `uv run -m kg.apps.observation_eda observations_per_genus --threshold 100`
 - `uv run -m kg.apps.observation_eda nearby_observations`
 - `uv run -m kg.apps.observation_eda species_before_summer_solstice_by_class --year 2025`
+- `uv run -m kg.apps.observation_eda observation_records --year 2024 --memory-report`
+
+relationalai and the model are only imported once a query runs, so `--help`
+and argument errors return immediately (see kg/profiling.py).
 """
 
+from __future__ import annotations
+
 import argparse
 import inspect
 import sys
-from typing import Callable, Dict
+from typing import TYPE_CHECKING, Callable, Dict
+
+from kg.profiling import ImportProfiler, define_report, lazy_import
 
-import relationalai.semantics as rai
+rai = lazy_import("relationalai.semantics")
 
-from kg.model import define_arq, ARQModel
+if TYPE_CHECKING:
+    import relationalai.semantics as rai
+    from kg.model import ARQModel
 
 
-def observations_per_genus(arq: ARQModel, threshold: int = 10) -> rai.Fragment:
+def observations_per_genus(
+    arq: ARQModel, threshold: int = 10, exclude_outliers: bool = False, deduplicate: bool = False
+) -> rai.Fragment:
     """Count the number of observations classified as each taxonomic genus,
     above the given threshold.
 
+    Uses the derived Observation.genus (kg/model/derived/classification.py)
+    rather than joining through the classified taxon.
+
+    Args:
+        threshold: Minimum observation count (default: 10)
+        exclude_outliers: Skip observations flagged by the outlier pass
+            (Observation.is_outlier, see kg/local/outliers.py)
+        deduplicate: Count each cluster of duplicate records once
+            (Observation.is_duplicate, see kg/local/dedup.py)
+
     Returns:
         A query fragment with columns:
         - observation_count: Number of observations for that genus
         - genus_name: The canonical name of the genus
         - genus_id: The taxonomic ID of the genus
     """
+    filters = []
+    if exclude_outliers:
+        filters.append(rai.not_(arq.Observation.is_outlier()))
+    if deduplicate:
+        filters.append(rai.not_(arq.Observation.is_duplicate()))
 
     return rai.where(
-        arq.Observation.classification(arq.Taxon),
-        arq.Taxon.genus(arq.Genus),
+        arq.Observation.genus(arq.Genus),
+        *filters,
         obs_count := rai.count(arq.Observation).per(arq.Genus),
         obs_count > threshold
     ).select(
@@ -44,6 +71,107 @@ def observations_per_genus(arq: ARQModel, threshold: int = 10) -> rai.Fragment:
     )
 
 
+def subtree_observations(arq: ARQModel, rank: str = "family", threshold: int = 100) -> rai.Fragment:
+    """Observation and species counts for every taxon of a rank, including
+    observations classified anywhere below it, above the given threshold.
+
+    Uses the rollup relations from kg/model/derived/rollup.py, so any rank is
+    answered from the same precomputed counts.
+
+    Args:
+        rank: Taxonomic rank to report, eg genus, family, order (default: family)
+        threshold: Minimum observation count (default: 100)
+
+    Returns:
+        A query fragment with columns:
+        - observation_count: Observations classified in the taxon's subtree
+        - species_count: Observed species in the taxon's subtree
+        - taxon_name: The canonical name of the taxon
+        - taxon_id: The taxonomic ID of the taxon
+    """
+
+    return rai.where(
+        arq.Taxon.rank(rank),
+        arq.Taxon.observation_count > threshold,
+    ).select(
+        arq.Taxon.observation_count.alias("observation_count"),
+        arq.Taxon.species_count.alias("species_count"),
+        arq.Taxon.canonical_name.alias("taxon_name"),
+        arq.Taxon.id.alias("taxon_id"),
+    )
+
+
+def yearly_taxon_counts(arq: ARQModel, rank: str = "genus", threshold: int = 0, by_region: bool = True) -> rai.Fragment:
+    """Yearly observations per taxon of a rank (and country), with the total
+    observations that year (in the country): the sampling effort.
+
+    Observations classified anywhere below a taxon count towards it (through
+    Taxon.rolls_up_to). Rolling trend slopes of the share of effort are
+    computed from these rows by kg/local/trends.py, see kg.apps.taxon_trends.
+    Split by region, observations without a country are left out; overall,
+    they count like any other.
+
+    Args:
+        rank: Taxonomic rank to report, eg genus, family (default: genus)
+        threshold: Minimum observations of the taxon in the country and year (default: 0)
+        by_region: Count per country rather than over all observations (default: True)
+
+    Returns:
+        A query fragment with columns:
+        - taxon_id: The taxonomic ID of the taxon
+        - region: Country code of the observations (only by region)
+        - year: Year of the observations
+        - observations: Observations of the taxon (in the country) that year
+        - effort: All observations (in the country) that year
+    """
+    year = arq.Year.ref()
+    country = arq.CountryCode.ref()
+    classified = arq.Taxon.ref()
+    other = arq.Observation.ref()
+    region = [country] if by_region else []
+    in_region = [arq.Observation.country_code(country), other.country_code(country)] if by_region else []
+
+    return rai.where(
+        arq.Observation.year(year),
+        arq.Observation.classification(classified),
+        classified.rolls_up_to(arq.Taxon),
+        arq.Taxon.rank(rank),
+        other.year(year),
+        *in_region,
+        observations := rai.count(arq.Observation).per(arq.Taxon, year, *region),
+        effort := rai.count(other).per(year, *region),
+        observations > threshold,
+    ).select(
+        arq.Taxon.id.alias("taxon_id"),
+        *([country.alias("region")] if by_region else []),
+        year.alias("year"),
+        observations.alias("observations"),
+        effort.alias("effort"),
+    )
+
+
+def synonym_recovery(arq: ARQModel) -> rai.Fragment:
+    """Count observations that only reach a genus through their accepted taxon.
+
+    These are observations classified as synonyms without a parent chain of
+    their own, which rank queries over classification miss and queries over
+    accepted_taxon (kg/model/core/synonymy.py) recover.
+
+    Returns:
+        A query fragment with columns:
+        - recovered_count: Observations recovered by resolving synonyms
+    """
+    accepted = arq.Taxon.ref()
+
+    return rai.where(
+        rai.not_(arq.Observation.genus(arq.Genus.ref())),
+        arq.Observation.accepted_taxon(accepted),
+        accepted.genus(arq.Genus),
+    ).select(
+        rai.count(arq.Observation).alias("recovered_count"),
+    )
+
+
 def nearby_observations(arq: ARQModel) -> rai.Fragment:
     """Count pairs of observations that co-occur in space and time.
 
@@ -69,12 +197,50 @@ def nearby_observations(arq: ARQModel) -> rai.Fragment:
     )
 
 
+def nearby_common_ancestors(arq: ARQModel) -> rai.Fragment:
+    """Count co-occurring observation pairs by the rank of their taxa's lowest
+    common ancestor.
+
+    Pairs are the co-occurrences of nearby_observations (same H3 cell at
+    resolution 6, year and day of year). A pair of observations of the same
+    species meets at rank species, a pair of species in one genus at genus, etc.
+
+    Returns:
+        A query fragment with columns:
+        - ancestor_rank: Rank of the lowest common ancestor
+        - pair_count: Number of co-occurring observation pairs
+    """
+    from kg.model.derived.lineage import lowest_common_ancestor
+
+    obs1 = arq.Observation.ref()
+    obs2 = arq.Observation.ref()
+    t1 = arq.Taxon.ref()
+    t2 = arq.Taxon.ref()
+    ancestor, conditions, _ = lowest_common_ancestor(arq, t1, t2)
+
+    return rai.where(
+        obs1 < obs2,
+        obs1.year == obs2.year,
+        obs1.h3_cell_6 == obs2.h3_cell_6,
+        obs1.day_of_year == obs2.day_of_year,
+        obs1.classification(t1),
+        obs2.classification(t2),
+        *conditions,
+        pair_count := rai.count(obs1, obs2).per(ancestor.rank),
+    ).select(
+        ancestor.rank.alias("ancestor_rank"),
+        pair_count.alias("pair_count"),
+    )
+
+
 def species_before_summer_solstice_by_class(arq: ARQModel, year: int = 2025) -> rai.Fragment:
     """Count species observed before summer solstice in the US, grouped by class.
 
     Finds species observations that occurred:
     - In the United States (country code "US")
-    - Before the summer solstice for the given year
+    - Before the summer solstice for the given year, looked up by key on the
+      observation's year (Year.june_solstice, see define_observation_season)
+      rather than joined with every solstice
     - Groups by taxonomic class
 
     Args:
@@ -89,17 +255,47 @@ def species_before_summer_solstice_by_class(arq: ARQModel, year: int = 2025) ->
     return rai.where(
         arq.Observation.country_code("US"),
         arq.Observation.year(year),
-        arq.Observation.classification(arq.Species),
-        arq.Species.class_(arq.Class),
-        arq.Solstice.year(year),
-        arq.Solstice.summer(arq.HemisphereNorth),
-        arq.Observation.event_datetime < arq.Solstice.datetime,
+        arq.Observation.species(arq.Species),
+        arq.Observation.class_(arq.Class),
+        arq.Observation.event_datetime < arq.Observation.year.june_solstice,
         species_count := rai.count(arq.Species).per(arq.Class),
     ).select(
         species_count.alias("species_count"),
         arq.Class.canonical_name.alias("class_name"),
     )
 
+
+def observation_records(arq: ARQModel, year: int = 2025) -> rai.Fragment:
+    """Select the observations of a year, one row each, with their taxon's name and rank.
+
+    Raw records are the largest results the apps materialize, mostly
+    repeated strings (see kg/results.py for compacting them).
+
+    Args:
+        year: The year to select (default: 2025)
+
+    Returns:
+        A query fragment with columns:
+        - id: The observation's GBIF id
+        - day_of_year: Day of the year it occurred on
+        - country_code, state_province, basis_of_record: Where and how it was recorded
+        - h3_cell_9: Its H3 cell at resolution 9
+        - canonical_name, rank: Name and rank of the taxon it is classified as
+    """
+    return rai.where(
+        arq.Observation.year(year),
+        arq.Observation.classification(arq.Taxon),
+    ).select(
+        arq.Observation.id.alias("id"),
+        arq.Observation.day_of_year.alias("day_of_year"),
+        arq.Observation.country_code.alias("country_code"),
+        arq.Observation.state_province.alias("state_province"),
+        arq.Observation.basis_of_record.alias("basis_of_record"),
+        arq.Observation.h3_cell_9.alias("h3_cell_9"),
+        arq.Taxon.canonical_name.alias("canonical_name"),
+        arq.Taxon.rank.alias("rank"),
+    )
+
 ## ↓ brought to you by Claude
 
 def _get_query_functions() -> Dict[str, Callable]:
@@ -107,7 +303,8 @@ def _get_query_functions() -> Dict[str, Callable]:
 
     Returns a dictionary mapping function names to function objects.
     Only includes functions that take ARQModel as first parameter and
-    return rai.Fragment.
+    return rai.Fragment. Annotations are compared as written, so listing the
+    queries does not import relationalai.
     """
     current_module = sys.modules[__name__]
     query_functions = {}
@@ -121,8 +318,8 @@ def _get_query_functions() -> Dict[str, Callable]:
 
         # Check if first parameter is ARQModel and return type is rai.Fragment
         if (params and
-            params[0].annotation == ARQModel and
-            sig.return_annotation == rai.Fragment):
+            params[0].annotation == "ARQModel" and
+            sig.return_annotation == "rai.Fragment"):
             query_functions[name] = obj
 
     return query_functions
@@ -157,8 +354,33 @@ def main():
 
     parser.add_argument(
         '--model-name',
-        default='arq_eda',
-        help='Name for the RAI model (default: arq_eda)'
+        default=None,
+        help="Name for the RAI model (default: the shared session model for the query's program, see kg/session.py)"
+    )
+
+    parser.add_argument(
+        '--session-stats',
+        action='store_true',
+        help='Print session setup timings, and run the query twice to time it on a cold and a warm model'
+    )
+
+    parser.add_argument(
+        '--profile-startup',
+        action='store_true',
+        help='Print import costs and time spent in each define_* function'
+    )
+
+    parser.add_argument(
+        '--compact',
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help='Materialize results with categoricals and downcast integers (see kg/results.py)'
+    )
+
+    parser.add_argument(
+        '--memory-report',
+        action='store_true',
+        help='Print the memory used by each result column before and after compacting'
     )
 
     # Parse known args first to get the query name
@@ -174,9 +396,19 @@ def main():
     # Add arguments for function parameters
     for param in params:
         param_name = f'--{param.name.replace("_", "-")}'
-        param_type = param.annotation if param.annotation != inspect.Parameter.empty else str
+        param_type = eval(param.annotation, globals()) if param.annotation != inspect.Parameter.empty else str
         param_default = param.default if param.default != inspect.Parameter.empty else None
 
+        if param_type is bool:
+            # type=bool would parse any non-empty string as True
+            parser.add_argument(
+                param_name,
+                action=argparse.BooleanOptionalAction,
+                default=param_default,
+                help=f"Parameter {param.name} (flag)"
+            )
+            continue
+
         parser.add_argument(
             param_name,
             type=param_type,
@@ -187,10 +419,6 @@ def main():
     # Parse all arguments
     args = parser.parse_args()
 
-    # Instantiate the model
-    print(f"Initializing model: {args.model_name}")
-    arq = define_arq(rai.Model(args.model_name))
-
     # Build kwargs for the query function
     kwargs = {}
     for param in params:
@@ -198,18 +426,42 @@ def main():
         if value is not None:
             kwargs[param.name] = value
 
+    # Arguments are valid, only now pay for importing relationalai and the model
+    profiler = ImportProfiler().start() if args.profile_startup else None
+    from kg.model import define_seconds
+    from kg.session import get_pool
+
+    # Get the model from the shared session pool, defining only what the query needs
+    pool = get_pool()
+    query = lambda arq: query_func(arq, **kwargs)
+    model_name = args.model_name or pool.shared_name(query)
+    print(f"Initializing model: {model_name}")
+    arq = pool.arq(model_name, query=query)
+    if profiler:
+        profiler.stop()
+        print(f"\nStartup:\n{profiler.report()}\n{define_report(define_seconds(arq))}\n")
+
     # Run the query
     print(f"Running query: {args.query_name}")
     if kwargs:
         print(f"Parameters: {kwargs}")
 
-    result = query_func(arq, **kwargs)
-
     # Execute and display results
-    df = result.to_df()
+    df = pool.measure_query(arq, query) if args.session_stats else query(arq).to_df()
+    if args.compact or args.memory_report:
+        from kg.results import compact, memory_report
+
+        compacted = compact(df)
+        if args.memory_report:
+            print(f"\nMemory:\n{memory_report(df, compacted).to_string(index=False)}")
+        if args.compact:
+            df = compacted
     print(f"\nResults ({len(df)} rows):")
     print(df)
 
+    if args.session_stats:
+        print(f"\nSession:\n{pool.stats.report()}\n{pool.compile_cache.report()}")
+
 
 if __name__ == '__main__':
     main()
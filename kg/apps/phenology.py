@@ -0,0 +1,56 @@
+"""
+Phenology
+
+Peak day and onset / end of the observation season per taxon and hemisphere,
+from day-of-year histograms that include observations classified below each
+taxon (see kg/local/phenology.py). Grouped counts and histograms are cached
+until the observation table changes.
+
+Run with `uv run -m kg.apps.phenology (--taxon <id or name> ... | --rank <rank>)` eg
+- `uv run -m kg.apps.phenology --taxon "Bellis perennis" --years 2015 2025`
+- `uv run -m kg.apps.phenology --rank family --table OBSERVATION_1m`
+
+Build the taxonomy store first with `uv run -m kg.apps.build_local taxonomy`
+(and the name index with `uv run -m kg.apps.build_local names` to pass names).
+"""
+
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seasonal timing of taxa by hemisphere")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--taxon', nargs='+', help='Taxon ids or names, of any rank')
+    target.add_argument('--rank', help='Report every observed taxon of a main rank, eg family')
+    parser.add_argument('--years', type=int, nargs=2, default=None, metavar=('FIRST', 'LAST'), help='Inclusive year range')
+    parser.add_argument('--bandwidth', type=float, default=7.0, help='Smoothing bandwidth in days (default: 7)')
+    parser.add_argument('--table', default='OBSERVATION_10k', help='Observation tier (default: OBSERVATION_10k)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print (default: 20)')
+    args = parser.parse_args()
+
+    from kg.apps import taxon_ids
+    from kg.local.phenology import PhenologyIndex
+    from kg.local.taxonomy import TaxonomyStore
+    from kg.session import get_pool
+
+    start = time.perf_counter()
+    index = PhenologyIndex.load(TaxonomyStore.load(), get_pool().connection(), f"{args.db}.{args.schema}.{args.table}")
+    loaded = time.perf_counter()
+    years = tuple(args.years) if args.years else None
+    if args.rank:
+        phenology = index.by_rank(args.rank, years, args.bandwidth)
+    else:
+        phenology = index.phenology(taxon_ids(args.taxon), years, args.bandwidth)
+    df = phenology.summary().sort_values("observations", ascending=False, ignore_index=True)
+    done = time.perf_counter()
+
+    print(f"\nResults ({len(df)} rows):")
+    print(df.head(args.top))
+    print(f"\nload: {loaded - start:.2f}s, phenology: {done - loaded:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
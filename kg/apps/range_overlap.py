@@ -0,0 +1,50 @@
+"""
+Range Overlap
+
+Taxa whose observed ranges (sets of H3 cells) overlap most with the given
+taxa, from MinHash signatures and an LSH index (see kg/local/minhash.py):
+estimated Jaccard similarity without intersecting cell sets.
+
+Run with `uv run -m kg.apps.range_overlap --taxon <id or name> ...` eg
+- `uv run -m kg.apps.range_overlap --taxon "Bellis perennis" --k 20`
+- `uv run -m kg.apps.range_overlap --taxon 3189866 --with 3189871 3189870`
+
+Build or refresh the index first with `uv run -m kg.apps.build_local minhash`.
+"""
+
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Taxa with overlapping ranges")
+    parser.add_argument('--taxon', nargs='+', required=True, help='Taxon ids or names')
+    parser.add_argument('--with', dest='others', nargs='+', default=None, help='Estimate Jaccard with these taxa instead of searching')
+    parser.add_argument('--k', type=int, default=10, help='Overlapping taxa per taxon (default: 10)')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Minimum estimated Jaccard (default: 0.1)')
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    from kg.apps import taxon_ids
+    from kg.local.minhash import RangeIndex
+
+    index = RangeIndex.load()
+    taxa = taxon_ids(args.taxon)
+    start = time.perf_counter()
+    if args.others:
+        others = taxon_ids(args.others)
+        pairs = [(a, b) for a in taxa for b in others]
+        df = pd.DataFrame(pairs, columns=["taxon_id", "other_id"])
+        df["jaccard"] = index.jaccard(df["taxon_id"], df["other_id"])
+    else:
+        df = pd.concat([index.similar(t, args.k, args.threshold) for t in taxa], ignore_index=True)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nResults ({len(df)} rows):")
+    print(df)
+    print(f"\n{elapsed * 1000:.1f}ms over {len(index.taxa):,} taxa (H3 resolution {index.meta.get('resolution')})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Rarefaction
+
+Species richness per country or H3 cell rarefied to standardized numbers of
+observations, so regions sampled with very different effort can be compared
+(kata step 2 reports raw species and observation counts), and species
+accumulation curves per region (see kg/local/rarefaction.py).
+
+Run with `uv run -m kg.apps.rarefaction <args>` eg
+- `uv run -m kg.apps.rarefaction --table OBSERVATION_1m`
+- `uv run -m kg.apps.rarefaction --region h3_cell_6 --sizes 50 200 --min-observations 200`
+- `uv run -m kg.apps.rarefaction --curve US --curve CA`
+
+Build the taxonomy store first with `uv run -m kg.apps.build_local taxonomy`.
+"""
+
+import argparse
+import time
+
+# kg.local.rarefaction.REGIONS, without importing NumPy before arguments are parsed
+REGIONS = ("country", "h3_cell_6", "h3_cell_7", "h3_cell_8", "h3_cell_9", "h3_cell_10")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rarefied species richness per region")
+    parser.add_argument('--region', default='country', choices=REGIONS, help='Regions to compare (default: country)')
+    parser.add_argument('--sizes', type=int, nargs='+', help='Sample sizes (default: the smallest region kept)')
+    parser.add_argument('--min-observations', type=int, default=100, help='Skip regions with fewer species-level observations (default: 100)')
+    parser.add_argument('--curve', action='append', default=[], help='Print the accumulation curve of a region (repeatable)')
+    parser.add_argument('--points', type=int, default=20, help='Points per accumulation curve (default: 20)')
+    parser.add_argument('--table', default='OBSERVATION_10k', help='Observation tier (default: OBSERVATION_10k)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print (default: 20)')
+    args = parser.parse_args()
+
+    from kg.local.rarefaction import Abundances, accumulation_curve, rarefaction_table, species_counts_sql
+    from kg.local.taxonomy import TaxonomyStore
+    from kg.session import get_pool
+
+    start = time.perf_counter()
+    counts = get_pool().connection().sql(species_counts_sql(f"{args.db}.{args.schema}.{args.table}", args.region)).to_pandas()
+    fetched = time.perf_counter()
+    abundances = Abundances.from_counts(TaxonomyStore.load(), counts)
+    df = rarefaction_table(abundances, args.sizes, args.min_observations)
+    done = time.perf_counter()
+
+    rarefied = [c for c in df.columns if c.startswith("expected_species_")]
+    print(f"\nRegions ({len(df)} with at least {args.min_observations} species-level observations):")
+    print(df.sort_values(rarefied[-1] if rarefied else "species_count", ascending=False).head(args.top).to_string(index=False))
+    for region in args.curve:
+        key = int(region) if args.region != "country" else region
+        print(f"\nAccumulation curve of {region}:")
+        print(accumulation_curve(abundances, key, args.points).to_string(index=False))
+    print(f"\nfetch: {fetched - start:.2f}s, rarefaction: {done - fetched:.2f}s ({len(abundances.n):,} region / species rows)")
+
+
+if __name__ == '__main__':
+    main()
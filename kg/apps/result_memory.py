@@ -0,0 +1,62 @@
+"""
+Result Memory Report
+
+Memory used by EDA query results as `to_df()` returns them and compacted
+(categorical strings, downcast integers, see kg/results.py), per column and
+in total, on an observation tier.
+
+Run with `uv run -m kg.apps.result_memory [<query> ...] --table <tier>` eg
+- `uv run -m kg.apps.result_memory --table OBSERVATION_1m` (raw observation records)
+- `uv run -m kg.apps.result_memory observation_records observations_per_genus --table OBSERVATION_1m`
+"""
+
+import argparse
+import time
+
+from kg.apps.observation_eda import _get_query_functions
+
+
+def main():
+    query_functions = _get_query_functions()
+    parser = argparse.ArgumentParser(description="Memory of query results before and after compacting")
+    parser.add_argument('query_names', nargs='*', metavar='QUERY', help=f"Queries to run, of {', '.join(query_functions)} (default: observation_records)")
+    parser.add_argument('--table', default='OBSERVATION_1m', help='Observation tier to bind (default: OBSERVATION_1m)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--columns', action='store_true', help='Print the report of every column, not just the totals')
+    args = parser.parse_args()
+    unknown = set(args.query_names) - set(query_functions)
+    if unknown:
+        parser.error(f"unknown queries: {', '.join(sorted(unknown))}")
+
+    import relationalai.semantics as rai
+
+    from kg.model import define_arq
+    from kg.results import compact, memory_report
+    from kg.session import get_pool
+
+    pool = get_pool()
+    m = rai.Model(f"{pool.model_name}_memory_{args.table.lower()}", connection=pool.connection())
+    print(f"Observations: {args.db}.{args.schema}.{args.table}")
+    for name in args.query_names or ['observation_records']:
+        query = query_functions[name]
+        define_arq(m, db=args.db, schema=args.schema, query=query, observation_table=args.table)
+        start = time.perf_counter()
+        df = query(m).to_df()
+        loaded = time.perf_counter()
+        compacted = compact(df)
+        done = time.perf_counter()
+
+        report = memory_report(df, compacted)
+        total = report.iloc[-1]
+        print(f"\n{name}: {len(df)} rows")
+        print(
+            f"  {total['bytes_before'] / 2**20:.1f} MiB -> {total['bytes_after'] / 2**20:.1f} MiB "
+            f"({total['saved']:.0%} saved), query: {loaded - start:.2f}s, compact: {done - loaded:.2f}s"
+        )
+        if args.columns:
+            print(report.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
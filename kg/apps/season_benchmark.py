@@ -0,0 +1,150 @@
+"""
+Season Benchmark
+
+Compares seasonal queries written against the solstice / equinox concepts
+(joining each observation with the solstices of its hemisphere) with the same
+queries on the derived seasons and boundaries (see kg/model/derived/observation.py):
+- kata step 3: species within 20 days of the summer solstice, by region, which
+  only compares spring and summer observations (Observation.season) with the
+  solstices
+- species_before_summer_solstice_by_class from observation_eda, which looks
+  up its year's June solstice (Year.june_solstice)
+
+Each variant is defined and run on a fresh model; the report shows load +
+query time, rows, and whether the rewritten query returns the same rows as
+the solstice join. The benchmark exits non-zero if it does not.
+
+Run with `uv run -m kg.apps.season_benchmark <args>` eg
+- `uv run -m kg.apps.season_benchmark --table OBSERVATION_1m`
+- `uv run -m kg.apps.season_benchmark kata_step_3 --repeat 3`
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from typing import TYPE_CHECKING
+
+from kg.profiling import lazy_import
+
+rai = lazy_import("relationalai.semantics")
+std = lazy_import("relationalai.semantics.std")
+
+if TYPE_CHECKING:
+    import relationalai.semantics as rai
+    from kg.model import ARQModel
+
+
+def before_summer_solstice_by_solstice(arq: ARQModel, year: int = 2025) -> rai.Fragment:
+    """species_before_summer_solstice_by_class as written before Observation.season."""
+    return rai.where(
+        arq.Observation.country_code("US"),
+        arq.Observation.year(year),
+        arq.Observation.species(arq.Species),
+        arq.Observation.class_(arq.Class),
+        arq.Solstice.year(year),
+        arq.Solstice.summer(arq.HemisphereNorth),
+        arq.Observation.event_datetime < arq.Solstice.datetime,
+        species_count := rai.count(arq.Species).per(arq.Class),
+    ).select(
+        species_count.alias("species_count"),
+        arq.Class.canonical_name.alias("class_name"),
+    )
+
+
+def summer_solstice_by_solstice(arq: ARQModel) -> rai.Fragment:
+    """Kata step 3 as written before Observation.season: every observation is
+    compared with every summer solstice of its hemisphere."""
+    dayofyear = std.datetime.datetime.dayofyear
+    delta_days = std.math.abs(dayofyear(arq.Solstice.datetime) - dayofyear(arq.Observation.event_datetime))
+
+    return rai.where(
+        arq.Observation.species(arq.Species),
+        arq.Observation.family(arq.Family),
+        arq.Solstice.summer(arq.Observation.hemisphere),
+        delta_days < 20,
+        species_count := rai.count(arq.Species).per(
+            arq.Family,
+            arq.Observation.country_code,
+            arq.Observation.state_province,
+        ),
+    ).select(
+        species_count.alias("species_count"),
+        arq.Family.canonical_name.alias("family_name"),
+        arq.Observation.country_code.alias("country_code"),
+        arq.Observation.state_province.alias("state_province"),
+    )
+
+
+def _cases():
+    """Solstice join and rewritten query per benchmark case."""
+    from kata.step_3.__main__ import summer_solstice_query
+    from kg.apps.observation_eda import species_before_summer_solstice_by_class
+
+    return {
+        "kata_step_3": (summer_solstice_by_solstice, summer_solstice_query),
+        "before_summer_solstice": (before_summer_solstice_by_solstice, species_before_summer_solstice_by_class),
+    }
+
+
+def _same_rows(a, b) -> bool:
+    if list(a.columns) != list(b.columns):
+        return False
+    key = list(a.columns)
+    a = a.astype(str).sort_values(key).reset_index(drop=True)
+    b = b.astype(str).sort_values(key).reset_index(drop=True)
+    return a.equals(b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark seasonal queries with and without Observation.season")
+    parser.add_argument('cases', nargs='*', help='Cases to run (default: all of kata_step_3, before_summer_solstice)')
+    parser.add_argument('--table', default='OBSERVATION_10k', help='Observation tier to bind (default: OBSERVATION_10k)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--repeat', type=int, default=1, help='Query runs per variant after the first (default: 1)')
+    args = parser.parse_args()
+
+    from kg.model import define_arq
+    from kg.session import get_pool
+
+    cases = _cases()
+    unknown = set(args.cases) - set(cases)
+    if unknown:
+        parser.error(f"unknown cases {sorted(unknown)}, expected some of {list(cases)}")
+
+    pool = get_pool()
+    connection = pool.connection()
+    mismatched = []
+    for case in args.cases or cases:
+        baseline, rewritten = cases[case]
+        variants = [("solstice join", baseline), ("season", rewritten)]
+        print(f"\n{case} on {args.db}.{args.schema}.{args.table}")
+        results = {}
+        for variant, query in variants:
+            m = rai.Model(f"{pool.model_name}_season_{case}_{variant.split()[0]}_{int(time.time())}", connection=connection)
+            start = time.perf_counter()
+            define_arq(m, db=args.db, schema=args.schema, query=query, observation_table=args.table)
+            results[variant] = query(m).to_df()
+            first = time.perf_counter() - start
+            runs = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                query(m).to_df()
+                runs.append(time.perf_counter() - start)
+            again = f", then {min(runs):.2f}s" if runs else ""
+            same = ""
+            if variant != "solstice join":
+                agree = _same_rows(results["solstice join"], results[variant])
+                if not agree:
+                    mismatched.append(case)
+                same = f", same rows: {agree}"
+            print(f"  {variant}: load + query {first:.2f}s{again} ({len(results[variant])} rows{same})")
+
+    if mismatched:
+        sys.exit(f"rows differ from the solstice join: {', '.join(mismatched)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Solstice / Equinox Seed
+
+Writes the dbt seed of computed solstice and equinox datetimes
+(dbt/seeds/meeus_soleq.csv) for any range of years, with the vectorized
+Meeus algorithms in kg/local/soleq.py. The soleq staging model takes the
+astropixels_soleq rows where they exist and these for every other year.
+
+Run with `uv run -m kg.apps.soleq_seed <args>` eg
+- `uv run -m kg.apps.soleq_seed --years 1600 2200`
+- `uv run -m kg.apps.soleq_seed --check`
+
+Then load it with `uv run dbt seed` (or `uv run dbt build`).
+"""
+
+import argparse
+from pathlib import Path
+
+SEEDS = Path(__file__).resolve().parents[2] / "dbt" / "seeds"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the computed solstice / equinox dbt seed")
+    parser.add_argument('--years', type=int, nargs=2, default=[1600, 2200], metavar=('FIRST', 'LAST'), help='Inclusive year range (default: 1600 2200)')
+    parser.add_argument('--out', type=Path, default=SEEDS / "meeus_soleq.csv", help='Seed CSV to write (default: dbt/seeds/meeus_soleq.csv)')
+    parser.add_argument('--check', action='store_true', help='Compare with the astropixels_soleq seed instead of writing')
+    args = parser.parse_args()
+
+    import numpy as np
+    import pandas as pd
+
+    from kg.local.soleq import EVENTS, solstice_equinox, write_seed
+
+    if args.check:
+        seed = pd.read_csv(SEEDS / "astropixels_soleq.csv", parse_dates=list(EVENTS))
+        computed = solstice_equinox(int(seed["year"].min()), int(seed["year"].max()))
+        minutes = pd.DataFrame({event: (computed[event] - seed[event]).dt.total_seconds() / 60 for event in EVENTS})
+        minutes.insert(0, "year", seed["year"])
+        error = minutes[list(EVENTS)].abs().to_numpy()
+        print(minutes[(error > 1).any(axis=1)].to_string(index=False))
+        print(f"\n{error.size} instants: mean {error.mean():.2f} min, max {error.max():.0f} min, "
+              f"{np.mean(error <= 1):.1%} within a minute")
+        return
+
+    df = write_seed(args.out, *args.years)
+    print(f"wrote {args.out}: {len(df)} years {df['year'].min()}-{df['year'].max()}")
+
+
+if __name__ == '__main__':
+    main()
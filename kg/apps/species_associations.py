@@ -0,0 +1,45 @@
+"""
+Species Associations
+
+Taxa most often found in the same H3 cells as the given taxa, ranked by
+Jaccard similarity or pointwise mutual information over the sparse taxon x
+cell incidence matrix (see kg/local/cooccurrence.py).
+
+Run with `uv run -m kg.apps.species_associations --taxon <id or name> ...` eg
+- `uv run -m kg.apps.species_associations --taxon "Bellis perennis" --metric pmi --min-shared 5`
+
+Build the matrix first with `uv run -m kg.apps.build_local cooccurrence`.
+"""
+
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Top associated taxa by shared H3 cells")
+    parser.add_argument('--taxon', nargs='+', default=None, help='Taxon ids or names (default: all taxa)')
+    parser.add_argument('--k', type=int, default=10, help='Associated taxa per taxon (default: 10)')
+    parser.add_argument('--metric', default='jaccard', choices=['jaccard', 'pmi'], help='Ranking metric (default: jaccard)')
+    parser.add_argument('--min-shared', type=int, default=1, help='Minimum shared cells (default: 1)')
+    parser.add_argument('--output', default=None, help='Write all associations to this parquet file')
+    args = parser.parse_args()
+
+    from kg.apps import taxon_ids
+    from kg.local.cooccurrence import Incidence
+
+    incidence = Incidence.load()
+    taxa = taxon_ids(args.taxon) if args.taxon else None
+    start = time.perf_counter()
+    df = incidence.associations(taxa, args.k, args.metric, args.min_shared)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nResults ({len(df)} rows):")
+    print(df.head(50))
+    if args.output:
+        df.to_parquet(args.output)
+        print(f"wrote {args.output}")
+    print(f"\nassociations: {elapsed:.2f}s over {incidence.shape[0]:,} taxa x {incidence.shape[1]:,} cells")
+
+
+if __name__ == '__main__':
+    main()
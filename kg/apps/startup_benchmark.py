@@ -0,0 +1,118 @@
+"""
+Startup Benchmark
+
+Measures the time from process start to a compiled first query for each entry
+point, with an empty compiled model cache (cold) and with the cache populated
+by the cold run (cached). Entry points are the EDA queries, the pytest
+fixture's full model and the kata queries.
+
+Each run is a fresh Python process using a dry-run model, so the numbers cover
+imports, schema lookup, model definition and compilation but not the engine.
+Both runs connect to check the cached table versions; the cold run also
+fetches the table schemas from Snowflake.
+
+Run with `uv run -m kg.apps.startup_benchmark` or pick entry points eg
+- `uv run -m kg.apps.startup_benchmark eda:nearby_observations kata:step_1`
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ENTRY_POINTS = [
+    "eda:observations_per_genus",
+    "eda:nearby_observations",
+    "eda:species_before_summer_solstice_by_class",
+    "tests",
+    "kata:step_1",
+    "kata:step_2",
+    "kata:step_3",
+]
+
+KATA_QUERIES = {
+    "step_1": "taxonomic_hierarchy_query",
+    "step_2": "species_richness_query",
+    "step_3": "summer_solstice_query",
+}
+
+
+def _entry_query(entry: str):
+    """The query an entry point runs first, or None for the full model."""
+    import importlib
+
+    kind, _, name = entry.partition(":")
+    if kind == "eda":
+        from kg.apps.observation_eda import _get_query_functions
+        return _get_query_functions()[name]
+    if kind == "kata":
+        module = importlib.import_module(f"kata.{name}.__main__")
+        return getattr(module, KATA_QUERIES[name])
+    if kind == "tests":
+        return None
+    raise ValueError(f"Unknown entry point: {entry}")
+
+
+def _child(entry: str, process_start: float):
+    """Define and compile an entry point's first query, printing timings as JSON."""
+    import relationalai.semantics as rai
+    from kg.compile_cache import model_cache
+    from kg.model import define_arq
+    from kg.session import get_pool
+
+    imported = time.time()
+    query = _entry_query(entry)
+    cache = model_cache()
+    m = rai.Model(f"arq_startup_{os.getpid()}", dry_run=True)
+    cache.install(m, get_pool().connection())
+    define_arq(m, query=query)
+    defined = time.time()
+    fragment = query(m) if query else rai.select(rai.count(m.Hemisphere))
+    fragment.to_df()
+    done = time.time()
+    print(json.dumps({
+        "import": imported - process_start,
+        "define": defined - imported,
+        "compile": done - defined,
+        "total": done - process_start,
+        "hits": cache.hits,
+    }))
+
+
+def _run(entry: str, cache_root: str) -> dict:
+    env = dict(os.environ, ARQ_CACHE_DIR=cache_root)
+    command = [sys.executable, "-m", "kg.apps.startup_benchmark", "--child", entry, "--start", str(time.time())]
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold vs cached startup per entry point")
+    parser.add_argument('entries', nargs='*', default=ENTRY_POINTS, help='Entry points (default: all)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--start', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.start)
+        return
+
+    print(f"{'entry point':<48} {'cold':>8} {'cached':>8} {'saved':>8}")
+    for entry in args.entries:
+        # A private cache root per entry point keeps the cold run cold
+        with tempfile.TemporaryDirectory() as cache_root:
+            cold = _run(entry, cache_root)
+            cached = _run(entry, cache_root)
+        saved = cold["total"] - cached["total"]
+        print(f"{entry:<48} {cold['total']:>7.2f}s {cached['total']:>7.2f}s {saved:>7.2f}s")
+        for phase in ("import", "define", "compile"):
+            print(f"  {phase:<46} {cold[phase]:>7.2f}s {cached[phase]:>7.2f}s")
+        if not cached["hits"]:
+            print("  (cached run missed the compile cache)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Synonym Recovery Report
+
+How many observations reach each rank through their classification, and how
+many more do once synonyms are resolved to their accepted taxon (see
+kg/local/synonyms.py and Observation.accepted_taxon).
+
+Run with `uv run -m kg.apps.synonym_report --table <tier>` eg
+- `uv run -m kg.apps.synonym_report --table OBSERVATION_1m`
+
+Build the local artifacts first with `uv run -m kg.apps.build_local taxonomy`
+and `uv run -m kg.apps.build_local synonyms`.
+"""
+
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report observations recovered by synonym resolution")
+    parser.add_argument('--table', default='OBSERVATION_10k', help='Observation tier (default: OBSERVATION_10k)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    args = parser.parse_args()
+
+    from kg.local.synonyms import SynonymMap, recovery_report
+    from kg.local.taxonomy import TaxonomyStore
+    from kg.session import get_pool
+
+    grouped = get_pool().connection().sql(
+        f"select TAXONKEY, count(*) as N from {args.db}.{args.schema}.{args.table} group by TAXONKEY"
+    ).to_pandas()
+    report = recovery_report(TaxonomyStore.load(), SynonymMap.load(), grouped["TAXONKEY"], grouped["N"])
+
+    print(f"Observations in {args.table}: {grouped['N'].sum():,}")
+    print(report.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Taxon Rollup
+
+Observation and species counts for every taxon of a rank, including
+observations classified anywhere below it, computed locally from the taxonomy
+store (see kg/local/rollup.py) and one grouped scan of the observation table.
+
+Run with `uv run -m kg.apps.taxon_rollup --rank <rank>` eg
+- `uv run -m kg.apps.taxon_rollup --rank order --table OBSERVATION_1m`
+
+Build the taxonomy store first with `uv run -m kg.apps.build_local taxonomy`.
+"""
+
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roll observation counts up the taxonomy")
+    parser.add_argument('--rank', default='family', help='Rank to report (default: family)')
+    parser.add_argument('--threshold', type=int, default=100, help='Minimum observation count (default: 100)')
+    parser.add_argument('--table', default='OBSERVATION_10k', help='Observation tier (default: OBSERVATION_10k)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print (default: 20)')
+    args = parser.parse_args()
+
+    from kg.local.rollup import rollup_observations
+    from kg.local.taxonomy import TaxonomyStore
+    from kg.session import get_pool
+
+    store = TaxonomyStore.load()
+    start = time.perf_counter()
+    grouped = get_pool().connection().sql(
+        f"select TAXONKEY, count(*) as N from {args.db}.{args.schema}.{args.table} group by TAXONKEY"
+    ).to_pandas()
+    fetched = time.perf_counter()
+    rollup = rollup_observations(store, grouped["TAXONKEY"], grouped["N"])
+    done = time.perf_counter()
+
+    df = rollup.to_frame(args.rank, args.threshold)
+    print(f"\nResults ({len(df)} rows):")
+    print(df.head(args.top))
+    print(f"\n{rollup.unmatched} observations with taxa missing from the store")
+    print(f"fetch: {fetched - start:.2f}s, rollup: {done - fetched:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
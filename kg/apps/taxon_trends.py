@@ -0,0 +1,83 @@
+"""
+Taxon Trends
+
+Year-over-year observation trends per taxon of a rank: yearly counts, their
+share of each region's observations that year (normalizing for sampling
+effort) and rolling least-squares slopes of that share (see
+kg/local/trends.py). Grouped counts and trends per rank are cached until the
+observation table changes.
+
+Run with `uv run -m kg.apps.taxon_trends <args>` eg
+- `uv run -m kg.apps.taxon_trends --rank family --window 5 --table OBSERVATION_1m`
+- `uv run -m kg.apps.taxon_trends --rank genus --by-region --taxon Quercus Acer`
+- `uv run -m kg.apps.taxon_trends --rank genus --query` (counts from the model, observation_eda yearly_taxon_counts)
+
+Both sources count the same observations and effort, except that split by
+region the grouped counts keep observations without a country as region ''
+while the query leaves them out (the model has no country to group them by).
+
+Build the taxonomy store first with `uv run -m kg.apps.build_local taxonomy`
+(and the name index with `uv run -m kg.apps.build_local names` to pass names).
+"""
+
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Year-over-year observation trends per taxon")
+    parser.add_argument('--rank', default='genus', help='Main rank to report, eg genus, family (default: genus)')
+    parser.add_argument('--taxon', nargs='+', help='Only report these taxa (ids or names, of the rank)')
+    parser.add_argument('--window', type=int, default=5, help='Years in each rolling slope (default: 5)')
+    parser.add_argument('--min-years', type=int, default=3, help='Years with effort needed for a slope (default: 3)')
+    parser.add_argument('--by-region', action='store_true', help='Trends per country instead of overall')
+    parser.add_argument('--query', action='store_true', help='Count with the model query instead of grouped counts in Snowflake')
+    parser.add_argument('--table', default='OBSERVATION_10k', help='Observation tier (default: OBSERVATION_10k)')
+    parser.add_argument('--db', default='TEAM_ARQ')
+    parser.add_argument('--schema', default='PUBLIC')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print (default: 20)')
+    args = parser.parse_args()
+
+    from kg.local.trends import ALL_REGIONS, TrendIndex, with_trends
+    from kg.session import get_pool
+
+    start = time.perf_counter()
+    if args.query:
+        import relationalai.semantics as rai
+
+        from kg.apps.observation_eda import yearly_taxon_counts
+        from kg.model import define_arq
+
+        pool = get_pool()
+        query = lambda arq: yearly_taxon_counts(arq, rank=args.rank, by_region=args.by_region)
+        m = rai.Model(f"{pool.model_name}_trends_{args.table.lower()}", connection=pool.connection())
+        define_arq(m, db=args.db, schema=args.schema, query=query, observation_table=args.table)
+        counts = query(m).to_df()
+        if not args.by_region:
+            counts = counts.assign(region=ALL_REGIONS)
+        loaded = time.perf_counter()
+        df = with_trends(counts, args.window, args.min_years)
+    else:
+        from kg.local.taxonomy import TaxonomyStore
+
+        fqn = f"{args.db}.{args.schema}.{args.table}"
+        index = TrendIndex.load(TaxonomyStore.load(), get_pool().connection(), fqn)
+        loaded = time.perf_counter()
+        df = index.by_rank(args.rank, args.window, args.by_region, args.min_years)
+    if args.taxon:
+        from kg.apps import taxon_ids
+
+        df = df[df["taxon_id"].isin(taxon_ids(args.taxon))]
+    done = time.perf_counter()
+
+    latest = df[df["year"] == df["year"].max()].dropna(subset=["slope"]).sort_values("slope")
+    print(f"\nSeries: {df.groupby(['taxon_id', 'region']).ngroups}, rows: {len(df)}")
+    print(f"\nFastest rising share in {df['year'].max()} ({args.window}-year window):")
+    print(latest.tail(args.top)[::-1].to_string(index=False))
+    print("\nFastest falling share:")
+    print(latest.head(args.top).to_string(index=False))
+    print(f"\nload: {loaded - start:.2f}s, trends: {done - loaded:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
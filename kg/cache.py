@@ -0,0 +1,58 @@
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Local artifact cache shared by the session layer and client-side tools
+
+
+def cache_dir(*parts: str) -> Path:
+    """Return (and create) a directory under the ARQ cache root.
+
+    The root defaults to ~/.cache/arq and can be moved with ARQ_CACHE_DIR, eg
+    to keep artifacts for different datasets apart.
+    """
+    root = Path(os.environ.get("ARQ_CACHE_DIR", Path.home() / ".cache" / "arq"))
+    path = root.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def drop_stale_versions(root: Path, keep: str, pattern: str = "*"):
+    """Remove the files and directories in root matching pattern, except keep.
+
+    Caches keyed by a table or taxonomy store version call this for the
+    current version, so those of earlier versions do not pile up.
+    """
+    for stale in root.glob(pattern):
+        if stale.name == keep:
+            continue
+        if stale.is_dir():
+            shutil.rmtree(stale)
+        else:
+            stale.unlink()
+
+
+def table_versions(connection: Any, db: str, schema: str, table: Optional[str] = None) -> Dict[str, str]:
+    """A token per table (or just the given one) that changes whenever its rows or columns change.
+
+    The token combines LAST_ALTERED (bumped by DML and DDL) and ROW_COUNT from
+    INFORMATION_SCHEMA.TABLES, keyed by the upper-case fully qualified name.
+    """
+    where = f" and TABLE_NAME = '{table.upper()}'" if table is not None else ""
+    rows = connection.sql(f"""
+        select TABLE_NAME, LAST_ALTERED, ROW_COUNT from {db}.INFORMATION_SCHEMA.TABLES
+        where TABLE_SCHEMA = '{schema.upper()}'{where}
+    """).collect()
+    return {f"{db}.{schema}.{name}".upper(): f"{_stamp(altered)}-{row_count}" for name, altered, row_count in rows}
+
+
+def _stamp(altered: Any) -> str:
+    # Microseconds since the epoch, so the token can name a cache directory
+    return str(int(altered.timestamp() * 1_000_000)) if hasattr(altered, "timestamp") else str(altered)
+
+
+def table_version(connection: Any, fqn: str) -> str:
+    """The table_versions token of one table."""
+    db, schema, table = fqn.split(".")
+    return table_versions(connection, db, schema, table)[fqn.upper()]
@@ -0,0 +1,226 @@
+"""
+Compiled model cache
+
+Before the first query, every process fetches the source table schemas from
+Snowflake and compiles the model IR into an LQP transaction, even when nothing
+under kg/model has changed. Both artifacts are persisted under the ARQ cache
+(see kg/cache.py) keyed by a hash of the kg/model sources, the bound table
+names and the relationalai version, and reused by later processes.
+
+Entries invalidate automatically when any of those change. Each cached table
+schema also records the table's version (kg/cache.py table_versions) and is
+only reused while the table has not changed since (one INFORMATION_SCHEMA
+query per process), so a recreated table, eg with new columns, is fetched
+again. Each compiled transaction is stored under a fingerprint of the model IR
+it was compiled from, so a model that compiles differently (eg a query that
+needs other modules, or a table whose columns changed) misses, compiles
+normally and adds its own entry. Only the MAX_ENTRIES most recently used
+transactions are kept per key.
+
+IR node ids are handed out per process, so the fingerprint is taken over a
+canonical form of the IR with each id replaced by its position in a fixed
+traversal. The compiler's names for relations (keyed by node id, and used by
+every later query compile) are stored by position too and mapped back to
+this process's ids on a hit. The cache hooks into the model's executor and
+compiler (private relationalai APIs), which ties it to the relationalai
+version in the key.
+
+Set ARQ_COMPILE_CACHE=0 to disable.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import relationalai
+import relationalai.semantics as rai
+from relationalai.semantics.internal.snowflake import SchemaInfo, Table, schema_dict_to_fields
+from relationalai.semantics.lqp.executor import LQPExecutor
+from relationalai.semantics.lqp.utils import UniqueNames
+from relationalai.semantics.metamodel import ir
+
+import kg.model
+from kg.cache import cache_dir, table_versions
+
+MODEL_DIR = Path(kg.model.__file__).parent
+
+# Compiled transactions kept per cache key, least recently used evicted first
+MAX_ENTRIES = 32
+
+
+def source_hash(*tables: str) -> str:
+    """Hash the kg/model sources, the given table names and the relationalai version."""
+    digest = hashlib.sha256(relationalai.__version__.encode())
+    for path in sorted(MODEL_DIR.rglob("*.py")):
+        digest.update(str(path.relative_to(MODEL_DIR)).encode())
+        digest.update(path.read_bytes())
+    for table in tables:
+        digest.update(table.upper().encode())
+    return digest.hexdigest()[:16]
+
+
+def canonical_ir(model: ir.Model) -> Tuple[bytes, Dict[int, int]]:
+    """A process-independent serialization of an IR model, and each node id's position in it."""
+    positions: Dict[int, int] = {}
+
+    def walk(value: Any) -> Any:
+        if isinstance(value, ir.Node):
+            if value.id in positions:
+                return ("ref", positions[value.id])
+            positions[value.id] = len(positions)
+            fields = tuple(
+                (f.name, walk(getattr(value, f.name))) for f in dataclasses.fields(value) if f.name != "id"
+            )
+            return (type(value).__name__, fields)
+        if isinstance(value, (set, frozenset)):
+            return ("set", tuple(sorted((walk(v) for v in value), key=repr)))
+        if isinstance(value, dict):
+            return ("dict", tuple((walk(k), walk(v)) for k, v in value.items()))
+        if isinstance(value, (str, bytes)):
+            return value
+        if isinstance(value, (tuple, list)) or hasattr(value, "__iter__") and hasattr(value, "__len__"):
+            return tuple(walk(v) for v in value)
+        return value
+
+    return pickle.dumps(walk(model)), positions
+
+
+def _to_positions(names: UniqueNames, positions: Dict[int, int]) -> Tuple[Dict[str, int], Dict[Any, str]]:
+    # Ids of nodes outside the model (eg from earlier queries) stay as they are
+    by_position = {("position", positions[i]) if i in positions else ("id", i): name for i, name in names.id_to_name.items()}
+    return dict(names.seen), by_position
+
+
+def _from_positions(seen: Dict[str, int], by_position: Dict[Any, str], positions: Dict[int, int]) -> UniqueNames:
+    ids = {position: i for i, position in positions.items()}
+    names = UniqueNames()
+    names.seen = dict(seen)
+    names.id_to_name = {(ids[key] if kind == "position" else key): name for (kind, key), name in by_position.items()}
+    return names
+
+
+class CompiledModelCache:
+    """Persists table schemas and compiled model transactions for one source hash."""
+
+    def __init__(self, key: str, db: str = "TEAM_ARQ", schema: str = "PUBLIC"):
+        self.key = key
+        self.db = db
+        self.schema = schema
+        self.versions: Optional[Dict[str, str]] = None
+        self.path = cache_dir("compiled", key)
+        self.enabled = os.environ.get("ARQ_COMPILE_CACHE", "1") != "0"
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def seed_schemas(self):
+        """Register cached table schemas so Table skips fetching them.
+
+        Only schemas of tables unchanged since they were cached are seeded.
+        """
+        path = self.path / "schemas.json"
+        if not self.enabled or not path.exists():
+            return
+        for fqn, cached in json.loads(path.read_text()).items():
+            version = (self.versions or {}).get(fqn.upper())
+            if version is None or cached.get("version") != version:
+                continue
+            columns = cached["columns"]
+            database, schema, table = fqn.split(".")
+            info = Table._schemas.get((database, schema))
+            if info is None:
+                info = Table._schemas[(database, schema)] = SchemaInfo(database, schema)
+            if table.upper() not in info.fetched:
+                info.fetched.update([table, table.upper()])
+                info.tables[table].fields = schema_dict_to_fields(columns)
+
+    def save_schemas(self):
+        schemas = {}
+        for (database, schema), info in Table._schemas.items():
+            for table, table_info in info.tables.items():
+                fqn = f"{database}.{schema}.{table}"
+                version = (self.versions or {}).get(fqn.upper())
+                if table.upper() in info.fetched and table_info.fields and version is not None:
+                    schemas[fqn] = {
+                        "version": version,
+                        "columns": {f.name: f.type_str for f in table_info.fields},
+                    }
+        (self.path / "schemas.json").write_text(json.dumps(schemas, indent=2))
+
+    def install(self, m: rai.Model, connection: Any):
+        """Serve m's model compilation from the cache, storing it on a miss.
+
+        The connection is used once to read the versions of the cached tables.
+        """
+        if not self.enabled:
+            return
+        if self.versions is None:
+            self.versions = table_versions(connection, self.db, self.schema)
+        self.seed_schemas()
+        to_executor = m._to_executor
+
+        def cached_to_executor():
+            executor = to_executor()
+            if isinstance(executor, LQPExecutor) and not getattr(executor, "_arq_cached", False):
+                executor._arq_cached = True
+                self._wrap_compiler(executor.compiler)
+            return executor
+
+        m._to_executor = cached_to_executor
+
+    def _wrap_compiler(self, compiler: Any):
+        compile = compiler.compile
+
+        def cached_compile(model: Any, options: Optional[Dict[str, Any]] = None):
+            options = options if options is not None else {}
+            if options.get("fragment_id") != b"model":
+                return compile(model, options)
+
+            # Compiled names depend on the IR and on the names already handed
+            # out, so both go into the fingerprint, in process-independent form
+            canonical, positions = canonical_ir(model)
+            names = _to_positions(compiler.def_names, positions)
+            fingerprint = hashlib.sha256(pickle.dumps((canonical, names))).hexdigest()[:16]
+            path = self.path / f"{fingerprint}.pkl"
+            if path.exists():
+                txn, (seen, by_position), seconds = pickle.loads(path.read_bytes())
+                compiler.def_names = _from_positions(seen, by_position, positions)
+                path.touch()
+                self.hits += 1
+                self.saved_seconds += seconds
+                return None, txn
+
+            start = time.perf_counter()
+            result = compile(model, options)
+            seconds = time.perf_counter() - start
+            names = _to_positions(compiler.def_names, positions)
+            path.write_bytes(pickle.dumps((result[1], names, seconds)))
+            self.evict()
+            self.save_schemas()
+            self.misses += 1
+            return result
+
+        compiler.compile = cached_compile
+
+    def evict(self):
+        """Remove all but the MAX_ENTRIES most recently used compiled transactions."""
+        entries = sorted(self.path.glob("*.pkl"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in entries[MAX_ENTRIES:]:
+            stale.unlink(missing_ok=True)
+
+    def report(self) -> str:
+        return f"compile cache {self.key}: {self.hits} hits, {self.misses} misses, saved {self.saved_seconds:.2f}s"
+
+
+def model_cache(
+    db: str = "TEAM_ARQ",
+    schema: str = "PUBLIC",
+    observation_table: str = "OBSERVATION_10k",
+) -> CompiledModelCache:
+    """Return the compiled model cache for the given source tables (the observation tier bound)."""
+    return CompiledModelCache(source_hash(f"{db}.{schema}", observation_table), db, schema)
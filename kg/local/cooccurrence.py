@@ -0,0 +1,241 @@
+"""
+Species co-occurrence
+
+Sparse incidence of taxa (rows, eg species) in H3 cells (columns, optionally
+split into year buckets), and association metrics between taxa from its
+products: the co-occurrence count of two taxa is the number of cells they
+share, the off-diagonal entries of A Aᵀ.
+
+The matrix is kept in CSR form (indptr / indices arrays) together with its
+transpose, as plain NumPy arrays saved as .npy and loaded with mmap. Row
+products are computed block by block, expanding each row's cells into the
+taxa seen there and counting, with the block size bounded by the work
+involved so the full observation table fits on one machine.
+
+Metrics, for taxa seen in a and b cells of n, sharing c:
+- jaccard: c / (a + b - c)
+- pmi: log(c n / (a b))
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from kg.cache import cache_dir
+from kg.local.taxonomy import TaxonomyStore
+
+METRICS = ("jaccard", "pmi")
+
+# Row pairs expanded per block of a product
+BLOCK_PAIRS = 20_000_000
+
+ARRAYS = ("taxa", "cells", "buckets", "indptr", "indices", "t_indptr", "t_indices")
+
+
+def incidence_sql(fqn: str, resolution: int = 6, bucket_years: int = 0) -> str:
+    """Distinct (taxon, cell[, year bucket]) rows of an observation table."""
+    bucket = f", floor(YEAR / {bucket_years}) * {bucket_years} as BUCKET" if bucket_years else ", 0 as BUCKET"
+    return f"""
+        select distinct TAXONKEY, H3_CELL_{resolution} as CELL{bucket}
+        from {fqn}
+        where TAXONKEY is not null and H3_CELL_{resolution} is not null
+    """
+
+
+def _csr(rows: np.ndarray, columns: np.ndarray, n_rows: int):
+    order = np.lexsort((columns, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, columns[order].astype(np.int32)
+
+
+@dataclass
+class Incidence:
+    """Taxon × cell incidence in CSR form, with its transpose."""
+    taxa: np.ndarray
+    cells: np.ndarray
+    buckets: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    t_indptr: np.ndarray
+    t_indices: np.ndarray
+    path: Optional[Path] = None
+
+    @classmethod
+    def build(
+        cls,
+        taxon_ids: Any,
+        cells: Any,
+        buckets: Optional[Any] = None,
+        store: Optional[TaxonomyStore] = None,
+        rank: str = "species",
+    ) -> "Incidence":
+        """Build from (taxon, cell[, bucket]) rows, eg one per observation.
+
+        Args:
+            taxon_ids: Classification of each row
+            cells: H3 cell of each row
+            buckets: Optional time bucket of each row, making columns (cell, bucket) pairs
+            store: Optional taxonomy store to roll classifications up to rank,
+                dropping rows not classified at or below it
+            rank: Rank to roll up to with a store (default: species)
+        """
+        taxon_ids = np.asarray(taxon_ids, dtype=np.int64)
+        cells = np.asarray(cells, dtype=np.int64)
+        buckets = np.zeros(len(cells), dtype=np.int64) if buckets is None else np.asarray(buckets, dtype=np.int64)
+        if store is not None:
+            taxon_ids = store.ancestor_at_rank(taxon_ids, rank)
+            keep = taxon_ids >= 0
+            taxon_ids, cells, buckets = taxon_ids[keep], cells[keep], buckets[keep]
+
+        taxa, rows = np.unique(taxon_ids, return_inverse=True)
+        cell_labels, cell_codes = np.unique(cells, return_inverse=True)
+        bucket_labels, bucket_codes = np.unique(buckets, return_inverse=True)
+        labels, codes = np.unique(cell_codes.astype(np.int64) * len(bucket_labels) + bucket_codes, return_inverse=True)
+        pairs = np.unique(rows.astype(np.int64) * len(labels) + codes)
+        rows, codes = pairs // len(labels), pairs % len(labels)
+
+        indptr, indices = _csr(rows, codes, len(taxa))
+        t_indptr, t_indices = _csr(codes, rows, len(labels))
+        return cls(
+            taxa, cell_labels[labels // len(bucket_labels)], bucket_labels[labels % len(bucket_labels)],
+            indptr, indices, t_indptr, t_indices,
+        )
+
+    @classmethod
+    def from_table(
+        cls,
+        connection: Any,
+        fqn: str,
+        resolution: int = 6,
+        bucket_years: int = 0,
+        store: Optional[TaxonomyStore] = None,
+        rank: str = "species",
+    ) -> "Incidence":
+        df = connection.sql(incidence_sql(fqn, resolution, bucket_years)).to_pandas()
+        return cls.build(df["TAXONKEY"], df["CELL"], df["BUCKET"], store, rank)
+
+    def save(self, path: Optional[Path] = None) -> "Incidence":
+        path = Path(path) if path is not None else cache_dir("cooccurrence")
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        return Incidence.load(path)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "Incidence":
+        path = Path(path) if path is not None else cache_dir("cooccurrence")
+        if not (path / "indptr.npy").exists():
+            raise FileNotFoundError(f"No incidence matrix in {path}, build one with `uv run -m kg.apps.build_local cooccurrence`")
+        return cls(*(np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAYS), path=path)
+
+    @property
+    def shape(self):
+        return len(self.taxa), len(self.cells)
+
+    @property
+    def occupancy(self) -> np.ndarray:
+        """Number of cells each taxon was seen in."""
+        return np.diff(self.indptr)
+
+    def rows(self, taxon_ids: Any) -> np.ndarray:
+        """Row of each taxon id, -1 if it was never seen."""
+        taxon_ids = np.atleast_1d(np.asarray(taxon_ids, dtype=np.int64))
+        if not len(self.taxa):
+            return np.full(len(taxon_ids), -1)
+        found = np.minimum(np.searchsorted(self.taxa, taxon_ids), len(self.taxa) - 1)
+        return np.where(self.taxa[found] == taxon_ids, found, -1)
+
+    def _products(self, rows: np.ndarray):
+        """Nonzero entries of A[rows] Aᵀ as (row index into rows, other row, shared cells)."""
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        sizes = ends - starts
+        entry = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes) + np.repeat(starts, sizes)
+        owner = np.repeat(np.arange(len(rows)), sizes)
+        cols = self.indices[entry]
+        col_starts, col_sizes = self.t_indptr[cols], self.t_indptr[cols + 1] - self.t_indptr[cols]
+        other = self.t_indices[
+            np.arange(col_sizes.sum()) - np.repeat(np.cumsum(col_sizes) - col_sizes, col_sizes) + np.repeat(col_starts, col_sizes)
+        ]
+        keys, shared = np.unique(np.repeat(owner, col_sizes) * len(self.taxa) + other, return_counts=True)
+        return keys // len(self.taxa), keys % len(self.taxa), shared
+
+    def _blocks(self, rows: np.ndarray):
+        """Split rows into blocks expanding at most BLOCK_PAIRS pairs each (single heavy rows excepted)."""
+        col_sizes = np.diff(self.t_indptr)
+        work = np.add.reduceat(
+            np.r_[col_sizes[self.indices], 0], np.minimum(self.indptr[:-1], len(self.indices))
+        ) * (np.diff(self.indptr) > 0)
+        cumulative = np.cumsum(work[rows])
+        start = 0
+        while start < len(rows):
+            base = cumulative[start - 1] if start else 0
+            end = max(int(np.searchsorted(cumulative, base + BLOCK_PAIRS, side="right")), start + 1)
+            yield rows[start:end]
+            start = end
+
+    def _score(self, row: np.ndarray, other: np.ndarray, shared: np.ndarray, metric: str) -> np.ndarray:
+        a, b = self.occupancy[row], self.occupancy[other]
+        if metric == "jaccard":
+            return shared / (a + b - shared)
+        if metric == "pmi":
+            return np.log(shared * len(self.cells) / (a * b))
+        raise ValueError(f"Unknown metric {metric}, expected one of {METRICS}")
+
+    def associations(
+        self,
+        taxon_ids: Optional[Any] = None,
+        k: int = 10,
+        metric: str = "jaccard",
+        min_shared: int = 1,
+    ) -> pd.DataFrame:
+        """Top-k associated taxa for each taxon.
+
+        Args:
+            taxon_ids: Taxa to report (default: all)
+            k: Associated taxa per taxon
+            metric: Ranking metric, jaccard or pmi
+            min_shared: Minimum shared cells for a pair to count, eg to keep PMI off singletons
+
+        Returns:
+            A frame with taxon_id, other_id, shared, jaccard and pmi, sorted by
+            taxon and descending metric
+        """
+        rows = np.arange(len(self.taxa)) if taxon_ids is None else self.rows(taxon_ids)
+        rows = rows[rows >= 0]
+        frames = []
+        for block in self._blocks(rows):
+            owner, other, shared = self._products(block)
+            row = block[owner]
+            keep = (row != other) & (shared >= min_shared)
+            row, other, shared = row[keep], other[keep], shared[keep]
+            score = self._score(row, other, shared, metric)
+            order = np.lexsort((-score, row))
+            row, other, shared = row[order], other[order], shared[order]
+            first = np.r_[0, np.flatnonzero(row[1:] != row[:-1]) + 1]
+            within = np.arange(len(row)) - np.repeat(first, np.diff(np.r_[first, len(row)]))
+            top = within < k
+            row, other, shared = row[top], other[top], shared[top]
+            frames.append(pd.DataFrame({
+                "taxon_id": self.taxa[row],
+                "other_id": self.taxa[other],
+                "shared": shared,
+                "jaccard": self._score(row, other, shared, "jaccard"),
+                "pmi": self._score(row, other, shared, "pmi"),
+            }))
+        columns = ["taxon_id", "other_id", "shared", "jaccard", "pmi"]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+    def cooccurrence(self, a: Any, b: Any) -> np.ndarray:
+        """Shared cells of each (a, b) taxon pair, 0 for unseen taxa."""
+        ra, rb = np.broadcast_arrays(self.rows(a), self.rows(b))
+        result = np.zeros(len(ra), dtype=np.int64)
+        known = np.flatnonzero((ra >= 0) & (rb >= 0))
+        for i in known:
+            left = self.indices[self.indptr[ra[i]] : self.indptr[ra[i] + 1]]
+            right = self.indices[self.indptr[rb[i]] : self.indptr[rb[i] + 1]]
+            result[i] = len(np.intersect1d(left, right, assume_unique=True))
+        return result
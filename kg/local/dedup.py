@@ -0,0 +1,156 @@
+"""
+Duplicate observations
+
+Clusters records of the same sighting published through several datasets or
+by several observers, which inflate observation counts.
+
+Candidates are blocked on (taxon, H3 cell at resolution 9, day): only rows
+sharing all three are ever compared, and the query only returns rows of
+blocks with more than one record, ordered by block, so the table streams in
+batches with at most one block carried between them. Within a block, rows
+are compared pairwise (by offset, for all blocks at once) and linked when
+they are within max_meters of each other and, when both have a time of day,
+within max_minutes. Linked rows form clusters (connected components), and
+each cluster is identified by its lowest GBIFID, the record kept when
+counting events.
+
+Rows in clusters of two or more are written to the OBSERVATION_DUPLICATES
+table (GBIFID, CLUSTERID, CLUSTERSIZE), which kg/model/core/duplicates.py
+binds as Observation.is_duplicate for the non-representative records.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+from kg.local.spatial import chord_of, to_xyz
+
+DUPLICATE_TABLE = "OBSERVATION_DUPLICATES"
+
+COLUMNS = ["GBIFID", "CLUSTERID", "CLUSTERSIZE"]
+
+
+def candidates_sql(fqn: str) -> str:
+    """Rows of multi-row (taxon, cell, day) blocks, ordered by block."""
+    return f"""
+        select GBIFID, TAXONKEY, H3_CELL_9, EVENTDATE, LAT, LON from {fqn}
+        where TAXONKEY is not null and H3_CELL_9 is not null and EVENTDATE is not null
+            and LAT is not null and LON is not null
+        qualify count(*) over (partition by TAXONKEY, H3_CELL_9, to_date(EVENTDATE)) > 1
+        order by TAXONKEY, H3_CELL_9, to_date(EVENTDATE)
+    """
+
+
+@dataclass
+class DedupParams:
+    max_meters: float = 100.0
+    max_minutes: float = 60.0
+    # rows compared with at most this many following rows of their block (in time order)
+    max_block: int = 1000
+
+
+def _components(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Connected component label (lowest member) of each of n nodes linked by edges (i, j)."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[i], labels[j])
+        np.minimum.at(labels, i, low)
+        np.minimum.at(labels, j, low)
+        while True:
+            jumped = labels[labels]
+            if (jumped == labels).all():
+                break
+            labels = jumped
+        if (labels[i] == labels[j]).all():
+            return labels
+
+
+def cluster_rows(rows: pd.DataFrame, params: DedupParams = DedupParams()) -> pd.DataFrame:
+    """Clusters among candidate rows (GBIFID, TAXONKEY, H3_CELL_9, EVENTDATE, LAT, LON).
+
+    Returns:
+        GBIFID, CLUSTERID and CLUSTERSIZE of the rows in clusters of two or more
+    """
+    if rows.empty:
+        return pd.DataFrame(columns=COLUMNS, dtype=np.int64)
+    time = pd.to_datetime(rows["EVENTDATE"]).to_numpy("datetime64[s]")
+    day = time.astype("datetime64[D]")
+    seconds = (time - day).astype(np.int64)
+    taxa = rows["TAXONKEY"].to_numpy(np.int64)
+    cells = rows["H3_CELL_9"].to_numpy(np.int64)
+    day = day.astype(np.int64)
+    order = np.lexsort((seconds, day, cells, taxa))
+    taxa, cells, day, seconds = taxa[order], cells[order], day[order], seconds[order]
+    gbif_ids = rows["GBIFID"].to_numpy(np.int64)[order]
+    xyz = to_xyz(rows["LAT"].to_numpy()[order], rows["LON"].to_numpy()[order])
+    timed = seconds > 0  # midnight means a date without a time
+
+    starts = np.r_[True, (taxa[1:] != taxa[:-1]) | (cells[1:] != cells[:-1]) | (day[1:] != day[:-1])]
+    first = np.flatnonzero(starts)
+    sizes = np.diff(np.r_[first, len(taxa)])
+    remaining = np.repeat(first + sizes, sizes) - np.arange(len(taxa)) - 1  # later rows in the block
+
+    max_chord = chord_of(params.max_meters)
+    max_seconds = params.max_minutes * 60
+    linked_i, linked_j = [], []
+    active = np.flatnonzero(remaining > 0)
+    for offset in range(1, params.max_block + 1):
+        active = active[remaining[active] >= offset]
+        if not len(active):
+            break
+        other = active + offset
+        close = np.linalg.norm(xyz[active] - xyz[other], axis=1) <= max_chord
+        close &= ~(timed[active] & timed[other]) | (np.abs(seconds[other] - seconds[active]) <= max_seconds)
+        linked_i.append(active[close])
+        linked_j.append(other[close])
+
+    if not linked_i:
+        return pd.DataFrame(columns=COLUMNS, dtype=np.int64)
+    i, j = np.concatenate(linked_i), np.concatenate(linked_j)
+    labels = _components(len(taxa), i, j)
+    cluster_ids = np.full(len(taxa), np.iinfo(np.int64).max)
+    np.minimum.at(cluster_ids, labels, gbif_ids)
+    cluster_sizes = np.bincount(labels, minlength=len(taxa))
+    keep = cluster_sizes[labels] > 1
+    return pd.DataFrame({
+        "GBIFID": gbif_ids[keep],
+        "CLUSTERID": cluster_ids[labels[keep]],
+        "CLUSTERSIZE": cluster_sizes[labels[keep]],
+    })
+
+
+def cluster_batches(batches: Iterable[pd.DataFrame], params: DedupParams = DedupParams()) -> pd.DataFrame:
+    """cluster_rows over batches of candidates_sql, carrying each batch's last block into the next."""
+    found = []
+    carry = None
+    for batch in batches:
+        if carry is not None:
+            batch = pd.concat([carry, batch], ignore_index=True)
+        if batch.empty:
+            continue
+        last = batch.iloc[-1]
+        tail = (
+            (batch["TAXONKEY"] == last["TAXONKEY"])
+            & (batch["H3_CELL_9"] == last["H3_CELL_9"])
+            & (pd.to_datetime(batch["EVENTDATE"]).dt.normalize() == pd.Timestamp(last["EVENTDATE"]).normalize())
+        )
+        carry = batch[tail]
+        found.append(cluster_rows(batch[~tail], params))
+    if carry is not None:
+        found.append(cluster_rows(carry, params))
+    if not found:
+        return pd.DataFrame(columns=COLUMNS, dtype=np.int64)
+    return pd.concat(found, ignore_index=True)
+
+
+def write_duplicates(connection: Any, clusters: pd.DataFrame, db: str = "TEAM_ARQ", schema: str = "PUBLIC") -> int:
+    """Replace the duplicate table with the clustered rows, returning the number of duplicates beyond one per cluster."""
+    connection.write_pandas(
+        clusters[COLUMNS].reset_index(drop=True), DUPLICATE_TABLE, database=db, schema=schema,
+        auto_create_table=True, overwrite=True,
+    )
+    # overwrite recreates the table, so turn change tracking (needed for RAI) back on
+    connection.sql(f"alter table {db}.{schema}.{DUPLICATE_TABLE} set change_tracking=true").collect()
+    return int((clusters["GBIFID"] != clusters["CLUSTERID"]).sum())
@@ -0,0 +1,519 @@
+"""
+H3 cells
+
+Vectorized H3 indexing of latitude / longitude arrays, the same cells as
+H3_LATLNG_TO_CELL in Snowflake (and latLngToCell in the H3 C library), so
+observations can be indexed locally while converting the raw GBIF files.
+
+Follows the H3 C library step by step, over arrays: points are projected
+gnomonically onto the closest icosahedron face, quantized into face IJK
+coordinates at the target resolution, then walked up to resolution 0 one
+aperture-7 step at a time, each step yielding one index digit. The
+resolution 0 coordinates give the base cell and the number of 60 degree
+rotations into its orientation, applied to the digits with lookup tables
+(pentagon base cells also skip their deleted k-axis subsequence).
+
+The way back (cell centers, and the disks of cells within k steps used to
+smooth heatmaps) walks down from each base cell's home face coordinates one
+digit at a time, moving cells past the face's edge onto the neighboring face.
+
+The face and base cell tables are those of the H3 C library (v4), which is
+Apache 2.0 licensed.
+"""
+
+from typing import Any, Dict, Iterable
+
+import numpy as np
+
+# Icosahedron face centers as (lat, lng) radians and unit vectors, and the azimuth of each face's i axis
+FACE_CENTER_GEO = np.array([
+    [0.803582649718989942, 1.248397419617396099],
+    [1.307747883455638156, 2.536945009877921159],
+    [1.054751253523952054, -1.347517358900396623],
+    [0.600191595538186799, -0.450603909469755746],
+    [0.491715428198773866, 0.401988202911306943],
+    [0.172745327415618701, 1.678146885280433686],
+    [0.605929321571350690, 2.953923329812411617],
+    [0.427370518328979641, -1.888876200336285401],
+    [-0.079066118549212831, -0.733429513380867741],
+    [-0.230961644455383637, 0.506495587332349035],
+    [0.079066118549212831, 2.408163140208925497],
+    [0.230961644455383637, -2.635097066257444203],
+    [-0.172745327415618701, -1.463445768309359553],
+    [-0.605929321571350690, -0.187669323777381622],
+    [-0.427370518328979641, 1.252716453253507838],
+    [-0.600191595538186799, 2.690988744120037492],
+    [-0.491715428198773866, -2.739604450678486295],
+    [-0.803582649718989942, -1.893195233972397139],
+    [-1.307747883455638156, -0.604647643711872080],
+    [-1.054751253523952054, 1.794075294689396615],
+])
+FACE_CENTER_POINT = np.array([
+    [0.2199307791404606, 0.6583691780274996, 0.7198475378926182],
+    [-0.2139234834501421, 0.1478171829550703, 0.9656017935214205],
+    [0.1092625278784797, -0.4811951572873210, 0.8697775121287253],
+    [0.7428567301586791, -0.3593941678278028, 0.5648005936517033],
+    [0.8112534709140969, 0.3448953237639384, 0.4721387736413930],
+    [-0.1055498149613921, 0.9794457296411413, 0.1718874610009365],
+    [-0.8075407579970092, 0.1533552485898818, 0.5695261994882688],
+    [-0.2846148069787907, -0.8644080972654206, 0.4144792552473539],
+    [0.7405621473854482, -0.6673299564565524, -0.0789837646326737],
+    [0.8512303986474293, 0.4722343788582681, -0.2289137388687808],
+    [-0.7405621473854481, 0.6673299564565524, 0.0789837646326737],
+    [-0.8512303986474292, -0.4722343788582682, 0.2289137388687808],
+    [0.1055498149613919, -0.9794457296411413, -0.1718874610009365],
+    [0.8075407579970092, -0.1533552485898819, -0.5695261994882688],
+    [0.2846148069787908, 0.8644080972654204, -0.4144792552473539],
+    [-0.7428567301586791, 0.3593941678278027, -0.5648005936517033],
+    [-0.8112534709140971, -0.3448953237639382, -0.4721387736413930],
+    [-0.2199307791404607, -0.6583691780274996, -0.7198475378926182],
+    [0.2139234834501420, -0.1478171829550704, -0.9656017935214205],
+    [-0.1092625278784796, 0.4811951572873210, -0.8697775121287253],
+])
+FACE_AXIS_AZ = np.array([
+    5.619958268523939882, 5.760339081714187279, 0.780213654393430055, 0.430469363979999913,
+    6.130269123335111400, 2.692877706530642877, 2.982963003477243874, 3.532912002790141181,
+    3.494305004259568154, 3.003214169499538391, 5.930472956509811562, 0.138378484090254847,
+    0.448714947059150361, 0.158629650112549365, 5.891865957979238535, 2.711123289609793325,
+    3.294508837434268316, 3.804819692245439833, 3.664438879055192436, 2.361378999196363184,
+])
+
+# Base cell and counter-clockwise 60 degree rotations of each resolution 0 (face, i, j, k), by face * 27 + i * 9 + j * 3 + k
+BASE_CELLS = np.array([
+    16, 18, 24, 33, 30, 32, 49, 48, 50, 8, 5, 10, 22, 16, 18, 41, 33, 30, 4, 0, 2, 15, 8, 5, 31, 22, 16,
+    2, 6, 14, 10, 11, 17, 24, 23, 25, 0, 1, 9, 5, 2, 6, 18, 10, 11, 4, 3, 7, 8, 0, 1, 16, 5, 2,
+    7, 21, 38, 9, 19, 34, 14, 20, 36, 3, 13, 29, 1, 7, 21, 6, 9, 19, 4, 12, 26, 0, 3, 13, 2, 1, 7,
+    26, 42, 58, 29, 43, 62, 38, 47, 64, 12, 28, 44, 13, 26, 42, 21, 29, 43, 4, 15, 31, 3, 12, 28, 7, 13, 26,
+    31, 41, 49, 44, 53, 61, 58, 65, 75, 15, 22, 33, 28, 31, 41, 42, 44, 53, 4, 8, 16, 12, 15, 22, 26, 28, 31,
+    50, 48, 49, 32, 30, 33, 24, 18, 16, 70, 67, 66, 52, 50, 48, 37, 32, 30, 83, 87, 85, 74, 70, 67, 57, 52, 50,
+    25, 23, 24, 17, 11, 10, 14, 6, 2, 45, 39, 37, 35, 25, 23, 27, 17, 11, 63, 59, 57, 56, 45, 39, 46, 35, 25,
+    36, 20, 14, 34, 19, 9, 38, 21, 7, 55, 40, 27, 54, 36, 20, 51, 34, 19, 72, 60, 46, 73, 55, 40, 71, 54, 36,
+    64, 47, 38, 62, 43, 29, 58, 42, 26, 84, 69, 51, 82, 64, 47, 76, 62, 43, 97, 89, 71, 98, 84, 69, 96, 82, 64,
+    75, 65, 58, 61, 53, 44, 49, 41, 31, 94, 86, 76, 81, 75, 65, 66, 61, 53, 107, 104, 96, 101, 94, 86, 85, 81, 75,
+    57, 59, 63, 74, 78, 79, 83, 92, 95, 37, 39, 45, 52, 57, 59, 70, 74, 78, 24, 23, 25, 32, 37, 39, 50, 52, 57,
+    46, 60, 72, 56, 68, 80, 63, 77, 90, 27, 40, 55, 35, 46, 60, 45, 56, 68, 14, 20, 36, 17, 27, 40, 25, 35, 46,
+    71, 89, 97, 73, 91, 103, 72, 88, 105, 51, 69, 84, 54, 71, 89, 55, 73, 91, 38, 47, 64, 34, 51, 69, 36, 54, 71,
+    96, 104, 107, 98, 110, 115, 97, 111, 119, 76, 86, 94, 82, 96, 104, 84, 98, 110, 58, 65, 75, 62, 76, 86, 64, 82, 96,
+    85, 87, 83, 101, 102, 100, 107, 112, 114, 66, 67, 70, 81, 85, 87, 94, 101, 102, 49, 48, 50, 61, 66, 67, 75, 81, 85,
+    95, 92, 83, 79, 78, 74, 63, 59, 57, 109, 108, 100, 93, 95, 92, 77, 79, 78, 117, 118, 114, 106, 109, 108, 90, 93, 95,
+    90, 77, 63, 80, 68, 56, 72, 60, 46, 106, 93, 79, 99, 90, 77, 88, 80, 68, 117, 109, 95, 113, 106, 93, 105, 99, 90,
+    105, 88, 72, 103, 91, 73, 97, 89, 71, 113, 99, 80, 116, 105, 88, 111, 103, 91, 117, 106, 90, 121, 113, 99, 119, 116, 105,
+    119, 111, 97, 115, 110, 98, 107, 104, 96, 121, 116, 103, 120, 119, 111, 112, 115, 110, 117, 113, 105, 118, 121, 116, 114, 120, 119,
+    114, 112, 107, 100, 102, 101, 83, 87, 85, 118, 120, 115, 108, 114, 112, 92, 100, 102, 117, 121, 119, 109, 118, 120, 95, 108, 114,
+])
+ROTATIONS = np.array([
+    0, 0, 0, 0, 0, 3, 1, 3, 3, 0, 5, 5, 0, 0, 0, 1, 0, 0, 0, 5, 5, 1, 0, 5, 1, 0, 0,
+    0, 0, 0, 0, 0, 3, 1, 3, 3, 0, 5, 5, 0, 0, 0, 1, 0, 0, 1, 5, 5, 1, 0, 5, 1, 0, 0,
+    0, 0, 0, 0, 0, 3, 1, 3, 3, 0, 5, 5, 0, 0, 0, 1, 0, 0, 2, 5, 5, 1, 0, 5, 1, 0, 0,
+    0, 0, 0, 0, 0, 3, 1, 3, 3, 0, 5, 5, 0, 0, 0, 1, 0, 0, 3, 5, 5, 1, 0, 5, 1, 0, 0,
+    0, 0, 0, 0, 0, 3, 1, 3, 3, 0, 5, 5, 0, 0, 0, 1, 0, 0, 4, 5, 5, 1, 0, 5, 1, 0, 0,
+    0, 0, 3, 0, 3, 3, 3, 3, 3, 0, 0, 3, 3, 0, 0, 3, 0, 3, 0, 3, 3, 3, 0, 0, 1, 3, 0,
+    0, 0, 3, 0, 3, 3, 3, 3, 3, 0, 0, 3, 3, 0, 0, 3, 0, 3, 0, 3, 3, 3, 0, 0, 3, 3, 0,
+    0, 0, 3, 0, 3, 3, 3, 3, 3, 0, 0, 3, 3, 0, 0, 3, 0, 3, 0, 3, 3, 3, 0, 0, 3, 3, 0,
+    0, 0, 3, 0, 3, 3, 3, 3, 3, 0, 0, 3, 3, 0, 0, 3, 0, 3, 0, 3, 3, 3, 0, 0, 3, 3, 0,
+    0, 0, 3, 0, 3, 3, 3, 3, 3, 0, 0, 3, 3, 0, 0, 3, 0, 3, 0, 3, 3, 3, 0, 0, 3, 3, 0,
+    0, 0, 3, 0, 3, 3, 3, 3, 3, 0, 3, 3, 0, 0, 0, 3, 0, 3, 0, 3, 3, 3, 0, 3, 3, 0, 0,
+    0, 0, 3, 0, 3, 3, 3, 3, 3, 0, 3, 3, 0, 0, 0, 3, 0, 3, 0, 3, 3, 3, 0, 3, 3, 0, 0,
+    0, 0, 3, 0, 3, 3, 3, 3, 3, 0, 3, 3, 0, 0, 0, 3, 0, 3, 0, 3, 3, 3, 0, 3, 3, 0, 0,
+    0, 0, 3, 0, 3, 3, 3, 3, 3, 0, 3, 3, 0, 0, 0, 3, 0, 3, 0, 3, 3, 3, 0, 3, 3, 0, 0,
+    0, 0, 3, 0, 3, 3, 3, 3, 3, 0, 3, 3, 0, 0, 0, 3, 0, 3, 0, 3, 3, 3, 0, 3, 3, 0, 0,
+    0, 0, 0, 0, 0, 3, 1, 3, 3, 0, 0, 5, 1, 0, 0, 1, 0, 0, 4, 5, 5, 1, 0, 0, 1, 1, 0,
+    0, 0, 0, 0, 0, 3, 1, 3, 3, 0, 0, 5, 1, 0, 0, 1, 0, 0, 3, 5, 5, 1, 0, 0, 1, 1, 0,
+    0, 0, 0, 0, 0, 3, 1, 3, 3, 0, 0, 5, 1, 0, 0, 1, 0, 0, 2, 5, 5, 1, 0, 0, 1, 1, 0,
+    0, 0, 0, 0, 0, 3, 1, 3, 3, 0, 0, 5, 1, 0, 0, 1, 0, 0, 1, 5, 5, 1, 0, 0, 1, 1, 0,
+    0, 0, 0, 0, 0, 3, 1, 3, 3, 0, 0, 5, 1, 0, 0, 1, 0, 0, 0, 5, 5, 1, 0, 0, 1, 1, 0,
+])
+
+# Pentagon base cells, and the faces on which each is offset clockwise (-1: none)
+PENTAGONS = np.array([4, 14, 24, 38, 49, 58, 63, 72, 83, 97, 107, 117])
+CW_OFFSET_FACES = np.full((122, 2), -1)
+CW_OFFSET_FACES[PENTAGONS] = [[-1, -1], [2, 6], [1, 5], [3, 7], [0, 9], [4, 8], [11, 15], [12, 16], [10, 19], [13, 17], [14, 18], [-1, -1]]
+
+# Home face and (i, j, k) coordinates of each base cell
+BASE_CELL_HOMES = np.array([
+    [1, 1, 0, 0], [2, 1, 1, 0], [1, 0, 0, 0], [2, 1, 0, 0], [0, 2, 0, 0], [1, 1, 1, 0], [1, 0, 0, 1], [2, 0, 0, 0],
+    [0, 1, 0, 0], [2, 0, 1, 0], [1, 0, 1, 0], [1, 0, 1, 1], [3, 1, 0, 0], [3, 1, 1, 0], [11, 2, 0, 0], [4, 1, 0, 0],
+    [0, 0, 0, 0], [6, 0, 1, 0], [0, 0, 0, 1], [2, 0, 1, 1], [7, 0, 0, 1], [2, 0, 0, 1], [0, 1, 1, 0], [6, 0, 0, 1],
+    [10, 2, 0, 0], [6, 0, 0, 0], [3, 0, 0, 0], [11, 1, 0, 0], [4, 1, 1, 0], [3, 0, 1, 0], [0, 0, 1, 1], [4, 0, 0, 0],
+    [5, 0, 1, 0], [0, 0, 1, 0], [7, 0, 1, 0], [11, 1, 1, 0], [7, 0, 0, 0], [10, 1, 0, 0], [12, 2, 0, 0], [6, 1, 0, 1],
+    [7, 1, 0, 1], [4, 0, 0, 1], [3, 0, 0, 1], [3, 0, 1, 1], [4, 0, 1, 0], [6, 1, 0, 0], [11, 0, 0, 0], [8, 0, 0, 1],
+    [5, 0, 0, 1], [14, 2, 0, 0], [5, 0, 0, 0], [12, 1, 0, 0], [10, 1, 1, 0], [4, 0, 1, 1], [12, 1, 1, 0], [7, 1, 0, 0],
+    [11, 0, 1, 0], [10, 0, 0, 0], [13, 2, 0, 0], [10, 0, 0, 1], [11, 0, 0, 1], [9, 0, 1, 0], [8, 0, 1, 0], [6, 2, 0, 0],
+    [8, 0, 0, 0], [9, 0, 0, 1], [14, 1, 0, 0], [5, 1, 0, 1], [16, 0, 1, 1], [8, 1, 0, 1], [5, 1, 0, 0], [12, 0, 0, 0],
+    [7, 2, 0, 0], [12, 0, 1, 0], [10, 0, 1, 0], [9, 0, 0, 0], [13, 1, 0, 0], [16, 0, 0, 1], [15, 0, 1, 1], [15, 0, 1, 0],
+    [16, 0, 1, 0], [14, 1, 1, 0], [13, 1, 1, 0], [5, 2, 0, 0], [8, 1, 0, 0], [14, 0, 0, 0], [9, 1, 0, 1], [14, 0, 0, 1],
+    [17, 0, 0, 1], [12, 0, 0, 1], [16, 0, 0, 0], [17, 0, 1, 1], [15, 0, 0, 1], [16, 1, 0, 1], [9, 1, 0, 0], [15, 0, 0, 0],
+    [13, 0, 0, 0], [8, 2, 0, 0], [13, 0, 1, 0], [17, 1, 0, 1], [19, 0, 1, 0], [14, 0, 1, 0], [19, 0, 1, 1], [17, 0, 1, 0],
+    [13, 0, 0, 1], [17, 0, 0, 0], [16, 1, 0, 0], [9, 2, 0, 0], [15, 1, 0, 1], [15, 1, 0, 0], [18, 0, 1, 1], [18, 0, 0, 1],
+    [19, 0, 0, 1], [17, 1, 0, 0], [19, 0, 0, 0], [18, 0, 1, 0], [18, 1, 0, 1], [19, 2, 0, 0], [19, 1, 0, 0], [18, 0, 0, 0],
+    [19, 1, 0, 1], [18, 1, 0, 0],
+])
+
+# Neighbor (face, i, j, k translation, counter-clockwise 60 degree rotations) across each face's ij, ki and jk edges
+FACE_NEIGHBORS = np.array([
+    [[4, 2, 0, 2, 1], [1, 2, 2, 0, 5], [5, 0, 2, 2, 3]],
+    [[0, 2, 0, 2, 1], [2, 2, 2, 0, 5], [6, 0, 2, 2, 3]],
+    [[1, 2, 0, 2, 1], [3, 2, 2, 0, 5], [7, 0, 2, 2, 3]],
+    [[2, 2, 0, 2, 1], [4, 2, 2, 0, 5], [8, 0, 2, 2, 3]],
+    [[3, 2, 0, 2, 1], [0, 2, 2, 0, 5], [9, 0, 2, 2, 3]],
+    [[10, 2, 2, 0, 3], [14, 2, 0, 2, 3], [0, 0, 2, 2, 3]],
+    [[11, 2, 2, 0, 3], [10, 2, 0, 2, 3], [1, 0, 2, 2, 3]],
+    [[12, 2, 2, 0, 3], [11, 2, 0, 2, 3], [2, 0, 2, 2, 3]],
+    [[13, 2, 2, 0, 3], [12, 2, 0, 2, 3], [3, 0, 2, 2, 3]],
+    [[14, 2, 2, 0, 3], [13, 2, 0, 2, 3], [4, 0, 2, 2, 3]],
+    [[5, 2, 2, 0, 3], [6, 2, 0, 2, 3], [15, 0, 2, 2, 3]],
+    [[6, 2, 2, 0, 3], [7, 2, 0, 2, 3], [16, 0, 2, 2, 3]],
+    [[7, 2, 2, 0, 3], [8, 2, 0, 2, 3], [17, 0, 2, 2, 3]],
+    [[8, 2, 2, 0, 3], [9, 2, 0, 2, 3], [18, 0, 2, 2, 3]],
+    [[9, 2, 2, 0, 3], [5, 2, 0, 2, 3], [19, 0, 2, 2, 3]],
+    [[16, 2, 0, 2, 1], [19, 2, 2, 0, 5], [10, 0, 2, 2, 3]],
+    [[17, 2, 0, 2, 1], [15, 2, 2, 0, 5], [11, 0, 2, 2, 3]],
+    [[18, 2, 0, 2, 1], [16, 2, 2, 0, 5], [12, 0, 2, 2, 3]],
+    [[19, 2, 0, 2, 1], [17, 2, 2, 0, 5], [13, 0, 2, 2, 3]],
+    [[15, 2, 0, 2, 1], [18, 2, 2, 0, 5], [14, 0, 2, 2, 3]],
+])
+
+RESOLUTIONS = (6, 7, 8, 9, 10)
+
+# Digit after one 60 degree rotation, counter-clockwise and clockwise
+_CCW = np.array([0, 5, 3, 1, 6, 4, 2], dtype=np.int64)
+_CW = np.array([0, 3, 6, 2, 5, 1, 4], dtype=np.int64)
+# Digits rotated counter-clockwise n times, by n * 7 + digit
+_CCW_N = np.array([np.arange(7)] * 6)
+for _n in range(1, 6):
+    _CCW_N[_n] = _CCW[_CCW_N[_n - 1]]
+_CCW_N = _CCW_N.ravel()
+
+# Digit of a unit offset in axial (i - k, j - k) coordinates, by (di + 1) * 3 + (dj + 1)
+_AXIAL_DIGITS = np.array([1, 3, 7, 5, 0, 2, 7, 4, 6], dtype=np.int64)
+# Unit (i, j, k) offset of each digit
+_DIGIT_IJK = np.array([[0, 0, 0], [0, 0, 1], [0, 1, 0], [0, 1, 1], [1, 0, 0], [1, 0, 1], [1, 1, 0]], dtype=np.int64)
+
+_IS_PENTAGON = np.zeros(122, dtype=bool)
+_IS_PENTAGON[PENTAGONS] = True
+
+_K_AXES_DIGIT = 1
+_IK_AXES_DIGIT = 5
+_IJ_AXES_DIGIT = 4
+_AP7_ROT_RADS = 0.333473172251832115336090755351601070065900389
+_RES0_U_GNOMONIC = 0.38196601125010500003
+_SQRT7 = 2.6457513110645905905016157536392604257102
+_SIN60 = 0.8660254037844386467637231707529361834714
+_EPSILON = 1e-16
+_MAX_FACE_COORD = 2
+
+_MODE_CELL = np.int64(1) << np.int64(59)
+_RES_OFFSET = 52
+_BASE_CELL_OFFSET = 45
+_DIGIT_BITS = 3
+
+
+def _hex2d_to_axial(x: np.ndarray, y: np.ndarray):
+    """Axial (i - k, j - k) coordinates of the hexagons containing hex2d points (_hex2dToCoordIJK)."""
+    a1, a2 = np.abs(x), np.abs(y)
+    x2 = a2 / _SIN60
+    x1 = a1 + x2 / 2
+    m1, m2 = np.floor(x1).astype(np.int64), np.floor(x2).astype(np.int64)
+    r1, r2 = x1 - m1, x2 - m2
+
+    i = np.where(
+        r1 < 0.5,
+        np.where(r1 < 1 / 3, m1, np.where(((1 - r1) <= r2) & (r2 < 2 * r1), m1 + 1, m1)),
+        np.where(r1 < 2 / 3, np.where(((2 * r1 - 1) < r2) & (r2 < (1 - r1)), m1, m1 + 1), m1 + 1),
+    )
+    j = np.where(
+        r1 < 0.5,
+        np.where(r1 < 1 / 3, np.where(r2 < (1 + r1) / 2, m2, m2 + 1), np.where(r2 < 1 - r1, m2, m2 + 1)),
+        np.where(r1 < 2 / 3, np.where(r2 < 1 - r1, m2, m2 + 1), np.where(r2 < r1 / 2, m2, m2 + 1)),
+    )
+
+    # fold across the axes
+    odd = j % 2
+    i = np.where(x < 0, i - (2 * (i - (j + odd) // 2) + odd), i)
+    negative = y < 0
+    i = np.where(negative, i - (2 * j + 1) // 2, i)
+    j = np.where(negative, -j, j)
+    return i, j
+
+
+def _face_hex2d(lat: np.ndarray, lon: np.ndarray):
+    """Closest icosahedron face, gnomonic angle and class II angle of each point (_geoToHex2d)."""
+    cos_lat = np.cos(lat)
+    point = np.stack([np.cos(lon) * cos_lat, np.sin(lon) * cos_lat, np.sin(lat)], axis=1)
+    # closest face center, then its squared chord, as the C library computes it
+    face = (point @ FACE_CENTER_POINT.T).argmax(axis=1)
+    sqd = ((point - FACE_CENTER_POINT[face]) ** 2).sum(axis=1)
+    r = np.arccos(np.clip(1 - sqd / 2, -1, 1))
+
+    center_lat, center_lon = FACE_CENTER_GEO[face, 0], FACE_CENTER_GEO[face, 1]
+    azimuth = np.arctan2(
+        cos_lat * np.sin(lon - center_lon),
+        np.cos(center_lat) * point[:, 2] - np.sin(center_lat) * cos_lat * np.cos(lon - center_lon),
+    )
+    theta = np.mod(FACE_AXIS_AZ[face] - np.mod(azimuth, 2 * np.pi), 2 * np.pi)
+    return face, r, theta
+
+
+def _leading(digits: np.ndarray) -> np.ndarray:
+    """First non-zero digit of each column of (resolution, n) digits (0 if none)."""
+    if not len(digits):
+        return np.zeros(digits.shape[1], dtype=np.int64)
+    return digits[(digits != 0).argmax(axis=0), np.arange(digits.shape[1])]
+
+
+def latlng_to_cell(lat: Any, lon: Any, resolution: int) -> np.ndarray:
+    """H3 cell of each latitude / longitude (degrees) at a resolution, -1 where invalid."""
+    return latlng_to_cells(lat, lon, [resolution])[resolution]
+
+
+def latlng_to_cells(lat: Any, lon: Any, resolutions: Iterable[int] = RESOLUTIONS) -> Dict[int, np.ndarray]:
+    """latlng_to_cell at several resolutions, sharing the face projection."""
+    lat = np.radians(np.atleast_1d(np.asarray(lat, dtype=np.float64)))
+    lon = np.radians(np.atleast_1d(np.asarray(lon, dtype=np.float64)))
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    face, r, theta = _face_hex2d(np.where(valid, lat, 0), np.where(valid, lon, 0))
+    # gnomonic scaling and the axes of each resolution class, shared by the resolutions
+    radius = np.where(r < _EPSILON, 0.0, np.tan(r) / _RES0_U_GNOMONIC)
+    axes = {}
+    cells = {}
+    for resolution in resolutions:
+        if resolution % 2 not in axes:
+            angle = np.mod(theta - _AP7_ROT_RADS, 2 * np.pi) if resolution % 2 else theta
+            axes[resolution % 2] = np.cos(angle), np.sin(angle)
+        cells[resolution] = np.where(valid, _cells(face, radius, *axes[resolution % 2], resolution), -1)
+    return cells
+
+
+def _cells(face: np.ndarray, radius: np.ndarray, cos: np.ndarray, sin: np.ndarray, resolution: int) -> np.ndarray:
+    scaled = radius
+    for _ in range(resolution):
+        scaled = scaled * _SQRT7
+    i, j = _hex2d_to_axial(scaled * cos, scaled * sin)
+
+    # walk up to resolution 0, each level's offset from its parent's center child giving its digit
+    digits = np.empty((resolution, len(face)), dtype=np.int64)
+    for level in range(resolution, 0, -1):
+        if level % 2:  # class III
+            pi, pj = (3 * i - j + 3) // 7, (i + 2 * j + 3) // 7
+            di, dj = i - (2 * pi + pj), j - (3 * pj - pi)
+        else:
+            pi, pj = (2 * i + j + 3) // 7, (3 * j - i + 3) // 7
+            di, dj = i - (3 * pi - pj), j - (pi + 2 * pj)
+        digits[level - 1] = _AXIAL_DIGITS[(di + 1) * 3 + (dj + 1)]
+        i, j = pi, pj
+
+    low = np.minimum(np.minimum(i, j), 0)
+    i, j, k = i - low, j - low, -low
+    valid = (i <= _MAX_FACE_COORD) & (j <= _MAX_FACE_COORD) & (k <= _MAX_FACE_COORD)
+    slot = face * 27 + np.minimum(i, 2) * 9 + np.minimum(j, 2) * 3 + np.minimum(k, 2)
+    base_cell, rotations = BASE_CELLS[slot], ROTATIONS[slot]
+
+    pentagon = _IS_PENTAGON[base_cell]
+    if pentagon.any():
+        # leave the deleted k-axes subsequence, clockwise on the offset faces
+        p = np.flatnonzero(pentagon & (_leading(digits) == _K_AXES_DIGIT))
+        cw = (CW_OFFSET_FACES[base_cell[p], 0] == face[p]) | (CW_OFFSET_FACES[base_cell[p], 1] == face[p])
+        digits[:, p] = np.where(cw, _CW[digits[:, p]], _CCW[digits[:, p]])
+        for turn in range(5):
+            p = np.flatnonzero(pentagon & (rotations > turn))
+            rotated = _CCW[digits[:, p]]
+            again = _leading(rotated) == _K_AXES_DIGIT
+            rotated[:, again] = _CCW[rotated[:, again]]
+            digits[:, p] = rotated
+        rotations = np.where(pentagon, 0, rotations)
+    if rotations.any():
+        digits = _CCW_N[rotations * 7 + digits]
+
+    unused = sum(7 << ((15 - level) * _DIGIT_BITS) for level in range(resolution + 1, 16))
+    cells = _MODE_CELL | np.int64(resolution << _RES_OFFSET | unused) | (base_cell << _BASE_CELL_OFFSET)
+    for level in range(1, resolution + 1):
+        cells |= digits[level - 1] << ((15 - level) * _DIGIT_BITS)
+    return np.where(valid, cells, -1)
+
+
+def _normalize(i: np.ndarray, j: np.ndarray, k: np.ndarray):
+    low = np.minimum(np.minimum(i, j), k)
+    return i - low, j - low, k - low
+
+
+def _rotate_ccw(i: np.ndarray, j: np.ndarray, k: np.ndarray):
+    return _normalize(i + k, i + j, j + k)
+
+
+def _rotate_cw(i: np.ndarray, j: np.ndarray, k: np.ndarray):
+    return _normalize(i + j, j + k, i + k)
+
+
+def _down_ap7r(i: np.ndarray, j: np.ndarray, k: np.ndarray):
+    return _normalize(3 * i + k, i + 3 * j, j + 3 * k)
+
+
+def _up_ap7r(i: np.ndarray, j: np.ndarray, k: np.ndarray):
+    a, b = i - k, j - k
+    return _normalize(np.rint((2 * a + b) / 7).astype(np.int64), np.rint((3 * b - a) / 7).astype(np.int64), 0 * a)
+
+
+def cell_resolution(cells: Any) -> np.ndarray:
+    """Resolution of each cell."""
+    return (np.asarray(cells, dtype=np.int64) >> _RES_OFFSET) & 15
+
+
+def cell_to_parent(cells: Any, resolution: int) -> np.ndarray:
+    """Parent of each cell at a coarser (or the same) resolution."""
+    cells = np.atleast_1d(np.asarray(cells, dtype=np.int64))
+    if (cell_resolution(cells) < resolution).any():
+        raise ValueError(f"Cells are finer than resolution {resolution}")
+    unused = sum(7 << ((15 - level) * _DIGIT_BITS) for level in range(resolution + 1, 16))
+    return (cells & ~np.int64(15 << _RES_OFFSET)) | np.int64(resolution << _RES_OFFSET | unused)
+
+
+def _cell_digits(cells: np.ndarray):
+    """Resolution shared by the cells, their base cells and (resolution, n) digits."""
+    resolution = cell_resolution(cells)
+    if len(cells) and (resolution != resolution[0]).any():
+        raise ValueError("Cells must all have the same resolution")
+    resolution = int(resolution[0]) if len(cells) else 0
+    base_cell = (cells >> _BASE_CELL_OFFSET) & 127
+    digits = np.empty((resolution, len(cells)), dtype=np.int64)
+    for level in range(1, resolution + 1):
+        digits[level - 1] = (cells >> ((15 - level) * _DIGIT_BITS)) & 7
+    return resolution, base_cell, digits
+
+
+def _adjust_overage(face, i, j, k, rows, max_dim: int, unit: int, pentagon_leading_4):
+    """Move the coordinates of rows past their face's edge onto the neighboring face (_adjustOverageClassII).
+
+    Returns the rows that moved.
+    """
+    over = rows[i[rows] + j[rows] + k[rows] > max_dim]
+    fi, ii, jj, kk = face[over], i[over], j[over], k[over]
+    # ij, ki or jk edge
+    quadrant = np.where(kk > 0, np.where(jj > 0, 2, 1), 0)
+
+    # a pentagon's leading 4 subsequence turns clockwise about its center
+    turn = (quadrant == 1) & pentagon_leading_4[over]
+    ti, tj, tk = _rotate_cw(ii[turn] - max_dim, jj[turn], kk[turn])
+    ii[turn], jj[turn], kk[turn] = ti + max_dim, tj, tk
+
+    neighbor = FACE_NEIGHBORS[fi, quadrant]
+    for rotation in range(5):
+        r = neighbor[:, 4] > rotation
+        ii[r], jj[r], kk[r] = _rotate_ccw(ii[r], jj[r], kk[r])
+    face[over] = neighbor[:, 0]
+    i[over], j[over], k[over] = _normalize(
+        ii + neighbor[:, 1] * unit, jj + neighbor[:, 2] * unit, kk + neighbor[:, 3] * unit,
+    )
+    return over
+
+
+def _cell_face_ijk(cells: np.ndarray):
+    """Face and (i, j, k) coordinates of cell centers, on the face containing them (_h3ToFaceIjk)."""
+    resolution, base_cell, digits = _cell_digits(cells)
+    pentagon = _IS_PENTAGON[base_cell]
+    # a pentagon's whole ik subsequence is rotated clockwise
+    rotate = np.flatnonzero(pentagon & (_leading(digits) == _IK_AXES_DIGIT))
+    digits[:, rotate] = _CW[digits[:, rotate]]
+
+    # walk down from the base cell's home coordinates, one aperture 7 step per digit
+    face, i, j, k = BASE_CELL_HOMES[base_cell].T.copy()
+    possible_overage = pentagon | ((resolution > 0) & ((i != 0) | (j != 0) | (k != 0)))
+    for level in range(1, resolution + 1):
+        if level % 2:  # class III
+            i, j, k = 3 * i + j, 3 * j + k, i + 3 * k
+        else:
+            i, j, k = 3 * i + k, i + 3 * j, j + 3 * k
+        offset = _DIGIT_IJK[digits[level - 1]]
+        i, j, k = _normalize(i + offset[:, 0], j + offset[:, 1], k + offset[:, 2])
+
+    leading_4 = pentagon & (_leading(digits) == _IJ_AXES_DIGIT)
+    _onto_own_face(face, i, j, k, resolution, np.flatnonzero(possible_overage), pentagon, leading_4)
+    return resolution, face, i, j, k
+
+
+def _onto_own_face(face, i, j, k, resolution: int, rows, pentagon, leading_4):
+    """Move coordinates past the edge of their face onto the face they lie on, in place."""
+    if not len(rows):
+        return
+    # overage is resolved on the class II grid at or below the resolution
+    class_ii = resolution + resolution % 2
+    fi, ii, jj, kk = face.copy(), i.copy(), j.copy(), k.copy()
+    if resolution % 2:
+        ii[rows], jj[rows], kk[rows] = _down_ap7r(i[rows], j[rows], k[rows])
+    max_dim, unit = 2 * 7 ** (class_ii // 2), 7 ** (class_ii // 2)
+    moved = _adjust_overage(fi, ii, jj, kk, rows, max_dim, unit, leading_4)
+    # pentagons can overflow onto a second face
+    again = moved[pentagon[moved]]
+    while len(again):
+        again = _adjust_overage(fi, ii, jj, kk, again, max_dim, unit, np.zeros_like(leading_4))
+    if resolution % 2:
+        ii[moved], jj[moved], kk[moved] = _up_ap7r(ii[moved], jj[moved], kk[moved])
+    face[moved], i[moved], j[moved], k[moved] = fi[moved], ii[moved], jj[moved], kk[moved]
+
+
+def _face_ijk_to_latlng(face, i, j, k, resolution: int):
+    """Latitude / longitude radians of face (i, j, k) coordinates at a resolution (_hex2dToGeo)."""
+    a, b = i - k, j - k
+    x, y = a - 0.5 * b, b * _SIN60
+    r = np.hypot(x, y)
+    theta = np.arctan2(y, x)
+    for _ in range(resolution):
+        r = r / _SQRT7
+    r = np.arctan(r * _RES0_U_GNOMONIC)
+    if resolution % 2:
+        theta = theta + _AP7_ROT_RADS
+    azimuth = FACE_AXIS_AZ[face] - theta
+
+    center_lat, center_lon = FACE_CENTER_GEO[face, 0], FACE_CENTER_GEO[face, 1]
+    sin_lat = np.clip(np.sin(center_lat) * np.cos(r) + np.cos(center_lat) * np.sin(r) * np.cos(azimuth), -1, 1)
+    lon = center_lon + np.arctan2(
+        np.sin(azimuth) * np.sin(r) * np.cos(center_lat),
+        np.cos(r) - np.sin(center_lat) * sin_lat,
+    )
+    return np.arcsin(sin_lat), np.mod(lon + np.pi, 2 * np.pi) - np.pi
+
+
+def cell_to_latlng(cells: Any):
+    """Latitude and longitude (degrees) of the center of each cell, all of one resolution."""
+    cells = np.atleast_1d(np.asarray(cells, dtype=np.int64))
+    resolution, face, i, j, k = _cell_face_ijk(cells)
+    lat, lon = _face_ijk_to_latlng(face, i, j, k, resolution)
+    return np.degrees(lat), np.degrees(lon)
+
+
+def disk_offsets(k: int):
+    """Axial (i - k, j - k) offsets of the cells within k steps of a cell, and their distance, nearest first."""
+    a, b = (x.ravel() for x in np.meshgrid(np.arange(-k, k + 1), np.arange(-k, k + 1), indexing="ij"))
+    distance = np.maximum(np.maximum(np.abs(a), np.abs(b)), np.abs(a - b))
+    order = np.argsort(distance, kind="stable")
+    order = order[distance[order] <= k]
+    return a[order], b[order], distance[order]
+
+
+def grid_disk(cells: Any, k: int) -> np.ndarray:
+    """Cells within k steps of each cell, as (cells, 3k(k + 1) + 1) columns nearest first.
+
+    Neighbors are found by offsetting the cell's coordinates on the face
+    containing its center, moving offsets past the face's edge onto the next
+    face as cell centers are, then indexing the projected centers. This
+    matches H3's gridDisk except within k cells of the 12 pentagons (mostly
+    at sea), whose disks are short of the deleted sector's cells, the missing
+    columns being -1, and can differ from gridDisk by a cell at k >= 2.
+    """
+    cells = np.atleast_1d(np.asarray(cells, dtype=np.int64))
+    resolution, face, i, j, kk = _cell_face_ijk(cells)
+    da, db, _ = disk_offsets(k)
+    face = np.repeat(face, len(da))
+    i, j, kk = _normalize(((i - kk)[:, None] + da).ravel(), ((j - kk)[:, None] + db).ravel(), np.zeros(len(face), dtype=np.int64))
+    # neighbors past the face's edge are placed on the next face, as their centers are
+    none = np.zeros(len(face), dtype=bool)
+    _onto_own_face(face, i, j, kk, resolution, np.arange(len(face)), none, none)
+    lat, lon = _face_ijk_to_latlng(face, i, j, kk, resolution)
+    disk = latlng_to_cell(np.degrees(lat), np.degrees(lon), resolution).reshape(len(cells), len(da))
+
+    # offsets into a pentagon's deleted sector land on cells already in the disk
+    order = np.argsort(disk, axis=1, kind="stable")
+    ordered = np.take_along_axis(disk, order, axis=1)
+    repeated = np.zeros_like(ordered, dtype=bool)
+    repeated[:, 1:] = ordered[:, 1:] == ordered[:, :-1]
+    np.put_along_axis(disk, order, np.where(repeated, -1, ordered), axis=1)
+    return disk
@@ -0,0 +1,272 @@
+"""
+Heatmaps
+
+Kernel density heatmaps of observations over the H3 grid, at any resolution
+the observation table is indexed at (h3_cell_6 .. h3_cell_10), optionally
+restricted to a taxon's subtree, a year range and a season.
+
+Observations are fetched as counts grouped by (cell, taxon) per resolution,
+year range and season, and the taxon filter is applied to those rows with
+the taxonomy store. Smoothing spreads each cell's count over the cells
+within k steps (grid_disk in kg/local/h3cells.py) with weights that fall with
+the distance in steps and sum to one, so totals are kept: one bincount over
+the (cell, neighbor) pairs, without a loop over cells.
+
+Grouped counts and heatmaps are cached under a directory keyed by the
+observation table's version (as in kg/local/phenology.py), heatmaps by their
+filter and kernel, so exports are reproducible and recomputed only once the
+table changes. Heatmaps are written as (cell, value) rows sorted by cell, as
+Parquet or GeoJSON points at the cell centers, in one file or one per tile
+(a parent cell at a coarser resolution).
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from kg.cache import cache_dir, drop_stale_versions, table_version
+from kg.local.h3cells import RESOLUTIONS, cell_to_latlng, cell_to_parent, disk_offsets, grid_disk
+from kg.local.taxonomy import TaxonomyStore
+
+SEASONS = ("spring", "summer", "fall", "winter")
+KERNELS = ("gaussian", "linear", "flat")
+FORMATS = ("parquet", "geojson")
+
+# The same season in the other hemisphere
+_OPPOSITE = {"spring": "fall", "summer": "winter", "fall": "spring", "winter": "summer"}
+
+Years = Optional[Tuple[int, int]]
+
+
+def cell_counts_sql(fqn: str, resolution: int, years: Years = None, season: Optional[str] = None) -> str:
+    """Observation counts grouped by H3 cell and taxon, in a year range and season of their hemisphere.
+
+    Seasons run between the same-year equinoxes and solstices of the SOLEQ
+    table next to the observation table, as Observation.season does.
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution {resolution}, expected one of {RESOLUTIONS}")
+    column = f"o.H3_CELL_{resolution}"
+    where = [f"{column} is not null"]
+    join = ""
+    if years is not None:
+        where.append(f"o.YEAR between {int(years[0])} and {int(years[1])}")
+    if season is not None:
+        if season not in SEASONS:
+            raise ValueError(f"Unknown season {season!r}, expected one of {SEASONS}")
+        soleq = fqn.rsplit(".", 1)[0] + ".SOLEQ"
+        join = f"join {soleq} as s on s.YEAR = o.YEAR"
+        # the northern season of the date, then the requested season as the north names it
+        where.append(f"""
+            case
+                when o.EVENTDATE < s.SPRING_EQUINOX then 'winter'
+                when o.EVENTDATE < s.SUMMER_SOLSTICE then 'spring'
+                when o.EVENTDATE < s.FALL_EQUINOX then 'summer'
+                when o.EVENTDATE < s.WINTER_SOLSTICE then 'fall'
+                else 'winter'
+            end = iff(o.LAT >= 0, '{season}', '{_OPPOSITE[season]}')
+        """)
+    return f"""
+        select {column} as CELL, o.TAXONKEY, count(*) as N
+        from {fqn} as o
+        {join}
+        where {' and '.join(where)}
+        group by 1, 2
+    """
+
+
+def kernel_weights(k: int, kernel: str = "gaussian") -> np.ndarray:
+    """Weight of each cell of a disk (nearest first, as grid_disk), falling with distance and summing to one.
+
+    gaussian: sigma of k / 2 steps; linear: 1 - d / (k + 1); flat: uniform
+    """
+    _, _, distance = disk_offsets(k)
+    if kernel == "gaussian":
+        weights = np.exp(-0.5 * (distance / max(k / 2, 0.5)) ** 2)
+    elif kernel == "linear":
+        weights = 1 - distance / (k + 1)
+    elif kernel == "flat":
+        weights = np.ones(len(distance))
+    else:
+        raise ValueError(f"Unknown kernel {kernel!r}, expected one of {KERNELS}")
+    return weights / weights.sum()
+
+
+def smooth_cells(cells: Any, values: Any, k: int = 2, kernel: str = "gaussian", chunk: int = 100_000):
+    """Spread each cell's value over the cells within k steps, keeping the total.
+
+    Returns:
+        (cells, values) sorted by cell, including neighbors without values of their own
+    """
+    cells = np.asarray(cells, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    weights = kernel_weights(k, kernel)
+    spread_cells, spread_values = [], []
+    for start in range(0, len(cells), chunk):
+        disk = grid_disk(cells[start:start + chunk], k)
+        # renormalize where a pentagon's disk is short of cells
+        w = np.where(disk >= 0, weights, 0)
+        w /= w.sum(axis=1, keepdims=True)
+        keep = disk >= 0
+        spread_cells.append(disk[keep])
+        spread_values.append((values[start:start + chunk, None] * w)[keep])
+    if not spread_cells:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    out, inverse = np.unique(np.concatenate(spread_cells), return_inverse=True)
+    return out, np.bincount(inverse, weights=np.concatenate(spread_values), minlength=len(out))
+
+
+def heatmap_frame(cells: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    """Compact (cell, value) rows sorted by cell, as float32 values."""
+    order = np.argsort(cells, kind="stable")
+    return pd.DataFrame({"cell": cells[order].astype(np.int64), "value": values[order].astype(np.float32)})
+
+
+class HeatmapIndex:
+    """Heatmaps of an observation table for any taxon, year range, season and kernel.
+
+    Args:
+        store: The taxonomy store
+        connection: A connection to fetch grouped counts with (connection.sql(...).to_pandas())
+        fqn: The observation table
+        path: Optional directory to cache grouped counts and (per taxonomy store version) heatmaps in
+    """
+
+    def __init__(self, store: TaxonomyStore, connection: Any, fqn: str, path: Optional[Path] = None):
+        self.store = store
+        self.connection = connection
+        self.fqn = fqn
+        self.path = path
+
+    @classmethod
+    def load(cls, store: TaxonomyStore, connection: Any, fqn: str) -> "HeatmapIndex":
+        """Open the index for an observation table, clearing the cache when the table changed."""
+        root = cache_dir("heatmap", re.sub(r"\W", "_", fqn.lower()))
+        path = root / table_version(connection, fqn)
+        if not path.exists():
+            drop_stale_versions(root, path.name)
+            path.mkdir(parents=True)
+        # Taxon heatmaps cover store subtrees, drop those of other (rebuilt) stores
+        drop_stale_versions(path / "heatmaps", store.version)
+        return cls(store, connection, fqn, path)
+
+    def counts(self, resolution: int, years: Years = None, season: Optional[str] = None) -> pd.DataFrame:
+        """Grouped CELL, TAXONKEY, N counts of the observations in a year range and season."""
+        cached = None
+        if self.path is not None:
+            cached = self.path / "counts" / f"r{resolution}-{_years_key(years)}-{season or 'all'}.parquet"
+            if cached.exists():
+                return pd.read_parquet(cached)
+        df = self.connection.sql(cell_counts_sql(self.fqn, resolution, years, season)).to_pandas()
+        if cached is not None:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(cached)
+        return df
+
+    def heatmap(
+        self,
+        resolution: int,
+        taxon_id: Optional[int] = None,
+        years: Years = None,
+        season: Optional[str] = None,
+        k: int = 2,
+        kernel: str = "gaussian",
+    ) -> pd.DataFrame:
+        """Smoothed observation counts per cell, see smooth_cells.
+
+        Args:
+            resolution: H3 resolution, one of RESOLUTIONS
+            taxon_id: Only count observations of this taxon's subtree
+            years: Optional inclusive (first, last) year range
+            season: Optional season of each observation's hemisphere, one of SEASONS
+            k: Steps to smooth over (0: raw counts)
+            kernel: One of KERNELS
+
+        Returns:
+            A frame with cell and value columns, sorted by cell
+        """
+        cached = None
+        if self.path is not None:
+            key = f"r{resolution}-t{'all' if taxon_id is None else taxon_id}-{_years_key(years)}-{season or 'all'}-k{k}-{kernel}"
+            cached = self.path / "heatmaps" / self.store.version / f"{key}.parquet"
+            if cached.exists():
+                return pd.read_parquet(cached)
+        counts = self.counts(resolution, years, season)
+        if taxon_id is not None:
+            known = counts["TAXONKEY"].notna().to_numpy()
+            keep = np.zeros(len(counts), dtype=bool)
+            keep[known] = self.store.in_subtree(taxon_id, counts["TAXONKEY"][known].to_numpy(dtype=np.int64))
+            counts = counts[keep]
+        cells, inverse = np.unique(counts["CELL"].to_numpy(dtype=np.int64), return_inverse=True)
+        values = np.bincount(inverse, weights=counts["N"].to_numpy(dtype=np.float64), minlength=len(cells))
+        if k > 0:
+            cells, values = smooth_cells(cells, values, k, kernel)
+        df = heatmap_frame(cells, values)
+        if cached is not None:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(cached)
+        return df
+
+
+def _years_key(years: Years) -> str:
+    return "all" if years is None else f"{years[0]}-{years[1]}"
+
+
+def write_parquet(df: pd.DataFrame, path: Path) -> Path:
+    """Write (cell, value) rows as Parquet, cells as int64."""
+    table = pa.Table.from_pandas(df[["cell", "value"]], preserve_index=False)
+    pq.write_table(table, path, compression="zstd")
+    return path
+
+
+def write_geojson(df: pd.DataFrame, path: Path, chunk: int = 50_000) -> Path:
+    """Write (cell, value) rows as a GeoJSON FeatureCollection of cell center points, streamed in chunks.
+
+    Cells are hex strings (as H3 tools print them), since int64 does not survive JSON numbers.
+    """
+    with open(path, "w") as f:
+        f.write('{"type":"FeatureCollection","features":[')
+        for start in range(0, len(df), chunk):
+            part = df.iloc[start:start + chunk]
+            cells = part["cell"].to_numpy(dtype=np.int64)
+            lat, lon = cell_to_latlng(cells)
+            features = [
+                json.dumps({
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [round(x, 6), round(y, 6)]},
+                    "properties": {"cell": format(cell, "x"), "value": round(value, 6)},
+                }, separators=(",", ":"))
+                for cell, x, y, value in zip(cells.tolist(), lon.tolist(), lat.tolist(), part["value"].tolist())
+            ]
+            f.write(("," if start else "") + ",".join(features))
+        f.write("]}\n")
+    return path
+
+
+def write_tiles(df: pd.DataFrame, out: Path, fmt: str = "parquet", tile_resolution: Optional[int] = None) -> List[Path]:
+    """Write a heatmap to one file, or one file per tile (the cells' parent at tile_resolution) in a directory.
+
+    Tiles are named by their parent cell in hex, eg out/832830fffffffff.geojson.
+    """
+    writer = {"parquet": write_parquet, "geojson": write_geojson}.get(fmt)
+    if writer is None:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+    out = Path(out)
+    if tile_resolution is None:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        return [writer(df, out)]
+    out.mkdir(parents=True, exist_ok=True)
+    tiles = cell_to_parent(df["cell"].to_numpy(dtype=np.int64), tile_resolution)
+    # rows stay sorted by cell within each tile
+    order = np.argsort(tiles, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(tiles[order]) != 0])
+    paths = []
+    for rows in np.split(order, starts[1:]):
+        paths.append(writer(df.iloc[rows], out / f"{format(int(tiles[rows[0]]), 'x')}.{fmt}"))
+    return paths
@@ -0,0 +1,132 @@
+"""
+Observation ingestion
+
+Converts the raw GBIF observation TSV into Parquet files with the H3 cells of
+every record precomputed as int64 columns (H3_CELL_6 .. H3_CELL_10), so the
+staging model selects them instead of calling H3_LATLNG_TO_CELL five times
+per row on every rebuild.
+
+The TSV is read in batches with pyarrow, keeping every raw column as a string
+(as the CSV load into Snowflake does) and the coordinates as floats. Rows
+with the wrong number of fields, which the CSV COPY rejected, are skipped
+and returned for the caller to report. Each
+batch is indexed at all resolutions with the vectorized encoder in
+kg/local/h3cells.py, by a pool of worker processes, and written as its own
+Parquet part in order.
+
+check_parity compares local cells with the warehouse's on a sample of an
+observation table.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as csv
+import pyarrow.parquet as pq
+
+from kg.local.h3cells import RESOLUTIONS, latlng_to_cells
+
+LAT, LON = "decimalLatitude", "decimalLongitude"
+
+# Batches kept in flight per worker, bounding memory while keeping workers busy
+PREFETCH = 2
+
+
+def h3_columns(lat: Any, lon: Any) -> Dict[str, np.ndarray]:
+    """H3_CELL_<res> columns for coordinates, -1 where they are missing or invalid."""
+    return {f"H3_CELL_{res}": cells for res, cells in latlng_to_cells(lat, lon, RESOLUTIONS).items()}
+
+
+def read_batches(
+    path: Path, block_bytes: int = 64 << 20, skipped: Optional[List[str]] = None
+) -> Iterator[pa.RecordBatch]:
+    """Record batches of a GBIF TSV, every column a string except the coordinates.
+
+    Rows with the wrong number of fields are skipped, and their text is
+    appended to skipped if given.
+    """
+    with open(path, encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("\t")
+    types = {name: pa.string() for name in header}
+    types[LAT] = types[LON] = pa.float64()
+
+    def skip(row: csv.InvalidRow) -> str:
+        if skipped is not None:
+            skipped.append(row.text)
+        return "skip"
+
+    reader = csv.open_csv(
+        path,
+        read_options=csv.ReadOptions(block_size=block_bytes),
+        parse_options=csv.ParseOptions(delimiter="\t", quote_char=False, invalid_row_handler=skip),
+        convert_options=csv.ConvertOptions(column_types=types, strings_can_be_null=True),
+    )
+    yield from reader
+
+
+def _with_cells(batch: pa.RecordBatch, cells: Dict[str, np.ndarray]) -> pa.Table:
+    table = pa.Table.from_batches([batch])
+    for name, values in cells.items():
+        table = table.append_column(name, pa.array(values, mask=values < 0, type=pa.int64()))
+    return table
+
+
+def convert_tsv(
+    path: Path, out: Path, workers: Optional[int] = None, block_bytes: int = 64 << 20
+) -> Tuple[int, List[str]]:
+    """Write the TSV as Parquet parts with H3 cells in out.
+
+    Returns:
+        The number of records written and the text of the malformed rows skipped
+    """
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    for stale in out.glob("part-*.parquet"):
+        stale.unlink()
+
+    workers = workers or os.cpu_count() or 1
+    rows = 0
+    skipped: List[str] = []
+    with ProcessPoolExecutor(workers) as pool:
+        pending = []
+        for part, batch in enumerate(read_batches(path, block_bytes, skipped)):
+            coordinates = batch.column(LAT).to_numpy(zero_copy_only=False), batch.column(LON).to_numpy(zero_copy_only=False)
+            pending.append((part, batch, pool.submit(h3_columns, *coordinates)))
+            # write finished parts in order, waiting once enough batches are in flight
+            while pending and (pending[0][2].done() or len(pending) >= PREFETCH * workers):
+                done, finished, future = pending.pop(0)
+                pq.write_table(_with_cells(finished, future.result()), out / f"part-{done:05d}.parquet")
+                rows += finished.num_rows
+        for done, finished, future in pending:
+            pq.write_table(_with_cells(finished, future.result()), out / f"part-{done:05d}.parquet")
+            rows += finished.num_rows
+    return rows, skipped
+
+
+def check_parity(connection: Any, fqn: str, sample: int = 100_000) -> pd.DataFrame:
+    """Local against warehouse H3 cells on a sample of an observation table, per resolution.
+
+    Returns:
+        A frame with resolution, rows and mismatches, and the first mismatching
+        LAT / LON / cells in frame.attrs["examples"]
+    """
+    columns = ", ".join(f"H3_CELL_{res}" for res in RESOLUTIONS)
+    df = connection.sql(
+        f"select LAT, LON, {columns} from {fqn} sample ({sample} rows) where LAT is not null and LON is not null"
+    ).to_pandas()
+    local = h3_columns(df["LAT"], df["LON"])
+    report, examples = [], []
+    for res in RESOLUTIONS:
+        name = f"H3_CELL_{res}"
+        warehouse = df[name].fillna(-1).to_numpy(np.int64)
+        mismatch = local[name] != warehouse
+        report.append({"resolution": res, "rows": len(df), "mismatches": int(mismatch.sum())})
+        examples.append(df.loc[mismatch, ["LAT", "LON", name]].assign(LOCAL=local[name][mismatch]).head(5))
+    result = pd.DataFrame(report)
+    result.attrs["examples"] = pd.concat(examples, ignore_index=True)
+    return result
@@ -0,0 +1,119 @@
+"""
+Batch lowest common ancestors
+
+Vectorized LCA and taxonomic distance for millions of (taxon, taxon) pairs,
+eg the species pairs behind nearby_observations. Local counterpart of the
+lowest_common_ancestor query helper in kg/model/derived/lineage.py.
+
+The backbone is shallow (a dozen levels at most), so instead of an Euler tour
+with a sparse table (2N log N entries) the index keeps one ancestor array per
+depth: ancestors[d, i] is the ancestor of taxon i at depth d, or i itself when
+it is shallower. Two taxa share every ancestor down to their LCA and none
+below it, so a binary search over depth finds it in O(log depth) array lookups
+per pair. The table is saved next to the taxonomy store and mmapped on reuse.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from kg.cache import drop_stale_versions
+from kg.local.taxonomy import TaxonomyStore, TaxonIds
+
+
+def build_depth_ancestors(store: TaxonomyStore) -> np.ndarray:
+    """Ancestor positions per depth, shape (max depth + 1, taxa)."""
+    depth = np.asarray(store.depth)
+    parent = np.asarray(store.parent)
+    n = len(store)
+    ancestors = np.empty((int(depth.max()) + 1 if n else 1, n), dtype=np.int32)
+    ancestors[:] = np.arange(n, dtype=np.int32)
+    by_depth = np.argsort(depth, kind="stable")
+    bounds = np.searchsorted(depth[by_depth], np.arange(len(ancestors) + 1))
+    for d in range(1, len(ancestors)):
+        # Taxa at depth d inherit their parent's ancestors above them
+        level = by_depth[bounds[d] : bounds[d + 1]]
+        ancestors[:d, level] = ancestors[:d, parent[level]]
+    return ancestors
+
+
+class LCAIndex:
+    """Answers lowest common ancestor and distance queries for arrays of taxon id pairs.
+
+    Unknown taxon ids, and pairs in different trees, give -1.
+    """
+
+    def __init__(self, store: TaxonomyStore, ancestors: Optional[np.ndarray] = None):
+        self.store = store
+        self.ancestors = ancestors if ancestors is not None else build_depth_ancestors(store)
+
+    @classmethod
+    def load(cls, store: TaxonomyStore) -> "LCAIndex":
+        """Open the index saved with a store, building and saving it on first use.
+
+        The table is saved per store version, so a store rebuilt in place does
+        not reuse the table of the old taxonomy.
+        """
+        if store.path is None:
+            return cls(store)
+        path = store.path / f"depth_ancestors-{store.version}.npy"
+        if not path.exists():
+            drop_stale_versions(store.path, path.name, "depth_ancestors*.npy")
+            np.save(path, build_depth_ancestors(store))
+        return cls(store, np.load(path, mmap_mode="r"))
+
+    def _positions(self, a: TaxonIds, b: TaxonIds):
+        a, b = np.broadcast_arrays(self.store.positions(a), self.store.positions(b))
+        known = (a >= 0) & (b >= 0)
+        return np.where(known, a, 0), np.where(known, b, 0), known
+
+    def _lca(self, a: np.ndarray, b: np.ndarray, known: np.ndarray) -> np.ndarray:
+        depth = self.store.depth
+        ancestors = self.ancestors
+
+        # Binary search for the deepest depth at which the ancestors still agree
+        lo = np.zeros(len(a), dtype=np.int64)
+        hi = np.minimum(depth[a], depth[b]).astype(np.int64)
+        known = known & (ancestors[0, a] == ancestors[0, b])
+        while True:
+            searching = lo < hi
+            if not searching.any():
+                break
+            mid = (lo + hi + 1) // 2
+            same = ancestors[mid, a] == ancestors[mid, b]
+            lo = np.where(searching & same, mid, lo)
+            hi = np.where(searching & ~same, mid - 1, hi)
+        return np.where(known, ancestors[lo, a], -1)
+
+    def lca_positions(self, a: TaxonIds, b: TaxonIds) -> np.ndarray:
+        """Store position of the lowest common ancestor of each pair, -1 if none."""
+        return self._lca(*self._positions(a, b))
+
+    def lca(self, a: TaxonIds, b: TaxonIds) -> np.ndarray:
+        """Taxon id of the lowest common ancestor of each pair, -1 if none."""
+        positions = self.lca_positions(a, b)
+        return np.where(positions >= 0, self.store.ids[np.maximum(positions, 0)], -1)
+
+    def distance(self, a: TaxonIds, b: TaxonIds) -> np.ndarray:
+        """Taxonomic distance of each pair: edges from a up to the LCA and down to b, -1 if none."""
+        a, b, known = self._positions(a, b)
+        positions = self._lca(a, b, known)
+        depth = self.store.depth.astype(np.int64)
+        distance = depth[a] + depth[b] - 2 * depth[np.maximum(positions, 0)]
+        return np.where(positions >= 0, distance, -1)
+
+    def pairs(self, a: TaxonIds, b: TaxonIds) -> pd.DataFrame:
+        """LCA id, rank and distance for each pair as a frame."""
+        positions = self.lca_positions(a, b)
+        known = positions >= 0
+        safe = np.maximum(positions, 0)
+        ranks = np.asarray(self.store.ranks + [None], dtype=object)
+        a, b = np.broadcast_arrays(np.atleast_1d(a), np.atleast_1d(b))
+        return pd.DataFrame({
+            "taxon_a": a,
+            "taxon_b": b,
+            "ancestor_id": np.where(known, self.store.ids[safe], -1),
+            "ancestor_rank": ranks[np.where(known, self.store.rank[safe], -1)],
+            "distance": self.distance(a, b),
+        })
@@ -0,0 +1,234 @@
+"""
+Range similarity sketches
+
+MinHash signatures of each taxon's set of observed H3 cells, and an LSH index
+over them, to estimate the Jaccard similarity of two taxa's ranges and find
+taxa with overlapping ranges without intersecting every pair of cell sets.
+
+A signature holds, for each of PERMUTATIONS hash functions, the minimum hash
+of the taxon's cells; the fraction of equal entries between two signatures
+estimates their Jaccard similarity. The LSH index splits signatures into
+BANDS bands and keys each band by a hash of its rows: taxa with similar
+ranges very likely share a band key, so candidates are found by sorted key
+lookups (per band, one searchsorted).
+
+Signatures merge with an elementwise minimum, so when observations were
+only appended since the last build, refresh() hashes just the (taxon, cell)
+pairs of the new ones (GBIFID above the stored watermark) and rebuilds the
+band keys of the taxa touched. Minima cannot forget cells, so any other
+change to the table (deletes, reclassified or moved observations, a reload
+with other ids) rebuilds the index.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from kg.cache import cache_dir, table_version
+
+PERMUTATIONS = 128
+BANDS = 32
+
+# (taxon, cell) pairs hashed per chunk, bounding the (pairs, PERMUTATIONS) hash matrix
+CHUNK = 200_000
+
+ARRAYS = ("taxa", "signatures", "band_keys", "band_order", "band_sorted")
+
+# Permutation i hashes a mixed cell id x as (x * A[i] + B[i]) ^ shift, A odd
+_A, _B = np.random.default_rng(20240621).integers(0, 2**63, (2, PERMUTATIONS), dtype=np.uint64)
+_A |= np.uint64(1)
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, vectorized over uint64 arrays."""
+    x = x.copy()
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def signatures(taxon_ids: Any, cells: Any):
+    """MinHash signatures from (taxon, cell) pairs.
+
+    Returns:
+        Sorted distinct taxon ids and their (taxa, PERMUTATIONS) uint64 signatures
+    """
+    taxon_ids = np.asarray(taxon_ids, dtype=np.int64)
+    cells = np.asarray(cells, dtype=np.int64).view(np.uint64)
+    taxa, rows = np.unique(taxon_ids, return_inverse=True)
+    order = np.argsort(rows, kind="stable")
+    rows, cells = rows[order], cells[order]
+
+    result = np.full((len(taxa), PERMUTATIONS), np.iinfo(np.uint64).max, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for start in range(0, len(cells), CHUNK):
+            chunk_rows = rows[start : start + CHUNK]
+            # (PERMUTATIONS, chunk), so the per-taxon reduction runs along contiguous rows
+            hashes = _A[:, None] * _mix(cells[start : start + CHUNK])[None, :] + _B[:, None]
+            hashes ^= hashes >> np.uint64(29)
+            # rows are sorted, so each taxon is one segment of the chunk
+            firsts = np.r_[0, np.flatnonzero(chunk_rows[1:] != chunk_rows[:-1]) + 1]
+            segment_rows = chunk_rows[firsts]
+            result[segment_rows] = np.minimum(result[segment_rows], np.minimum.reduceat(hashes, firsts, axis=1).T)
+    return taxa, result
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """One uint64 key per band of each signature, shape (taxa, BANDS)."""
+    rows = PERMUTATIONS // BANDS
+    bands = signatures.reshape(len(signatures), BANDS, rows)
+    keys = np.zeros((len(signatures), BANDS), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for r in range(rows):
+            keys = _mix(keys ^ bands[:, :, r])
+        keys ^= np.arange(BANDS, dtype=np.uint64)
+    return keys
+
+
+class RangeIndex:
+    """MinHash signatures of taxon ranges with an LSH index."""
+
+    def __init__(self, taxa: np.ndarray, signatures: np.ndarray, keys: Optional[np.ndarray] = None,
+                 order: Optional[np.ndarray] = None, sorted_keys: Optional[np.ndarray] = None,
+                 path: Optional[Path] = None, meta: Optional[dict] = None):
+        self.taxa = taxa
+        self.signatures = signatures
+        self.band_keys = band_keys(signatures) if keys is None else keys
+        if order is None:
+            # per band, rows in key order and the sorted keys, for searchsorted
+            order = np.ascontiguousarray(np.argsort(self.band_keys, axis=0, kind="stable").T)
+            sorted_keys = np.take_along_axis(self.band_keys.T, order, axis=1)
+        self.band_order = order
+        self.band_sorted = sorted_keys
+        self.path = path
+        self.meta = meta or {}
+
+    @classmethod
+    def build(cls, taxon_ids: Any, cells: Any, meta: Optional[dict] = None) -> "RangeIndex":
+        return cls(*signatures(taxon_ids, cells), meta=meta)
+
+    def merge(self, taxon_ids: Any, cells: Any) -> "RangeIndex":
+        """Index with the given (taxon, cell) pairs added, re-keying only the taxa they touch."""
+        new_taxa, new_signatures = signatures(taxon_ids, cells)
+        taxa = np.union1d(self.taxa, new_taxa)
+        merged = np.full((len(taxa), PERMUTATIONS), np.iinfo(np.uint64).max, dtype=np.uint64)
+        old_rows = np.searchsorted(taxa, self.taxa)
+        merged[old_rows] = self.signatures
+        keys = np.zeros((len(taxa), BANDS), dtype=np.uint64)
+        keys[old_rows] = self.band_keys
+
+        touched = np.searchsorted(taxa, new_taxa)
+        merged[touched] = np.minimum(merged[touched], new_signatures)
+        keys[touched] = band_keys(merged[touched])
+        return RangeIndex(taxa, merged, keys, path=self.path, meta=dict(self.meta))
+
+    def save(self, path: Optional[Path] = None) -> "RangeIndex":
+        path = Path(path) if path is not None else self.path or cache_dir("minhash")
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            # write next to the old file and swap, as the old arrays may still be mmapped
+            np.save(path / f"{name}.tmp.npy", getattr(self, name))
+            os.replace(path / f"{name}.tmp.npy", path / f"{name}.npy")
+        (path / "meta.json").write_text(json.dumps(self.meta, indent=2))
+        return RangeIndex.load(path)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "RangeIndex":
+        path = Path(path) if path is not None else cache_dir("minhash")
+        if not (path / "meta.json").exists():
+            raise FileNotFoundError(f"No range index in {path}, build one with `uv run -m kg.apps.build_local minhash`")
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+        meta = json.loads((path / "meta.json").read_text())
+        return cls(*(arrays[name] for name in ARRAYS), path=path, meta=meta)
+
+    @classmethod
+    def refresh(cls, connection: Any, fqn: str, resolution: int = 6, path: Optional[Path] = None) -> "RangeIndex":
+        """Build or update the index for an observation table.
+
+        The stored index is returned as is while the table's version is
+        unchanged. Otherwise, if the rows up to the watermark still hash as
+        they did (only new observations were appended), their pairs are
+        merged in; if not, the index is rebuilt from the whole table.
+        """
+        try:
+            index = cls.load(path)
+        except FileNotFoundError:
+            index = None
+        if index is not None and (index.meta.get("table"), index.meta.get("resolution")) != (fqn, resolution):
+            index = None
+        version = table_version(connection, fqn)
+        if index is not None and index.meta.get("version") == version:
+            return index
+
+        watermark = index.meta["watermark"] if index is not None else -1
+        columns = f"GBIFID, TAXONKEY, H3_CELL_{resolution}"
+        last, kept, rows_hash = connection.sql(f"""
+            select
+                coalesce(max(GBIFID), -1),
+                (select hash_agg({columns}) from {fqn} where GBIFID <= {watermark}),
+                hash_agg({columns})
+            from {fqn}
+        """).collect()[0]
+        if index is not None and index.meta.get("rows_hash") != kept:
+            index, watermark = None, -1
+
+        df = connection.sql(f"""
+            select TAXONKEY, H3_CELL_{resolution} as CELL
+            from {fqn}
+            where GBIFID > {watermark} and GBIFID <= {last}
+                and TAXONKEY is not null and H3_CELL_{resolution} is not null
+            group by 1, 2
+        """).to_pandas()
+        # rows_hash covers every row up to the new watermark, to tell appends from other changes
+        meta = {"table": fqn, "resolution": resolution, "version": version, "watermark": int(last), "rows_hash": rows_hash}
+        if index is None:
+            index = cls.build(df["TAXONKEY"], df["CELL"], meta)
+        else:
+            if len(df):
+                index = index.merge(df["TAXONKEY"], df["CELL"])
+            index.meta = meta
+        return index.save(path)
+
+    def rows(self, taxon_ids: Any) -> np.ndarray:
+        """Row of each taxon id, -1 if it has no observations."""
+        taxon_ids = np.atleast_1d(np.asarray(taxon_ids, dtype=np.int64))
+        if not len(self.taxa):
+            return np.full(len(taxon_ids), -1)
+        found = np.minimum(np.searchsorted(self.taxa, taxon_ids), len(self.taxa) - 1)
+        return np.where(self.taxa[found] == taxon_ids, found, -1)
+
+    def jaccard(self, a: Any, b: Any) -> np.ndarray:
+        """Estimated range Jaccard similarity of each (a, b) pair, 0 for unknown taxa."""
+        ra, rb = np.broadcast_arrays(self.rows(a), self.rows(b))
+        known = (ra >= 0) & (rb >= 0)
+        equal = self.signatures[np.maximum(ra, 0)] == self.signatures[np.maximum(rb, 0)]
+        return np.where(known, equal.mean(axis=1), 0.0)
+
+    def candidates(self, taxon_id: int) -> np.ndarray:
+        """Rows sharing at least one band key with the taxon (excluding itself)."""
+        row = self.rows(taxon_id)[0]
+        if row < 0:
+            return np.empty(0, dtype=np.int64)
+        found = []
+        for band in range(BANDS):
+            keys = self.band_sorted[band]
+            key = self.band_keys[row, band]
+            lo, hi = np.searchsorted(keys, key, side="left"), np.searchsorted(keys, key, side="right")
+            found.append(self.band_order[band, lo:hi])
+        rows = np.unique(np.concatenate(found))
+        return rows[rows != row]
+
+    def similar(self, taxon_id: int, k: int = 10, threshold: float = 0.0) -> pd.DataFrame:
+        """Taxa with the most similar ranges among the LSH candidates, best first."""
+        rows = self.candidates(taxon_id)
+        estimate = self.jaccard(taxon_id, self.taxa[rows]) if len(rows) else np.empty(0)
+        df = pd.DataFrame({"taxon_id": taxon_id, "other_id": self.taxa[rows], "jaccard": estimate})
+        df = df[df["jaccard"] >= threshold]
+        return df.sort_values("jaccard", ascending=False, kind="stable", ignore_index=True).head(k)
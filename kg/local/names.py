@@ -0,0 +1,403 @@
+"""
+Taxon name index
+
+Resolves canonical, scientific and vernacular names to taxon ids for
+interactive use, where the model only supports exact equality on
+canonical_name. Names are normalized (Unicode decomposed, diacritics
+dropped, case folded, whitespace collapsed) so lookups are case- and
+diacritic-insensitive, and three lookups are offered:
+
+- exact: binary search over the sorted normalized names
+- prefix: the same search, scanning forward while names share the prefix
+- fuzzy: trigram similarity, tolerating typos
+
+Each index segment stores its names as UTF-8 blobs with offsets and its
+trigram postings as sorted arrays, all .npy files loaded with mmap. Exact and
+prefix lookups touch a few pages and take well under a millisecond; fuzzy
+lookups cost a few milliseconds at worst, depending on how common the query's
+rarest trigrams are.
+
+Updates are incremental: a fingerprint of each taxon's names is kept, and
+update() writes a new segment holding only the taxa whose names changed.
+Newer segments shadow older entries for the same taxa. compact() folds all
+segments back into one.
+"""
+
+import bisect
+import csv
+import json
+import re
+import shutil
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from kg.cache import cache_dir
+
+KINDS = ("canonical", "scientific", "vernacular")
+
+# Fuzzy candidates are drawn from the names sharing the query's rarest trigrams
+SEED_TRIGRAMS = 8
+TYPOS = 1
+MAX_CANDIDATES = 5_000
+
+COMBINING_MARKS = re.compile("[\\u0300-\\u036f]")
+
+
+def normalize_name(name: str) -> str:
+    """Normalize one name for lookup."""
+    name = COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", name))
+    return " ".join(name.casefold().split())
+
+
+def normalize_names(names: pd.Series) -> pd.Series:
+    """Vectorized normalize_name."""
+    return (
+        names.fillna("").astype(str)
+        .str.normalize("NFKD")
+        .str.replace(COMBINING_MARKS, "", regex=True)
+        .str.casefold()
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+
+def _trigrams(name: str) -> set:
+    padded = f"  {name} "
+    return {
+        (ord(padded[i]) << 42) | (ord(padded[i + 1]) << 21) | ord(padded[i + 2])
+        for i in range(len(padded) - 2)
+    }
+
+
+def _blob(values: List[str]):
+    encoded = [v.encode() for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _trigram_postings(keys: List[str]):
+    """Sorted (trigram, key index) postings for the given names, vectorized over all code points."""
+    if not keys:
+        # A segment of removals only shadows older taxa and has no names of its own
+        empty = np.empty(0, dtype=np.int64)
+        return empty, np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    padded = [f"  {k} " for k in keys]
+    lengths = np.array([len(p) for p in padded], dtype=np.int64)
+    codepoints = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    windows = lengths - 2
+    starts = np.cumsum(lengths) - lengths
+    key_of = np.repeat(np.arange(len(keys), dtype=np.int32), windows)
+    position = starts[key_of] + np.arange(windows.sum()) - np.repeat(np.cumsum(windows) - windows, windows)
+    trigram = (codepoints[position] << 42) | (codepoints[position + 1] << 21) | codepoints[position + 2]
+
+    order = np.lexsort((key_of, trigram))
+    trigram, key_of = trigram[order], key_of[order]
+    distinct = np.r_[True, (trigram[1:] != trigram[:-1]) | (key_of[1:] != key_of[:-1])]
+    trigram, key_of = trigram[distinct], key_of[distinct]
+    key_trigrams = np.bincount(key_of, minlength=len(keys)).astype(np.int32)
+
+    tri_keys, tri_starts = np.unique(trigram, return_index=True)
+    tri_offsets = np.append(tri_starts, len(trigram)).astype(np.int64)
+    return tri_keys, tri_offsets, key_of, key_trigrams
+
+
+def entries_frame(taxa: Optional[pd.DataFrame] = None, vernacular: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Index entries (taxon_id, name, kind) from taxon and vernacular name frames.
+
+    Args:
+        taxa: Frame with TAXONID, CANONICALNAME and SCIENTIFICNAME columns (any case)
+        vernacular: Frame with TAXONID and VERNACULARNAME columns (any case)
+    """
+    frames = []
+    if taxa is not None:
+        columns = {c.upper(): c for c in taxa.columns}
+        for kind, column in (("canonical", "CANONICALNAME"), ("scientific", "SCIENTIFICNAME")):
+            frames.append(pd.DataFrame({"taxon_id": taxa[columns["TAXONID"]], "name": taxa[columns[column]], "kind": kind}))
+    if vernacular is not None:
+        columns = {c.upper(): c for c in vernacular.columns}
+        frames.append(pd.DataFrame({"taxon_id": vernacular[columns["TAXONID"]], "name": vernacular[columns["VERNACULARNAME"]], "kind": "vernacular"}))
+    entries = pd.concat(frames, ignore_index=True).dropna()
+    entries["taxon_id"] = entries["taxon_id"].astype(np.int64)
+    entries["name"] = entries["name"].astype(str)
+    return entries[entries["name"].str.strip() != ""].drop_duplicates(ignore_index=True)
+
+
+def entries_from_tsv(taxon_tsv: Union[str, Path], vernacular_tsv: Optional[Union[str, Path]] = None) -> pd.DataFrame:
+    """Index entries from the GBIF backbone Taxon.tsv and optionally VernacularName.tsv."""
+    read = dict(sep="\t", quoting=csv.QUOTE_NONE, dtype=str, keep_default_na=False)
+    taxa = pd.read_csv(taxon_tsv, usecols=["taxonID", "canonicalName", "scientificName"], **read)
+    vernacular = pd.read_csv(vernacular_tsv, usecols=["taxonID", "vernacularName"], **read) if vernacular_tsv else None
+    return entries_frame(taxa, vernacular)
+
+
+def entries_from_tables(connection: Any, db: str = "TEAM_ARQ", schema: str = "PUBLIC") -> pd.DataFrame:
+    """Index entries from the TAXON and TAXON_SYNONYMS (vernacular names) tables."""
+    taxa = connection.sql(f"select TAXONID, CANONICALNAME, SCIENTIFICNAME from {db}.{schema}.TAXON").to_pandas()
+    vernacular = connection.sql(f"select TAXONID, VERNACULARNAME from {db}.{schema}.TAXON_SYNONYMS").to_pandas()
+    return entries_frame(taxa, vernacular)
+
+
+def fingerprints(entries: pd.DataFrame) -> pd.Series:
+    """Order-independent hash of each taxon's names, indexed by taxon id."""
+    hashes = pd.util.hash_pandas_object(entries[["name", "kind"]], index=False)
+    return hashes.groupby(entries["taxon_id"].to_numpy()).sum()
+
+
+@dataclass
+class Match:
+    taxon_id: int
+    name: str
+    kind: str
+    score: float = 1.0
+
+
+class _Keys:
+    """Sequence view of a segment's sorted UTF-8 keys, for bisect."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.blob[self.offsets[i] : self.offsets[i + 1]].tobytes()
+
+
+SEGMENT_ARRAYS = (
+    "key_blob", "key_offsets", "key_trigrams",
+    "entry_offsets", "entry_taxon", "entry_kind", "name_blob", "name_offsets",
+    "tri_keys", "tri_offsets", "tri_postings", "taxa",
+)
+
+
+class Segment:
+    """One immutable part of the index."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        for name in SEGMENT_ARRAYS:
+            setattr(self, name, np.load(path / f"{name}.npy", mmap_mode="r"))
+        self.keys = _Keys(self.key_blob, self.key_offsets)
+
+    @staticmethod
+    def write(path: Path, entries: pd.DataFrame, taxa: np.ndarray) -> "Segment":
+        """Write a segment for the given entries, shadowing older entries of the given taxa."""
+        path.mkdir(parents=True, exist_ok=True)
+        entries = entries.assign(key=normalize_names(entries["name"]))
+        entries = entries[entries["key"] != ""]
+        # UTF-8 byte order is code point order, so bisect over the encoded keys agrees
+        entries = entries.assign(sort_key=entries["key"].map(str.encode)).sort_values(["sort_key", "kind", "taxon_id"])
+        keys, key_starts = np.unique(entries["sort_key"].to_numpy(), return_index=True)
+        keys = [k.decode() for k in keys]
+
+        arrays: Dict[str, Any] = {}
+        arrays["key_blob"], arrays["key_offsets"] = _blob(keys)
+        arrays["entry_offsets"] = np.append(key_starts, len(entries)).astype(np.int64)
+        arrays["entry_taxon"] = entries["taxon_id"].to_numpy(dtype=np.int64)
+        arrays["entry_kind"] = entries["kind"].map(KINDS.index).to_numpy(dtype=np.int8)
+        arrays["name_blob"], arrays["name_offsets"] = _blob(entries["name"].tolist())
+        arrays["tri_keys"], arrays["tri_offsets"], arrays["tri_postings"], arrays["key_trigrams"] = _trigram_postings(keys)
+        arrays["taxa"] = np.unique(np.asarray(taxa, dtype=np.int64))
+        for name in SEGMENT_ARRAYS:
+            np.save(path / f"{name}.npy", arrays[name])
+        return Segment(path)
+
+    def entries(self, key_index: int) -> List[Match]:
+        start, end = self.entry_offsets[key_index], self.entry_offsets[key_index + 1]
+        return [
+            Match(
+                int(self.entry_taxon[i]),
+                self.name_blob[self.name_offsets[i] : self.name_offsets[i + 1]].tobytes().decode(),
+                KINDS[self.entry_kind[i]],
+            )
+            for i in range(start, end)
+        ]
+
+    def all_entries(self) -> pd.DataFrame:
+        names = self.name_blob.tobytes()
+        offsets = self.name_offsets
+        return pd.DataFrame({
+            "taxon_id": np.asarray(self.entry_taxon),
+            "name": [names[offsets[i] : offsets[i + 1]].decode() for i in range(len(self.entry_taxon))],
+            "kind": np.asarray(KINDS, dtype=object)[self.entry_kind],
+        })
+
+    def find(self, key: str) -> Optional[int]:
+        encoded = key.encode()
+        i = bisect.bisect_left(self.keys, encoded)
+        return i if i < len(self.keys) and self.keys[i] == encoded else None
+
+    def prefixed(self, prefix: str):
+        """Key indexes starting with the prefix, in key order."""
+        encoded = prefix.encode()
+        i = bisect.bisect_left(self.keys, encoded)
+        while i < len(self.keys) and self.keys[i].startswith(encoded):
+            yield i
+            i += 1
+
+    def similar(self, key: str, limit: int) -> List[tuple]:
+        """(score, key index) of the keys sharing the most trigrams with key."""
+        query = np.array(sorted(_trigrams(key)), dtype=np.int64)
+        found = np.searchsorted(self.tri_keys, query)
+        hit = found < len(self.tri_keys)
+        hit[hit] = self.tri_keys[found[hit]] == query[hit]
+        found = found[hit]
+        if not len(found):
+            return []
+        postings = [self.tri_postings[self.tri_offsets[t] : self.tri_offsets[t + 1]] for t in found]
+
+        # Candidates share enough of the rarest trigrams to be at most TYPOS edits away,
+        # as one edit changes at most three trigrams
+        seeds = np.argsort([len(p) for p in postings], kind="stable")[:SEED_TRIGRAMS]
+        seen = np.bincount(np.concatenate([postings[i] for i in seeds]), minlength=len(self.keys))
+        candidates = np.flatnonzero(seen >= max(1, len(seeds) - 3 * TYPOS))
+        if len(candidates) > MAX_CANDIDATES:
+            candidates = np.sort(candidates[np.argpartition(-seen[candidates], MAX_CANDIDATES)[:MAX_CANDIDATES]])
+
+        # Count every shared trigram, by binary search in the sorted postings
+        shared = np.zeros(len(candidates), dtype=np.int64)
+        for posting in postings:
+            at = np.searchsorted(posting, candidates)
+            shared += posting[np.minimum(at, len(posting) - 1)] == candidates
+        score = shared / (len(query) + self.key_trigrams[candidates] - shared)
+        best = np.argsort(-score, kind="stable")[:limit]
+        return [(float(score[i]), int(candidates[i])) for i in best]
+
+
+class NameIndex:
+    """Case- and diacritic-insensitive taxon name lookup over index segments."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        manifest = json.loads((path / "manifest.json").read_text())
+        self.segments = [Segment(path / name) for name in manifest["segments"]]
+        self._next = manifest["next"]
+
+    # Building
+
+    @classmethod
+    def build(cls, entries: pd.DataFrame, path: Optional[Path] = None) -> "NameIndex":
+        """Build a fresh single-segment index from entries (see entries_frame)."""
+        path = Path(path) if path is not None else cache_dir("names")
+        path.mkdir(parents=True, exist_ok=True)
+        for old in path.glob("segment-*"):
+            shutil.rmtree(old)
+        Segment.write(path / "segment-0000", entries, entries["taxon_id"].unique())
+        cls._write_state(path, ["segment-0000"], 1, fingerprints(entries))
+        return cls(path)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "NameIndex":
+        path = Path(path) if path is not None else cache_dir("names")
+        if not (path / "manifest.json").exists():
+            raise FileNotFoundError(f"No name index in {path}, build one with `uv run -m kg.apps.build_local names`")
+        return cls(path)
+
+    @staticmethod
+    def _write_state(path: Path, segments: List[str], next_segment: int, prints: pd.Series):
+        np.save(path / "fingerprint_taxa.npy", prints.index.to_numpy(dtype=np.int64))
+        np.save(path / "fingerprints.npy", prints.to_numpy(dtype=np.uint64))
+        manifest = {"segments": segments, "next": next_segment}
+        (path / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    def update(self, entries: pd.DataFrame) -> int:
+        """Bring the index up to date with the full current entries, writing only what changed.
+
+        Returns:
+            The number of taxa whose names were added, changed or removed
+        """
+        new = fingerprints(entries)
+        old = pd.Series(
+            np.load(self.path / "fingerprints.npy"),
+            index=np.load(self.path / "fingerprint_taxa.npy"),
+        )
+        joined = pd.concat([old.rename("old"), new.rename("new")], axis=1)
+        changed = joined.index[joined["old"] != joined["new"]].to_numpy(dtype=np.int64)
+        if not len(changed):
+            return 0
+
+        name = f"segment-{self._next:04d}"
+        Segment.write(self.path / name, entries[entries["taxon_id"].isin(changed)], changed)
+        segments = [s.path.name for s in self.segments] + [name]
+        self._write_state(self.path, segments, self._next + 1, new)
+        self.__init__(self.path)
+        return len(changed)
+
+    def compact(self) -> "NameIndex":
+        """Fold all segments into one."""
+        live = [self._live(s, s.all_entries()) for s in self.segments]
+        return NameIndex.build(pd.concat(live, ignore_index=True), self.path)
+
+    # Lookups
+
+    def _shadowing(self, segment_index: int) -> np.ndarray:
+        newer = [s.taxa for s in self.segments[segment_index + 1 :]]
+        return np.unique(np.concatenate(newer)) if newer else np.empty(0, dtype=np.int64)
+
+    def _live(self, segment: Segment, matches):
+        shadow = self._shadowing(self.segments.index(segment))
+        if isinstance(matches, pd.DataFrame):
+            return matches[~np.isin(matches["taxon_id"].to_numpy(), shadow)]
+        return [m for m in matches if not len(shadow) or not np.isin(m.taxon_id, shadow)]
+
+    def exact(self, name: str) -> List[Match]:
+        """Entries whose normalized name equals the normalized query."""
+        key = normalize_name(name)
+        matches = []
+        for segment in self.segments:
+            i = segment.find(key)
+            if i is not None:
+                matches.extend(self._live(segment, segment.entries(i)))
+        return matches
+
+    def prefix(self, prefix: str, limit: int = 20) -> List[Match]:
+        """Entries whose normalized name starts with the normalized prefix, in name order."""
+        key = normalize_name(prefix)
+        matches = []
+        for segment in self.segments:
+            found = []
+            for i in segment.prefixed(key):
+                found.extend(self._live(segment, segment.entries(i)))
+                if len(found) >= limit:
+                    break
+            matches.extend(found)
+        matches.sort(key=lambda m: normalize_name(m.name))
+        return matches[:limit]
+
+    def fuzzy(self, name: str, limit: int = 10, min_score: float = 0.2) -> List[Match]:
+        """Entries with the most similar names by trigram overlap (Jaccard), best first."""
+        key = normalize_name(name)
+        matches = []
+        for segment in self.segments:
+            for score, i in segment.similar(key, limit):
+                matches.extend(
+                    Match(m.taxon_id, m.name, m.kind, score)
+                    for m in self._live(segment, segment.entries(i))
+                    if score >= min_score
+                )
+        matches.sort(key=lambda m: -m.score)
+        return matches[:limit]
+
+    def taxon_ids(self, name: str) -> List[int]:
+        """Taxon ids for a name: exact matches, else the best fuzzy matches."""
+        matches = self.exact(name) or self.fuzzy(name, 5, min_score=0.5)
+        return sorted({m.taxon_id for m in matches})
+
+
+def resolve_taxa(values: List[str], index: Optional[NameIndex] = None) -> Dict[str, List[int]]:
+    """Taxon ids matching each command line value, which is either an id or a name (no match: [])."""
+    matches = {v: [int(v)] for v in values if v.isdigit()}
+    names = [v for v in values if not v.isdigit()]
+    if names:
+        index = index or NameIndex.load()
+        for name in names:
+            matches[name] = index.taxon_ids(name)
+    return {v: matches[v] for v in values}
@@ -0,0 +1,150 @@
+"""
+Coordinate outliers
+
+Flags observations whose coordinates are implausible for their species, eg
+swapped signs or country centroids, which distort every H3 aggregate.
+
+One streaming pass over observation batches (TAXONKEY, H3_CELL_6, LAT, LON)
+accumulates observation counts and coordinate sums per (taxon, cell). Taxa
+are rolled up to species with the taxonomy store, and each species gets a
+robust range model from its cells, weighted by observations:
+
+- center: the coordinate-wise weighted median of the cells' unit vectors
+- spread: the weighted median great-circle distance of cells to the center
+
+A cell is flagged when it lies more than distance_factor spreads (and at least
+min_km) from the center ("distance"), or when it is at least min_km out and
+its surrounding H3 cell at density_resolution holds fewer than min_density
+of the species' observations ("isolated"). Species with fewer than
+min_observations observations are not modelled.
+
+Flagged (TAXONKEY, H3_CELL_6) pairs are written to the OBSERVATION_OUTLIER_CELLS
+table, which kg/model/core/outliers.py binds as Observation.is_outlier.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from kg.local.spatial import EARTH_RADIUS_M, to_xyz
+from kg.local.taxonomy import TaxonomyStore
+
+OUTLIER_TABLE = "OBSERVATION_OUTLIER_CELLS"
+
+# H3 index layout: 4 resolution bits at 52, then 3 bits per resolution digit 1..15
+_RES_OFFSET = 52
+_DIGIT_BITS = 3
+
+
+def h3_parent(cells: Any, resolution: int) -> np.ndarray:
+    """Parent H3 cells at a coarser resolution, by rewriting the index bits."""
+    cells = np.asarray(cells, dtype=np.int64)
+    unused = np.int64(0)
+    for digit in range(resolution + 1, 16):
+        unused |= np.int64(7) << np.int64((15 - digit) * _DIGIT_BITS)
+    cleared = cells & ~(np.int64(15) << np.int64(_RES_OFFSET))
+    return cleared | (np.int64(resolution) << np.int64(_RES_OFFSET)) | unused
+
+
+def observation_batches_sql(fqn: str) -> str:
+    return f"""
+        select TAXONKEY, H3_CELL_6, LAT, LON from {fqn}
+        where TAXONKEY is not null and H3_CELL_6 is not null and LAT is not null and LON is not null
+    """
+
+
+def accumulate_cells(batches: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Observation count and mean unit vector per (TAXONKEY, H3_CELL_6), in one pass over batches."""
+    partials = []
+    for batch in batches:
+        xyz = to_xyz(batch["LAT"], batch["LON"])
+        frame = pd.DataFrame({
+            "TAXONKEY": batch["TAXONKEY"].to_numpy(np.int64),
+            "H3_CELL_6": batch["H3_CELL_6"].to_numpy(np.int64),
+            "N": 1, "X": xyz[:, 0], "Y": xyz[:, 1], "Z": xyz[:, 2],
+        })
+        partials.append(frame.groupby(["TAXONKEY", "H3_CELL_6"], sort=False).sum())
+        # keep the partials small by folding them as they grow
+        if len(partials) > 16:
+            partials = [pd.concat(partials).groupby(level=[0, 1], sort=False).sum()]
+    if not partials:
+        return pd.DataFrame(columns=["TAXONKEY", "H3_CELL_6", "N", "X", "Y", "Z"])
+    cells = pd.concat(partials).groupby(level=[0, 1]).sum().reset_index()
+    cells[["X", "Y", "Z"]] = cells[["X", "Y", "Z"]].to_numpy() / cells[["N"]].to_numpy()
+    return cells
+
+
+def _weighted_median(groups: np.ndarray, values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Weighted median of values per group (groups are 0..G-1)."""
+    order = np.lexsort((values, groups))
+    groups, values, weights = groups[order], values[order], weights[order]
+    cumulative = np.cumsum(weights)
+    totals = np.bincount(groups, weights=weights)
+    before = np.r_[0, np.cumsum(totals)[:-1]]
+    # first row of each group whose cumulative weight reaches half the group total
+    position = np.searchsorted(cumulative, before + totals / 2, side="left")
+    return values[np.minimum(position, len(values) - 1)]
+
+
+@dataclass
+class OutlierParams:
+    distance_factor: float = 5.0
+    min_km: float = 500.0
+    density_resolution: int = 3
+    min_density: int = 2
+    min_observations: int = 20
+
+
+def flag_cells(cells: pd.DataFrame, store: Optional[TaxonomyStore] = None, params: OutlierParams = OutlierParams()) -> pd.DataFrame:
+    """Flag (taxon, cell) rows of accumulate_cells against their species' range model.
+
+    Returns:
+        The cells with SPECIESID, DISTANCE_KM, DENSITY, REASON ('distance',
+        'isolated' or None) and IS_OUTLIER columns
+    """
+    cells = cells.copy()
+    taxa = cells["TAXONKEY"].to_numpy(np.int64)
+    cells["SPECIESID"] = store.ancestor_at_rank(taxa, "species") if store is not None else taxa
+    modelled = cells[cells["SPECIESID"] >= 0]
+
+    species, group = np.unique(modelled["SPECIESID"].to_numpy(), return_inverse=True)
+    weights = modelled["N"].to_numpy(np.float64)
+    xyz = modelled[["X", "Y", "Z"]].to_numpy()
+    center = np.stack([_weighted_median(group, xyz[:, axis], weights) for axis in range(3)], axis=1)
+    center /= np.maximum(np.linalg.norm(center, axis=1, keepdims=True), 1e-12)
+    cosine = np.clip(np.einsum("ij,ij->i", xyz / np.linalg.norm(xyz, axis=1, keepdims=True), center[group]), -1, 1)
+    distance_km = np.arccos(cosine) * EARTH_RADIUS_M / 1000
+    spread_km = _weighted_median(group, distance_km, weights)
+    observations = np.bincount(group, weights=weights)
+
+    parent = h3_parent(modelled["H3_CELL_6"], params.density_resolution)
+    density = pd.Series(weights).groupby([group, parent]).transform("sum").to_numpy()
+
+    far = distance_km > np.maximum(params.min_km, params.distance_factor * spread_km[group])
+    out = distance_km > params.min_km
+    isolated = out & (density < params.min_density)
+    enough = observations[group] >= params.min_observations
+    reason = np.where(enough & far, "distance", np.where(enough & isolated, "isolated", None))
+
+    cells["DISTANCE_KM"] = np.nan
+    cells["DENSITY"] = 0
+    cells["REASON"] = None
+    cells.loc[modelled.index, "DISTANCE_KM"] = distance_km
+    cells.loc[modelled.index, "DENSITY"] = density.astype(np.int64)
+    cells.loc[modelled.index, "REASON"] = reason
+    cells["IS_OUTLIER"] = cells["REASON"].notna()
+    return cells
+
+
+def write_outliers(connection: Any, flags: pd.DataFrame, db: str = "TEAM_ARQ", schema: str = "PUBLIC") -> int:
+    """Replace the outlier table with the flagged cells, returning the number of flagged observations."""
+    flagged = flags.loc[flags["IS_OUTLIER"], ["TAXONKEY", "H3_CELL_6", "SPECIESID", "N", "DISTANCE_KM", "DENSITY", "REASON"]]
+    connection.write_pandas(
+        flagged.reset_index(drop=True), OUTLIER_TABLE, database=db, schema=schema,
+        auto_create_table=True, overwrite=True,
+    )
+    # overwrite recreates the table, so turn change tracking (needed for RAI) back on
+    connection.sql(f"alter table {db}.{schema}.{OUTLIER_TABLE} set change_tracking=true").collect()
+    return int(flagged["N"].sum())
@@ -0,0 +1,189 @@
+"""
+Phenology
+
+Seasonal timing of taxa: day-of-year histograms per taxon (at any rank) and
+hemisphere, smoothed curves, and their peak day and onset / end percentiles.
+
+Observations are fetched once as counts grouped by (taxon, year, day of
+year, hemisphere) and sorted by the taxonomy store's preorder, so every
+taxon's subtree is a contiguous range of rows. The histograms for any set of
+taxa are then one bincount over those ranges, whatever their ranks.
+
+Histograms are cached per taxon and year range under a directory keyed by the
+observation table's version (its LAST_ALTERED time and row count), so they
+are recomputed, and the grouped counts refetched, only once the table changes.
+"""
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from kg.cache import cache_dir, drop_stale_versions, table_version
+from kg.local.taxonomy import TaxonomyStore, TaxonIds
+
+HEMISPHERES = ("north", "south")
+DAYS = 366
+
+Years = Optional[Tuple[int, int]]
+
+
+def day_counts_sql(fqn: str) -> str:
+    """Observation counts grouped by taxon, year, day of year and hemisphere."""
+    return f"""
+        select TAXONKEY, YEAR, DAYOFYEAR, iff(LAT >= 0, 0, 1) as HEMISPHERE, count(*) as N
+        from {fqn}
+        where TAXONKEY is not null and DAYOFYEAR is not null and LAT is not null
+        group by 1, 2, 3, 4
+    """
+
+
+def smooth(counts: np.ndarray, bandwidth: float = 7.0) -> np.ndarray:
+    """Circular Gaussian smoothing along the last (day of year) axis, keeping totals."""
+    distance = np.minimum(np.arange(DAYS), DAYS - np.arange(DAYS))
+    kernel = np.exp(-0.5 * (distance / bandwidth) ** 2)
+    kernel /= kernel.sum()
+    return np.fft.irfft(np.fft.rfft(counts, axis=-1) * np.fft.rfft(kernel), n=DAYS, axis=-1)
+
+
+def season_days(curves: np.ndarray, onset: float = 0.1, end: float = 0.9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Peak, onset and end day of year (1-based) of each curve, 0 for empty curves.
+
+    Percentiles are taken from the curve's quietest day, so a season spanning
+    the new year (eg southern summers) is not split in two.
+    """
+    peak = curves.argmax(axis=-1) + 1
+    start = curves.argmin(axis=-1)[..., None]
+    days = (start + np.arange(DAYS)) % DAYS
+    cdf = np.cumsum(np.take_along_axis(curves, days, axis=-1), axis=-1)
+    total = cdf[..., -1:]
+    cdf = cdf / np.where(total > 0, total, 1)
+    onset_day = np.take_along_axis(days, (cdf >= onset).argmax(axis=-1)[..., None], axis=-1)[..., 0] + 1
+    end_day = np.take_along_axis(days, (cdf >= end).argmax(axis=-1)[..., None], axis=-1)[..., 0] + 1
+    empty = total[..., 0] <= 0
+    return (np.where(empty, 0, x) for x in (peak, onset_day, end_day))
+
+
+@dataclass
+class Phenology:
+    """Day-of-year histograms of shape (taxa, hemispheres, days) and their smoothed curves."""
+    taxon_ids: np.ndarray
+    counts: np.ndarray
+    bandwidth: float = 7.0
+
+    @property
+    def curves(self) -> np.ndarray:
+        return smooth(self.counts, self.bandwidth)
+
+    def summary(self, onset: float = 0.1, end: float = 0.9) -> pd.DataFrame:
+        """Observations, peak, onset and end day per taxon and hemisphere with observations."""
+        peak, onset_day, end_day = season_days(self.curves, onset, end)
+        df = pd.DataFrame({
+            "taxon_id": np.repeat(self.taxon_ids, len(HEMISPHERES)),
+            "hemisphere": np.tile(HEMISPHERES, len(self.taxon_ids)),
+            "observations": self.counts.sum(axis=-1).ravel(),
+            "peak_day": peak.ravel(),
+            "onset_day": onset_day.ravel(),
+            "end_day": end_day.ravel(),
+        })
+        return df[df["observations"] > 0].reset_index(drop=True)
+
+
+class PhenologyIndex:
+    """Day-of-year histograms for any taxa from grouped observation counts.
+
+    Args:
+        store: The taxonomy store
+        days: Grouped counts with TAXONKEY, YEAR, DAYOFYEAR, HEMISPHERE (0 north, 1 south) and N columns
+        path: Optional directory to cache histograms in, per taxonomy store version, year range and taxon
+    """
+
+    def __init__(self, store: TaxonomyStore, days: pd.DataFrame, path: Optional[Path] = None):
+        self.store = store
+        self.path = path
+        positions = store.positions(days["TAXONKEY"].to_numpy(dtype=np.int64))
+        known = positions >= 0
+        pre = np.asarray(store.pre)[positions[known]]
+        order = np.argsort(pre, kind="stable")
+        self.pre = pre[order]
+        self.year = days["YEAR"].to_numpy(dtype=np.int64)[known][order]
+        self.slot = (
+            days["HEMISPHERE"].to_numpy(dtype=np.int64) * DAYS + days["DAYOFYEAR"].to_numpy(dtype=np.int64) - 1
+        )[known][order]
+        self.n = days["N"].to_numpy(dtype=np.int64)[known][order]
+        self.unmatched = int(days["N"].to_numpy()[~known].sum())
+
+    @classmethod
+    def load(cls, store: TaxonomyStore, connection: Any, fqn: str) -> "PhenologyIndex":
+        """Open the index for an observation table, refetching the grouped counts only when it changed.
+
+        Histograms aggregate store subtrees, so they are cached per store
+        version; those of other (rebuilt) stores are cleared.
+        """
+        root = cache_dir("phenology", re.sub(r"\W", "_", fqn.lower()))
+        path = root / table_version(connection, fqn)
+        days_path = path / "days.parquet"
+        if not days_path.exists():
+            drop_stale_versions(root, path.name)
+            path.mkdir(parents=True, exist_ok=True)
+            connection.sql(day_counts_sql(fqn)).to_pandas().to_parquet(days_path)
+        drop_stale_versions(path / "histograms", store.version)
+        return cls(store, pd.read_parquet(days_path), path)
+
+    def _compute(self, positions: np.ndarray, years: Years) -> np.ndarray:
+        """Histograms for store positions in one pass over the rows of their subtrees."""
+        lo = np.searchsorted(self.pre, np.asarray(self.store.pre)[positions], side="left")
+        hi = np.searchsorted(self.pre, np.asarray(self.store.last)[positions], side="right")
+        sizes = hi - lo
+        target = np.repeat(np.arange(len(positions)), sizes)
+        rows = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes) + np.repeat(lo, sizes)
+        weights = self.n[rows]
+        if years is not None:
+            weights = np.where((self.year[rows] >= years[0]) & (self.year[rows] <= years[1]), weights, 0)
+        slots = len(HEMISPHERES) * DAYS
+        counts = np.bincount(target * slots + self.slot[rows], weights=weights, minlength=len(positions) * slots)
+        return counts.astype(np.int64).reshape(len(positions), len(HEMISPHERES), DAYS)
+
+    def _cache_file(self, taxon_id: int, years: Years) -> Optional[Path]:
+        if self.path is None:
+            return None
+        key = "all" if years is None else f"{years[0]}-{years[1]}"
+        return self.path / "histograms" / self.store.version / key / f"{taxon_id}.npy"
+
+    def histograms(self, taxon_ids: TaxonIds, years: Years = None) -> np.ndarray:
+        """Day-of-year histograms (taxa, hemispheres, days) including observations of descendants.
+
+        Args:
+            taxon_ids: Taxa of any rank; unknown ids get empty histograms
+            years: Optional inclusive (first, last) year range
+        """
+        taxon_ids = np.atleast_1d(np.asarray(taxon_ids, dtype=np.int64))
+        counts = np.zeros((len(taxon_ids), len(HEMISPHERES), DAYS), dtype=np.int64)
+        files = [self._cache_file(t, years) for t in taxon_ids]
+        cached = np.array([f is not None and f.exists() for f in files], dtype=bool)
+        for i in np.flatnonzero(cached):
+            counts[i] = np.load(files[i])
+
+        positions = self.store.positions(taxon_ids)
+        missing = np.flatnonzero(~cached & (positions >= 0))
+        if len(missing):
+            counts[missing] = self._compute(positions[missing], years)
+            for i in missing:
+                if files[i] is not None:
+                    files[i].parent.mkdir(parents=True, exist_ok=True)
+                    np.save(files[i], counts[i])
+        return counts
+
+    def phenology(self, taxon_ids: TaxonIds, years: Years = None, bandwidth: float = 7.0) -> Phenology:
+        taxon_ids = np.atleast_1d(np.asarray(taxon_ids, dtype=np.int64))
+        return Phenology(taxon_ids, self.histograms(taxon_ids, years), bandwidth)
+
+    def by_rank(self, rank: str, years: Years = None, bandwidth: float = 7.0) -> Phenology:
+        """Phenology of every observed taxon of a rank, in one pass without per-taxon caching."""
+        ranked = self.store.ancestor_at_rank(self.store.ids[self.store.order[self.pre]], rank)
+        taxon_ids = np.unique(ranked[ranked >= 0])
+        counts = self._compute(self.store.positions(taxon_ids), years)
+        return Phenology(taxon_ids, counts, bandwidth)
@@ -0,0 +1,156 @@
+"""
+Rarefaction
+
+Expected species richness of regions (countries or H3 cells) at standardized
+numbers of observations, so richness can be compared across regions sampled
+with very different effort, and species accumulation curves per region.
+
+Richness at n observations is the exact hypergeometric expectation
+(Hurlbert 1971) over a region's species abundances N_i, with N in total:
+
+    E[S_n] = sum_i 1 - C(N - N_i, n) / C(N, n)
+
+The binomial ratios come from one table of log factorials up to the largest
+region, so each sample size is one pass of array operations over all
+(region, species) rows, summed per region with bincount, with no resampling
+or loop over regions.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from kg.local.taxonomy import TaxonomyStore
+
+REGIONS = ("country", "h3_cell_6", "h3_cell_7", "h3_cell_8", "h3_cell_9", "h3_cell_10")
+
+
+def species_counts_sql(fqn: str, region: str = "country") -> str:
+    """Observation counts grouped by region (country code or H3 cell) and taxon."""
+    if region not in REGIONS:
+        raise ValueError(f"Unknown region {region!r}, expected one of {REGIONS}")
+    column = "COUNTRYCODE" if region == "country" else region.upper()
+    return f"""
+        select {column} as REGION, TAXONKEY, count(*) as N
+        from {fqn}
+        where {column} is not null and TAXONKEY is not null
+        group by 1, 2
+    """
+
+
+@dataclass
+class Abundances:
+    """Observations per species of each region, as rows sorted by region.
+
+    region_ids: Region of each position (country code or H3 cell)
+    region: Region position of each (region, species) row
+    n: Observations of the species in the region
+    """
+    region_ids: np.ndarray
+    region: np.ndarray
+    n: np.ndarray
+
+    @classmethod
+    def from_counts(cls, store: TaxonomyStore, counts: pd.DataFrame) -> "Abundances":
+        """Roll grouped REGION, TAXONKEY, N counts up to species, dropping coarser taxa."""
+        species = store.ancestor_at_rank(counts["TAXONKEY"].to_numpy(dtype=np.int64), "species")
+        known = species >= 0
+        region, region_ids = pd.factorize(counts["REGION"].to_numpy()[known], sort=True)
+        species = species[known]
+        stride = int(species.max()) + 1 if len(species) else 1
+        keys, group = np.unique(region.astype(np.int64) * stride + species, return_inverse=True)
+        n = np.bincount(group, weights=counts["N"].to_numpy(dtype=np.int64)[known], minlength=len(keys))
+        return cls(np.asarray(region_ids), keys // stride, n.astype(np.int64))
+
+    def subset(self, positions: np.ndarray) -> "Abundances":
+        """The abundances of some regions only, by region position."""
+        rows = np.isin(self.region, positions)
+        renumber = np.full(len(self.region_ids), -1, dtype=np.int64)
+        renumber[positions] = np.arange(len(positions))
+        return Abundances(self.region_ids[positions], renumber[self.region[rows]], self.n[rows])
+
+    @property
+    def totals(self) -> np.ndarray:
+        """Species-level observations per region."""
+        return np.bincount(self.region, weights=self.n, minlength=len(self.region_ids)).astype(np.int64)
+
+    @property
+    def richness(self) -> np.ndarray:
+        """Observed species per region."""
+        return np.bincount(self.region, minlength=len(self.region_ids))
+
+
+def _log_factorials(n: int) -> np.ndarray:
+    return np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, n + 1, dtype=np.float64)))])
+
+
+def rarefy(abundances: Abundances, sizes: Iterable[int]) -> np.ndarray:
+    """Expected species richness of each region at each sample size.
+
+    Returns:
+        An array of shape (regions, sizes), NaN where a region has fewer
+        observations than the sample size
+    """
+    sizes = np.atleast_1d(np.asarray(list(sizes), dtype=np.int64))
+    totals = abundances.totals
+    log_factorial = _log_factorials(int(totals.max()) if len(totals) else 0)
+    total = totals[abundances.region]
+    rest = total - abundances.n
+
+    # one pass over the (region, species) rows per sample size
+    expected = np.empty((len(totals), len(sizes)))
+    for j, n in enumerate(sizes):
+        # log C(N - N_i, n) - log C(N, n); the n! terms cancel
+        absent = rest >= n
+        log_ratio = (
+            log_factorial[np.where(absent, rest, 0)] - log_factorial[np.where(absent, rest - n, 0)]
+            - log_factorial[total] + log_factorial[np.maximum(total - n, 0)]
+        )
+        present = np.where(absent, -np.expm1(log_ratio), 1.0)
+        expected[:, j] = np.bincount(abundances.region, weights=present, minlength=len(totals))
+    return np.where(totals[:, None] >= sizes[None, :], expected, np.nan)
+
+
+def rarefaction_table(
+    abundances: Abundances,
+    sizes: Optional[Iterable[int]] = None,
+    min_observations: int = 100,
+) -> pd.DataFrame:
+    """Observed and rarefied richness per region.
+
+    Args:
+        abundances: Species abundances per region
+        sizes: Sample sizes to rarefy to (default: the smallest region kept)
+        min_observations: Leave out regions with fewer species-level observations
+
+    Returns:
+        A frame with region, observation_count, species_count and one
+        expected_species_<n> column per sample size
+    """
+    totals = abundances.totals
+    keep = totals >= min_observations
+    if sizes is None:
+        sizes = [int(totals[keep].min())] if keep.any() else []
+    sizes = list(sizes)
+    expected = rarefy(abundances, sizes) if sizes else np.empty((len(totals), 0))
+    df = pd.DataFrame({
+        "region": abundances.region_ids,
+        "observation_count": totals,
+        "species_count": abundances.richness,
+    })
+    for j, size in enumerate(sizes):
+        df[f"expected_species_{size}"] = expected[:, j]
+    return df[keep].reset_index(drop=True)
+
+
+def accumulation_curve(abundances: Abundances, region: Any, points: int = 50) -> pd.DataFrame:
+    """Expected species against observations for one region, from 1 to all its observations."""
+    position = np.flatnonzero(abundances.region_ids == region)
+    if not len(position):
+        raise KeyError(f"No observations for region {region!r}")
+    single = abundances.subset(position[:1])
+    total = int(single.totals[0])
+    sizes = np.unique(np.geomspace(1, total, num=min(points, total)).round().astype(np.int64))
+    return pd.DataFrame({"observations": sizes, "expected_species": rarefy(single, sizes)[0]})
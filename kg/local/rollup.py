@@ -0,0 +1,89 @@
+"""
+Subtree observation rollup
+
+Local counterpart of kg/model/derived/rollup.py: observations are counted per
+directly classified taxon and propagated up the taxonomy in one pass, giving
+observation and species counts for every taxon at every rank.
+
+The pass runs over the taxonomy store's preorder, where every subtree is a
+contiguous range [pre, last], so subtree totals are differences of a single
+prefix sum instead of a walk up Taxon.parent per rank.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from kg.local.taxonomy import TaxonomyStore
+
+
+def subtree_sums(store: TaxonomyStore, values: np.ndarray) -> np.ndarray:
+    """Sum per-taxon values (indexed by store position) over each taxon's subtree."""
+    totals = np.zeros(len(store) + 1, dtype=np.int64)
+    np.cumsum(np.asarray(values, dtype=np.int64)[store.order], out=totals[1:])
+    return totals[np.asarray(store.last) + 1] - totals[store.pre]
+
+
+@dataclass
+class Rollup:
+    """Subtree counts indexed by taxonomy store position."""
+    store: TaxonomyStore
+    direct: np.ndarray
+    observations: np.ndarray
+    species: np.ndarray
+    unmatched: int = 0
+
+    def counts(self, taxon_ids: Any) -> pd.DataFrame:
+        """Counts for the given taxon ids (zero for unknown ids)."""
+        positions = self.store.positions(taxon_ids)
+        known = positions >= 0
+        safe = np.maximum(positions, 0)
+        return pd.DataFrame({
+            "taxon_id": np.atleast_1d(np.asarray(taxon_ids, dtype=np.int64)),
+            "observation_count": np.where(known, self.observations[safe], 0),
+            "species_count": np.where(known, self.species[safe], 0),
+        })
+
+    def to_frame(self, rank: Optional[str] = None, threshold: int = 0) -> pd.DataFrame:
+        """Taxa with more than threshold observations in their subtree, optionally of one rank."""
+        mask = self.observations > threshold
+        if rank is not None:
+            mask &= self.store.rank == self.store.ranks.index(rank)
+        positions = np.flatnonzero(mask)
+        df = pd.DataFrame({
+            "taxon_id": self.store.ids[positions],
+            "rank": np.asarray(self.store.ranks, dtype=object)[self.store.rank[positions]],
+            "observation_count": self.observations[positions],
+            "species_count": self.species[positions],
+            "direct_count": self.direct[positions],
+        })
+        return df.sort_values("observation_count", ascending=False, ignore_index=True)
+
+
+def rollup_observations(
+    store: TaxonomyStore,
+    classification: Any,
+    counts: Optional[Any] = None,
+) -> Rollup:
+    """Roll observation counts up the taxonomy.
+
+    Args:
+        store: The taxonomy store
+        classification: Taxon id of each observation, or of each group if counts is given
+        counts: Optional observation count per classification id, eg from a GROUP BY TAXONKEY
+
+    Returns:
+        The subtree rollup; observations whose taxon is not in the store are
+        reported as unmatched
+    """
+    positions = store.positions(classification)
+    weights = np.ones(len(positions), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+    known = positions >= 0
+    direct = np.bincount(positions[known], weights=weights[known], minlength=len(store)).astype(np.int64)
+
+    observations = subtree_sums(store, direct)
+    observed_species = (store.rank == store.ranks.index("species")) & (observations > 0)
+    species = subtree_sums(store, observed_species)
+    return Rollup(store, direct, observations, species, int(weights[~known].sum()))
@@ -0,0 +1,157 @@
+"""
+Solstices and equinoxes
+
+Equinox and solstice instants for any range of years, vectorized over years,
+with the algorithms of Astronomical Algorithms (Jean Meeus, 1998, chapter
+27) that the astropixels_soleq seed (2001-2100) was computed with:
+
+- a mean instant (JDE0) from a polynomial in the year, per event
+- a correction from 24 periodic terms, scaled by the Sun's speed
+- conversion from Dynamical Time to Universal Time with the ΔT polynomials
+  of Espenak and Meeus (NASA Five Millennium Canon of Solar Eclipses), except
+  for the seed's own years, which use the ΔT the seed implies per year
+
+The seed's ΔT is a prediction that varies by up to two minutes from one
+year to the next after 2050, which no smooth extrapolation follows; taking
+it per year keeps computed and seeded instants within a minute of each
+other, so binding in memory and reading SOLEQ give the same seasons.
+
+The result has the seed's columns (year, spring_equinox, summer_solstice,
+fall_equinox, winter_solstice, naming the northern hemisphere seasons) at
+minute precision, for writing a dbt seed (`uv run -m kg.apps.soleq_seed`) or
+binding in memory (define_arq(soleq_years=...)).
+"""
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+EVENTS = ("spring_equinox", "summer_solstice", "fall_equinox", "winter_solstice")
+
+# JDE0 polynomial coefficients per event, for years -1000..1000 (Y = year / 1000)
+# and 1000..3000 (Y = (year - 2000) / 1000)
+_MEAN_BEFORE_1000 = np.array([
+    [1721139.29189, 365242.13740, 0.06134, 0.00111, -0.00071],
+    [1721233.25401, 365241.72562, -0.05323, 0.00907, 0.00025],
+    [1721325.70455, 365242.49558, -0.11677, -0.00297, 0.00074],
+    [1721414.39987, 365242.88257, -0.00769, -0.00933, -0.00006],
+])
+_MEAN_AFTER_1000 = np.array([
+    [2451623.80984, 365242.37404, 0.05169, -0.00411, -0.00057],
+    [2451716.56767, 365241.62603, 0.00325, 0.00888, -0.00030],
+    [2451810.21715, 365242.01767, -0.11575, 0.00337, 0.00078],
+    [2451900.05952, 365242.74049, -0.06223, -0.00823, 0.00032],
+])
+
+# Periodic terms (A, B degrees, C degrees per Julian century)
+_TERMS = np.array([
+    [485, 324.96, 1934.136], [203, 337.23, 32964.467], [199, 342.08, 20.186], [182, 27.85, 445267.112],
+    [156, 73.14, 45036.886], [136, 171.52, 22518.443], [77, 222.54, 65928.934], [74, 296.72, 3034.906],
+    [70, 243.58, 9037.513], [58, 119.81, 33718.147], [52, 297.17, 150.678], [50, 21.02, 2281.226],
+    [45, 247.54, 29929.562], [44, 325.15, 31555.956], [29, 60.93, 4443.417], [18, 155.12, 67555.328],
+    [17, 288.79, 4562.452], [16, 198.04, 62894.029], [14, 199.76, 31436.921], [12, 95.39, 14577.848],
+    [12, 287.11, 31931.756], [12, 320.81, 34777.259], [9, 227.73, 1222.114], [8, 15.45, 16859.074],
+])
+
+# ΔT in whole seconds per year of the astropixels seed (2001-2100): the
+# mean difference between each year's computed Dynamical Time instants and
+# the seed's Universal Time ones
+_SEED_FIRST_YEAR = 2001
+_SEED_DELTA_T = np.array([
+    49, 57, 67, 55, 66, 62, 70, 40, 81, 87, 68, 64, 63, 53, 79, 34, 33, 76, 82, 72,
+    82, 74, 56, 64, 65, 58, 43, 69, 106, 101, 83, 40, 80, 26, 74, 115, 69, 117, 55, 108,
+    51, 94, 30, 118, 39, 79, 130, 65, 130, 65, 145, 72, 137, 56, 114, 58, 116, 169, 98, 183,
+    94, 152, 97, 25, 183, 138, 77, 20, 177, 132, 59, 235, 189, 100, 49, 239, 170, 114, 28, 215,
+    159, 80, 259, 226, 151, 83, 245, 181, 134, 83, 250, 204, 122, 281, 231, 171, 116, 301, 214, 173,
+])
+
+_J2000 = 2451545.0
+_UNIX_EPOCH_JD = 2440587.5
+
+
+def _polynomial(coefficients: Any, t: np.ndarray) -> np.ndarray:
+    return sum(c * t**power for power, c in enumerate(coefficients))
+
+
+def delta_t(year: Any) -> np.ndarray:
+    """ΔT = TD - UT in seconds at decimal years, by the Espenak and Meeus polynomials."""
+    y = np.asarray(year, dtype=np.float64)
+    long_term = -20 + 32 * ((y - 1820) / 100) ** 2
+    pieces = [
+        (y < -500, long_term),
+        (y < 500, _polynomial([10583.6, -1014.41, 33.78311, -5.952053, -0.1798452, 0.022174192, 0.0090316521], y / 100)),
+        (y < 1600, _polynomial([1574.2, -556.01, 71.23472, 0.319781, -0.8503463, -0.005050998, 0.0083572073], (y - 1000) / 100)),
+        (y < 1700, _polynomial([120, -0.9808, -0.01532, 1 / 7129], y - 1600)),
+        (y < 1800, _polynomial([8.83, 0.1603, -0.0059285, 0.00013336, -1 / 1174000], y - 1700)),
+        (y < 1860, _polynomial([13.72, -0.332447, 0.0068612, 0.0041116, -0.00037436, 0.0000121272, -0.0000001699, 0.000000000875], y - 1800)),
+        (y < 1900, _polynomial([7.62, 0.5737, -0.251754, 0.01680668, -0.0004473624, 1 / 233174], y - 1860)),
+        (y < 1920, _polynomial([-2.79, 1.494119, -0.0598939, 0.0061966, -0.000197], y - 1900)),
+        (y < 1941, _polynomial([21.20, 0.84493, -0.076100, 0.0020936], y - 1920)),
+        (y < 1961, _polynomial([29.07, 0.407, -1 / 233, 1 / 2547], y - 1950)),
+        (y < 1986, _polynomial([45.45, 1.067, -1 / 260, -1 / 718], y - 1975)),
+        (y < 2005, _polynomial([63.86, 0.3345, -0.060374, 0.0017275, 0.000651814, 0.00002373599], y - 2000)),
+        (y < 2050, _polynomial([62.92, 0.32217, 0.005589], y - 2000)),
+        (y < 2150, long_term - 0.5628 * (2150 - y)),
+    ]
+    return np.select([condition for condition, _ in pieces], [value for _, value in pieces], long_term)
+
+
+def event_delta_t(years: Any) -> np.ndarray:
+    """ΔT in seconds at the four events of each year, shape (years, 4): per year in the seed's years, else delta_t."""
+    years = np.asarray(years, dtype=np.int64)
+    computed = delta_t(years[:, None] + np.array([0.22, 0.47, 0.72, 0.97]))
+    seeded = (years >= _SEED_FIRST_YEAR) & (years < _SEED_FIRST_YEAR + len(_SEED_DELTA_T))
+    seed_delta_t = _SEED_DELTA_T[np.clip(years - _SEED_FIRST_YEAR, 0, len(_SEED_DELTA_T) - 1)]
+    return np.where(seeded[:, None], seed_delta_t[:, None], computed)
+
+
+def event_jde(years: Any) -> np.ndarray:
+    """Julian Ephemeris Days (Dynamical Time) of the four events, shape (years, 4)."""
+    years = np.asarray(years, dtype=np.float64)
+    early = (years < 1000)[:, None]
+    y = np.where(early, years[:, None] / 1000, (years[:, None] - 2000) / 1000)
+    mean = np.where(
+        early,
+        _polynomial(_MEAN_BEFORE_1000.T[:, None, :], y),
+        _polynomial(_MEAN_AFTER_1000.T[:, None, :], y),
+    )
+    t = (mean - _J2000) / 36525
+    w = np.radians(35999.373 * t - 2.47)
+    speed = 1 + 0.0334 * np.cos(w) + 0.0007 * np.cos(2 * w)
+    a, b, c = (_TERMS[:, column, None, None] for column in range(3))
+    s = (a * np.cos(np.radians(b + c * t))).sum(axis=0)
+    return mean + 0.00001 * s / speed
+
+
+def solstice_equinox(first_year: int, last_year: int, universal_time: bool = True) -> pd.DataFrame:
+    """Equinox and solstice datetimes for each year of an inclusive range, to the minute.
+
+    Args:
+        first_year, last_year: Inclusive year range
+        universal_time: Convert from Dynamical Time to Universal Time, as the seed is
+
+    Returns:
+        A frame with year and the four event columns of the astropixels_soleq seed
+    """
+    years = np.arange(first_year, last_year + 1)
+    jde = event_jde(years)
+    if universal_time:
+        jde = jde - event_delta_t(years) / 86400
+    minutes = np.round((jde - _UNIX_EPOCH_JD) * 1440).astype(np.int64)
+    df = pd.DataFrame({"year": years})
+    for column, event in enumerate(EVENTS):
+        # second resolution, as nanoseconds only span 1677-2262
+        df[event] = minutes[:, column].astype("datetime64[m]").astype("datetime64[s]")
+    return df
+
+
+def write_seed(path: Path, first_year: int, last_year: int) -> pd.DataFrame:
+    """Write the years as a dbt seed CSV in the astropixels_soleq format."""
+    df = solstice_equinox(first_year, last_year)
+    out = df.copy()
+    for event in EVENTS:
+        out[event] = out[event].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    out.to_csv(path, index=False)
+    return df
@@ -0,0 +1,248 @@
+"""
+Observation spatial index
+
+A ball tree over observation coordinates on the unit sphere, answering
+batched radius and k-nearest-neighbour queries, optionally restricted to a
+taxon's subtree and a year range, eg the 20 closest observations of any
+Ericaceae to a point.
+
+Points are stored as unit vectors, where the chord between two points is
+monotone in their great-circle distance. The tree is built without
+recursion: points are sorted once along a 3D Morton curve, leaves are runs of
+LEAF_SIZE consecutive points, and each internal node (heap layout, children
+2i+1 and 2i+2) covers its children's runs, with a bounding ball computed per
+level by segment reductions.
+
+Queries descend the tree level by level for all (query, node) pairs at once,
+pruning balls farther than the search radius. k-NN runs radius searches
+that widen (by the density seen so far) until every query has k matches
+after filtering, so the k nearest are among them.
+
+Saved as .npy arrays in the ARQ cache and loaded with mmap.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from kg.cache import cache_dir
+from kg.local.taxonomy import TaxonomyStore
+
+EARTH_RADIUS_M = 6_371_008.8
+LEAF_SIZE = 64
+
+ARRAYS = ("xyz", "gbif_ids", "taxon_ids", "years", "node_start", "node_end", "node_center", "node_radius")
+
+Years = Optional[Tuple[int, int]]
+
+
+def to_xyz(lat: Any, lon: Any) -> np.ndarray:
+    """Unit vectors for latitude / longitude in degrees, shape (n, 3)."""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_of(meters: Any) -> np.ndarray:
+    """Chord length on the unit sphere for a great-circle distance in meters."""
+    angle = np.minimum(np.asarray(meters, dtype=np.float64) / EARTH_RADIUS_M, np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+def meters_of(chord: Any) -> np.ndarray:
+    """Great-circle distance in meters for a chord length on the unit sphere."""
+    return 2 * np.arcsin(np.minimum(np.asarray(chord) / 2, 1.0)) * EARTH_RADIUS_M
+
+
+def _morton(xyz: np.ndarray) -> np.ndarray:
+    """21-bit per axis Morton code of points in the [-1, 1] cube."""
+    cells = ((xyz + 1) * 0.5 * (2**21 - 1)).astype(np.uint64)
+    code = np.zeros(len(xyz), dtype=np.uint64)
+    for bit in range(21):
+        for axis in range(3):
+            code |= ((cells[:, axis] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(3 * bit + axis)
+    return code
+
+
+def _build_nodes(xyz: np.ndarray, leaf_size: int):
+    """Heap-ordered node ranges and bounding balls over points in curve order."""
+    leaves = 1 << int(np.ceil(np.log2(max(1, -(-len(xyz) // leaf_size)))))
+    levels = leaves.bit_length()
+    nodes = 2 * leaves - 1
+    start = np.empty(nodes, dtype=np.int64)
+    end = np.empty(nodes, dtype=np.int64)
+    center = np.zeros((nodes, 3))
+    radius = np.full(nodes, -1.0)
+
+    for level in range(levels):
+        first, count = (1 << level) - 1, 1 << level
+        span = leaf_size * (leaves // count)
+        bounds = np.minimum(np.arange(count + 1, dtype=np.int64) * span, len(xyz))
+        start[first : first + count], end[first : first + count] = bounds[:-1], bounds[1:]
+        sizes = bounds[1:] - bounds[:-1]
+        filled = np.flatnonzero(sizes > 0)
+        if not len(filled):
+            continue
+        offsets = bounds[:-1][filled]
+        sums = np.add.reduceat(xyz, offsets, axis=0)
+        mean = sums / sizes[filled, None]
+        owner = np.repeat(np.arange(len(filled)), sizes[filled])
+        distance = np.linalg.norm(xyz[offsets[0] :] - mean[owner], axis=1)
+        center[first + filled] = mean
+        radius[first + filled] = np.maximum.reduceat(distance, offsets - offsets[0])
+    return start, end, center, radius
+
+
+class SpatialIndex:
+    """Ball tree over observation coordinates."""
+
+    def __init__(self, arrays: dict, path: Optional[Path] = None):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.first_leaf = (len(self.node_start) - 1) // 2
+        self.path = path
+
+    def __len__(self) -> int:
+        return len(self.xyz)
+
+    @classmethod
+    def build(cls, lat: Any, lon: Any, gbif_ids: Any, taxon_ids: Any, years: Any,
+              leaf_size: int = LEAF_SIZE, path: Optional[Path] = None) -> "SpatialIndex":
+        """Build from observation columns; rows without coordinates are dropped."""
+        lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+        keep = np.isfinite(lat) & np.isfinite(lon)
+        xyz = to_xyz(lat[keep], lon[keep])
+        order = np.argsort(_morton(xyz), kind="stable")
+        arrays = {
+            "xyz": xyz[order],
+            "gbif_ids": np.asarray(gbif_ids, dtype=np.int64)[keep][order],
+            "taxon_ids": np.asarray(pd.Series(taxon_ids).fillna(-1), dtype=np.int64)[keep][order],
+            "years": np.asarray(pd.Series(years).fillna(-1), dtype=np.int32)[keep][order],
+        }
+        arrays["node_start"], arrays["node_end"], arrays["node_center"], arrays["node_radius"] = _build_nodes(
+            arrays["xyz"], leaf_size
+        )
+        index = cls(arrays)
+        return index.save(path) if path is not None else index
+
+    @classmethod
+    def from_table(cls, connection: Any, fqn: str, path: Optional[Path] = None) -> "SpatialIndex":
+        df = connection.sql(
+            f"select GBIFID, TAXONKEY, YEAR, LAT, LON from {fqn} where LAT is not null and LON is not null"
+        ).to_pandas()
+        return cls.build(df["LAT"], df["LON"], df["GBIFID"], df["TAXONKEY"], df["YEAR"], path=path)
+
+    def save(self, path: Optional[Path] = None) -> "SpatialIndex":
+        path = Path(path) if path is not None else cache_dir("spatial")
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        (path / "meta.json").write_text(json.dumps({"points": len(self)}))
+        return SpatialIndex.load(path)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "SpatialIndex":
+        path = Path(path) if path is not None else cache_dir("spatial")
+        if not (path / "meta.json").exists():
+            raise FileNotFoundError(f"No spatial index in {path}, build one with `uv run -m kg.apps.build_local spatial`")
+        return cls({name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAYS}, path)
+
+    # Queries
+
+    def _within(self, points: np.ndarray, chord: np.ndarray, mask) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(query, point, chord distance) for every point within each query's chord, passing mask."""
+        query = np.arange(len(points))
+        node = np.zeros(len(points), dtype=np.int64)
+        leaf_query, leaf_node = [], []
+        while len(query):
+            gap = np.linalg.norm(points[query] - self.node_center[node], axis=1) - self.node_radius[node]
+            keep = (self.node_radius[node] >= 0) & (gap <= chord[query] + 1e-12)
+            query, node = query[keep], node[keep]
+            leaf = node >= self.first_leaf
+            leaf_query.append(query[leaf])
+            leaf_node.append(node[leaf])
+            query, node = np.repeat(query[~leaf], 2), (2 * node[~leaf, None] + np.array([1, 2])).ravel()
+
+        query, node = np.concatenate(leaf_query), np.concatenate(leaf_node)
+        starts, sizes = self.node_start[node], self.node_end[node] - self.node_start[node]
+        query = np.repeat(query, sizes)
+        point = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes) + np.repeat(starts, sizes)
+        distance = np.linalg.norm(self.xyz[point] - points[query], axis=1)
+        keep = distance <= chord[query]
+        query, point, distance = query[keep], point[keep], distance[keep]
+        if mask is not None:
+            keep = mask(point)
+            query, point, distance = query[keep], point[keep], distance[keep]
+        return query, point, distance
+
+    def _mask(self, taxon_id: Optional[int], years: Years, store: Optional[TaxonomyStore]):
+        if taxon_id is None and years is None:
+            return None
+        if taxon_id is not None and store is None:
+            store = TaxonomyStore.load()
+
+        def mask(point: np.ndarray) -> np.ndarray:
+            keep = np.ones(len(point), dtype=bool)
+            if years is not None:
+                year = self.years[point]
+                keep &= (year >= years[0]) & (year <= years[1])
+            if taxon_id is not None:
+                keep[keep] = store.is_ancestor(taxon_id, self.taxon_ids[point[keep]])
+            return keep
+        return mask
+
+    def _frame(self, query: np.ndarray, point: np.ndarray, distance: np.ndarray) -> pd.DataFrame:
+        order = np.lexsort((distance, query))
+        query, point, distance = query[order], point[order], distance[order]
+        return pd.DataFrame({
+            "query": query,
+            "gbif_id": self.gbif_ids[point],
+            "taxon_id": self.taxon_ids[point],
+            "year": self.years[point],
+            "distance_m": meters_of(distance),
+        })
+
+    def radius(self, lat: Any, lon: Any, meters: Any, taxon_id: Optional[int] = None, years: Years = None,
+               store: Optional[TaxonomyStore] = None) -> pd.DataFrame:
+        """Observations within meters of each query point, nearest first.
+
+        Args:
+            lat, lon: Query coordinates in degrees, scalars or arrays
+            meters: Search radius, a scalar or one per query
+            taxon_id: Only observations classified in this taxon's subtree
+            years: Only observations in this inclusive (first, last) year range
+            store: Taxonomy store for the taxon filter (default: the cached store)
+
+        Returns:
+            A frame with the query index, gbif_id, taxon_id, year and distance_m
+        """
+        points = to_xyz(np.atleast_1d(lat), np.atleast_1d(lon))
+        chord = np.broadcast_to(chord_of(meters), len(points))
+        return self._frame(*self._within(points, chord, self._mask(taxon_id, years, store)))
+
+    def knn(self, lat: Any, lon: Any, k: int = 10, taxon_id: Optional[int] = None, years: Years = None,
+            store: Optional[TaxonomyStore] = None) -> pd.DataFrame:
+        """The k nearest observations to each query point, with the filters of radius()."""
+        points = to_xyz(np.atleast_1d(lat), np.atleast_1d(lon))
+        mask = self._mask(taxon_id, years, store)
+        # start from the radius holding k points if observations were uniform
+        chord = np.full(len(points), chord_of(EARTH_RADIUS_M * np.sqrt(4 * k / max(len(self), 1))))
+        found = []
+        pending = np.arange(len(points))
+        while len(pending):
+            query, point, distance = self._within(points[pending], chord[pending], mask)
+            counts = np.bincount(query, minlength=len(pending))
+            done = (counts >= k) | (chord[pending] >= 2)
+            keep = done[query]
+            found.append((pending[query[keep]], point[keep], distance[keep]))
+            # grow by the area expected to hold k points at the density seen so far
+            growth = np.clip(1.2 * np.sqrt(k / np.maximum(counts[~done], 1)), 1.5, 4.0)
+            pending = pending[~done]
+            chord[pending] = np.minimum(chord[pending] * growth, 2.0)
+
+        query, point, distance = (np.concatenate(parts) for parts in zip(*found))
+        df = self._frame(query, point, distance)
+        return df[df.groupby("query").cumcount() < k].reset_index(drop=True)
@@ -0,0 +1,129 @@
+"""
+Synonym to accepted taxon map
+
+Local counterpart of dbt/models/staging/taxon_accepted.sql: a dense array
+mapping every taxon id to its accepted taxon id, following synonym chains.
+Taxa that are accepted, unknown, or whose accepted name is missing from the
+backbone (or part of a synonym cycle, or more than MAX_HOPS links from an
+accepted name) map to themselves.
+
+Saved as accepted.npy in the ARQ cache and loaded with mmap.
+"""
+
+import csv
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from kg.cache import cache_dir
+from kg.local.taxonomy import MAIN_RANKS, TaxonomyStore, TaxonIds
+
+# Longest synonym chain followed, matching the dbt model
+MAX_HOPS = 10
+
+
+def resolve_accepted(ids: Any, accepted_ids: Any) -> np.ndarray:
+    """Dense taxon id -> accepted taxon id array from taxon and accepted name usage id columns."""
+    ids = np.asarray(ids, dtype=np.int64)
+    accepted_ids = np.asarray(pd.Series(accepted_ids).fillna(-1), dtype=np.int64)
+    accepted = np.arange(int(ids.max()) + 1 if len(ids) else 0, dtype=np.int64)
+    known = np.zeros(len(accepted), dtype=bool)
+    known[ids] = True
+
+    # Only link to accepted names that exist, then follow exactly MAX_HOPS links
+    # by pointer jumping, composing the 2^k-hop maps for the bits of MAX_HOPS
+    linked = (accepted_ids >= 0) & (accepted_ids < len(accepted))
+    linked[linked] &= known[accepted_ids[linked]]
+    accepted[ids[linked]] = accepted_ids[linked]
+    step, resolved, hops = accepted, np.arange(len(accepted), dtype=np.int64), MAX_HOPS
+    while hops:
+        if hops & 1:
+            resolved = step[resolved]
+        hops >>= 1
+        if hops:
+            step = step[step]
+    # Chains longer than MAX_HOPS, or running into a cycle, end short of an accepted name
+    unresolved = accepted[resolved] != resolved
+    resolved[unresolved] = np.flatnonzero(unresolved)
+    return resolved
+
+
+class SynonymMap:
+    """Resolves taxon ids to accepted taxon ids."""
+
+    def __init__(self, accepted: np.ndarray, path: Optional[Path] = None):
+        self.accepted = accepted
+        self.path = path
+
+    @classmethod
+    def build(cls, ids: Any, accepted_ids: Any, path: Optional[Path] = None) -> "SynonymMap":
+        synonyms = cls(resolve_accepted(ids, accepted_ids))
+        return synonyms.save(path) if path is not None else synonyms
+
+    @classmethod
+    def from_tsv(cls, tsv_path: Union[str, Path], path: Optional[Path] = None) -> "SynonymMap":
+        """Build from the GBIF backbone Taxon.tsv, resolving synonym chains locally."""
+        df = pd.read_csv(
+            tsv_path,
+            sep="\t",
+            usecols=["taxonID", "acceptedNameUsageID"],
+            dtype={"taxonID": "int64", "acceptedNameUsageID": "Int64"},
+            quoting=csv.QUOTE_NONE,
+        )
+        return cls.build(df["taxonID"], df["acceptedNameUsageID"], path)
+
+    @classmethod
+    def from_table(cls, connection: Any, fqn: str = "TEAM_ARQ.PUBLIC.TAXON_ACCEPTED", path: Optional[Path] = None) -> "SynonymMap":
+        """Build from the resolved TAXON_ACCEPTED table produced by dbt."""
+        df = connection.sql(f"select TAXONID, ACCEPTEDTAXONID from {fqn}").to_pandas()
+        return cls.build(df["TAXONID"], df["ACCEPTEDTAXONID"], path)
+
+    def save(self, path: Optional[Path] = None) -> "SynonymMap":
+        path = Path(path) if path is not None else cache_dir("synonyms")
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "accepted.npy", self.accepted)
+        return SynonymMap.load(path)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "SynonymMap":
+        path = Path(path) if path is not None else cache_dir("synonyms")
+        if not (path / "accepted.npy").exists():
+            raise FileNotFoundError(f"No synonym map in {path}, build one with `uv run -m kg.apps.build_local synonyms`")
+        return cls(np.load(path / "accepted.npy", mmap_mode="r"), path)
+
+    def resolve(self, taxon_ids: TaxonIds) -> np.ndarray:
+        """Accepted taxon ids; unknown ids are returned unchanged."""
+        taxon_ids = np.atleast_1d(np.asarray(taxon_ids, dtype=np.int64))
+        known = (taxon_ids >= 0) & (taxon_ids < len(self.accepted))
+        return np.where(known, self.accepted[np.where(known, taxon_ids, 0)], taxon_ids)
+
+
+def recovery_report(
+    store: TaxonomyStore,
+    synonyms: SynonymMap,
+    taxon_ids: Any,
+    counts: Optional[Any] = None,
+) -> pd.DataFrame:
+    """Observations reaching each main rank through their classification vs their accepted taxon.
+
+    Args:
+        store: The taxonomy store
+        synonyms: The synonym map
+        taxon_ids: Classification taxon id of each observation, or of each group if counts is given
+        counts: Optional observation count per taxon id, eg from a GROUP BY TAXONKEY
+
+    Returns:
+        One row per main rank with the observations resolved to a taxon of
+        that rank before and after synonym resolution, and the difference
+    """
+    taxon_ids = np.asarray(taxon_ids, dtype=np.int64)
+    counts = np.ones(len(taxon_ids), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+    accepted = synonyms.resolve(taxon_ids)
+    rows = []
+    for rank in MAIN_RANKS:
+        before = int(counts[store.ancestor_at_rank(taxon_ids, rank) >= 0].sum())
+        after = int(counts[store.ancestor_at_rank(accepted, rank) >= 0].sum())
+        rows.append((rank, before, after, after - before))
+    return pd.DataFrame(rows, columns=["rank", "classified", "accepted", "recovered"])
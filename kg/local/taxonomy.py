@@ -0,0 +1,289 @@
+"""
+Memory-mapped taxonomy store
+
+Client-side tools ask the same questions of the 7.7M taxon backbone over and
+over ("is taxon X under family Y?", "what is the genus of taxon Z?"). The store
+answers them with array lookups instead of pandas joins over Taxon.parent:
+
+- ids / parent: taxon ids (int64) and the position of each parent (int32, -1 for roots)
+- rank: int8 codes into the store's rank list
+- pre / last: nested-set interval, a taxon's subtree is the preorder range [pre, last]
+- ancestor_<rank>: position of the nearest ancestor (or self) at each main rank, -1 if none
+- index: dense taxon id -> position lookup
+
+Arrays are saved as .npy files in one directory and loaded with mmap, so
+opening the store takes milliseconds and pages are shared between processes.
+Ancestor, rank-at-level and subtree-membership checks are O(1) per taxon and
+vectorized over NumPy arrays of taxon ids.
+
+Parents missing from the table and self-parents make a taxon a root, as do
+parent cycles (which never reach a root).
+"""
+
+import csv
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from kg.cache import cache_dir
+
+# Ranks with derived relations in kg/model/derived/taxonomy.py, top down
+MAIN_RANKS = ("kingdom", "phylum", "class", "order", "family", "genus", "species")
+
+ARRAYS = ("ids", "parent", "rank", "depth", "pre", "last", "order", "index") + tuple(f"ancestor_{r}" for r in MAIN_RANKS)
+
+TaxonIds = Union[int, Iterable[int], np.ndarray]
+
+
+def _children(parent: np.ndarray):
+    """CSR children lists: child positions grouped by parent, in position order."""
+    has_parent = np.flatnonzero(parent >= 0)
+    children = has_parent[np.argsort(parent[has_parent], kind="stable")]
+    offsets = np.zeros(len(parent) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(parent[has_parent], minlength=len(parent)), out=offsets[1:])
+    return children, offsets
+
+
+def _expand(nodes: np.ndarray, children: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """All children of the given nodes, grouped by node in the order given."""
+    counts = offsets[nodes + 1] - offsets[nodes]
+    starts = np.repeat(offsets[nodes] - np.cumsum(counts) + counts, counts)
+    return children[starts + np.arange(counts.sum())]
+
+
+def _levels(parent: np.ndarray) -> List[np.ndarray]:
+    """Breadth-first levels from the roots; nodes unreachable from a root become roots."""
+    while True:
+        children, offsets = _children(parent)
+        reached = np.zeros(len(parent), dtype=bool)
+        levels = []
+        frontier = np.flatnonzero(parent < 0)
+        while len(frontier):
+            reached[frontier] = True
+            levels.append(frontier)
+            frontier = _expand(frontier, children, offsets)
+        if reached.all():
+            return levels
+        parent[~reached] = -1
+
+
+def build_arrays(ids: Any, parent_ids: Any, ranks: Any) -> Dict[str, Any]:
+    """Build the store arrays from parallel taxon id, parent id and rank columns.
+
+    Returns:
+        The arrays keyed by name (see ARRAYS) plus "ranks", the rank names
+        indexed by rank code
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    parent_ids = np.asarray(pd.Series(parent_ids).fillna(-1), dtype=np.int64)
+
+    # Rank codes: main ranks first, then any others found, missing ranks are "unranked"
+    codes, found = pd.factorize(pd.Series(ranks))
+    found = [str(name).lower() for name in found] + ["unranked"]
+    rank_names = list(MAIN_RANKS) + sorted(set(found) - set(MAIN_RANKS))
+    rank = np.array([rank_names.index(name) for name in found], dtype=np.int8)[codes]
+
+    # Positions follow taxon id order so stores built from any source agree
+    by_id = np.argsort(ids)
+    ids, parent_ids, rank = ids[by_id], parent_ids[by_id], rank[by_id]
+    n = len(ids)
+    index = np.full(int(ids.max()) + 1 if n else 0, -1, dtype=np.int32)
+    index[ids] = np.arange(n, dtype=np.int32)
+
+    parent = np.full(n, -1, dtype=np.int32)
+    known = (parent_ids >= 0) & (parent_ids < len(index))
+    parent[known] = index[parent_ids[known]]
+    parent[parent == np.arange(n)] = -1
+
+    levels = _levels(parent)
+    depth = np.zeros(n, dtype=np.int16)
+    for d, level in enumerate(levels):
+        depth[level] = d
+
+    # Subtree sizes bottom up, then preorder numbers top down: a child starts
+    # right after its parent plus the subtrees of its earlier siblings
+    size = np.ones(n, dtype=np.int64)
+    for level in reversed(levels[1:]):
+        size += np.bincount(parent[level], weights=size[level], minlength=n).astype(np.int64)
+    pre = np.zeros(n, dtype=np.int64)
+    for i, level in enumerate(levels):
+        before = np.cumsum(size[level]) - size[level]
+        if i == 0:
+            pre[level] = before
+            continue
+        level_parent = parent[level]
+        first = np.r_[True, level_parent[1:] != level_parent[:-1]]
+        group_start = np.maximum.accumulate(np.where(first, np.arange(len(level)), 0))
+        pre[level] = pre[level_parent] + 1 + before - before[group_start]
+    last = pre + size - 1
+    order = np.empty(n, dtype=np.int32)
+    order[pre] = np.arange(n, dtype=np.int32)
+
+    arrays: Dict[str, Any] = {
+        "ids": ids,
+        "parent": parent,
+        "rank": rank,
+        "depth": depth,
+        "pre": pre.astype(np.int32),
+        "last": last.astype(np.int32),
+        "order": order,
+        "index": index,
+        "ranks": rank_names,
+    }
+    for code, name in enumerate(MAIN_RANKS):
+        ancestor = np.full(n, -1, dtype=np.int32)
+        for i, level in enumerate(levels):
+            inherited = ancestor[parent[level]] if i else -1
+            ancestor[level] = np.where(rank[level] == code, level, inherited)
+        arrays[f"ancestor_{name}"] = ancestor
+    return arrays
+
+
+class TaxonomyStore:
+    """Array-backed taxonomy answering ancestor and rank queries over taxon ids.
+
+    Query methods take a taxon id or an array of them and return arrays;
+    unknown taxon ids give -1 (ids) or False (checks).
+    """
+
+    def __init__(self, arrays: Dict[str, Any], path: Optional[Path] = None, version: Optional[str] = None):
+        self.arrays = arrays
+        self.path = path
+        self.ranks: List[str] = list(arrays["ranks"])
+        self._version = version
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def version(self) -> str:
+        """A hash of the taxonomy (ids, parents and ranks), for caches derived from the store."""
+        if self._version is None:
+            digest = hashlib.sha256(json.dumps(self.ranks).encode())
+            for name in ("ids", "parent", "rank"):
+                digest.update(np.ascontiguousarray(self.arrays[name]).tobytes())
+            self._version = digest.hexdigest()[:16]
+        return self._version
+
+    # Building and loading
+
+    @classmethod
+    def build(cls, ids: Any, parent_ids: Any, ranks: Any, path: Optional[Path] = None) -> "TaxonomyStore":
+        """Build a store from taxon id, parent id and rank columns, saving it if a path is given."""
+        store = cls(build_arrays(ids, parent_ids, ranks))
+        if path is not None:
+            store.save(path)
+            store = cls.load(path)
+        return store
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, path: Optional[Path] = None) -> "TaxonomyStore":
+        """Build from a frame with TAXONID, PARENTNAMEUSAGEID and TAXONRANK columns (any case)."""
+        columns = {c.upper(): c for c in df.columns}
+        return cls.build(
+            df[columns["TAXONID"]],
+            df[columns["PARENTNAMEUSAGEID"]],
+            df[columns["TAXONRANK"]],
+            path,
+        )
+
+    @classmethod
+    def from_tsv(cls, tsv_path: Union[str, Path], path: Optional[Path] = None) -> "TaxonomyStore":
+        """Build from the GBIF backbone Taxon.tsv."""
+        # Names contain stray quotes, read them verbatim like the Snowflake COPY does
+        df = pd.read_csv(
+            tsv_path,
+            sep="\t",
+            usecols=["taxonID", "parentNameUsageID", "taxonRank"],
+            dtype={"taxonID": "int64", "parentNameUsageID": "Int64", "taxonRank": "string"},
+            quoting=csv.QUOTE_NONE,
+        )
+        return cls.from_frame(df, path)
+
+    @classmethod
+    def from_table(cls, connection: Any, fqn: str = "TEAM_ARQ.PUBLIC.TAXON", path: Optional[Path] = None) -> "TaxonomyStore":
+        """Build from the TAXON table through a Snowflake session."""
+        df = connection.sql(f"select TAXONID, PARENTNAMEUSAGEID, TAXONRANK from {fqn}").to_pandas()
+        return cls.from_frame(df, path)
+
+    def save(self, path: Optional[Path] = None) -> Path:
+        path = Path(path) if path is not None else cache_dir("taxonomy")
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(path / f"{name}.npy", np.asarray(self.arrays[name]))
+        meta = {"ranks": self.ranks, "taxa": len(self), "version": self.version}
+        (path / "meta.json").write_text(json.dumps(meta, indent=2))
+        return path
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "TaxonomyStore":
+        """Open a saved store (default: the ARQ cache) with memory-mapped arrays."""
+        path = Path(path) if path is not None else cache_dir("taxonomy")
+        if not (path / "meta.json").exists():
+            raise FileNotFoundError(f"No taxonomy store in {path}, build one with `uv run -m kg.apps.build_local taxonomy`")
+        arrays: Dict[str, Any] = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+        meta = json.loads((path / "meta.json").read_text())
+        arrays["ranks"] = meta["ranks"]
+        return cls(arrays, path, meta.get("version"))
+
+    # Queries
+
+    def positions(self, taxon_ids: TaxonIds) -> np.ndarray:
+        """Store positions of the given taxon ids, -1 for unknown ids."""
+        taxon_ids = np.atleast_1d(np.asarray(taxon_ids, dtype=np.int64))
+        result = np.full(taxon_ids.shape, -1, dtype=np.int32)
+        known = (taxon_ids >= 0) & (taxon_ids < len(self.index))
+        result[known] = self.index[taxon_ids[known]]
+        return result
+
+    def _ids(self, positions: np.ndarray) -> np.ndarray:
+        return np.where(positions >= 0, self.ids[np.maximum(positions, 0)], -1)
+
+    def parent_of(self, taxon_ids: TaxonIds) -> np.ndarray:
+        """Parent taxon ids, -1 for roots and unknown ids."""
+        positions = self.positions(taxon_ids)
+        parents = np.where(positions >= 0, self.parent[np.maximum(positions, 0)], -1)
+        return self._ids(parents)
+
+    def rank_of(self, taxon_ids: TaxonIds) -> np.ndarray:
+        """Rank names, None for unknown ids."""
+        positions = self.positions(taxon_ids)
+        names = np.array(self.ranks + [None], dtype=object)
+        return names[np.where(positions >= 0, self.rank[np.maximum(positions, 0)], -1)]
+
+    def ancestor_at_rank(self, taxon_ids: TaxonIds, rank: str) -> np.ndarray:
+        """Ids of the nearest ancestor (or the taxon itself) at a main rank, eg the genus of a species."""
+        if rank not in MAIN_RANKS:
+            raise ValueError(f"Unknown rank {rank!r}, expected one of {MAIN_RANKS}")
+        positions = self.positions(taxon_ids)
+        ancestors = np.where(positions >= 0, getattr(self, f"ancestor_{rank}")[np.maximum(positions, 0)], -1)
+        return self._ids(ancestors)
+
+    def is_ancestor(self, ancestor_ids: TaxonIds, taxon_ids: TaxonIds) -> np.ndarray:
+        """Whether each taxon is in the subtree of (or is) the corresponding ancestor.
+
+        Either argument may be a single id, which is broadcast against the other.
+        """
+        ancestors = self.positions(ancestor_ids)
+        taxa = self.positions(taxon_ids)
+        known = (ancestors >= 0) & (taxa >= 0)
+        ancestors, taxa = np.maximum(ancestors, 0), np.maximum(taxa, 0)
+        taxon_pre = self.pre[taxa]
+        return known & (self.pre[ancestors] <= taxon_pre) & (taxon_pre <= self.last[ancestors])
+
+    def in_subtree(self, root_id: int, taxon_ids: TaxonIds) -> np.ndarray:
+        """Subtree membership mask of taxon ids under a single root."""
+        return self.is_ancestor(root_id, taxon_ids)
+
+    def subtree(self, root_id: int) -> np.ndarray:
+        """Ids of every taxon in a subtree, root first, in preorder."""
+        position = self.positions(root_id)[0]
+        if position < 0:
+            return np.empty(0, dtype=np.int64)
+        return self.ids[self.order[self.pre[position] : self.last[position] + 1]]
@@ -0,0 +1,196 @@
+"""
+Trends
+
+Year-over-year observation trends per taxon at a rank (genus, family, ...):
+yearly observation counts, their share of all observations in the region
+that year (normalizing for sampling effort), and least-squares slopes of that
+share over rolling windows of years.
+
+Observations are fetched once as counts grouped by (taxon, country, year).
+Everything after that is a single pass over those rows: taxa are mapped to
+their ancestor at the rank with the taxonomy store, rows are binned into a
+dense (taxon / region series, year) grid with bincount, and the slopes of
+every window come from cumulative sums along the year axis.
+
+Grouped counts are cached under a directory keyed by the observation table's
+version (as in kg/local/phenology.py), with the trends of each rank next to
+them, so both are recomputed only once the table changes.
+"""
+
+import re
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from kg.cache import cache_dir, drop_stale_versions, table_version
+from kg.local.taxonomy import TaxonomyStore
+
+# Region of every observation when trends are not split by region
+ALL_REGIONS = ""
+
+
+def yearly_counts_sql(fqn: str) -> str:
+    """Observation counts grouped by taxon, country and year (taxon-less records count as effort)."""
+    return f"""
+        select TAXONKEY, coalesce(COUNTRYCODE, '') as REGION, YEAR, count(*) as N
+        from {fqn}
+        where YEAR is not null
+        group by 1, 2, 3
+    """
+
+
+def rank_counts(store: TaxonomyStore, counts: pd.DataFrame, rank: str, by_region: bool = False) -> pd.DataFrame:
+    """Yearly observations of every taxon of a rank, including those classified below it.
+
+    Args:
+        store: The taxonomy store
+        counts: Grouped counts with TAXONKEY, REGION, YEAR and N columns
+        rank: Main rank to report, eg genus
+        by_region: Keep regions apart (default: all regions together)
+
+    Returns:
+        A frame with taxon_id, region, year, observations and effort (all
+        observations in the region that year), one row per observed
+        (taxon, region, year)
+    """
+    taxon_ids = store.ancestor_at_rank(counts["TAXONKEY"].fillna(-1).to_numpy(dtype=np.int64), rank)
+    regions = counts["REGION"].to_numpy(dtype=object) if by_region else np.full(len(counts), ALL_REGIONS, dtype=object)
+    years = counts["YEAR"].to_numpy(dtype=np.int64)
+    n = counts["N"].to_numpy(dtype=np.int64)
+
+    region, region_names = pd.factorize(regions)
+    first_year = years.min() if len(years) else 0
+    span = int(years.max() - first_year + 1) if len(years) else 1
+    region_year = region * span + (years - first_year)
+    effort = np.bincount(region_year, weights=n, minlength=len(region_names) * span)
+
+    # one int64 key per (taxon, region, year)
+    ranked = taxon_ids >= 0
+    cells = len(region_names) * span
+    unique, group = np.unique(taxon_ids[ranked] * cells + region_year[ranked], return_inverse=True)
+    observations = np.bincount(group, weights=n[ranked], minlength=len(unique))
+    cell = unique % cells
+    return pd.DataFrame({
+        "taxon_id": unique // cells,
+        "region": np.asarray(region_names, dtype=object)[cell // span],
+        "year": first_year + cell % span,
+        "observations": observations.astype(np.int64),
+        "effort": effort[cell].astype(np.int64),
+    })
+
+
+def rolling_slopes(values: np.ndarray, valid: np.ndarray, window: int, min_years: int = 3) -> np.ndarray:
+    """Least-squares slope per step along the last axis over the trailing window.
+
+    Steps where valid is False are left out of the fit; windows with fewer
+    than min_years valid steps give NaN.
+    """
+    steps = values.shape[-1]
+    x = np.arange(steps, dtype=np.float64)
+    weight = valid.astype(np.float64)
+    y = np.where(valid, values, 0.0)
+
+    def window_sums(a: np.ndarray) -> np.ndarray:
+        total = np.cumsum(a, axis=-1)
+        shifted = np.zeros_like(total)
+        shifted[..., window:] = total[..., :-window]
+        return total - shifted
+
+    n = window_sums(weight)
+    sx, sy = window_sums(weight * x), window_sums(y)
+    sxx, sxy = window_sums(weight * x * x), window_sums(y * x)
+    denominator = n * sxx - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (n * sxy - sx * sy) / denominator
+    return np.where((n >= min_years) & (denominator > 0), slope, np.nan)
+
+
+def with_trends(df: pd.DataFrame, window: int = 5, min_years: int = 3) -> pd.DataFrame:
+    """Share of effort and rolling slope per (taxon, region) series and year.
+
+    Takes rows as returned by rank_counts (or the yearly_taxon_counts query);
+    years without observations of a taxon count as a share of 0 wherever the
+    region's effort that year is known from other rows.
+
+    Returns:
+        The series as a dense frame of taxon_id, region, year, observations,
+        effort, share (observations / effort) and slope (change in share per
+        year over the window ending that year)
+    """
+    if df.empty:
+        return df.assign(share=pd.Series(dtype=np.float64), slope=pd.Series(dtype=np.float64))
+    years = df["year"].to_numpy(dtype=np.int64)
+    first_year = years.min()
+    span = int(years.max() - first_year + 1)
+    year = years - first_year
+
+    region, regions = pd.factorize(df["region"])
+    series_key, series = np.unique(df["taxon_id"].to_numpy(dtype=np.int64) * len(regions) + region, return_inverse=True)
+    series_keys = np.stack([series_key // len(regions), series_key % len(regions)])
+    cells = len(series_keys[0]) * span
+    observations = np.bincount(series * span + year, weights=df["observations"], minlength=cells).reshape(-1, span)
+
+    region_effort = np.zeros(len(regions) * span)
+    region_effort[region * span + year] = df["effort"].to_numpy(dtype=np.float64)
+    effort = region_effort.reshape(len(regions), span)[series_keys[1]]
+
+    valid = effort > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = np.where(valid, observations / effort, np.nan)
+    slope = rolling_slopes(share, valid, window, min_years)
+
+    keep = valid.ravel()
+    return pd.DataFrame({
+        "taxon_id": np.repeat(series_keys[0], span)[keep],
+        "region": np.asarray(regions, dtype=object)[np.repeat(series_keys[1], span)][keep],
+        "year": np.tile(np.arange(span) + first_year, len(series_keys[0]))[keep],
+        "observations": observations.ravel()[keep].astype(np.int64),
+        "effort": effort.ravel()[keep].astype(np.int64),
+        "share": share.ravel()[keep],
+        "slope": slope.ravel()[keep],
+    })
+
+
+class TrendIndex:
+    """Yearly trends of the taxa of any rank from grouped observation counts.
+
+    Args:
+        store: The taxonomy store
+        counts: Grouped counts with TAXONKEY, REGION, YEAR and N columns
+        path: Optional directory to cache trends in, per taxonomy store version, rank and parameters
+    """
+
+    def __init__(self, store: TaxonomyStore, counts: pd.DataFrame, path: Optional[Path] = None):
+        self.store = store
+        self.counts = counts
+        self.path = path
+
+    @classmethod
+    def load(cls, store: TaxonomyStore, connection: Any, fqn: str) -> "TrendIndex":
+        """Open the index for an observation table, refetching the grouped counts only when it changed."""
+        root = cache_dir("trends", re.sub(r"\W", "_", fqn.lower()))
+        path = root / table_version(connection, fqn)
+        counts_path = path / "counts.parquet"
+        if not counts_path.exists():
+            drop_stale_versions(root, path.name)
+            path.mkdir(parents=True, exist_ok=True)
+            connection.sql(yearly_counts_sql(fqn)).to_pandas().to_parquet(counts_path)
+        # Trends roll counts up store subtrees, drop those of other (rebuilt) stores
+        drop_stale_versions(path / "trends", store.version)
+        return cls(store, pd.read_parquet(counts_path), path)
+
+    def by_rank(self, rank: str, window: int = 5, by_region: bool = False, min_years: int = 3) -> pd.DataFrame:
+        """Trends of every observed taxon of a rank, see with_trends."""
+        cached = None
+        if self.path is not None:
+            split = "region" if by_region else "all"
+            cached = self.path / "trends" / self.store.version / rank / f"{split}-w{window}-m{min_years}.parquet"
+            if cached.exists():
+                return pd.read_parquet(cached)
+        df = with_trends(rank_counts(self.store, self.counts, rank, by_region), window, min_years)
+        if cached is not None:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(cached)
+        return df
@@ -1,15 +1,28 @@
-from typing import Protocol
+import hashlib
+import json
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Protocol, Set, Tuple
 
 import relationalai.semantics as rai
+from relationalai.semantics.internal.internal import root_tracking
+from relationalai.semantics.metamodel import ir
+from relationalai.semantics.metamodel.visitor import collect_by_type
 from relationalai.semantics.snowflake import Table
 
 from kg.model.core.calendar import define_calendar
 from kg.model.core.geography import define_geography
 from kg.model.core.soleq import define_solstice_equinox
 from kg.model.core.taxon import define_taxon
-from kg.model.core.observation import define_observation
+from kg.model.core.observation import define_observation, bind_observation, OBSERVATION_COLUMNS
+from kg.model.core.synonymy import define_synonymy
+from kg.model.core.duplicates import define_duplicates
+from kg.model.core.outliers import define_outliers
 from kg.model.derived.taxonomy import define_taxonomy
-from kg.model.derived.observation import define_derived_observation
+from kg.model.derived.observation import define_derived_observation, define_observation_season
+from kg.model.derived.rollup import define_rollup
+from kg.model.derived.lineage import define_lineage
+from kg.model.derived.classification import define_observation_classification
 
 
 # Protocol definitions for the attributes dynamically assigned to the model
@@ -28,6 +41,12 @@ class Taxon(Protocol):
     class_: rai.Relationship
     phylum: rai.Relationship
     kingdom: rai.Relationship
+    rolls_up_to: rai.Relationship
+    observation_count: rai.Relationship
+    species_count: rai.Relationship
+    depth: rai.Relationship
+    lineage: rai.Relationship
+    accepted: rai.Relationship
 
 
 class Observation(Protocol):
@@ -47,12 +66,32 @@ class Observation(Protocol):
     h3_cell_10: rai.Relationship
     classification: rai.Relationship
     hemisphere: rai.Relationship
+    accepted_taxon: rai.Relationship
+    is_outlier: rai.Relationship
+    is_duplicate: rai.Relationship
+    season: rai.Relationship
+    species: rai.Relationship
+    genus: rai.Relationship
+    family: rai.Relationship
+    order: rai.Relationship
+    class_: rai.Relationship
 
 
 class Hemisphere(Protocol):
     id: rai.Relationship
 
 
+class Season(Protocol):
+    id: rai.Relationship
+
+
+class Year(Protocol):
+    march_equinox: rai.Relationship
+    june_solstice: rai.Relationship
+    september_equinox: rai.Relationship
+    december_solstice: rai.Relationship
+
+
 class Latitude(Protocol):
     hemisphere: rai.Relationship
 
@@ -120,7 +159,7 @@ class ARQModel(Protocol):
     ObservationId: rai.Concept
     EventDateTime: rai.Concept
     DayOfYear: rai.Concept
-    Year: rai.Concept
+    Year: Year
     BasisOfRecord: rai.Concept
     CountryCode: rai.Concept
     StateProvince: rai.Concept
@@ -134,6 +173,12 @@ class ARQModel(Protocol):
     HemisphereEast: Hemisphere
     HemisphereWest: Hemisphere
 
+    # Season instances
+    SeasonSpring: Season
+    SeasonSummer: Season
+    SeasonFall: Season
+    SeasonWinter: Season
+
     # Entity concepts
     Taxon: Taxon
     Observation: Observation
@@ -141,6 +186,7 @@ class ARQModel(Protocol):
     CalendarEvent: CalendarEvent
     Solstice: Solstice
     Equinox: Equinox
+    Season: Season
 
     # Taxonomic hierarchy concepts
     Species: Species
@@ -152,31 +198,360 @@ class ARQModel(Protocol):
     Kingdom: Kingdom
 
 
-def define_arq(m: rai.Model, db: str = "TEAM_ARQ", schema: str = "PUBLIC") -> ARQModel:
-    """Define the ARQ knowledge graph model.
+# define_* modules in definition order, with the modules each one builds on.
+# define_arq installs a module only after everything it depends on.
+MODULE_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "calendar": (),
+    "geography": (),
+    "taxon": (),
+    "observation": ("calendar", "geography", "taxon"),
+    "soleq": ("calendar", "geography"),
+    "taxonomy": ("taxon",),
+    "derived_observation": ("observation", "geography"),
+    "season": ("derived_observation", "soleq"),
+    "rollup": ("observation", "taxon"),
+    "lineage": ("taxon",),
+    "synonymy": ("observation", "taxon"),
+    "outliers": ("observation", "taxon"),
+    "duplicates": ("observation",),
+    "classification": ("observation", "taxonomy"),
+}
+
+# Modules bound to tables written by a kg.apps tool rather than by dbt build;
+# defined only when a query or modules= asks for them, so the default model
+# compiles on a fresh warehouse
+OPTIONAL_MODULES: Tuple[str, ...] = ("outliers", "duplicates")
+
+# Observation properties read by derived modules, kept bound when bindings are pruned
+DERIVED_OBSERVATION_PROPERTIES: Dict[str, Tuple[str, ...]] = {
+    "derived_observation": ("latitude", "longitude"),
+    "season": ("year", "event_datetime"),
+    "rollup": ("classification",),
+    "synonymy": ("classification",),
+    "outliers": ("classification", "h3_cell_6"),
+    "classification": ("classification",),
+}
+
+# Modules and observation properties already defined on each model, so
+# define_arq can be called incrementally
+_defined_modules: "weakref.WeakKeyDictionary[rai.Model, Set[str]]" = weakref.WeakKeyDictionary()
+_bound_properties: "weakref.WeakKeyDictionary[rai.Model, Set[str]]" = weakref.WeakKeyDictionary()
+# The observation sources of each model, reused when later queries bind more properties
+_observation_sources: "weakref.WeakKeyDictionary[rai.Model, _ObservationSources]" = weakref.WeakKeyDictionary()
+# Query plans (and seconds spent planning) per query function and (db, schema),
+# so naming and defining a model plan the query once
+_query_plans: "weakref.WeakKeyDictionary[Callable, Dict[Tuple[str, str], Tuple[QueryPlan, float]]]" = weakref.WeakKeyDictionary()
+# Seconds spent planning and in each module's define_* function, for startup profiles
+_define_seconds: "weakref.WeakKeyDictionary[rai.Model, Dict[str, float]]" = weakref.WeakKeyDictionary()
+
+
+def define_seconds(m: rai.Model) -> Dict[str, float]:
+    """Return the seconds define_arq spent per module (and planning) on a model."""
+    return dict(_define_seconds.get(m, {}))
+
+
+class _ObservationSources:
+    """The observation tier of a model, and its projection views when bindings are pruned."""
+
+    def __init__(self, db: str, schema: str, table: str, projected: bool):
+        self.fqn = f"{db}.{schema}.{table}"
+        self.projected = projected
+        self.tables: Dict[str, Table] = {}
+
+    def _get(self, fqn: str) -> Table:
+        if fqn not in self.tables:
+            self.tables[fqn] = Table(fqn)
+        return self.tables[fqn]
+
+    @property
+    def source(self) -> Optional[Table]:
+        """The tier table, or None when properties are bound from its projection views."""
+        return None if self.projected else self._get(self.fqn)
+
+    def view(self, projection: str) -> Table:
+        return self._get(f"{self.fqn}_{projection}")
+
+    @property
+    def projection(self) -> Optional[Callable[[str], Table]]:
+        return self.view if self.projected else None
+
+
+def observation_sources(m: rai.Model) -> List[str]:
+    """Return the tables and views a model binds observations from."""
+    sources = _observation_sources.get(m)
+    return sorted(sources.tables) if sources is not None else []
+
+
+def _module_definitions(
+    db: str,
+    schema: str,
+    observation_table: str = "OBSERVATION_10k",
+    observation_properties: Optional[Set[str]] = None,
+    soleq_years: Optional[Tuple[int, int]] = None,
+    materialized_classification: bool = False,
+    observation_sources: Optional[_ObservationSources] = None,
+) -> Dict[str, Callable[[rai.Model], None]]:
+    # Define source table binding helper
+    source = lambda t: Table(f"{db}.{schema}.{t}")
+    if observation_sources is None:
+        observation_sources = _ObservationSources(db, schema, observation_table, projected=False)
+
+    def soleq_source():
+        if soleq_years is None:
+            return source("SOLEQ")
+        from kg.local.soleq import solstice_equinox
+        return rai.data(solstice_equinox(*soleq_years))
+
+    def classification_source():
+        return observation_sources.view("CLASSIFICATION") if materialized_classification else None
+
+    return {
+        # Foundational concepts (used by other modules)
+        "calendar": define_calendar,
+        "geography": define_geography,
+        # Core model and bindings
+        "taxon": lambda m: define_taxon(m, source("TAXON")),
+        "observation": lambda m: define_observation(
+            m, observation_sources.source, observation_properties, observation_sources.projection
+        ),
+        "soleq": lambda m: define_solstice_equinox(m, soleq_source()),
+        "synonymy": lambda m: define_synonymy(m, source("TAXON_ACCEPTED")),
+        "outliers": lambda m: define_outliers(m, source("OBSERVATION_OUTLIER_CELLS")),
+        "duplicates": lambda m: define_duplicates(m, source("OBSERVATION_DUPLICATES")),
+        # Derived concepts
+        "taxonomy": define_taxonomy,
+        "derived_observation": define_derived_observation,
+        "season": define_observation_season,
+        "rollup": define_rollup,
+        "lineage": define_lineage,
+        "classification": lambda m: define_observation_classification(m, classification_source()),
+    }
+
+
+def _with_dependencies(modules: Iterable[str]) -> Set[str]:
+    resolved = set()
+    pending = list(modules)
+    while pending:
+        name = pending.pop()
+        if name not in MODULE_DEPENDENCIES:
+            raise ValueError(f"Unknown model module {name!r}, expected one of {list(MODULE_DEPENDENCIES)}")
+        if name not in resolved:
+            resolved.add(name)
+            pending.extend(MODULE_DEPENDENCIES[name])
+    return resolved
+
+
+class _AttributeRecorder:
+    """Stands in for an ARQModel and records which model attributes are used."""
+
+    def __init__(self, m: rai.Model):
+        self._m = m
+        self._used: Set[str] = set()
+
+    def __getattr__(self, name: str) -> Any:
+        self._used.add(name)
+        return getattr(self._m, name)
+
+
+class QueryPlan(NamedTuple):
+    # define_* modules the query touches directly (without their dependencies)
+    modules: Set[str]
+    # "Concept.relationship" names the compiled query looks up
+    relationships: Set[str]
+
+
+def plan_query(
+    query: Callable[[ARQModel], Any],
+    db: str = "TEAM_ARQ",
+    schema: str = "PUBLIC",
+) -> QueryPlan:
+    """Find the define_* modules and relationships a query depends on.
+
+    The query is built against a throwaway probe model (no rules are tracked
+    and nothing is sent to the engine). Both the model attributes it touches
+    and the concepts/relationships its compiled form looks up are traced back
+    to the module that introduced them.
 
     Args:
-        m: The RAI model to define concepts on
+        query: A function building a query fragment from an ARQModel
         db: The database name containing source tables
         schema: The schema name containing source tables
 
     Returns:
-        The typed ARQ model
+        The modules and relationships the query needs
     """
-    # Define source table binding helper
-    source = lambda t: Table(f"{db}.{schema}.{t}")
+    return _timed_plan(query, db, schema)[0]
+
+
+def _timed_plan(query: Callable[[ARQModel], Any], db: str, schema: str) -> Tuple[QueryPlan, float]:
+    try:
+        plans = _query_plans.setdefault(query, {})
+    except TypeError:
+        plans = {}  # not weakly referenceable, plan every time
+    if (db, schema) not in plans:
+        start = time.perf_counter()
+        plan = _plan_query(query, db, schema)
+        plans[db, schema] = (plan, time.perf_counter() - start)
+    return plans[db, schema]
+
+
+def _plan_query(query: Callable[[ARQModel], Any], db: str, schema: str) -> QueryPlan:
+    with root_tracking(enabled=False):
+        probe = rai.Model("arq_probe", dry_run=True)
+        providers: Dict[Any, str] = {}
+        for name, define in _module_definitions(db, schema).items():
+            attrs = set(vars(probe))
+            concepts = {id(c) for cs in probe.concepts.values() for c in cs}
+            relationships = {id(r) for r in probe.relationships}
+            define(probe)
+            for attr in set(vars(probe)) - attrs:
+                providers[attr] = name
+            for c in (c for cs in probe.concepts.values() for c in cs):
+                if id(c) not in concepts:
+                    providers[id(c)] = name
+            for r in probe.relationships:
+                if id(r) not in relationships:
+                    providers[id(r)] = name
+
+        recorder = _AttributeRecorder(probe)
+        task = probe._compiler.fragment(query(recorder))
+
+    # Map the compiled relations back to the concepts/relationships they came from
+    sources: Dict[int, list] = {}
+    for thing, relation in probe._compiler.relations.items():
+        sources.setdefault(id(relation), []).append(thing)
+
+    modules = {providers[attr] for attr in recorder._used if attr in providers}
+    relationships = set()
+    for lookup in collect_by_type(ir.Lookup, task):
+        for thing in sources.get(id(lookup.relation), []):
+            if id(thing) in providers:
+                modules.add(providers[id(thing)])
+                if isinstance(thing, rai.Relationship):
+                    relationships.add(str(thing))
+    return QueryPlan(modules, relationships)
+
+
+def _resolve(
+    query: Optional[Callable[[ARQModel], Any]],
+    modules: Optional[Iterable[str]],
+    db: str,
+    schema: str,
+) -> Tuple[Set[str], Set[str], float]:
+    """The modules (with their dependencies) and observation properties define_arq
+    defines, and the seconds spent planning the query."""
+    properties = set(OBSERVATION_COLUMNS)
+    seconds = 0.0
+    if query is not None:
+        plan, seconds = _timed_plan(query, db, schema)
+        modules = set(modules or ()) | plan.modules
+        properties = {r.split(".", 1)[1] for r in plan.relationships if r.startswith("Observation.")}
+    if modules is None:
+        modules = [name for name in MODULE_DEPENDENCIES if name not in OPTIONAL_MODULES]
+    wanted = _with_dependencies(modules)
+    for name in wanted:
+        properties.update(DERIVED_OBSERVATION_PROPERTIES.get(name, ()))
+    return wanted, properties & set(OBSERVATION_COLUMNS), seconds
+
+
+def model_variant(
+    query: Optional[Callable[[ARQModel], Any]] = None,
+    modules: Optional[Iterable[str]] = None,
+    db: str = "TEAM_ARQ",
+    schema: str = "PUBLIC",
+    observation_table: str = "OBSERVATION_10k",
+) -> str:
+    """Key of the program define_arq builds on a fresh model for these arguments.
+
+    Models installed under one name must hold the same program, or each run
+    replaces the last one's; naming a model by its variant keeps different
+    module subsets (and tiers) apart while identical ones share the model.
+
+    Returns:
+        '' for the default full model on the default tier, else a short hash
+        of the modules, bound observation properties and source tables
+    """
+    wanted, properties, _ = _resolve(query, modules, db, schema)
+    full, _, _ = _resolve(None, None, db, schema)
+    sources = (db, schema, observation_table)
+    if wanted == full and properties == set(OBSERVATION_COLUMNS) and sources == ("TEAM_ARQ", "PUBLIC", "OBSERVATION_10k"):
+        return ""
+    key = json.dumps([sorted(wanted), sorted(properties), db, schema, observation_table])
+    return hashlib.sha256(key.encode()).hexdigest()[:8]
+
+
+def define_arq(
+    m: rai.Model,
+    db: str = "TEAM_ARQ",
+    schema: str = "PUBLIC",
+    query: Optional[Callable[[ARQModel], Any]] = None,
+    modules: Optional[Iterable[str]] = None,
+    observation_table: str = "OBSERVATION_10k",
+    soleq_years: Optional[Tuple[int, int]] = None,
+    materialized_classification: bool = False,
+    project_observations: bool = True,
+) -> ARQModel:
+    """Define the ARQ knowledge graph model.
 
-    # Define foundational concepts first (used by other modules)
-    define_calendar(m)
-    define_geography(m)
+    By default every module but OPTIONAL_MODULES is defined. Given a query
+    (or explicit module names), only the modules reachable from it in
+    MODULE_DEPENDENCIES are defined, which keeps the compiled program and the
+    engine work small.
+    Given a query, only the observation properties it (or the derived
+    modules it needs) reads are bound, so the program has no rules for the
+    others. relationalai streams a bound table with all its columns, so
+    these are bound from the narrow projection views over the tier (see
+    OBSERVATION_PROJECTIONS), which leaves the columns of unbound properties
+    in the warehouse.
+    Calling again on the same model only adds what is still missing.
 
-    # Define core model and bindings
-    define_taxon(m, source("TAXON"))
-    define_observation(m, source("OBSERVATION_10k"))
-    define_solstice_equinox(m, source("ASTROPIXELS_SOLEQ"))
+    Args:
+        m: The RAI model to define concepts on
+        db: The database name containing source tables
+        schema: The schema name containing source tables
+        query: Optional query function; only the modules it depends on are defined
+        modules: Optional module names to define, see MODULE_DEPENDENCIES
+        observation_table: The observation tier to bind, eg OBSERVATION_1m
+        soleq_years: Optional inclusive year range to compute solstices and
+            equinoxes for locally (kg/local/soleq.py) instead of reading SOLEQ
+        materialized_classification: Bind Observation.species ... class_ from the
+            tier's <tier>_CLASSIFICATION view (dbt) instead of deriving them
+        project_observations: Bind pruned observation properties from the
+            projection views (dbt) rather than the whole tier
 
-    # Define derived concepts
-    define_taxonomy(m)
-    define_derived_observation(m)
+    Returns:
+        The typed ARQ model
+    """
+    timings = _define_seconds.setdefault(m, {})
+    wanted, properties, plan_seconds = _resolve(query, modules, db, schema)
+    if query is not None:
+        timings["plan_query"] = timings.get("plan_query", 0.0) + plan_seconds
+
+    defined = _defined_modules.setdefault(m, set())
+    bound = _bound_properties.setdefault(m, set())
+    if "observation" in defined and properties - bound:
+        # The model was defined earlier with pruned bindings; bind what this query adds
+        missing = properties - bound
+        start = time.perf_counter()
+        sources = _observation_sources[m]
+        bind_observation(m, sources.source, missing, sources.projection)
+        timings["observation"] = timings.get("observation", 0.0) + time.perf_counter() - start
+        bound.update(missing)
+
+    sources = _observation_sources.get(m)
+    if sources is None:
+        projected = project_observations and properties != set(OBSERVATION_COLUMNS)
+        sources = _observation_sources[m] = _ObservationSources(db, schema, observation_table, projected)
+    definitions = _module_definitions(
+        db, schema, observation_table, properties, soleq_years, materialized_classification, sources
+    )
+    for name, define in definitions.items():
+        if name in wanted and name not in defined:
+            start = time.perf_counter()
+            define(m)
+            timings[name] = time.perf_counter() - start
+            defined.add(name)
+            if name == "observation":
+                bound.update(properties)
 
     return m
@@ -0,0 +1,22 @@
+import relationalai.semantics as rai
+from relationalai.semantics.snowflake import Table
+
+# Sourced from OBSERVATION_DUPLICATES, written by kg/local/dedup.py
+# (`uv run -m kg.apps.dedup_observations`)
+
+
+def define_duplicates(m: rai.Model, source: Table):
+    """Define which observations repeat an earlier record of the same sighting.
+
+    The dedup pass clusters records of the same taxon, H3 cell (resolution 9)
+    and day within distance and time tolerances, and keeps the lowest GBIFID
+    of each cluster as its representative; every other member is a duplicate.
+    Queries count events with rai.not_(Observation.is_duplicate()).
+    """
+    m.Observation.is_duplicate = m.Relationship("{Observation} duplicates another record of the same sighting")
+    rai.define(
+        m.Observation.is_duplicate()
+    ).where(
+        m.Observation.id == source.GBIFID,
+        source.GBIFID != source.CLUSTERID,
+    )
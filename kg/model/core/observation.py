@@ -1,15 +1,74 @@
+from typing import Callable, Dict, Iterable, List, Optional
+
 import relationalai.semantics as rai
 from relationalai.semantics.snowflake import Table
 
 # Sourced from dbt/models/staging/observation.sql
 
+# Source column bound to each Observation property (the id is always bound from GBIFID)
+OBSERVATION_COLUMNS = {
+    "event_datetime": "EVENTDATE",
+    "day_of_year": "DAYOFYEAR",
+    "year": "YEAR",
+    "basis_of_record": "BASISOFRECORD",
+    "country_code": "COUNTRYCODE",
+    "state_province": "STATEPROVINCE",
+    "latitude": "LAT",
+    "longitude": "LON",
+    "h3_cell_6": "H3_CELL_6",
+    "h3_cell_7": "H3_CELL_7",
+    "h3_cell_8": "H3_CELL_8",
+    "h3_cell_9": "H3_CELL_9",
+    "h3_cell_10": "H3_CELL_10",
+    "classification": "TAXONKEY",
+}
+
+
+# Narrow views over each observation tier, <TIER>_<PROJECTION> with GBIFID and
+# the columns of these properties, created by dbt/macros/observation_projections.sql
+OBSERVATION_PROJECTIONS = {
+    "TAXON": ("classification",),
+    "TIME": ("event_datetime", "day_of_year", "year"),
+    "RECORD": ("basis_of_record", "country_code", "state_province"),
+    "LOCATION": ("latitude", "longitude", "h3_cell_6", "h3_cell_7", "h3_cell_8", "h3_cell_9", "h3_cell_10"),
+}
+
+
+def observation_projections(properties: Iterable[str]) -> Dict[str, List[str]]:
+    """The projections holding the given properties, with the properties bound from each."""
+    properties = set(properties)
+    found = {}
+    for name, covered in OBSERVATION_PROJECTIONS.items():
+        if properties & set(covered):
+            found[name] = [p for p in covered if p in properties]
+    return found
+
+
+def observation_columns(properties: Optional[Iterable[str]] = None) -> Optional[List[str]]:
+    """Source columns needed to bind the given properties (None: all columns)."""
+    if properties is None:
+        return None
+    return ["GBIFID"] + [OBSERVATION_COLUMNS[p] for p in OBSERVATION_COLUMNS if p in set(properties)]
 
-def define_observation(m: rai.Model, source: Table):
+
+def define_observation(
+    m: rai.Model,
+    source: Optional[Table],
+    properties: Optional[Iterable[str]] = None,
+    projection: Optional[Callable[[str], Table]] = None,
+):
     """Define the Observation concept representing GBIF plant observation records.
 
     An Observation represents a documented occurrence of a plant species at a specific
     location and time. It includes taxonomic identification, spatial coordinates,
     temporal information, and observation metadata.
+
+    All properties are declared, but only the given properties (default: all) are
+    bound, so unused properties add no rules. The engine streams a bound table
+    with all its columns, so given a projection (the view of an
+    OBSERVATION_PROJECTIONS name over the tier), the properties are bound from
+    the narrow views holding them instead of the source, and columns no query
+    reads are never loaded.
     """
 
     # Define ID and main concept
@@ -43,21 +102,41 @@ def define_observation(m: rai.Model, source: Table):
     m.Observation.classification = m.Property("{Observation} is classified as {Taxon}")
 
     # Bind source data to concepts
-    rai.define(m.Observation.new(id=source.GBIFID))
+    properties = OBSERVATION_COLUMNS if properties is None else properties
+    if projection is None:
+        rai.define(m.Observation.new(id=source.GBIFID))
+        bind_observation(m, source, properties)
+        return
+    if not observation_projections(properties):
+        # Observations are still identified, from the narrowest view
+        rai.define(m.Observation.new(id=projection("TAXON").GBIFID))
+    bind_observation(m, source, properties, projection)
+
+
+def bind_observation(
+    m: rai.Model,
+    source: Optional[Table],
+    properties: Iterable[str],
+    projection: Optional[Callable[[str], Table]] = None,
+):
+    """Bind the given Observation properties to their source columns.
+
+    Given a projection, each property is bound from the view holding it, which
+    also identifies the observations, see define_observation.
+    """
+    properties = set(properties)
+    if projection is not None:
+        for name, covered in observation_projections(properties).items():
+            view = projection(name)
+            rai.define(m.Observation.new(id=view.GBIFID))
+            bind_observation(m, view, covered)
+        return
+
     obs = rai.where(m.Observation.id == source.GBIFID)
-    obs.define(m.Observation.event_datetime(source.EVENTDATE))
-    obs.define(m.Observation.day_of_year(source.DAYOFYEAR))
-    obs.define(m.Observation.year(source.YEAR))
-    obs.define(m.Observation.basis_of_record(source.BASISOFRECORD))
-    obs.define(m.Observation.country_code(source.COUNTRYCODE))
-    obs.define(m.Observation.state_province(source.STATEPROVINCE))
-    obs.define(m.Observation.latitude(source.LAT))
-    obs.define(m.Observation.longitude(source.LON))
-    obs.define(m.Observation.h3_cell_6(source.H3_CELL_6))
-    obs.define(m.Observation.h3_cell_7(source.H3_CELL_7))
-    obs.define(m.Observation.h3_cell_8(source.H3_CELL_8))
-    obs.define(m.Observation.h3_cell_9(source.H3_CELL_9))
-    obs.define(m.Observation.h3_cell_10(source.H3_CELL_10))
-    obs.define(
-        m.Observation.classification(m.Taxon.filter_by(id=source.TAXONKEY))
-    )
+    for name, column in OBSERVATION_COLUMNS.items():
+        if name in properties and name != "classification":
+            obs.define(getattr(m.Observation, name)(getattr(source, column)))
+    if "classification" in properties:
+        obs.define(
+            m.Observation.classification(m.Taxon.filter_by(id=source.TAXONKEY))
+        )
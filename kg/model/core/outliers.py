@@ -0,0 +1,24 @@
+import relationalai.semantics as rai
+from relationalai.semantics.snowflake import Table
+
+# Sourced from OBSERVATION_OUTLIER_CELLS, written by kg/local/outliers.py
+# (`uv run -m kg.apps.flag_outliers`)
+
+
+def define_outliers(m: rai.Model, source: Table):
+    """Define which observations have implausible coordinates for their species.
+
+    The outlier pass models each species' range from its observations' H3
+    cells and flags (classification, H3 cell at resolution 6) pairs far from
+    it or isolated; observations with a flagged pair are outliers. Queries
+    filter them out with rai.not_(Observation.is_outlier()).
+    """
+    m.Observation.is_outlier = m.Relationship("{Observation} has outlying coordinates")
+    t = m.Taxon.ref()
+    rai.define(
+        m.Observation.is_outlier()
+    ).where(
+        m.Observation.classification(t),
+        t.id == source.TAXONKEY,
+        m.Observation.h3_cell_6 == source.H3_CELL_6,
+    )
@@ -7,7 +7,8 @@ from relationalai.semantics.snowflake import Table
 def define_solstice_equinox(m: rai.Model, source: Table):
     """Define solstice and equinox concepts for astronomical calendar events.
 
-    Source: https://www.astropixels.com/ephemeris/soleq2001.html
+    Source: https://www.astropixels.com/ephemeris/soleq2001.html for 2001-2100,
+    computed with the Meeus algorithms (kg/local/soleq.py) for other years.
 
     Earth's rotational axis is tilted about 23.5° from the perpendicular with
     respect to Earth's orbit around the Sun. As a result, the amount that Earth's
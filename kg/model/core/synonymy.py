@@ -0,0 +1,32 @@
+import relationalai.semantics as rai
+from relationalai.semantics.snowflake import Table
+
+# Sourced from dbt/models/staging/taxon_accepted.sql
+
+
+def define_synonymy(m: rai.Model, source: Table):
+    """Define the accepted taxon of every taxon and of every observation.
+
+    GBIF taxon keys often point at synonyms, which usually have no parent
+    chain to a genus, so observations classified as synonyms drop out of rank
+    queries. The accepted name map is precomputed in dbt (following synonym
+    chains), so Observation.accepted_taxon resolves in one hop.
+    """
+    m.Taxon.accepted = m.Property("{Taxon} is accepted as {Taxon}")
+    t = m.Taxon.ref()
+    a = m.Taxon.ref()
+    rai.define(
+        t.accepted(a)
+    ).where(
+        t.id == source.TAXONID,
+        a.id == source.ACCEPTEDTAXONID,
+    )
+
+    # Observations resolved to the accepted taxon of their classification
+    m.Observation.accepted_taxon = m.Property("{Observation} is classified under accepted {Taxon}")
+    rai.define(
+        m.Observation.accepted_taxon(a)
+    ).where(
+        m.Observation.classification(t),
+        t.accepted(a),
+    )
@@ -0,0 +1,64 @@
+from typing import Optional
+
+import relationalai.semantics as rai
+from relationalai.semantics.snowflake import Table
+
+# Derived ranks of each observation's classification, optionally read from
+# the tier's classification view (dbt/macros/observation_classification.sql)
+
+
+def define_observation_classification(m: rai.Model, source: Optional[Table] = None):
+    """Define the species, genus, family, order and class of every observation.
+
+    Queries at a rank otherwise repeat the same chain, eg
+    Observation.classification(Taxon), Taxon.genus(Genus); naming it once as
+    Observation.genus lets the engine derive and maintain it once for every
+    query that uses it. Observation.species is the classification when it is
+    a species; the other ranks follow Taxon.genus ... Taxon.class_, so
+    observations classified at or below a rank (a species, or the genus
+    itself) resolve to it.
+
+    Given the tier's classification view, the ranks are bound from its
+    precomputed ids instead, which skips the parent chain walk altogether.
+    """
+    m.Observation.species = m.Property("{Observation} is classified as {Species}")
+    m.Observation.genus = m.Property("{Observation} is classified in {Genus}")
+    m.Observation.family = m.Property("{Observation} is classified in {Family}")
+    m.Observation.order = m.Property("{Observation} is classified in {Order}")
+    m.Observation.class_ = m.Property("{Observation} is classified in {Class}")
+
+    s = m.Species.ref()
+    g = m.Genus.ref()
+    f = m.Family.ref()
+    o = m.Order.ref()
+    c = m.Class.ref()
+
+    if source is not None:
+        for name, rank, column in (
+            ("species", s, source.SPECIESID),
+            ("genus", g, source.GENUSID),
+            ("family", f, source.FAMILYID),
+            ("order", o, source.ORDERID),
+            ("class_", c, source.CLASSID),
+        ):
+            rai.define(
+                getattr(m.Observation, name)(rank)
+            ).where(
+                m.Observation.id == source.GBIFID,
+                rank.id == column,
+            )
+        return
+
+    t = m.Taxon.ref()
+    rai.define(
+        m.Observation.species(s)
+    ).where(
+        m.Observation.classification(s),
+    )
+    for name, rank in (("genus", g), ("family", f), ("order", o), ("class_", c)):
+        rai.define(
+            getattr(m.Observation, name)(rank)
+        ).where(
+            m.Observation.classification(t),
+            getattr(t, name)(rank),
+        )
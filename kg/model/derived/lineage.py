@@ -0,0 +1,52 @@
+from typing import Any, List, Tuple
+
+import relationalai.semantics as rai
+
+# Full ancestor lineage and depth of every taxon, for common ancestor queries
+
+
+def define_lineage(m: rai.Model):
+    """Define the depth of each taxon and its ancestor-or-self lineage.
+
+    Unlike the rank relations in taxonomy.py, lineage follows Taxon.parent to
+    any depth and through any rank, so any two taxa can be compared.
+    """
+    t = m.Taxon.ref()
+    p = m.Taxon.ref()
+    a = m.Taxon.ref()
+    depth = rai.Integer.ref()
+
+    # Depth below the root of each taxon's tree
+    m.Taxon.depth = m.Property("{Taxon} is at depth {depth:Integer}")
+    rai.define(t.depth(0)).where(rai.not_(t.parent(p)))
+    rai.define(t.depth(depth + 1)).where(t.parent(p), p.depth(depth))
+
+    # Ancestor-or-self pairs
+    m.Taxon.lineage = m.Relationship("{Taxon} descends from or is {Taxon}")
+    rai.define(t.lineage(t))
+    rai.define(t.lineage(a)).where(t.parent(p), p.lineage(a))
+
+
+def lowest_common_ancestor(m: Any, a: Any, b: Any) -> Tuple[Any, List[Any], Any]:
+    """Query helper binding the lowest common ancestor of two taxon references.
+
+    Args:
+        m: The ARQ model (with the lineage module defined)
+        a: A Taxon reference
+        b: Another Taxon reference
+
+    Returns:
+        The ancestor reference, the conditions binding it for use in
+        `rai.where`, and the taxonomic distance between a and b (edges via
+        the ancestor)
+    """
+    ancestor = m.Taxon.ref()
+    common = m.Taxon.ref()
+    ancestor_depth = rai.max(common.depth).per(a, b).where(a.lineage(common), b.lineage(common))
+    conditions = [
+        a.lineage(ancestor),
+        b.lineage(ancestor),
+        ancestor.depth == ancestor_depth,
+    ]
+    distance = a.depth + b.depth - 2 * ancestor_depth
+    return ancestor, conditions, distance
@@ -17,3 +17,55 @@ def define_derived_observation(m: rai.Model):
     rai.define(
         m.Observation.hemisphere(m.Observation.longitude.hemisphere)
     )
+
+
+# Seasons of each hemisphere between the year's boundaries, in order:
+# before the March equinox, then after each equinox / solstice
+SEASON_ORDER = {
+    "north": ("winter", "spring", "summer", "fall", "winter"),
+    "south": ("summer", "fall", "winter", "spring", "summer"),
+}
+
+
+def define_observation_season(m: rai.Model):
+    """Define the season of each observation in its own hemisphere.
+
+    Seasons run between the same-year equinoxes and solstices, eg spring in the
+    north from the March equinox to the June solstice, and winter both before
+    the March equinox and after the December solstice.
+
+    The four boundaries are first laid out per year, in order, so each
+    observation is matched by key against its own year's boundaries once,
+    instead of comparing it with every solstice and equinox.
+    """
+    m.Season = m.Concept("Season", identify_by={"id": rai.String})
+    seasons = {name: m.Season.new(id=name) for name in ("spring", "summer", "fall", "winter")}
+    for name, season in seasons.items():
+        rai.define(season)
+        setattr(m, f"Season{name.capitalize()}", season)
+
+    # Boundaries per year, named by month (the seasons they start depend on the hemisphere)
+    m.Year.march_equinox = m.Property("{Year} has its March equinox at {march_equinox:DateTime}")
+    m.Year.june_solstice = m.Property("{Year} has its June solstice at {june_solstice:DateTime}")
+    m.Year.september_equinox = m.Property("{Year} has its September equinox at {september_equinox:DateTime}")
+    m.Year.december_solstice = m.Property("{Year} has its December solstice at {december_solstice:DateTime}")
+    rai.define(m.Equinox.year.march_equinox(m.Equinox.datetime)).where(m.Equinox.spring(m.HemisphereNorth))
+    rai.define(m.Solstice.year.june_solstice(m.Solstice.datetime)).where(m.Solstice.summer(m.HemisphereNorth))
+    rai.define(m.Equinox.year.september_equinox(m.Equinox.datetime)).where(m.Equinox.fall(m.HemisphereNorth))
+    rai.define(m.Solstice.year.december_solstice(m.Solstice.datetime)).where(m.Solstice.winter(m.HemisphereNorth))
+
+    m.Observation.season = m.Property("{Observation} occurred in {Season} of its hemisphere")
+    year, at = m.Observation.year, m.Observation.event_datetime
+    boundaries = [year.march_equinox, year.june_solstice, year.september_equinox, year.december_solstice]
+    hemispheres = {"north": m.HemisphereNorth, "south": m.HemisphereSouth}
+    for hemisphere, order in SEASON_ORDER.items():
+        for position, name in enumerate(order):
+            bounds = []
+            if position > 0:
+                bounds.append(boundaries[position - 1] <= at)
+            if position < len(boundaries):
+                bounds.append(at < boundaries[position])
+            rai.define(m.Observation.season(seasons[name])).where(
+                m.Observation.hemisphere(hemispheres[hemisphere]),
+                *bounds,
+            )
@@ -0,0 +1,40 @@
+import relationalai.semantics as rai
+
+# Derived observation rollups over the taxonomy
+
+
+def define_rollup(m: rai.Model):
+    """Define observation and species counts for the subtree of every taxon.
+
+    Observations are counted against the taxon they are classified as and
+    propagated up Taxon.parent, so one relation answers counts at every rank
+    instead of an aggregation per rank over genus ... kingdom. Only taxa on a
+    path from an observed taxon to its root take part.
+    """
+    t = m.Taxon.ref()
+    p = m.Taxon.ref()
+    a = m.Taxon.ref()
+
+    # Ancestor-or-self pairs, walking up from the observed taxa
+    m.Taxon.rolls_up_to = m.Relationship("{Taxon} rolls up to {Taxon}")
+    rai.define(t.rolls_up_to(t)).where(m.Observation.classification(t))
+    rai.define(p.rolls_up_to(p)).where(t.rolls_up_to(t), t.parent(p))
+    rai.define(t.rolls_up_to(a)).where(t.parent(p), p.rolls_up_to(a), t.rolls_up_to(t))
+
+    # Observations classified anywhere in the subtree
+    m.Taxon.observation_count = m.Property("{Taxon} has {observation_count:Integer} observations in its subtree")
+    rai.define(
+        t.observation_count(rai.count(m.Observation).per(t))
+    ).where(
+        m.Observation.classification(a),
+        a.rolls_up_to(t),
+    )
+
+    # Species with at least one observation in their own subtree
+    s = m.Species.ref()
+    m.Taxon.species_count = m.Property("{Taxon} has {species_count:Integer} observed species in its subtree")
+    rai.define(
+        t.species_count(rai.count(s).per(t))
+    ).where(
+        s.rolls_up_to(t),
+    )
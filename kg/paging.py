@@ -0,0 +1,129 @@
+"""
+Paged query results
+
+`to_df()` materializes a whole result at once, which for raw observations on
+the larger tiers does not fit in a laptop's memory. `ResultCursor` runs a
+query fragment one page at a time with keyset pagination: each page is the
+fragment restricted to rows whose key is above the last key seen, ordered by
+the key and limited to the page size,
+
+    fragment.where(key > last).order_by(key).limit(page_size)
+
+so every page is a fresh query that is as cheap as the first (unlike an
+offset, which makes the engine rank and skip all the earlier rows), and a
+cursor can be resumed from any key. The key must be sortable and unique per
+row, eg Observation.id.
+
+While the caller consumes a page the next one is fetched on a background
+thread. Keyset pages depend on the previous page's last key, so one page is
+in flight at a time; the caller should not run other queries on the same
+connection while iterating.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_PAGE_SIZE = 100_000
+
+
+class ResultCursor:
+    """Iterates over the result of a query fragment in pages of DataFrames.
+
+    Args:
+        fragment: The query, which must select the key
+        key: A sortable expression unique per row, eg arq.Observation.id
+        column: The key's column in the result (its alias)
+        page_size: Rows per page
+        after: Resume after this key (default: from the start)
+        prefetch: Fetch the next page in the background while the caller uses the current one
+        compact: Compact each page with kg.results.compact
+    """
+
+    def __init__(
+        self,
+        fragment: Any,
+        key: Any,
+        column: str,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        after: Optional[Any] = None,
+        prefetch: bool = True,
+        compact: bool = False,
+    ):
+        if page_size < 1:
+            raise ValueError(f"page_size must be positive, got {page_size}")
+        self.fragment = fragment
+        self.key = key
+        self.column = column
+        self.page_size = page_size
+        self.after = after
+        self.prefetch = prefetch
+        self.compact = compact
+        self.pages = 0
+        self.rows = 0
+
+    def page_query(self, after: Optional[Any]) -> Any:
+        """The fragment of the page after a key (None: the first page)."""
+        if hasattr(after, "item"):  # numpy scalars from the previous page
+            after = after.item()
+        fragment = self.fragment if after is None else self.fragment.where(self.key > after)
+        return fragment.order_by(self.key).limit(self.page_size)
+
+    def _fetch(self, after: Optional[Any]) -> pd.DataFrame:
+        df = self.page_query(after).to_df()
+        return df.sort_values(self.column, ignore_index=True)
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        return self._pages(self.compact)
+
+    def _pages(self, compact: bool) -> Iterator[pd.DataFrame]:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arq-page") if self.prefetch else None
+        try:
+            pending: Optional[Future] = executor.submit(self._fetch, self.after) if executor else None
+            df = None if executor else self._fetch(self.after)
+            while True:
+                if executor:
+                    df = pending.result()
+                if not len(df):
+                    return
+                self.after = df[self.column].iloc[-1]
+                full = len(df) >= self.page_size
+                # start the next page before handing this one over
+                if executor and full:
+                    pending = executor.submit(self._fetch, self.after)
+                self.pages += 1
+                self.rows += len(df)
+                if compact:
+                    from kg.results import compact as compact_df
+
+                    df = compact_df(df)
+                yield df
+                if not full:
+                    return
+                if not executor:
+                    df = self._fetch(self.after)
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def write_parquet(self, path: Path) -> int:
+        """Stream every page into one Parquet file, with the first page's schema. Returns the rows written.
+
+        Pages are written as fetched (Parquet dictionary-encodes repeated
+        strings itself, and per-page compacting would change types between pages).
+        """
+        writer = None
+        try:
+            for df in self._pages(compact=False):
+                table = pa.Table.from_pandas(df, schema=writer.schema if writer else None, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return self.rows
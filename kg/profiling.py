@@ -0,0 +1,100 @@
+"""
+Startup profiling helpers
+
+Importing relationalai alone takes a couple of seconds, so the entry points
+only import it once they know they will run a query (`--help`, argument
+validation and listing queries never do). `lazy_import` keeps module level
+`rai.` references working while deferring the import to first use.
+
+`ImportProfiler` records the cost of every module imported while it is active,
+which together with the per-module define timings kept by define_arq (see
+`define_seconds`) makes up the startup profile printed by `--profile-startup`.
+"""
+
+import builtins
+import importlib
+import sys
+import time
+import types
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+
+class _LazyModule(types.ModuleType):
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Return the named module if already imported, else a proxy importing it on first use."""
+    return sys.modules.get(name) or _LazyModule(name)
+
+
+class ImportProfiler:
+    """Times the modules imported between start() and stop().
+
+    Each module gets its cumulative time (including the modules it imports in
+    turn) and its self time, like `python -X importtime`.
+    """
+
+    def __init__(self):
+        self.cumulative: Dict[str, float] = {}
+        self.self_seconds: Dict[str, float] = {}
+        self._stack: List[Tuple[str, float]] = []
+        self._import = None
+
+    def start(self) -> "ImportProfiler":
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import
+        return self
+
+    def stop(self):
+        if self._import is not None:
+            builtins.__import__ = self._import
+            self._import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            # Relative or already imported, let the import system resolve it untimed
+            return self._import(name, globals, locals, fromlist, level)
+
+        start = time.perf_counter()
+        self._stack.append((name, 0.0))
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            _, children = self._stack.pop()
+            elapsed = time.perf_counter() - start
+            self.cumulative[name] = self.cumulative.get(name, 0.0) + elapsed
+            self.self_seconds[name] = self.self_seconds.get(name, 0.0) + elapsed - children
+            if self._stack:
+                parent, parent_children = self._stack[-1]
+                self._stack[-1] = (parent, parent_children + elapsed)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.self_seconds.values())
+
+    def by_package(self) -> Dict[str, float]:
+        """Self time summed per top level package."""
+        packages: Dict[str, float] = defaultdict(float)
+        for name, seconds in self.self_seconds.items():
+            packages[name.split(".")[0]] += seconds
+        return dict(packages)
+
+    def report(self, top: int = 15) -> str:
+        lines = [f"imports: {self.total_seconds:.2f}s ({len(self.self_seconds)} modules)"]
+        for package, seconds in sorted(self.by_package().items(), key=lambda x: -x[1])[:top]:
+            lines.append(f"  {package:<40} {seconds:>7.3f}s")
+        return "\n".join(lines)
+
+
+def define_report(define_seconds: Optional[Dict[str, float]]) -> str:
+    """Format the per-module define timings recorded by define_arq."""
+    define_seconds = define_seconds or {}
+    lines = [f"define: {sum(define_seconds.values()):.2f}s"]
+    for name, seconds in sorted(define_seconds.items(), key=lambda x: -x[1]):
+        lines.append(f"  {name:<40} {seconds:>7.3f}s")
+    return "\n".join(lines)
@@ -0,0 +1,87 @@
+"""
+Compact query results
+
+`to_df()` returns strings as object columns and every number as int64 or
+float64, so a large result (eg raw observations with their country, state /
+province, basis of record and taxon names) takes several times the memory
+its values need. `compact` shrinks a materialized result column by column:
+
+- strings with few distinct values (country codes, ranks, basis of record,
+  names repeated across rows) become categoricals
+- integer columns are downcast to the narrowest signed type holding their
+  values, eg day of year to int16 and taxon ids to int32; H3 cells use all
+  64 bits and stay int64
+- id, year, day of year, count and H3 cell columns that came back as floats
+  (because of missing values), and Python ints / decimals, become integers,
+  nullable where values are missing
+
+Floats are left alone, since coordinates need float64 precision.
+"""
+
+import re
+from typing import Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Columns holding integers even when they come back as floats or decimals
+INTEGER_COLUMNS = re.compile(r"(^|_)(id|year|day_of_year|count)$|^h3_cell", re.IGNORECASE)
+
+
+def _integral(values: pd.Series) -> bool:
+    present = values.dropna()
+    return bool(len(present)) and bool((np.mod(present.astype(np.float64), 1) == 0).all())
+
+
+def compact_column(values: pd.Series, max_category_ratio: float = 0.5) -> pd.Series:
+    """The column in its narrowest type, see the module docstring."""
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if values.dtype == object and kind in ("integer", "decimal") and _integral(values):
+        values = values.astype("Int64") if values.isna().any() else values.astype(np.int64)
+    elif values.dtype == object and kind == "decimal":
+        values = pd.to_numeric(values)
+    elif pd.api.types.is_float_dtype(values) and INTEGER_COLUMNS.search(str(values.name)) and _integral(values):
+        values = values.astype("Int64") if values.isna().any() else values.astype(np.int64)
+
+    if pd.api.types.is_integer_dtype(values) and not pd.api.types.is_unsigned_integer_dtype(values):
+        return pd.to_numeric(values, downcast="integer")
+    if kind == "string" and not isinstance(values.dtype, pd.CategoricalDtype):
+        distinct = values.nunique(dropna=True)
+        if len(values) and distinct <= max_category_ratio * len(values):
+            return values.astype("category")
+    return values
+
+
+def compact(df: pd.DataFrame, max_category_ratio: float = 0.5, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """A copy of a result with each column (or just the given ones) in its narrowest type.
+
+    Args:
+        df: A materialized query result
+        max_category_ratio: Make string columns categorical when their distinct
+            values are at most this fraction of the rows
+        columns: Only compact these columns
+    """
+    out = df.copy()
+    for column in columns if columns is not None else df.columns:
+        out[column] = compact_column(df[column], max_category_ratio)
+    return out
+
+
+def to_compact_df(fragment: Any, max_category_ratio: float = 0.5) -> pd.DataFrame:
+    """Run a query fragment and materialize its result compacted."""
+    return compact(fragment.to_df(), max_category_ratio)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Types and deep memory use per column before and after compacting, with a total row."""
+    used_before = before.memory_usage(deep=True, index=False)
+    used_after = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "column": list(before.columns) + ["total"],
+        "dtype_before": [str(t) for t in before.dtypes] + [""],
+        "dtype_after": [str(t) for t in after.dtypes] + [""],
+        "bytes_before": list(used_before) + [used_before.sum()],
+        "bytes_after": list(used_after) + [used_after.sum()],
+    })
+    report["saved"] = 1 - report["bytes_after"] / report["bytes_before"].where(report["bytes_before"] > 0)
+    return report
@@ -0,0 +1,200 @@
+"""
+Shared RAI session layer
+
+The apps, kata runners and the pytest fixture all get their model from here
+instead of building their own `rai.Model`. They share one Snowflake
+connection, which is health checked and re-established with exponential
+backoff when it drops, and one model name per program: define_arq builds a
+different program per query's module subset, so the shared name is suffixed
+with model_variant (the full model keeps the bare name). Entry points that
+run the same query share its installed model and warm engine on the service
+side, and runs of different queries never replace each other's model.
+
+Configure with environment variables:
+- ARQ_MODEL_NAME: shared model name (default: arq)
+- ARQ_OBSERVATION_TABLE: observation tier the shared model binds (default: OBSERVATION_10k)
+- ARQ_CONNECT_RETRIES: connection attempts before giving up (default: 4)
+- ARQ_CONNECT_BACKOFF: initial backoff in seconds, doubled per attempt (default: 1)
+- ARQ_COMPILE_CACHE: set to 0 to always recompile the model (see kg/compile_cache.py)
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import relationalai.semantics as rai
+
+from kg.compile_cache import model_cache
+from kg.model import define_arq, model_variant, ARQModel
+
+
+@dataclass
+class SessionStats:
+    """Setup and query timings measured in this process."""
+    connect_seconds: float = 0.0
+    define_seconds: float = 0.0
+    cold_query_seconds: Optional[float] = None
+    warm_query_seconds: Optional[float] = None
+    connects: int = 0
+    reuses: int = 0
+    retries: int = 0
+    health_checks: int = 0
+
+    def report(self) -> str:
+        lines = [
+            f"connect: {self.connect_seconds:.2f}s ({self.connects} connects, {self.retries} retries)",
+            f"define: {self.define_seconds:.2f}s, model reused {self.reuses}x in this process",
+        ]
+        if self.cold_query_seconds is not None and self.warm_query_seconds is not None:
+            delta = self.cold_query_seconds - self.warm_query_seconds
+            lines.append(
+                f"query: first {self.cold_query_seconds:.2f}s, again {self.warm_query_seconds:.2f}s"
+                f" (first run {delta:+.2f}s)"
+            )
+        return "\n".join(lines)
+
+
+class SessionPool:
+    """Hands out one shared connection and an ARQ model per program."""
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        max_backoff: float = 30.0,
+        health_check_interval: float = 300.0,
+        observation_table: Optional[str] = None,
+    ):
+        self.model_name = model_name or os.environ.get("ARQ_MODEL_NAME", "arq")
+        self.retries = retries if retries is not None else int(os.environ.get("ARQ_CONNECT_RETRIES", 4))
+        self.backoff = backoff if backoff is not None else float(os.environ.get("ARQ_CONNECT_BACKOFF", 1.0))
+        self.max_backoff = max_backoff
+        self.health_check_interval = health_check_interval
+        self.observation_table = observation_table or os.environ.get("ARQ_OBSERVATION_TABLE", "OBSERVATION_10k")
+        self.stats = SessionStats()
+        self._connection: Any = None
+        self._last_check = 0.0
+        self._models: Dict[str, rai.Model] = {}
+        self.compile_cache = model_cache(observation_table=self.observation_table)
+
+    def connection(self) -> Any:
+        """Return the shared Snowflake session, reconnecting if it is unhealthy."""
+        now = time.monotonic()
+        if self._connection is not None and now - self._last_check > self.health_check_interval:
+            self._last_check = now
+            if not self.healthy():
+                self._connection = None
+        if self._connection is None:
+            self._connection = self._connect()
+            self._last_check = time.monotonic()
+            for m in self._models.values():
+                self._rebind(m)
+        return self._connection
+
+    def _rebind(self, m: rai.Model):
+        # Models handed out earlier run on the replaced session; point them
+        # (and their executor, created on first query) at the new one
+        m._connection = self._connection
+        m._executor = None
+
+    def healthy(self) -> bool:
+        """Check the shared session can still run a trivial statement."""
+        if self._connection is None:
+            return False
+        self.stats.health_checks += 1
+        try:
+            self._connection.sql("select 1").collect()
+            return True
+        except Exception:
+            return False
+
+    def _connect(self) -> Any:
+        from relationalai import Resources
+
+        start = time.perf_counter()
+        delay = self.backoff
+        for attempt in range(self.retries):
+            try:
+                connection = Resources(reset_session=attempt > 0).get_sf_session()
+                break
+            except Exception:
+                if attempt == self.retries - 1:
+                    raise
+                self.stats.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+        self.stats.connects += 1
+        self.stats.connect_seconds += time.perf_counter() - start
+        return connection
+
+    def shared_name(
+        self,
+        query: Optional[Callable[[ARQModel], Any]] = None,
+        modules: Optional[Iterable[str]] = None,
+    ) -> str:
+        """The shared model name for the program defined for a query or module names."""
+        variant = model_variant(query, modules, observation_table=self.observation_table)
+        return f"{self.model_name}_{variant}" if variant else self.model_name
+
+    def arq(
+        self,
+        model_name: Optional[str] = None,
+        query: Optional[Callable[[ARQModel], Any]] = None,
+        modules: Optional[Iterable[str]] = None,
+    ) -> ARQModel:
+        """Return the ARQ model for a query or module names (default: the full model).
+
+        With a query or module names only what they need is defined, see
+        define_arq. Without a model name the model is shared under
+        shared_name, so it only ever holds that program. A given (private)
+        model name is defined incrementally: later calls add whatever is
+        still missing to the same model.
+        """
+        name = model_name or self.shared_name(query, modules)
+        if name in self._models:
+            self.stats.reuses += 1
+        m = self._models.get(name)
+        if m is None:
+            m = self._models[name] = rai.Model(name, connection=self.connection())
+            self.compile_cache.install(m, self.connection())
+
+        start = time.perf_counter()
+        arq = define_arq(m, query=query, modules=modules, observation_table=self.observation_table)
+        self.stats.define_seconds += time.perf_counter() - start
+        return arq
+
+    def measure_query(self, arq: ARQModel, query: Callable[[ARQModel], Any]) -> Any:
+        """Run a query twice, recording both times, and return the second result frame.
+
+        The first run includes installing the model and waking the engine
+        when no earlier run left them warm; the second is what repeated
+        queries on the warm model cost.
+        """
+        runs = []
+        for _ in range(2):
+            start = time.perf_counter()
+            df = query(arq).to_df()
+            runs.append(time.perf_counter() - start)
+        self.stats.cold_query_seconds, self.stats.warm_query_seconds = runs
+        return df
+
+
+_pool: Optional[SessionPool] = None
+
+
+def get_pool() -> SessionPool:
+    """Return the process-wide session pool."""
+    global _pool
+    if _pool is None:
+        _pool = SessionPool()
+    return _pool
+
+
+def arq_model(
+    model_name: Optional[str] = None,
+    query: Optional[Callable[[ARQModel], Any]] = None,
+) -> ARQModel:
+    """Return the shared ARQ model for a query, creating the connection on first use."""
+    return get_pool().arq(model_name, query=query)
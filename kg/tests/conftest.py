@@ -1,9 +1,9 @@
 import pytest
-import relationalai.semantics as rai
 
-from kg.model import define_arq, ARQModel
+from kg.model import ARQModel
+from kg.session import arq_model
 
 
 @pytest.fixture(scope="session")
 def arq() -> ARQModel:
-    return define_arq(rai.Model(f"arq_test"))
+    return arq_model()
@@ -0,0 +1,86 @@
+import json
+
+from relationalai.semantics.internal.snowflake import Table
+from relationalai.semantics.lqp.utils import UniqueNames
+from relationalai.semantics.metamodel import factory as f, ir, types
+from relationalai.semantics.metamodel.util import ordered_set
+
+from kg.cache import table_versions
+from kg.compile_cache import CompiledModelCache
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def collect(self):
+        return self.rows
+
+
+class _Connection:
+    """Answers the INFORMATION_SCHEMA.TABLES query with fixed LAST_ALTERED values and no rows."""
+
+    def __init__(self, versions):
+        self.versions = versions
+
+    def sql(self, query):
+        return _Result([(name, altered, 0) for name, altered in self.versions.items()])
+
+
+def _seeded(tmp_path, monkeypatch, altered):
+    monkeypatch.setenv("ARQ_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(Table, "_schemas", {})
+    cache = CompiledModelCache("test", "ARQ_TEST", "PUBLIC")
+    (cache.path / "schemas.json").write_text(json.dumps({
+        "ARQ_TEST.PUBLIC.OBSERVATION": {"version": "2025-01-01-0", "columns": {"GBIFID": "Number"}},
+    }))
+    cache.versions = table_versions(_Connection(altered), "ARQ_TEST", "PUBLIC")
+    cache.seed_schemas()
+    info = Table._schemas.get(("ARQ_TEST", "PUBLIC"))
+    return info is not None and "OBSERVATION" in info.fetched
+
+
+def test_schema_seeded_while_table_unchanged(tmp_path, monkeypatch):
+    assert _seeded(tmp_path, monkeypatch, {"OBSERVATION": "2025-01-01"})
+
+
+def test_schema_refetched_after_table_changes(tmp_path, monkeypatch):
+    assert not _seeded(tmp_path, monkeypatch, {"OBSERVATION": "2025-06-01"})
+    assert not _seeded(tmp_path, monkeypatch, {})
+
+
+class _Compiler:
+    """Counts model compiles and names each relation as the LQP compiler does."""
+
+    def __init__(self):
+        self.def_names = UniqueNames()
+        self.compiles = 0
+
+    def compile(self, model, options):
+        self.compiles += 1
+        for relation in model.relations:
+            self.def_names.get_name_by_id(relation.id, relation.name)
+        return None, f"txn {self.compiles}"
+
+
+def _model(padding=0):
+    # Node ids come from a global counter, so padding shifts them as a later
+    # process building the same model would
+    for _ in range(padding):
+        ir.next_id()
+    relation = f.relation("species", [f.field("id", types.Int64), f.field("name", types.String)])
+    return relation, f.model(ordered_set(), ordered_set(relation), ordered_set(), f.logical([]))
+
+
+def test_compiled_model_reused_across_node_ids(tmp_path, monkeypatch):
+    monkeypatch.setenv("ARQ_CACHE_DIR", str(tmp_path))
+    compiled = []
+    for padding in (0, 100):
+        cache = CompiledModelCache("test", "ARQ_TEST", "PUBLIC")
+        compiler = _Compiler()
+        cache._wrap_compiler(compiler)
+        relation, model = _model(padding)
+        compiled.append(compiler.compile(model, {"fragment_id": b"model"})[1])
+        assert compiler.def_names.id_to_name == {relation.id: "species"}
+    assert compiled == ["txn 1", "txn 1"]
+    assert (cache.hits, cache.misses) == (1, 0)
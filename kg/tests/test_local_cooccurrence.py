@@ -0,0 +1,51 @@
+import numpy as np
+
+from kg.local import cooccurrence
+from kg.local.cooccurrence import Incidence
+from kg.local.taxonomy import TaxonomyStore
+
+
+def _random_incidence(seed: int = 0):
+    rng = np.random.default_rng(seed)
+    taxa = rng.integers(0, 60, 3000) * 7 + 1
+    cells = rng.integers(0, 200, 3000)
+    return taxa, cells
+
+
+def test_associations_match_dense(tmp_path, monkeypatch):
+    """Test blocked sparse products and metrics against the dense matrix."""
+    taxa, cells = _random_incidence()
+    incidence = Incidence.build(taxa, cells).save(tmp_path)
+    dense = np.zeros(incidence.shape, dtype=np.int64)
+    dense[np.searchsorted(incidence.taxa, taxa), np.searchsorted(incidence.cells, cells)] = 1
+    products = dense @ dense.T
+
+    monkeypatch.setattr(cooccurrence, "BLOCK_PAIRS", 500)
+    df = incidence.associations(k=5, metric="pmi", min_shared=2)
+    print(df.head())
+
+    rows = np.searchsorted(incidence.taxa, df["taxon_id"])
+    others = np.searchsorted(incidence.taxa, df["other_id"])
+    assert (df["shared"].to_numpy() == products[rows, others]).all()
+    sizes = products.diagonal()
+    assert np.allclose(df["jaccard"], products[rows, others] / (sizes[rows] + sizes[others] - products[rows, others]))
+    assert (df.groupby("taxon_id").size() <= 5).all()
+    assert (df["taxon_id"] != df["other_id"]).all()
+
+    # the best pmi partner of each taxon, among pairs sharing 2+ cells
+    row = rows[0]
+    candidates = [j for j in range(len(sizes)) if j != row and products[row, j] >= 2]
+    pmi = [np.log(products[row, j] * incidence.shape[1] / (sizes[row] * sizes[j])) for j in candidates]
+    assert np.isclose(df["pmi"].iloc[0], max(pmi))
+    assert incidence.cooccurrence(incidence.taxa[:3], incidence.taxa[3]).tolist() == products[:3, 3].tolist()
+
+
+def test_buckets_and_rollup():
+    """Test year buckets split columns and classifications roll up to species."""
+    store = TaxonomyStore.build([1, 2, 3, 4], [-1, 1, 1, 2], ["genus", "species", "species", "subspecies"])
+    incidence = Incidence.build([2, 4, 3, 1], [10, 10, 10, 10], [2020, 2020, 2010, 2020], store)
+    assert incidence.taxa.tolist() == [2, 3]
+    assert incidence.shape == (2, 2)
+    assert incidence.occupancy.tolist() == [1, 1]
+    assert incidence.cooccurrence([2], [3]).tolist() == [0]
+    assert incidence.associations().empty
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from kg.local.dedup import DUPLICATE_TABLE, DedupParams, _components, cluster_batches, cluster_rows, write_duplicates
+
+CELL = 0x8928308280FFFFF
+
+
+def _rows():
+    # (gbif id, taxon, event date, lat, lon)
+    records = [
+        (10, 1, "2024-05-01 09:00", 37.7750, -122.4190),
+        (11, 1, "2024-05-01 09:20", 37.7752, -122.4191),  # same sighting, another dataset
+        (12, 1, "2024-05-01 00:00", 37.7751, -122.4190),  # date only, matches any time that day
+        (13, 1, "2024-05-01 15:00", 37.7750, -122.4190),  # same place, hours later
+        (14, 1, "2024-05-02 09:00", 37.7750, -122.4190),  # next day, another block
+        (15, 2, "2024-05-01 09:00", 37.7750, -122.4190),  # another taxon
+        (16, 1, "2024-05-01 09:05", 37.7790, -122.4190),  # ~450 m away
+    ]
+    df = pd.DataFrame(records, columns=["GBIFID", "TAXONKEY", "EVENTDATE", "LAT", "LON"])
+    df["EVENTDATE"] = pd.to_datetime(df["EVENTDATE"])
+    df["H3_CELL_9"] = CELL
+    return df
+
+
+def test_components():
+    """Test label propagation joins chains into one component."""
+    labels = _components(6, np.array([4, 3, 0]), np.array([5, 4, 1]))
+    assert labels.tolist() == [0, 0, 2, 3, 3, 3]
+
+
+def test_cluster_rows():
+    """Test blocking and tolerances, and cluster ids as the lowest GBIFID."""
+    clusters = cluster_rows(_rows())
+    print(clusters)
+    assert sorted(clusters["GBIFID"]) == [10, 11, 12, 13]
+    assert set(clusters["CLUSTERID"]) == {10}
+    assert set(clusters["CLUSTERSIZE"]) == {4}
+
+    # the date-only record links 13 to the morning sightings; without it they are apart
+    morning = cluster_rows(_rows()[lambda df: df["GBIFID"] != 12])
+    assert sorted(morning["GBIFID"]) == [10, 11]
+    assert cluster_rows(_rows(), DedupParams(max_meters=1000))["GBIFID"].nunique() == 5
+
+
+def test_cluster_batches():
+    """Test streaming batches split mid-block give the same clusters."""
+    rows = _rows()
+    rows = rows.iloc[np.lexsort((rows["EVENTDATE"].dt.normalize(), rows["TAXONKEY"]))]
+    batches = [rows.iloc[i : i + 2] for i in range(0, len(rows), 2)]
+    streamed = cluster_batches(batches).sort_values("GBIFID", ignore_index=True)
+    assert streamed.equals(cluster_rows(rows).sort_values("GBIFID", ignore_index=True))
+
+
+class _Connection:
+    """Records written frames and statements."""
+
+    def __init__(self):
+        self.written = {}
+        self.statements = []
+
+    def write_pandas(self, df, table, **kwargs):
+        self.written[table] = df
+
+    def sql(self, query):
+        self.statements.append(query)
+        return self
+
+    def collect(self):
+        return []
+
+
+def test_write_duplicates_keeps_change_tracking():
+    """Test the recreated duplicate table gets change tracking back for RAI."""
+    clusters = cluster_rows(_rows())
+    connection = _Connection()
+    assert write_duplicates(connection, clusters, "ARQ_TEST", "PUBLIC") == int((clusters["GBIFID"] != clusters["CLUSTERID"]).sum())
+    assert len(connection.written[DUPLICATE_TABLE]) == len(clusters)
+    assert connection.statements == [f"alter table ARQ_TEST.PUBLIC.{DUPLICATE_TABLE} set change_tracking=true"]
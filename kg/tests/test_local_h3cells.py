@@ -0,0 +1,93 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from kg.local.h3cells import cell_to_latlng, cell_to_parent, grid_disk, latlng_to_cell, latlng_to_cells
+from kg.local.ingest import convert_tsv
+
+# (lat, lon) and its cells at resolutions 0, 6, 9 and 10, from the H3 C library
+KNOWN = [
+    ((37.7752702151959, -122.418307270836), (0x8029FFFFFFFFFFF, 0x86283082FFFFFFF, 0x8928308280FFFFF, 0x8A28308280E7FFF)),
+    ((-33.8688, 151.2093), (0x80BFFFFFFFFFFFF, 0x86BE0E35FFFFFFF, 0x89BE0E35CBBFFFF, 0x8ABE0E35CBAFFFF)),
+    ((64.0, -21.9), (0x8007FFFFFFFFFFF, 0x86075D8AFFFFFFF, 0x89075D8A863FFFF, 0x8A075D8A8607FFF)),
+    ((0.0, 180.0), (0x807FFFFFFFFFFFF, 0x867EB5727FFFFFF, 0x897EB57221BFFFF, 0x8A7EB57221A7FFF)),
+    ((-89.9, 45.0), (0x80F1FFFFFFFFFFF, 0x86F2938AFFFFFFF, 0x89F2938A823FFFF, 0x8AF2938A8227FFF)),
+    # next to the pentagons of base cells 4 and 58
+    ((64.71, 10.556199), (0x8009FFFFFFFFFFF, 0x860800007FFFFFF, 0x890800003B3FFFF, 0x8A0800003B17FFF)),
+    ((2.297882, -5.24439), (0x8075FFFFFFFFFFF, 0x867400007FFFFFF, 0x8974000000FFFFF, 0x8A74000000DFFFF)),
+]
+
+
+def test_known_cells():
+    """Test cells against values from the H3 C library, including pentagon base cells."""
+    lat, lon = np.array([point for point, _ in KNOWN]).T
+    cells = latlng_to_cells(lat, lon, (0, 6, 9, 10))
+    for column, res in enumerate((0, 6, 9, 10)):
+        assert [hex(c) for c in cells[res]] == [hex(expected[column]) for _, expected in KNOWN]
+    assert latlng_to_cell([np.nan, 10.0], [0.0, np.nan], 9).tolist() == [-1, -1]
+
+
+def test_matches_h3_library():
+    """Test random points at every resolution against the h3 package, when installed."""
+    h3 = pytest.importorskip("h3")
+    rng = np.random.default_rng(0)
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, 5000)))
+    lon = rng.uniform(-180, 180, 5000)
+    for res, cells in latlng_to_cells(lat, lon, range(16)).items():
+        expected = [h3.str_to_int(h3.latlng_to_cell(a, b, res)) for a, b in zip(lat, lon)]
+        assert cells.tolist() == expected
+
+
+def test_cell_centers_and_disks():
+    """Test centers, parents and disks against the H3 C library, including a pentagon."""
+    lat, lon = cell_to_latlng([0x8928308280FFFFF, 0x89BE0E35CBBFFFF])
+    np.testing.assert_allclose(lat, [37.776702349435695, -33.86733858922612], atol=1e-9)
+    np.testing.assert_allclose(lon, [-122.41845932318309, 151.21041156652367], atol=1e-9)
+    assert cell_to_parent([0x8928308280FFFFF], 6).tolist() == [0x86283082FFFFFFF]
+
+    disk = grid_disk([0x8928308280FFFFF], 1)[0]
+    assert disk[0] == 0x8928308280FFFFF
+    assert sorted(disk.tolist()) == [
+        0x89283082803FFFF, 0x89283082807FFFF, 0x8928308280BFFFF, 0x8928308280FFFFF,
+        0x8928308283BFFFF, 0x89283082873FFFF, 0x89283082877FFFF,
+    ]
+    # a pentagon has five neighbors
+    disk = grid_disk([0x8009FFFFFFFFFFF], 1)[0]
+    assert sorted(disk[disk >= 0].tolist()) == [
+        0x8001FFFFFFFFFFF, 0x8007FFFFFFFFFFF, 0x8009FFFFFFFFFFF, 0x8011FFFFFFFFFFF, 0x8019FFFFFFFFFFF, 0x801FFFFFFFFFFFF,
+    ]
+
+
+def test_disks_match_h3_library():
+    """Test centers and k = 2 disks of random cells against the h3 package, when installed."""
+    h3 = pytest.importorskip("h3")
+    rng = np.random.default_rng(0)
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, 1000)))
+    lon = rng.uniform(-180, 180, 1000)
+    for res in (6, 9):
+        cells = latlng_to_cell(lat, lon, res)
+        expected = np.array([h3.cell_to_latlng(h3.int_to_str(int(c))) for c in cells])
+        np.testing.assert_allclose(np.c_[cell_to_latlng(cells)], expected, atol=1e-9)
+        for cell, disk in zip(cells, grid_disk(cells, 2)):
+            assert set(disk.tolist()) == {h3.str_to_int(c) for c in h3.grid_disk(h3.int_to_str(int(cell)), 2)}
+
+
+def test_convert_tsv(tmp_path):
+    """Test TSV conversion keeps raw columns as strings and appends int64 cells, null without coordinates."""
+    tsv = tmp_path / "observation.tsv"
+    tsv.write_text(
+        "gbifID\ttaxonKey\tdecimalLatitude\tdecimalLongitude\teventDate\n"
+        "1\t5\t37.7752702151959\t-122.418307270836\t2024-05-01T09:00\n"
+        "2\t6\t\t\t2024-05-02\n"
+        "3\t7\t-33.8688\t151.2093\t\n"
+        "4\t8\tmalformed\n"
+    )
+    rows, skipped = convert_tsv(tsv, tmp_path / "out", workers=1, block_bytes=64)
+    table = pq.read_table(tmp_path / "out")
+    print(table.to_pandas())
+    assert rows == 3 and table.num_rows == 3
+    assert skipped == ["4\t8\tmalformed"]
+    assert table.column("gbifID").to_pylist() == ["1", "2", "3"]
+    assert all(table.schema.field(f"H3_CELL_{res}").type == pa.int64() for res in range(6, 11))
+    assert table.column("H3_CELL_9").to_pylist() == [0x8928308280FFFFF, None, 0x89BE0E35CBBFFFF]
@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from kg.local.h3cells import grid_disk, latlng_to_cell
+from kg.local.heatmap import HeatmapIndex, cell_counts_sql, kernel_weights, smooth_cells, write_tiles
+from kg.local.taxonomy import TaxonomyStore
+
+SEATTLE = latlng_to_cell(47.6, -122.3, 7)[0]
+SYDNEY = latlng_to_cell(-33.9, 151.2, 7)[0]
+
+
+class _Connection:
+    """Answers every query with the same grouped counts, recording the queries."""
+
+    def __init__(self, counts: pd.DataFrame):
+        self.counts = counts
+        self.queries = []
+
+    def sql(self, query: str):
+        self.queries.append(query)
+        return self
+
+    def to_pandas(self) -> pd.DataFrame:
+        return self.counts
+
+
+def _index(path=None):
+    # genus 1 with species 2 and 3
+    store = TaxonomyStore.build([1, 2, 3], [-1, 1, 1], ["genus", "species", "species"])
+    counts = pd.DataFrame({
+        "CELL": [SEATTLE, SEATTLE, SYDNEY, SYDNEY],
+        "TAXONKEY": pd.array([2, 3, 3, None], dtype="Int64"),
+        "N": [5, 1, 4, 2],
+    })
+    return HeatmapIndex(store, _Connection(counts), "TEAM_ARQ.PUBLIC.OBSERVATION", path)
+
+
+def test_counts_sql():
+    """Test the year and season filters, with seasons named by each observation's hemisphere."""
+    sql = cell_counts_sql("TEAM_ARQ.PUBLIC.OBSERVATION", 8, years=(2010, 2020), season="summer")
+    assert "o.H3_CELL_8 as CELL" in sql and "o.YEAR between 2010 and 2020" in sql
+    assert "join TEAM_ARQ.PUBLIC.SOLEQ" in sql and "iff(o.LAT >= 0, 'summer', 'winter')" in sql
+    assert "SOLEQ" not in cell_counts_sql("TEAM_ARQ.PUBLIC.OBSERVATION", 8)
+
+
+def test_smoothing_keeps_totals():
+    """Test that values spread over the disk by distance and sum to the original total."""
+    weights = kernel_weights(2, "linear")
+    assert len(weights) == 19 and np.isclose(weights.sum(), 1)
+    assert weights[0] > weights[1] > weights[-1]
+
+    cells, values = smooth_cells([SEATTLE], [10.0], k=2, kernel="linear")
+    assert sorted(cells.tolist()) == sorted(grid_disk([SEATTLE], 2)[0].tolist())
+    assert np.isclose(values.sum(), 10)
+    np.testing.assert_allclose(values[cells == SEATTLE], 10 * weights[0])
+
+
+def test_heatmap_filters_and_cache(tmp_path):
+    """Test the taxon subtree filter, raw counts at k = 0, and caching by filter."""
+    index = _index(tmp_path)
+    raw = index.heatmap(7, k=0)
+    assert raw["cell"].tolist() == sorted([SEATTLE, SYDNEY])
+    assert raw.set_index("cell")["value"].to_dict() == {SEATTLE: 6, SYDNEY: 6}
+    assert index.heatmap(7, taxon_id=0, k=0).empty  # not the cached unfiltered heatmap
+    species = index.heatmap(7, taxon_id=3, k=0)
+    assert species.set_index("cell")["value"].to_dict() == {SEATTLE: 1, SYDNEY: 4}
+
+    smoothed = index.heatmap(7, taxon_id=1, k=1)
+    assert len(smoothed) == 14 and np.isclose(smoothed["value"].sum(), 10)
+    assert (tmp_path / "heatmaps" / index.store.version / "r7-t1-all-all-k1-gaussian.parquet").exists()
+    assert len(index.connection.queries) == 1  # grouped counts are fetched once per resolution and filter
+    pd.testing.assert_frame_equal(_index(tmp_path).heatmap(7, taxon_id=1, k=1), smoothed)
+
+
+def test_write_tiles(tmp_path):
+    """Test single file and tiled output in both formats."""
+    df = _index().heatmap(7, k=1)
+    (path,) = write_tiles(df, tmp_path / "heatmap.parquet")
+    pd.testing.assert_frame_equal(pd.read_parquet(path), df)
+
+    paths = write_tiles(df, tmp_path / "tiles", "geojson", tile_resolution=3)
+    assert len(paths) == 2
+    features = [f for p in paths for f in json.loads(p.read_text())["features"]]
+    assert len(features) == len(df)
+    seattle = next(f for f in features if f["properties"]["cell"] == format(SEATTLE, "x"))
+    np.testing.assert_allclose(seattle["geometry"]["coordinates"], [-122.3, 47.6], atol=0.02)
@@ -0,0 +1,60 @@
+import numpy as np
+
+from kg.local.lca import LCAIndex
+from kg.local.taxonomy import TaxonomyStore
+
+
+def _random_forest(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(np.arange(10, 10 + 3 * n))[:n]
+    parents = np.full(n, -1)
+    for i in range(1, n):
+        # a couple of separate trees, the rest attach to an earlier taxon
+        if i % 97:
+            parents[i] = ids[rng.integers(0, i)]
+    return ids, parents
+
+
+def _brute_force_lca(store: TaxonomyStore, a: int, b: int) -> int:
+    lineage = []
+    while a != -1:
+        lineage.append(a)
+        a = store.parent_of(a)[0]
+    while b != -1:
+        if b in lineage:
+            return b
+        b = store.parent_of(b)[0]
+    return -1
+
+
+def test_lca_matches_brute_force(tmp_path):
+    """Test batch LCA and distance against walking up the parents."""
+    ids, parents = _random_forest(500)
+    store = TaxonomyStore.build(ids, parents, ["species"] * len(ids), tmp_path)
+    index = LCAIndex.load(store)
+    assert (tmp_path / f"depth_ancestors-{store.version}.npy").exists()
+
+    rng = np.random.default_rng(1)
+    a = rng.choice(ids, 2000)
+    b = rng.choice(ids, 2000)
+    lca = index.lca(a, b)
+    distance = index.distance(a, b)
+    expected = [_brute_force_lca(store, x, y) for x, y in zip(a, b)]
+    print(index.pairs(a[:5], b[:5]))
+
+    assert lca.tolist() == expected
+    depth = store.depth[store.positions(a)] + store.depth[store.positions(b)]
+    known = lca >= 0
+    assert (distance[known] == depth[known] - 2 * store.depth[store.positions(lca[known])]).all()
+    assert (distance[~known] == -1).all()
+
+
+def test_lca_edge_cases():
+    """Test self pairs, ancestor pairs, broadcasting and unknown ids."""
+    store = TaxonomyStore.build([1, 2, 3, 4], [-1, 1, 2, 1], ["family", "genus", "species", "genus"])
+    index = LCAIndex(store)
+
+    assert index.lca([3, 3, 2, 3], [3, 1, 3, 4]).tolist() == [3, 1, 2, 1]
+    assert index.distance([3, 3, 2, 3], [3, 1, 3, 4]).tolist() == [0, 2, 1, 3]
+    assert index.lca(3, [2, 4, 99]).tolist() == [2, 1, -1]
+    assert index.pairs([3], [4])["ancestor_rank"].tolist() == ["family"]
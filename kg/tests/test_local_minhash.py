@@ -0,0 +1,121 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from kg.local.minhash import RangeIndex
+
+
+def _ranges(seed: int = 0):
+    """Taxa 1..40 with random ranges, taxon 100 sharing most of taxon 1's cells."""
+    rng = np.random.default_rng(seed)
+    taxa, cells = [], []
+    for taxon in range(1, 41):
+        own = rng.choice(5000, rng.integers(50, 300), replace=False)
+        taxa.append(np.full(len(own), taxon))
+        cells.append(own)
+    overlap = np.r_[cells[0][: int(len(cells[0]) * 0.9)], [9001, 9002]]
+    taxa.append(np.full(len(overlap), 100))
+    cells.append(overlap)
+    return np.concatenate(taxa), np.concatenate(cells)
+
+
+def _exact_jaccard(taxa, cells, a, b):
+    sa, sb = set(cells[taxa == a]), set(cells[taxa == b])
+    return len(sa & sb) / len(sa | sb)
+
+
+def test_jaccard_estimates_and_lsh(tmp_path):
+    """Test MinHash estimates against exact Jaccard and that LSH finds overlapping ranges."""
+    taxa, cells = _ranges()
+    index = RangeIndex.build(taxa, cells, {"watermark": 0}).save(tmp_path)
+
+    pairs = [(1, 100), (1, 2), (3, 4), (5, 6)]
+    estimate = index.jaccard([a for a, _ in pairs], [b for _, b in pairs])
+    exact = [_exact_jaccard(taxa, cells, a, b) for a, b in pairs]
+    print(list(zip(pairs, estimate, exact)))
+    assert np.allclose(estimate, exact, atol=0.12)
+
+    similar = index.similar(1, k=3)
+    assert similar["other_id"].iloc[0] == 100
+    assert index.similar(100)["other_id"].iloc[0] == 1
+    assert index.jaccard(1, 12345).tolist() == [0.0]
+
+
+def test_incremental_merge_matches_rebuild():
+    """Test that merging new observations gives the same index as building from scratch."""
+    taxa, cells = _ranges(1)
+    split = len(taxa) // 2
+    merged = RangeIndex.build(taxa[:split], cells[:split]).merge(
+        np.r_[taxa[split:], 500], np.r_[cells[split:], 7]
+    )
+    rebuilt = RangeIndex.build(np.r_[taxa, 500], np.r_[cells, 7])
+
+    assert (merged.taxa == rebuilt.taxa).all()
+    assert (merged.signatures == rebuilt.signatures).all()
+    assert (merged.band_keys == rebuilt.band_keys).all()
+    assert (merged.band_sorted == rebuilt.band_sorted).all()
+
+
+class _Connection:
+    """Answers refresh's queries from an in-memory observation table, recording the pair queries."""
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table
+        self.version = 0
+        self.pair_queries = []
+
+    def replace(self, table: pd.DataFrame):
+        self.table, self.version = table, self.version + 1
+
+    def sql(self, query: str):
+        self.query = query
+        if "GBIFID > " in query:
+            self.pair_queries.append(query)
+        return self
+
+    def _hash(self, rows: pd.DataFrame) -> int:
+        return sum(hash(tuple(row)) for row in rows.itertuples(index=False)) % 2**63
+
+    def collect(self):
+        if "INFORMATION_SCHEMA" in self.query:
+            return [("OBSERVATION", self.version, len(self.table))]
+        watermark = int(re.search(r"GBIFID <= (-?\d+)", self.query).group(1))
+        kept = self.table[self.table["GBIFID"] <= watermark]
+        return [(int(self.table["GBIFID"].max()), self._hash(kept), self._hash(self.table))]
+
+    def to_pandas(self) -> pd.DataFrame:
+        low, high = map(int, re.search(r"GBIFID > (-?\d+) and GBIFID <= (-?\d+)", self.query).groups())
+        rows = self.table[(self.table["GBIFID"] > low) & (self.table["GBIFID"] <= high)]
+        return rows.rename(columns={"H3_CELL_6": "CELL"})[["TAXONKEY", "CELL"]].drop_duplicates()
+
+
+def test_refresh_appends_or_rebuilds(tmp_path):
+    """Test refresh merges pure appends and rebuilds after reclassifications and reloads."""
+    taxa, cells = _ranges(2)
+    table = pd.DataFrame({"GBIFID": np.arange(len(taxa)), "TAXONKEY": taxa, "H3_CELL_6": cells})
+    split = len(taxa) // 2
+    connection = _Connection(table[:split])
+    fqn = "TEAM_ARQ.PUBLIC.OBSERVATION"
+
+    def refresh_matches(table):
+        index = RangeIndex.refresh(connection, fqn, path=tmp_path)
+        rebuilt = RangeIndex.build(table["TAXONKEY"], table["H3_CELL_6"])
+        return (index.taxa == rebuilt.taxa).all() and (index.signatures == rebuilt.signatures).all()
+
+    assert refresh_matches(table[:split])
+    RangeIndex.refresh(connection, fqn, path=tmp_path)
+    assert len(connection.pair_queries) == 1
+
+    connection.replace(table)
+    assert refresh_matches(table)
+    assert f"GBIFID > {split - 1} " in connection.pair_queries[-1]
+
+    reclassified = table.assign(TAXONKEY=np.where(table["TAXONKEY"] == 1, 2, table["TAXONKEY"]))
+    connection.replace(reclassified)
+    assert refresh_matches(reclassified)
+    assert "GBIFID > -1 " in connection.pair_queries[-1]
+
+    reloaded = table[table["TAXONKEY"] != 3].assign(GBIFID=lambda df: np.arange(len(df)))
+    connection.replace(reloaded)
+    assert refresh_matches(reloaded)
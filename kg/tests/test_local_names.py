@@ -0,0 +1,84 @@
+import time
+
+import pandas as pd
+
+from kg.local.names import NameIndex, entries_frame, normalize_name, resolve_taxa
+
+
+def _entries():
+    taxa = pd.DataFrame({
+        "TAXONID": [1, 2, 3, 4],
+        "CANONICALNAME": ["Acaena", "Acaena novae-zelandiae", "Bellis perennis", "Crépis capillaris"],
+        "SCIENTIFICNAME": ["Acaena Mutis ex L.", "Acaena novae-zelandiae Kirk", "Bellis perennis L.", "Crepis capillaris (L.) Wallr."],
+    })
+    vernacular = pd.DataFrame({
+        "taxonID": [2, 3, 3],
+        "vernacularName": ["Bidibid", "Common Daisy", "Pâquerette"],
+    })
+    return entries_frame(taxa, vernacular)
+
+
+def test_normalize_name():
+    """Test case, diacritic and whitespace folding."""
+    assert normalize_name("  Pâquerette  VIVACE ") == "paquerette vivace"
+    assert normalize_name("Crépis") == normalize_name("CREPIS")
+
+
+def test_lookups(tmp_path):
+    """Test exact, prefix and fuzzy lookups over all name kinds."""
+    index = NameIndex.build(_entries(), tmp_path)
+
+    assert [m.taxon_id for m in index.exact("crepis CAPILLARIS")] == [4]
+    assert {(m.taxon_id, m.kind) for m in index.exact("paquerette")} == {(3, "vernacular")}
+    assert index.exact("Bellis") == []
+    assert [m.name for m in index.prefix("acaena n")] == ["Acaena novae-zelandiae", "Acaena novae-zelandiae Kirk"]
+    assert index.prefix("acaena", limit=1)[0].name == "Acaena"
+
+    fuzzy = index.fuzzy("Belis perenis")
+    print(fuzzy)
+    assert fuzzy[0].taxon_id == 3 and fuzzy[0].score < 1
+    assert index.taxon_ids("comon daisy") == [3]
+    assert index.taxon_ids("xyz") == []
+    assert resolve_taxa(["comon daisy", "42", "xyz"], index) == {"comon daisy": [3], "42": [42], "xyz": []}
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        index.exact("bellis perennis")
+    assert time.perf_counter() - start < 1.0
+
+
+def test_incremental_update(tmp_path):
+    """Test that updates only write changed taxa and shadow their old names."""
+    entries = _entries()
+    index = NameIndex.build(entries, tmp_path)
+    assert index.update(entries) == 0
+
+    renamed = entries[entries["taxon_id"] != 4].copy()
+    renamed.loc[renamed["name"] == "Bidibid", "name"] = "Biddy-biddy"
+    renamed = pd.concat([renamed, pd.DataFrame({"taxon_id": [5], "name": ["Daucus carota"], "kind": ["canonical"]})])
+    assert index.update(renamed) == 3
+    assert len(index.segments) == 2
+
+    assert index.exact("bidibid") == []
+    assert [m.taxon_id for m in index.exact("Biddy-Biddy")] == [2]
+    assert [m.name for m in index.exact("acaena novae-zelandiae")] == ["Acaena novae-zelandiae"]
+    assert index.exact("crepis capillaris") == []
+    assert index.taxon_ids("daucus carota") == [5]
+
+    compacted = NameIndex.load(tmp_path).compact()
+    assert len(compacted.segments) == 1
+    assert sorted(compacted.segments[0].all_entries()["name"]) == sorted(renamed["name"])
+
+
+def test_removals_only_update(tmp_path):
+    """Test that an update removing taxa writes a segment that only shadows them."""
+    entries = _entries()
+    index = NameIndex.build(entries, tmp_path)
+
+    assert index.update(entries[entries["taxon_id"] != 3]) == 1
+    assert len(index.segments) == 2
+    assert index.exact("bellis perennis") == []
+    assert index.exact("common daisy") == []
+    assert all(m.taxon_id != 3 for m in index.fuzzy("Belis perenis"))
+    assert [m.name for m in index.prefix("acaena n")] == ["Acaena novae-zelandiae", "Acaena novae-zelandiae Kirk"]
+    assert len(index.compact().segments[0].all_entries()) == len(entries[entries["taxon_id"] != 3])
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from kg.local.outliers import OUTLIER_TABLE, OutlierParams, accumulate_cells, flag_cells, h3_parent, write_outliers
+from kg.local.taxonomy import TaxonomyStore
+
+CELL = 0x8928308280FFFFF  # a resolution 9 cell in San Francisco
+
+
+def test_h3_parent():
+    """Test parent cells by bit rewriting against known indexes."""
+    assert h3_parent(CELL, 9) == CELL
+    assert h3_parent(CELL, 0) == 0x8029FFFFFFFFFFF
+    assert h3_parent(h3_parent(CELL, 6), 3) == h3_parent(CELL, 3)
+    assert (h3_parent([CELL, CELL], 5) >> 52 & 15).tolist() == [5, 5]
+
+
+def _observations(seed: int = 0):
+    rng = np.random.default_rng(seed)
+    n = 400
+    # species 2 around Seattle in 20 cells, plus one record with the longitude sign flipped
+    lat = np.r_[rng.normal(47.6, 0.3, n), 47.6]
+    lon = np.r_[rng.normal(-122.3, 0.3, n), 122.3]
+    cells = np.r_[rng.integers(0, 20, n), 999] + (6 << 52)
+    taxa = np.r_[np.full(n, 2), 3]  # 3 is a subspecies of 2
+    return pd.DataFrame({"TAXONKEY": taxa, "H3_CELL_6": cells, "LAT": lat, "LON": lon})
+
+
+def test_flags_far_cells():
+    """Test the streaming accumulation and that only the far record is flagged."""
+    observations = _observations()
+    batches = [observations.iloc[i : i + 50] for i in range(0, len(observations), 50)]
+    cells = accumulate_cells(batches)
+    assert cells["N"].sum() == len(observations)
+    assert len(cells) == observations.groupby(["TAXONKEY", "H3_CELL_6"]).ngroups
+
+    store = TaxonomyStore.build([1, 2, 3], [-1, 1, 2], ["genus", "species", "subspecies"])
+    flags = flag_cells(cells, store)
+    print(flags[flags["IS_OUTLIER"]])
+    assert flags.loc[flags["IS_OUTLIER"], "TAXONKEY"].tolist() == [3]
+    assert flags.loc[flags["IS_OUTLIER"], "REASON"].tolist() == ["distance"]
+    assert (flags["SPECIESID"] == 2).all()
+
+    # too few observations to model the species
+    assert not flag_cells(cells, store, OutlierParams(min_observations=1000))["IS_OUTLIER"].any()
+
+
+class _Connection:
+    """Records written frames and statements."""
+
+    def __init__(self):
+        self.written = {}
+        self.statements = []
+
+    def write_pandas(self, df, table, **kwargs):
+        self.written[table] = df
+
+    def sql(self, query):
+        self.statements.append(query)
+        return self
+
+    def collect(self):
+        return []
+
+
+def test_write_outliers_keeps_change_tracking():
+    """Test the recreated outlier table gets change tracking back for RAI."""
+    store = TaxonomyStore.build([1, 2, 3], [-1, 1, 2], ["genus", "species", "subspecies"])
+    flags = flag_cells(accumulate_cells([_observations()]), store)
+    connection = _Connection()
+    assert write_outliers(connection, flags, "ARQ_TEST", "PUBLIC") == 1
+    assert connection.written[OUTLIER_TABLE]["TAXONKEY"].tolist() == [3]
+    assert connection.statements == [f"alter table ARQ_TEST.PUBLIC.{OUTLIER_TABLE} set change_tracking=true"]
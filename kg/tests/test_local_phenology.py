@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from kg.local.phenology import DAYS, PhenologyIndex, season_days, smooth
+from kg.local.taxonomy import TaxonomyStore
+
+
+def _store():
+    # genus 1 with species 2 and 3, genus 4 with species 5
+    return TaxonomyStore.build(
+        [1, 2, 3, 4, 5], [-1, 1, 1, -1, 4], ["genus", "species", "species", "genus", "species"]
+    )
+
+
+def _days():
+    rows = [
+        # taxon, year, day, hemisphere, n
+        (2, 2020, 100, 0, 5),
+        (2, 2021, 101, 0, 3),
+        (3, 2021, 120, 0, 2),
+        (3, 2021, 10, 1, 4),
+        (1, 2021, 100, 0, 1),
+        (5, 2021, 200, 0, 7),
+        (99, 2021, 200, 0, 6),
+    ]
+    return pd.DataFrame(rows, columns=["TAXONKEY", "YEAR", "DAYOFYEAR", "HEMISPHERE", "N"])
+
+
+def test_histograms_roll_up(tmp_path):
+    """Test histograms include descendants, filter years and are cached per taxon."""
+    index = PhenologyIndex(_store(), _days(), tmp_path)
+    assert index.unmatched == 6
+
+    counts = index.histograms([1, 2, 5, 42])
+    assert counts.shape == (4, 2, DAYS)
+    assert counts[0, 0, 99] == 6 and counts[0, 0, 100] == 3 and counts[0, 0, 119] == 2
+    assert counts[0, 1, 9] == 4
+    assert counts[1].sum() == 8 and counts[2].sum() == 7 and counts[3].sum() == 0
+
+    assert index.histograms([1], years=(2021, 2021))[0].sum() == 10
+    assert (tmp_path / "histograms" / index.store.version / "2021-2021" / "1.npy").exists()
+    index.n[:] = 0  # cached histograms no longer touch the rows
+    assert index.histograms([1], years=(2021, 2021))[0].sum() == 10
+
+    # A rebuilt store (species 3 moved to genus 4) does not reuse the cached curves
+    moved = TaxonomyStore.build(
+        [1, 2, 3, 4, 5], [-1, 1, 4, -1, 4], ["genus", "species", "species", "genus", "species"]
+    )
+    assert moved.version != index.store.version
+    assert PhenologyIndex(moved, _days(), tmp_path).histograms([1], years=(2021, 2021))[0].sum() == 4
+
+
+def test_by_rank_matches_histograms():
+    """Test the one-pass rank phenology against per-taxon histograms."""
+    index = PhenologyIndex(_store(), _days())
+    genera = index.by_rank("genus")
+    assert genera.taxon_ids.tolist() == [1, 4]
+    assert (genera.counts == index.histograms([1, 4])).all()
+
+    summary = genera.summary()
+    print(summary)
+    assert summary[["taxon_id", "hemisphere"]].values.tolist() == [[1, "north"], [1, "south"], [4, "north"]]
+    assert summary["peak_day"].tolist() == [100, 10, 200]
+
+
+def test_season_days_wrap_around():
+    """Test smoothing keeps totals and seasons spanning the new year are not split."""
+    counts = np.zeros((1, DAYS))
+    counts[0, [350, 360, 5, 15]] = 10
+    curves = smooth(counts)
+    assert np.isclose(curves.sum(), 40)
+
+    peak, onset, end = season_days(curves)
+    assert onset[0] > 300 and end[0] < 60
+    assert (peak[0] > 300) or (peak[0] < 60)
+    assert [x[0] for x in season_days(np.zeros((1, DAYS)))] == [0, 0, 0]
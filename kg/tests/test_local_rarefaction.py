@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from kg.local.rarefaction import Abundances, accumulation_curve, rarefaction_table, rarefy
+from kg.local.taxonomy import TaxonomyStore
+
+
+def _abundances():
+    # genus 1 with species 2..5, a subspecies 6 of species 2
+    store = TaxonomyStore.build([1, 2, 3, 4, 5, 6], [-1, 1, 1, 1, 1, 2], ["genus"] + ["species"] * 4 + ["subspecies"])
+    counts = pd.DataFrame({
+        "REGION": ["A", "A", "A", "A", "A", "B", "B"],
+        "TAXONKEY": [2, 6, 3, 4, 5, 2, 1],
+        "N": [3, 2, 3, 1, 1, 4, 9],
+    })
+    return Abundances.from_counts(store, counts)
+
+
+def test_from_counts():
+    """Test the rollup to species, dropping observations above species level."""
+    abundances = _abundances()
+    assert abundances.region_ids.tolist() == ["A", "B"]
+    assert abundances.totals.tolist() == [10, 4]
+    assert abundances.richness.tolist() == [4, 1]
+
+
+def test_rarefy_against_resampling():
+    """Test the hypergeometric expectation against drawing observations without replacement."""
+    abundances = _abundances()
+    expected = rarefy(abundances, [1, 4, 10, 11])
+    np.testing.assert_allclose(expected[0, [0, 2]], [1, 4])
+    assert np.isnan(expected[0, 3]) and np.isnan(expected[1, 2])
+
+    rng = np.random.default_rng(0)
+    pool = np.repeat(np.arange(4), [5, 3, 1, 1])
+    draws = rng.permuted(np.tile(pool, (20000, 1)), axis=1)[:, :4]
+    sampled = np.mean([len(set(row)) for row in draws])
+    assert abs(expected[0, 1] - sampled) < 0.02
+
+
+def test_rarefaction_table():
+    """Test the default common sample size and the region filter."""
+    df = rarefaction_table(_abundances(), min_observations=1)
+    assert df.columns.tolist() == ["region", "observation_count", "species_count", "expected_species_4"]
+    np.testing.assert_allclose(df["expected_species_4"].iloc[1], 1)
+    assert rarefaction_table(_abundances(), min_observations=5)["region"].tolist() == ["A"]
+
+
+def test_accumulation_curve():
+    """Test that a curve rises from one species to the observed richness."""
+    curve = accumulation_curve(_abundances(), "A", points=10)
+    assert curve["observations"].iloc[0] == 1 and curve["observations"].iloc[-1] == 10
+    np.testing.assert_allclose(curve["expected_species"].iloc[[0, -1]], [1, 4])
+    assert (np.diff(curve["expected_species"]) > 0).all()
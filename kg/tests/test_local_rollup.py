@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from kg.local.rollup import rollup_observations
+from kg.local.taxonomy import TaxonomyStore
+
+
+TAXA = pd.DataFrame(
+    [
+        (1, None, "family"),
+        (10, 1, "genus"),
+        (11, 1, "genus"),
+        (100, 10, "species"),
+        (101, 10, "species"),
+        (110, 11, "species"),
+        (1000, 100, "subspecies"),
+    ],
+    columns=["taxonid", "parentnameusageid", "taxonrank"],
+)
+
+
+def test_rollup_counts():
+    """Test that observations roll up to every ancestor, counting observed species once."""
+    store = TaxonomyStore.from_frame(TAXA)
+    # Two observations of the subspecies, one of species 101, one of the genus 11 itself, one unknown taxon
+    rollup = rollup_observations(store, [1000, 1000, 101, 11, 999])
+    df = rollup.counts([1, 10, 11, 100, 101, 110, 1000, 999])
+    print(df)
+
+    assert df["observation_count"].tolist() == [4, 3, 1, 2, 1, 0, 2, 0]
+    assert df["species_count"].tolist() == [2, 2, 0, 1, 1, 0, 0, 0]
+    assert rollup.unmatched == 1
+
+
+def test_rollup_grouped_counts():
+    """Test that grouped counts give the same rollup as one row per observation."""
+    store = TaxonomyStore.from_frame(TAXA)
+    rows = rollup_observations(store, [1000, 1000, 101, 110, 110, 110])
+    grouped = rollup_observations(store, [1000, 101, 110], counts=[2, 1, 3])
+    assert np.array_equal(rows.observations, grouped.observations)
+
+    genera = grouped.to_frame(rank="genus")
+    print(genera)
+    assert genera["taxon_id"].tolist() == [10, 11]
+    assert genera["observation_count"].tolist() == [3, 3]
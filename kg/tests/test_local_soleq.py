@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from kg.local.soleq import EVENTS, delta_t, event_delta_t, solstice_equinox, write_seed
+
+SEEDS = Path(__file__).resolve().parents[2] / "dbt" / "seeds"
+
+
+def test_matches_astropixels_seed():
+    """Test the computed 2001-2100 instants against the astropixels seed, in minutes."""
+    seed = pd.read_csv(SEEDS / "astropixels_soleq.csv", parse_dates=list(EVENTS))
+    computed = solstice_equinox(2001, 2100)
+    assert computed.columns.tolist() == seed.columns.tolist()
+    assert computed["year"].tolist() == seed["year"].tolist()
+
+    error = np.abs(np.stack([(computed[e] - seed[e]).dt.total_seconds() / 60 for e in EVENTS], axis=1))
+    print(f"mean {error.mean():.2f} min, max {error.max():.0f} min")
+    assert error.max() <= 1
+    assert error.mean() < 0.1
+
+
+def test_any_year_range():
+    """Test years outside the 64-bit nanosecond range and the order of events."""
+    df = solstice_equinox(1600, 1900)
+    assert len(df) == 301
+    assert (df["spring_equinox"].dt.year == df["year"]).all()
+    assert (df["winter_solstice"].dt.month == 12).all()
+    for earlier, later in zip(EVENTS, EVENTS[1:]):
+        assert (df[later] > df[earlier]).all()
+    assert df.loc[df["year"] == 1850, "summer_solstice"].iloc[0] == pd.Timestamp("1850-06-21 19:58")
+
+
+def test_seed_delta_t_only_in_seed_years():
+    """Test the per-year seed ΔT applies to 2001-2100 and the polynomials elsewhere."""
+    assert (event_delta_t([2000, 2101]) == delta_t(np.array([[2000], [2101]]) + [0.22, 0.47, 0.72, 0.97])).all()
+    assert abs(event_delta_t([2001])[0, 0] - delta_t(2001.22)) < 30
+
+
+def test_delta_t():
+    """Test ΔT against tabulated values (seconds)."""
+    assert abs(delta_t(1900) - -2.8) < 0.5
+    assert abs(delta_t(2000) - 63.9) < 0.5
+    assert abs(delta_t(1700) - 8.8) < 1
+
+
+def test_write_seed(tmp_path):
+    """Test the seed CSV round trips in the astropixels format."""
+    path = tmp_path / "soleq.csv"
+    write_seed(path, 2001, 2002)
+    assert path.read_text().splitlines()[:2] == (SEEDS / "astropixels_soleq.csv").read_text().splitlines()[:2]
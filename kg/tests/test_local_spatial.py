@@ -0,0 +1,55 @@
+import numpy as np
+
+from kg.local.spatial import SpatialIndex, chord_of, meters_of, to_xyz
+from kg.local.taxonomy import TaxonomyStore
+
+
+def _observations(n: int = 5000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    # a dense cluster plus points spread over the globe
+    lat = np.r_[rng.normal(45, 2, n // 2), np.degrees(np.arcsin(rng.uniform(-1, 1, n - n // 2)))]
+    lon = np.r_[rng.normal(-120, 2, n // 2), rng.uniform(-180, 180, n - n // 2)]
+    taxa = rng.choice([2, 3, 5], n)
+    years = rng.integers(2000, 2025, n)
+    return lat, lon, np.arange(n) + 1000, taxa, years
+
+
+def _brute_force(lat, lon, qlat, qlon):
+    return meters_of(np.linalg.norm(to_xyz(lat, lon) - to_xyz(qlat, qlon), axis=1))
+
+
+def test_radius_and_knn_match_brute_force(tmp_path):
+    """Test batched radius and k-NN queries against all distances."""
+    lat, lon, ids, taxa, years = _observations()
+    index = SpatialIndex.build(lat, lon, ids, taxa, years, leaf_size=16, path=tmp_path)
+    assert len(index) == len(lat)
+
+    queries = [(45.0, -120.0), (0.0, 0.0), (-89.0, 10.0)]
+    radius = index.radius([q[0] for q in queries], [q[1] for q in queries], 300_000)
+    knn = index.knn([q[0] for q in queries], [q[1] for q in queries], k=7)
+    print(knn.head(10))
+    for i, (qlat, qlon) in enumerate(queries):
+        distance = _brute_force(lat, lon, qlat, qlon)
+        expected = set(ids[distance <= 300_000])
+        assert set(radius.loc[radius["query"] == i, "gbif_id"]) == expected
+        nearest = knn[knn["query"] == i]
+        assert np.allclose(nearest["distance_m"], np.sort(distance)[:7])
+        assert nearest["distance_m"].is_monotonic_increasing
+
+
+def test_filters():
+    """Test the taxon subtree and year filters."""
+    lat, lon, ids, taxa, years = _observations(2000, 1)
+    store = TaxonomyStore.build([1, 2, 3, 5], [-1, 1, 1, -1], ["family", "genus", "genus", "family"])
+    index = SpatialIndex.build(lat, lon, ids, taxa, years)
+
+    knn = index.knn(45.0, -120.0, k=5, taxon_id=1, years=(2010, 2012), store=store)
+    distance = _brute_force(lat, lon, 45.0, -120.0)
+    allowed = np.isin(taxa, [2, 3]) & (years >= 2010) & (years <= 2012)
+    assert np.allclose(knn["distance_m"], np.sort(distance[allowed])[:5])
+    assert set(knn["taxon_id"]) <= {2, 3}
+
+    # fewer matches than k: every match is returned
+    rare = index.knn(0.0, 0.0, k=10_000, taxon_id=5, years=(2024, 2024), store=store)
+    assert len(rare) == ((taxa == 5) & (years == 2024)).sum()
+    assert np.isclose(chord_of(meters_of(0.5)), 0.5)
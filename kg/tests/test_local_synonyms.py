@@ -0,0 +1,48 @@
+import pandas as pd
+
+from kg.local.synonyms import MAX_HOPS, SynonymMap, recovery_report
+from kg.local.taxonomy import TaxonomyStore
+
+
+# 20 is a synonym of 10, 21 a synonym of the synonym 20, 22 points at a
+# missing taxon and 30/31 are synonyms of each other
+TAXA = pd.DataFrame(
+    [
+        (1, None, None, "genus"),
+        (10, 1, None, "species"),
+        (20, None, 10, "species"),
+        (21, None, 20, "species"),
+        (22, None, 999, "species"),
+        (30, None, 31, "species"),
+        (31, None, 30, "species"),
+    ],
+    columns=["taxonid", "parentnameusageid", "acceptednameusageid", "taxonrank"],
+)
+
+
+def test_synonym_chains(tmp_path):
+    """Test that synonym chains resolve to the accepted taxon and dead ends map to themselves."""
+    synonyms = SynonymMap.build(TAXA["taxonid"], TAXA["acceptednameusageid"], tmp_path)
+    resolved = synonyms.resolve([1, 10, 20, 21, 22, 30, 31, 12345])
+    print(resolved)
+    assert resolved.tolist() == [1, 10, 10, 10, 22, 30, 31, 12345]
+    assert (tmp_path / "accepted.npy").exists()
+
+
+def test_hop_limit():
+    """Test that chains resolve up to MAX_HOPS links, as in dbt, and longer ones map to themselves."""
+    chain = list(range(100, 100 + MAX_HOPS + 2))
+    synonyms = SynonymMap.build(chain, [None] + chain[:-1])
+    resolved = synonyms.resolve(chain)
+    assert resolved[: MAX_HOPS + 1].tolist() == [100] * (MAX_HOPS + 1)
+    assert resolved[-1] == chain[-1]
+
+
+def test_recovery_report():
+    """Test the observations recovered per rank by resolving synonyms."""
+    store = TaxonomyStore.from_frame(TAXA)
+    synonyms = SynonymMap.build(TAXA["taxonid"], TAXA["acceptednameusageid"])
+    report = recovery_report(store, synonyms, [10, 20, 21, 22], counts=[5, 3, 2, 1]).set_index("rank")
+    print(report)
+    assert report.loc["genus"].tolist() == [5, 10, 5]
+    assert report.loc["species"].tolist() == [11, 11, 0]
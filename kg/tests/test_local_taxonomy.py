@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from kg.local.taxonomy import TaxonomyStore
+
+
+# Small backbone shaped like GBIF: ids are sparse, 99 has a missing parent,
+# 50 is a self-parent and 60/61 form a cycle
+TAXA = pd.DataFrame(
+    [
+        (6, None, "kingdom"),
+        (7, 6, "phylum"),
+        (220, 7, "class"),
+        (1000, 220, "order"),
+        (2000, 1000, "family"),
+        (2001, 1000, "family"),
+        (3000, 2000, "genus"),
+        (3001, 2001, "genus"),
+        (4000, 3000, "species"),
+        (4001, 3000, "species"),
+        (4002, 3001, "species"),
+        (5000, 4000, "variety"),
+        (99, 12345, "species"),
+        (50, 50, "genus"),
+        (60, 61, "genus"),
+        (61, 60, "genus"),
+    ],
+    columns=["taxonid", "parentnameusageid", "taxonrank"],
+)
+
+
+def test_store_round_trip(tmp_path):
+    """Test that a saved store reopens memory-mapped with the same answers."""
+    built = TaxonomyStore.from_frame(TAXA)
+    store = TaxonomyStore.from_frame(TAXA, tmp_path)
+    print(store.ranks)
+    assert isinstance(store.pre, np.memmap)
+    assert len(store) == len(TAXA)
+    for name in ("ids", "parent", "pre", "last", "order", "ancestor_genus"):
+        assert np.array_equal(getattr(built, name), getattr(store, name))
+    assert store.version == built.version
+    assert TaxonomyStore.from_frame(TAXA.assign(taxonrank="genus")).version != built.version
+
+
+def test_ancestor_checks():
+    """Test ancestor, subtree and rank-at-level lookups."""
+    store = TaxonomyStore.from_frame(TAXA)
+
+    assert store.is_ancestor(2000, [4000, 4001, 5000, 4002, 2000, 6]).tolist() == [True, True, True, False, True, False]
+    assert store.is_ancestor([6, 7, 2001, 123], 4002).tolist() == [True, True, True, False]
+    assert store.in_subtree(3000, [4000, 5000, 3001]).tolist() == [True, True, False]
+    assert sorted(store.subtree(3000)) == [3000, 4000, 4001, 5000]
+    assert store.subtree(3000)[0] == 3000
+    assert len(store.subtree(6)) == 12
+
+    assert store.ancestor_at_rank([4000, 5000, 4002, 2000, 99], "genus").tolist() == [3000, 3000, 3001, -1, -1]
+    assert store.ancestor_at_rank([5000, 3000], "family").tolist() == [2000, 2000]
+    assert store.ancestor_at_rank(5000, "species").tolist() == [4000]
+    assert store.parent_of([4000, 6, 99, 50, 123]).tolist() == [3000, -1, -1, -1, -1]
+    assert store.rank_of([5000, 123]).tolist() == ["variety", None]
+
+
+def test_cycles_become_roots():
+    """Test that parent cycles are cut instead of dropping taxa."""
+    store = TaxonomyStore.from_frame(TAXA)
+    cycle = store.positions([60, 61])
+    print(store.parent[cycle], store.depth[cycle])
+    assert (store.parent[cycle] == -1).all()
+    assert sorted(store.order.tolist()) == list(range(len(TAXA)))
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from kg.local.taxonomy import TaxonomyStore
+from kg.local.trends import TrendIndex, rank_counts, rolling_slopes, with_trends
+
+
+def _store():
+    return TaxonomyStore.build([1, 2, 3, 4], [-1, 1, 1, 2], ["genus", "species", "species", "subspecies"])
+
+
+def _counts():
+    rows = []
+    for year in range(2000, 2010):
+        step = year - 2000
+        rows += [(2, "US", year, 10 + 2 * step), (4, "US", year, 5), (3, "US", year, 45 - 2 * step), (3, "CA", year, 10)]
+        rows += [(None, "US", year, 40)]  # unclassified records still count as effort
+    df = pd.DataFrame(rows, columns=["TAXONKEY", "REGION", "YEAR", "N"])
+    return df.astype({"TAXONKEY": "Int64"})
+
+
+def test_rank_counts():
+    """Test rollup to the rank and effort per region and year."""
+    df = rank_counts(_store(), _counts(), "species", by_region=True)
+    us_2003 = df[(df["taxon_id"] == 2) & (df["region"] == "US") & (df["year"] == 2003)].iloc[0]
+    assert us_2003["observations"] == 16 + 5  # the subspecies rolls up
+    assert us_2003["effort"] == 100
+    assert set(df.loc[df["taxon_id"] == 3, "region"]) == {"US", "CA"}
+
+    overall = rank_counts(_store(), _counts(), "genus")
+    assert overall["region"].unique().tolist() == [""]
+    assert (overall["observations"] == 70).all()
+    assert (overall["effort"] == 110).all()
+
+
+def test_trend_slopes():
+    """Test shares and rolling slopes against the linear trends they were built from."""
+    df = with_trends(rank_counts(_store(), _counts(), "species", by_region=True), window=4)
+    rising = df[(df["taxon_id"] == 2) & (df["region"] == "US")]
+    np.testing.assert_allclose(rising["share"], (15 + 2 * np.arange(10)) / 100)
+    assert rising["slope"].isna().sum() == 2  # fewer than 3 years in the first windows
+    np.testing.assert_allclose(rising["slope"].dropna(), 0.02)
+    falling = df[(df["taxon_id"] == 3) & (df["region"] == "US")]
+    np.testing.assert_allclose(falling["slope"].dropna(), -0.02)
+    np.testing.assert_allclose(df.loc[df["region"] == "CA", "slope"].dropna(), 0)
+
+
+def test_missing_years():
+    """Test that years without effort are skipped and years without the taxon count as zero."""
+    values = np.array([[0.0, 1, 2, np.nan, 4, 5]])
+    np.testing.assert_allclose(rolling_slopes(values, ~np.isnan(values), 3, 2)[0, 1:], 1)
+
+    rows = pd.DataFrame({
+        "taxon_id": [1, 1, 2, 2, 2],
+        "region": ["US"] * 5,
+        "year": [2000, 2002, 2000, 2001, 2002],
+        "observations": [4, 4, 1, 1, 1],
+        "effort": [10, 10, 10, 10, 10],
+    })
+    df = with_trends(rows, window=3, min_years=3)
+    first = df[df["taxon_id"] == 1]
+    assert first["observations"].tolist() == [4, 0, 4]
+    assert first["slope"].iloc[-1] == 0
+
+
+def test_index_cache(tmp_path):
+    """Test that trends are cached per rank and parameters."""
+    index = TrendIndex(_store(), _counts(), tmp_path)
+    df = index.by_rank("species", window=4)
+    assert (tmp_path / "trends" / index.store.version / "species" / "all-w4-m3.parquet").exists()
+    pd.testing.assert_frame_equal(TrendIndex(_store(), _counts().iloc[:0], tmp_path).by_rank("species", window=4), df)
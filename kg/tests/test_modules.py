@@ -0,0 +1,59 @@
+import relationalai.semantics as rai
+from relationalai.semantics.internal.snowflake import Table
+
+from kg.apps.observation_eda import observations_per_genus
+from kg.model import OPTIONAL_MODULES, _defined_modules, define_arq, observation_sources
+
+
+def _bound_tables(monkeypatch, **kwargs):
+    """Define a dry-run model and return the defined modules and the source tables it binds."""
+    monkeypatch.setattr(Table, "_schemas", {})
+    m = rai.Model("arq_modules_test", dry_run=True)
+    define_arq(m, **kwargs)
+    tables = {t for info in Table._schemas.values() for t in info.tables}
+    return _defined_modules[m], tables
+
+
+def test_default_model_binds_only_dbt_tables(monkeypatch):
+    """Test the default model does not bind tables only the kg.apps tools write."""
+    modules, tables = _bound_tables(monkeypatch)
+    print(sorted(modules), sorted(tables))
+    assert not modules & set(OPTIONAL_MODULES)
+    assert "OBSERVATION_OUTLIER_CELLS" not in tables
+    assert "OBSERVATION_DUPLICATES" not in tables
+    assert "OBSERVATION_10K" in tables and "TAXON" in tables
+
+
+def test_optional_modules_on_request(monkeypatch):
+    """Test outliers and duplicates are defined when a query or modules= asks for them."""
+    modules, tables = _bound_tables(monkeypatch, query=lambda arq: observations_per_genus(arq, exclude_outliers=True))
+    assert "outliers" in modules and "OBSERVATION_OUTLIER_CELLS" in tables
+    assert "duplicates" not in modules
+    modules, tables = _bound_tables(monkeypatch, query=lambda arq: observations_per_genus(arq, deduplicate=True))
+    assert "duplicates" in modules and "OBSERVATION_DUPLICATES" in tables
+    modules, _ = _bound_tables(monkeypatch, modules=["outliers", "duplicates"])
+    assert {"outliers", "duplicates"} <= modules
+
+
+def test_pruned_properties_bound_from_projections():
+    """Test a pruned model binds only the projection views holding the properties it reads."""
+    m = rai.Model("arq_projections_test", dry_run=True)
+    define_arq(m, query=observations_per_genus)
+    assert observation_sources(m) == ["TEAM_ARQ.PUBLIC.OBSERVATION_10k_TAXON"]
+    define_arq(m, query=lambda arq: rai.select(arq.Observation.latitude))
+    assert observation_sources(m) == ["TEAM_ARQ.PUBLIC.OBSERVATION_10k_LOCATION", "TEAM_ARQ.PUBLIC.OBSERVATION_10k_TAXON"]
+
+    m = rai.Model("arq_projections_test", dry_run=True)
+    define_arq(m, query=observations_per_genus, project_observations=False)
+    assert observation_sources(m) == ["TEAM_ARQ.PUBLIC.OBSERVATION_10k"]
+    m = rai.Model("arq_projections_test", dry_run=True)
+    define_arq(m)
+    assert observation_sources(m) == ["TEAM_ARQ.PUBLIC.OBSERVATION_10k"]
+
+
+def test_materialized_classification_bound_per_tier(monkeypatch):
+    """Test the materialized classification is read from the bound tier's view."""
+    _, tables = _bound_tables(
+        monkeypatch, modules=["classification"], observation_table="OBSERVATION_1m", materialized_classification=True
+    )
+    assert "OBSERVATION_1M_CLASSIFICATION" in tables and "OBSERVATION_CLASSIFICATION" not in tables
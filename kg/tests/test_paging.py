@@ -0,0 +1,78 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from kg.paging import ResultCursor
+
+
+class _Key:
+    def __gt__(self, value):
+        return ("after", value)
+
+
+class _Fragment:
+    """Stands in for a query fragment over a frame, recording the pages queried and their threads."""
+
+    def __init__(self, df: pd.DataFrame, log: list, after=None, limit=None):
+        self.df, self.log, self._after, self._limit = df, log, after, limit
+
+    def where(self, condition):
+        assert condition[0] == "after" and isinstance(condition[1], int)
+        return _Fragment(self.df, self.log, condition[1], self._limit)
+
+    def order_by(self, key):
+        return self
+
+    def limit(self, n):
+        return _Fragment(self.df, self.log, self._after, n)
+
+    def to_df(self):
+        self.log.append((self._after, threading.current_thread().name))
+        df = self.df if self._after is None else self.df[self.df["id"] > self._after]
+        # pages come back in no particular order
+        return df.sort_values("id").head(self._limit).sample(frac=1, random_state=0)
+
+
+def _records(n: int = 25) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id": rng.permutation(np.arange(100, 100 + 3 * n, 3)),
+        "country_code": rng.choice(["US", "CA"], n),
+    })
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_pages_cover_result_once(prefetch):
+    """Test that keyset pages return every row once, in key order, on a background thread when prefetching."""
+    df, log = _records(), []
+    cursor = ResultCursor(_Fragment(df, log), _Key(), "id", page_size=10, prefetch=prefetch)
+    pages = list(cursor)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert pd.concat(pages)["id"].tolist() == sorted(df["id"])
+    assert (cursor.pages, cursor.rows) == (3, 25)
+    assert [after for after, _ in log] == [None, pages[0]["id"].iloc[-1], pages[1]["id"].iloc[-1]]
+    assert all(name.startswith("arq-page") for _, name in log) == prefetch
+
+
+def test_resume_and_exact_pages():
+    """Test resuming after a key, and a final empty page when the result fills the last page exactly."""
+    df, log = _records(20), []
+    pages = list(ResultCursor(_Fragment(df, log), _Key(), "id", page_size=10, prefetch=False))
+    assert [len(page) for page in pages] == [10, 10] and len(log) == 3
+
+    after = int(pages[0]["id"].iloc[-1])
+    rest = list(ResultCursor(_Fragment(df, []), _Key(), "id", page_size=10, after=after))
+    pd.testing.assert_frame_equal(rest[0], pages[1])
+
+
+def test_write_parquet(tmp_path):
+    """Test streaming pages into one Parquet file, uncompacted so every page has the same types."""
+    df = _records()
+    cursor = ResultCursor(_Fragment(df, []), _Key(), "id", page_size=7, compact=True)
+    assert cursor.write_parquet(tmp_path / "records.parquet") == 25
+    written = pq.read_table(tmp_path / "records.parquet").to_pandas()
+    assert written["id"].tolist() == sorted(df["id"])
+    assert written["country_code"].astype(str).tolist() == df.sort_values("id")["country_code"].tolist()
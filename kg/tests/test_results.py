@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from kg.results import compact, memory_report
+
+
+def _result(n: int = 1000) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id": rng.integers(1, 5_000_000_000, n),
+        "taxon_id": rng.integers(1, 10_000_000, n),
+        "day_of_year": rng.integers(1, 367, n),
+        "h3_cell_9": np.full(n, 0x8928308280FFFFF),
+        "genus_id": np.where(rng.random(n) < 0.1, np.nan, rng.integers(1, 1000, n)),
+        "year": [Decimal(int(y)) for y in rng.integers(1900, 2026, n)],
+        "country_code": rng.choice(["US", "CA", "MX", None], n),
+        "canonical_name": [f"Species {i}" for i in range(n)],
+        "latitude": rng.uniform(-90, 90, n),
+    })
+
+
+def test_compact_types():
+    """Test categoricals for repeated strings and the narrowest integer types, keeping values."""
+    df = _result()
+    out = compact(df)
+    assert out.dtypes.astype(str).to_dict() == {
+        "id": "int64",
+        "taxon_id": "int32",
+        "day_of_year": "int16",
+        "h3_cell_9": "int64",
+        "genus_id": "Int16",
+        "year": "int16",
+        "country_code": "category",
+        "canonical_name": "object",  # every value distinct
+        "latitude": "float64",
+    }
+    assert out["genus_id"].isna().sum() == df["genus_id"].isna().sum()
+    assert out["country_code"].isna().sum() == df["country_code"].isna().sum()
+    assert (out["year"].astype(int) == df["year"].astype(int)).all()
+    columns = ["id", "taxon_id", "day_of_year", "h3_cell_9"]
+    assert (out[columns] == df[columns]).all().all()
+    assert out["country_code"].astype(object).equals(df["country_code"])
+
+
+def test_memory_report():
+    """Test that the report totals the per-column memory and the saving."""
+    df = _result()
+    report = memory_report(df, compact(df))
+    total = report.iloc[-1]
+    assert total["column"] == "total"
+    assert total["bytes_before"] == report["bytes_before"].iloc[:-1].sum()
+    assert 0.3 < total["saved"] < 1
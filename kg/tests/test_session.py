@@ -0,0 +1,56 @@
+from kg.apps.observation_eda import observations_per_genus, species_before_summer_solstice_by_class
+from kg.session import SessionPool
+
+
+class _Connection:
+    """Stands in for a Snowflake session that can be made to fail its health check."""
+
+    def __init__(self):
+        self.alive = True
+
+    def sql(self, query):
+        if not self.alive:
+            raise ConnectionError("session expired")
+        return self
+
+    def collect(self):
+        return []
+
+
+def _pool(monkeypatch) -> SessionPool:
+    monkeypatch.setenv("ARQ_COMPILE_CACHE", "0")
+    monkeypatch.delenv("ARQ_MODEL_NAME", raising=False)
+    monkeypatch.delenv("ARQ_OBSERVATION_TABLE", raising=False)
+    pool = SessionPool(health_check_interval=0.0)
+    monkeypatch.setattr(pool, "_connect", _Connection)
+    return pool
+
+
+def test_shared_name_per_program(monkeypatch):
+    """Test queries defining different module subsets never share a model name."""
+    pool = _pool(monkeypatch)
+    assert pool.shared_name() == "arq"
+    genus = pool.shared_name(observations_per_genus)
+    assert genus.startswith("arq_") and genus == pool.shared_name(observations_per_genus)
+    assert genus != pool.shared_name(species_before_summer_solstice_by_class)
+    assert pool.shared_name(modules=["taxon"]) != pool.shared_name(modules=["taxon", "observation"])
+    assert SessionPool(observation_table="OBSERVATION_1m").shared_name() != "arq"
+
+    first = pool.arq(query=observations_per_genus)
+    assert first.name == genus
+    assert pool.arq(query=observations_per_genus) is first
+    assert pool.stats.reuses == 1
+    assert pool.arq(query=species_before_summer_solstice_by_class) is not first
+
+
+def test_reconnect_rebinds_models(monkeypatch):
+    """Test models handed out before a reconnect run on the new session."""
+    pool = _pool(monkeypatch)
+    m = pool.arq(modules=["taxon"])
+    old = pool.connection()
+    assert m._connection is old
+
+    old.alive = False
+    new = pool.connection()
+    assert new is not old
+    assert m._connection is new and m._executor is None
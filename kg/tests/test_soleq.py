@@ -181,3 +181,36 @@ def test_fall_equinox_hemispheres(arq: ARQModel):
     assert result.shape == (1, 2)
     assert result.iloc[0]["year"] == 2001
     assert result.iloc[0]["datetime"] == Timestamp("2001-09-22 23:05:00")
+
+
+def test_observation_season(arq: ARQModel):
+    """Test that observations get one season, by their own hemisphere's boundaries."""
+    result = rai.where(
+        arq.Observation.season(arq.Season),
+        seasons := rai.count(arq.Season).per(arq.Observation),
+        seasons > 1,
+    ).select(
+        arq.Observation.id,
+    ).to_df()
+    print(result)
+    assert result.empty
+
+    # spring in the north starts at the March equinox, and it is fall in the south
+    result = rai.where(
+        arq.Observation.season(arq.SeasonSpring),
+        arq.Observation.hemisphere(arq.HemisphereNorth),
+        arq.Observation.event_datetime < arq.Observation.year.march_equinox,
+    ).select(
+        arq.Observation.id,
+    ).to_df()
+    assert result.empty
+    result = rai.where(
+        arq.Observation.hemisphere(arq.HemisphereSouth),
+        arq.Observation.event_datetime >= arq.Observation.year.march_equinox,
+        arq.Observation.event_datetime < arq.Observation.year.june_solstice,
+        rai.not_(arq.Observation.season(arq.SeasonFall)),
+    ).select(
+        arq.Observation.id,
+    ).to_df()
+    print(result)
+    assert result.empty
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Tuple
+
+# Startup budget for commands that must not import relationalai, override with ARQ_STARTUP_BUDGET
+STARTUP_BUDGET_SECONDS = float(os.environ.get("ARQ_STARTUP_BUDGET", 1.0))
+REPO_ROOT = Path(__file__).parents[2]
+
+
+def _run(*args: str) -> Tuple[float, subprocess.CompletedProcess]:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], capture_output=True, text=True, check=False, cwd=REPO_ROOT)
+    return time.perf_counter() - start, result
+
+
+def test_eda_help_within_budget():
+    """Test that --help and argument errors return without importing the model."""
+    elapsed, result = _run("-m", "kg.apps.observation_eda", "--help")
+    print("--help", f"{elapsed:.2f}s")
+    assert result.returncode == 0, result.stderr
+    assert "observations_per_genus" in result.stdout
+    assert elapsed < STARTUP_BUDGET_SECONDS
+
+    elapsed, result = _run("-m", "kg.apps.observation_eda", "not_a_query")
+    print("not_a_query", f"{elapsed:.2f}s")
+    # argparse rejects the query (exit 2) rather than the module crashing on import
+    assert result.returncode == 2, result.stderr
+    assert "invalid choice: 'not_a_query'" in result.stderr
+    assert elapsed < STARTUP_BUDGET_SECONDS
+
+
+def test_eda_listing_does_not_import_relationalai():
+    """Test that discovering the EDA queries leaves relationalai unimported."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from kg.apps.observation_eda import _get_query_functions; "
+            "print(sorted(_get_query_functions())); print('relationalai' in sys.modules)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    )
+    print(result.stdout)
+    queries, imported = result.stdout.strip().splitlines()
+    assert "observations_per_genus" in queries
+    assert imported == "False"
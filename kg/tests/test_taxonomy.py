@@ -166,3 +166,63 @@ def test_taxon_class(arq: ARQModel):
     assert result.iloc[0]["canonicalname"] == "Sulfolobales"
     assert result.iloc[0]["id2"] == 10705623
     assert result.iloc[0]["canonicalname2"] == "Thermoproteia"
+
+def test_subtree_rollup(arq: ARQModel):
+    """Test that every rollup is exactly the taxon's own observations plus its children's rollups,
+    eg a genus counts the observations classified as the genus plus those of each of its species."""
+    child = arq.Taxon.ref()
+    rollup = rai.select(
+        arq.Taxon.id.alias("id"),
+        arq.Taxon.rank.alias("rank"),
+        arq.Taxon.observation_count.alias("rollup"),
+    ).to_df()
+    direct = rai.where(
+        arq.Observation.classification(arq.Taxon),
+        obs_count := rai.count(arq.Observation).per(arq.Taxon),
+    ).select(
+        arq.Taxon.id.alias("id"),
+        obs_count.alias("direct"),
+    ).to_df()
+    children = rai.where(
+        child.parent(arq.Taxon),
+    ).select(
+        arq.Taxon.id.alias("id"),
+        child.observation_count.alias("child_rollup"),
+    ).to_df()
+
+    expected = rollup.merge(direct, on="id", how="left").merge(
+        children.groupby("id", as_index=False)["child_rollup"].sum(), on="id", how="left"
+    ).fillna({"direct": 0, "child_rollup": 0})
+    expected["expected"] = expected["direct"] + expected["child_rollup"]
+    print(expected[expected["rank"] == "genus"].head())
+    assert (expected["rank"] == "genus").any()
+    assert (expected["rollup"].astype("int64") == expected["expected"].astype("int64")).all()
+
+def test_accepted_taxon(arq: ARQModel):
+    """Test that every observation resolves to an accepted taxon that is its own accepted taxon."""
+    result = rai.select(
+        rai.count(arq.Observation),
+        rai.count(arq.Observation).where(arq.Observation.accepted_taxon(arq.Taxon)),
+        rai.count(arq.Taxon).where(arq.Observation.accepted_taxon(arq.Taxon), arq.Taxon.accepted(arq.Taxon)),
+        rai.count(arq.Taxon).where(arq.Observation.accepted_taxon(arq.Taxon)),
+    ).to_df()
+    print(result)
+    assert result.iloc[0, 0] == result.iloc[0, 1]
+    assert result.iloc[0, 2] == result.iloc[0, 3]
+
+def test_observation_ranks_match_chain(arq: ARQModel):
+    for rank, concept in (("genus", arq.Genus), ("family", arq.Family), ("class_", arq.Class)):
+        derived = rai.where(
+            getattr(arq.Observation, rank)(concept),
+        ).select(
+            rai.count(arq.Observation, concept).alias("observations"),
+        ).to_df()
+        chain = rai.where(
+            arq.Observation.classification(arq.Taxon),
+            getattr(arq.Taxon, rank)(concept),
+        ).select(
+            rai.count(arq.Observation, concept).alias("observations"),
+        ).to_df()
+        print(rank, derived, chain)
+        assert derived["observations"].iloc[0] > 0
+        assert derived["observations"].iloc[0] == chain["observations"].iloc[0]
@@ -5,7 +5,9 @@ use role team_arq;
 use database team_arq;
 use schema source;
 
-create table if not exists gbif_observation
+-- replaced (and reloaded from every part below) so a table created before the
+-- h3_cell_* columns picks them up; COPY matching by name would silently skip them
+create or replace table gbif_observation
 (
     gbifID int,
     datasetKey string,
@@ -56,19 +58,22 @@ create table if not exists gbif_observation
     establishmentMeans string, -- no values
     lastInterpreted timestamp_tz,
     mediaType string,
-    issue string
+    issue string,
+    -- precomputed by `uv run -m kg.apps.ingest_observations` (kg/local/h3cells.py)
+    h3_cell_6 int,
+    h3_cell_7 int,
+    h3_cell_8 int,
+    h3_cell_9 int,
+    h3_cell_10 int
 );
 
-PUT file://<% path %> @gbif/observation parallel=32;
+-- path: the output directory of `uv run -m kg.apps.ingest_observations <tsv> --out <path>`
+PUT file://<% path %>/*.parquet @gbif/observation parallel=32;
 
 COPY INTO gbif_observation
 FROM @gbif/observation
-FILE_FORMAT = (
-    TYPE = CSV,
-    FIELD_DELIMITER = '\t',
-    SKIP_HEADER = 1,
-    ESCAPE_UNENCLOSED_FIELD = None -- todo: lastInterpreted is missing / malformed in some cases
-);
+FILE_FORMAT = (TYPE = PARQUET)
+MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE;
 
 select count(*) from gbif_observation;
 -- 23279065